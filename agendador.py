@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Atualização agendada dos produtos do cache, em segundo plano.
+
+Mantém o banco aquecido: os produtos são extraídos novamente antes de
+ficarem desatualizados, em vez de esperar que um cliente os peça. A cada
+rodada, os produtos com idade acima de AGENDADOR_IDADE_MINIMA são ordenados
+pela prioridade (idade x popularidade, ver
+`banco_dados.get_produtos_para_atualizar`) e atualizados dentro do limite de
+AGENDADOR_REQUISICOES_POR_MINUTO requisições ao site.
+
+A popularidade vem dos acessos de cada URL, contados em memória pelos
+servidores (`ContadorAcessos`) e gravados no banco periodicamente.
+
+Execução:
+
+- processo separado (recomendado, um único agendador para todos os workers):
+  ``python agendador.py``
+- thread dentro do servidor, com AGENDADOR_THREAD=true: cada worker do
+  gunicorn inicia a sua thread, mas só o worker que detém a liderança
+  (`banco_dados.Lideranca`) faz as atualizações, de modo que o limite vale
+  para o conjunto dos workers; se esse worker cair, outro assume.
+
+Um processo separado e as threads disputam a mesma liderança, então
+também nunca rodam ao mesmo tempo.
+"""
+
+import os
+import time
+import signal
+import threading
+import logging
+from cache_produtos import TTL_FRESCO
+from limite_taxa import LimiteTaxa
+
+logger = logging.getLogger(__name__)
+
+# Requisições ao site por minuto feitas pelo agendador
+REQUISICOES_POR_MINUTO = float(os.environ.get('AGENDADOR_REQUISICOES_POR_MINUTO', 30))
+
+# Idade (segundos) a partir da qual um produto entra na fila de atualização;
+# por padrão, antes de o produto deixar de ser fresco
+IDADE_MINIMA = float(os.environ.get('AGENDADOR_IDADE_MINIMA', TTL_FRESCO * 0.8))
+
+# Espera (segundos) entre as rodadas quando não há produtos a atualizar
+INTERVALO = float(os.environ.get('AGENDADOR_INTERVALO', 60))
+
+# Intervalo (segundos) entre as gravações dos acessos contados em memória
+INTERVALO_GRAVACAO_ACESSOS = float(os.environ.get('AGENDADOR_GRAVACAO_ACESSOS', 30))
+
+# Tempo (segundos) sem tentar novamente um produto cuja atualização falhou
+ESPERA_APOS_FALHA = float(os.environ.get('AGENDADOR_ESPERA_FALHA', 900))
+
+# Papel disputado na tabela de lideranças, para haver um único agendador
+PAPEL = 'agendador'
+
+# Roda o agendador em uma thread do servidor
+EM_THREAD = os.environ.get('AGENDADOR_THREAD', 'false').lower() == 'true'
+
+
+class ContadorAcessos:
+    """
+    Conta os acessos por URL em memória e os grava em lote com
+    `gravar(contagens)` a cada `intervalo_gravacao` segundos, evitando uma
+    escrita no banco por requisição.
+    """
+
+    def __init__(self, gravar, intervalo_gravacao=None):
+        self.gravar = gravar
+        self.intervalo_gravacao = intervalo_gravacao if intervalo_gravacao is not None else INTERVALO_GRAVACAO_ACESSOS
+
+        self._lock = threading.Lock()
+        self._contagens = {}
+        self._ultima_gravacao = time.monotonic()
+        self._registrados = 0
+        self._gravacoes = 0
+
+    def registrar(self, url, quantidade=1):
+        """Conta um acesso à URL, gravando as contagens pendentes se o intervalo passou"""
+        with self._lock:
+            self._contagens[url] = self._contagens.get(url, 0) + quantidade
+            self._registrados += quantidade
+            if time.monotonic() - self._ultima_gravacao < self.intervalo_gravacao:
+                return
+        self.descarregar()
+
+    def descarregar(self):
+        """Grava as contagens pendentes"""
+        with self._lock:
+            contagens, self._contagens = self._contagens, {}
+            self._ultima_gravacao = time.monotonic()
+        if not contagens:
+            return
+        try:
+            self.gravar(contagens)
+            with self._lock:
+                self._gravacoes += 1
+        except Exception as e:
+            # As contagens só influenciam a prioridade: perdê-las não é crítico
+            logger.warning(f"Falha ao gravar {len(contagens)} contagens de acesso: {e}")
+
+    def estatisticas(self):
+        """Acessos registrados, gravações feitas e URLs com contagens pendentes"""
+        with self._lock:
+            return {
+                "registrados": self._registrados,
+                "gravacoes": self._gravacoes,
+                "pendentes": len(self._contagens),
+            }
+
+
+class AgendadorAtualizacoes:
+    """
+    Atualiza em segundo plano os produtos retornados por
+    `candidatos(limite, idade_minima)` (lista de (url, prioridade), do mais
+    prioritário para o menos) com `atualizar(url)`, respeitando o limite de
+    requisições por minuto.
+
+    Com `lideranca` (objeto com `adquirir(dono)` e `liberar(dono)`, como
+    `banco_dados.Lideranca`), só o agendador que detém a liderança executa
+    rodadas; os demais aguardam `intervalo` segundos e tentam de novo.
+    """
+
+    def __init__(self, atualizar, candidatos, requisicoes_por_minuto=None, idade_minima=None, intervalo=None,
+                 espera_apos_falha=None, lideranca=None):
+        self.atualizar = atualizar
+        self.candidatos = candidatos
+        self.requisicoes_por_minuto = requisicoes_por_minuto if requisicoes_por_minuto is not None else REQUISICOES_POR_MINUTO
+        self.idade_minima = idade_minima if idade_minima is not None else IDADE_MINIMA
+        self.intervalo = intervalo if intervalo is not None else INTERVALO
+        self.espera_apos_falha = espera_apos_falha if espera_apos_falha is not None else ESPERA_APOS_FALHA
+        self.lideranca = lideranca
+        self.limite = LimiteTaxa(self.requisicoes_por_minuto)
+
+        self._lider = lideranca is None
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        # URL -> instante (monotônico) até o qual a URL não é tentada novamente
+        self._suspensas = {}
+        self._estatisticas = {
+            "rodadas": 0,
+            "atualizados": 0,
+            "falhas": 0,
+            "sem_lideranca": 0,
+            "ultima_rodada": None,
+        }
+
+    def _dono(self):
+        # Calculado a cada chamada: com preload_app, o agendador é criado
+        # antes do fork e cada worker precisa de um dono distinto
+        return f"{os.getpid()}-{id(self)}"
+
+    def _liderar(self):
+        """Adquire ou renova a liderança; sem `lideranca`, sempre lidera"""
+        if self.lideranca is None:
+            return True
+        try:
+            lider = self.lideranca.adquirir(self._dono())
+        except Exception as e:
+            logger.error(f"Erro ao adquirir a liderança do agendador: {e}")
+            lider = False
+        if lider != self._lider:
+            logger.info("Liderança do agendador adquirida" if lider else "Liderança do agendador com outro processo")
+        self._lider = lider
+        return lider
+
+    def rodada(self):
+        """
+        Atualiza os produtos mais prioritários, até um minuto do limite de
+        requisições; a fila é recalculada na rodada seguinte. Retorna quantos
+        produtos foram processados. A liderança é renovada antes de cada
+        atualização; perdida, a rodada termina.
+        """
+        if not self._liderar():
+            with self._lock:
+                self._estatisticas["sem_lideranca"] += 1
+            return 0
+        tamanho = max(1, int(self.requisicoes_por_minuto)) if self.requisicoes_por_minuto > 0 else 100
+        agora = time.monotonic()
+        self._suspensas = {url: ate for url, ate in self._suspensas.items() if ate > agora}
+        # Pedir mais candidatos que o necessário, compensando os suspensos por falha
+        fila = self.candidatos(tamanho + len(self._suspensas), self.idade_minima)
+        fila = [url for url, _ in fila if url not in self._suspensas][:tamanho]
+        processados = 0
+        for url in fila:
+            if not self.limite.aguardar(self._parar) or not self._liderar():
+                break
+            chave = "falhas"
+            try:
+                info_produto = self.atualizar(url)
+                if "erro" in info_produto:
+                    logger.warning(f"Falha na atualização agendada de {url}: {info_produto['erro']}")
+                else:
+                    chave = "atualizados"
+            except Exception as e:
+                logger.error(f"Erro na atualização agendada de {url}: {e}")
+            if chave == "falhas":
+                self._suspensas[url] = time.monotonic() + self.espera_apos_falha
+            with self._lock:
+                self._estatisticas[chave] += 1
+            processados += 1
+
+        with self._lock:
+            self._estatisticas["rodadas"] += 1
+            self._estatisticas["ultima_rodada"] = time.time()
+        return processados
+
+    def executar(self):
+        """Executa rodadas até `parar()` ser chamado"""
+        logger.info(f"Agendador iniciado ({self.requisicoes_por_minuto:g} requisições/minuto, "
+                    f"idade mínima {self.idade_minima:g}s)")
+        while not self._parar.is_set():
+            try:
+                processados = self.rodada()
+            except Exception as e:
+                logger.error(f"Erro na rodada do agendador: {e}")
+                processados = 0
+            if not processados:
+                self._parar.wait(self.intervalo)
+        if self.lideranca is not None and self._lider:
+            try:
+                self.lideranca.liberar(self._dono())
+            except Exception as e:
+                logger.warning(f"Erro ao liberar a liderança do agendador: {e}")
+            self._lider = False
+        logger.info("Agendador encerrado")
+
+    def iniciar(self):
+        """Executa o agendador em uma thread daemon"""
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self.executar, name='agendador-atualizacoes', daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def parar(self, timeout=None):
+        """Interrompe o agendador (inclusive durante a espera pelo limite de requisições)"""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def estatisticas(self):
+        """Rodadas, produtos atualizados e falhas desde o início"""
+        with self._lock:
+            estatisticas = dict(self._estatisticas)
+        estatisticas["requisicoes_por_minuto"] = self.requisicoes_por_minuto
+        estatisticas["idade_minima"] = self.idade_minima
+        estatisticas["suspensos_por_falha"] = len(self._suspensas)
+        estatisticas["ativo"] = self._thread is not None and self._thread.is_alive()
+        estatisticas["lider"] = self._lider
+        return estatisticas
+
+
+def main():
+    from produto_scraper import ProdutoScraper
+    from cache_produtos import CacheProdutos
+    from banco_dados import (
+        init_db, get_produto_from_db, save_produto_to_db, get_validadores_from_db,
+        confirmar_produto_no_db, get_produtos_para_atualizar, LockExtracao, Lideranca
+    )
+
+    init_db()
+    scraper = ProdutoScraper()
+    cache = CacheProdutos(
+        get_produto_from_db, save_produto_to_db, scraper.extrair_info_ciainfor,
+        lock_distribuido=LockExtracao(),
+        buscar_validadores=get_validadores_from_db, confirmar=confirmar_produto_no_db
+    )
+    agendador = AgendadorAtualizacoes(cache.atualizar, get_produtos_para_atualizar, lideranca=Lideranca(PAPEL))
+
+    def encerrar(signum, frame):
+        agendador.parar()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+    agendador.executar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,1222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Camada de persistência dos produtos (SQLite), compartilhada pelos servidores.
+
+As consultas por URL passam antes por um cache LRU em memória do worker
+(`cache_memoria.py`), invalidado a cada escrita ou remoção.
+
+Cada thread mantém uma conexão persistente com o banco, reaproveitada entre
+as requisições (e com ela o cache de comandos preparados do sqlite3). O banco
+opera em modo WAL, em que leitores não bloqueiam o escritor, e as escritas
+usam transações BEGIN IMMEDIATE, que aguardam o lock de escrita pelo
+busy_timeout em vez de falhar com "database is locked".
+"""
+
+import os
+import re
+import json
+import base64
+import time
+import datetime
+import sqlite3
+import threading
+import contextlib
+import logging
+from cache_memoria import CacheLRU
+from dados_estruturados import preco_em_centavos
+
+logger = logging.getLogger(__name__)
+
+# Configuração do banco de dados
+DB_PATH = os.environ.get('PRODUTOS_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'produtos.db'))
+
+# Tempo de espera pelo lock de escrita antes de desistir (milissegundos)
+BUSY_TIMEOUT_MS = int(os.environ.get('BANCO_BUSY_TIMEOUT_MS', 5000))
+
+# Cache de páginas por conexão (KB) e tamanho da região mapeada em memória (bytes)
+CACHE_KB = int(os.environ.get('BANCO_CACHE_KB', 16384))
+MMAP_BYTES = int(os.environ.get('BANCO_MMAP_BYTES', 64 * 1024 * 1024))
+
+# Cache de páginas (KB) das conexões de leitura sequencial (exportações)
+CACHE_KB_LEITURA_SEQUENCIAL = 2048
+
+# Validade (segundos) do lock de extração de uma URL entre workers; deve
+# superar o tempo máximo de uma extração, incluindo as retentativas
+DURACAO_LOCK_EXTRACAO = float(os.environ.get('BANCO_DURACAO_LOCK_EXTRACAO', 60))
+
+# Validade (segundos) da liderança de um papel entre processos (ex.: o
+# agendador); um líder que caiu é substituído depois desse tempo
+DURACAO_LIDERANCA = float(os.environ.get('BANCO_DURACAO_LIDERANCA', 300))
+
+# Comandos preparados mantidos em cache por conexão
+COMANDOS_EM_CACHE = 64
+
+# Tamanho fixo dos blocos de consulta por várias URLs (limite de parâmetros do
+# SQLite); com tamanho fixo o mesmo comando preparado é reaproveitado
+TAMANHO_BLOCO_CONSULTA = 100
+
+COLUNAS = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'descricao', 'especificacoes', 'data_atualizacao']
+
+# Colunas da listagem e da exportação dos produtos
+COLUNAS_LISTAGEM = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'data_atualizacao']
+
+SQL_BUSCAR = f'SELECT {", ".join(COLUNAS)} FROM produtos WHERE url = ?'
+SQL_BUSCAR_BLOCO = (
+    f'SELECT {", ".join(COLUNAS)} FROM produtos '
+    f'WHERE url IN ({",".join("?" * TAMANHO_BLOCO_CONSULTA)})'
+)
+# Instante atual em epoch com milissegundos (data_atualizacao tem resolução de
+# segundos); 'now' é o mesmo em todo o comando
+SQL_AGORA_EPOCH = "(julianday('now') - 2440587.5) * 86400.0"
+
+# Inserção ou atualização no lugar (UPSERT), e não INSERT OR REPLACE: a linha
+# mantém o rowid e os gatilhos de atualização (histórico, busca) disparam
+SQL_SALVAR = f'''
+    INSERT INTO produtos
+    (url, nome, preco, disponibilidade, codigo, descricao, especificacoes, etag, last_modified, impressao,
+     bytes_pagina, preco_centavos, disponibilidade_codigo, data_atualizacao, atualizado_em)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, {SQL_AGORA_EPOCH})
+    ON CONFLICT(url) DO UPDATE SET
+        nome = excluded.nome, preco = excluded.preco, disponibilidade = excluded.disponibilidade,
+        codigo = excluded.codigo, descricao = excluded.descricao, especificacoes = excluded.especificacoes,
+        etag = excluded.etag, last_modified = excluded.last_modified, impressao = excluded.impressao,
+        bytes_pagina = excluded.bytes_pagina, preco_centavos = excluded.preco_centavos,
+        disponibilidade_codigo = excluded.disponibilidade_codigo, data_atualizacao = excluded.data_atualizacao,
+        atualizado_em = excluded.atualizado_em
+'''
+
+# Confirmação de um produto não modificado: só as datas de atualização mudam
+SQL_CONFIRMAR = f'UPDATE produtos SET data_atualizacao = CURRENT_TIMESTAMP, atualizado_em = {SQL_AGORA_EPOCH} WHERE url = ?'
+
+# Busca textual: pesos do BM25 por coluna (nome, codigo, descricao,
+# especificacoes), marcadores dos termos no trecho (negrito do WhatsApp) e
+# tamanho do trecho em palavras
+PESOS_BUSCA = (10.0, 5.0, 1.0, 2.0)
+MARCADORES_TRECHO = ('*', '*')
+PALAVRAS_TRECHO = 12
+PADRAO_PALAVRA = re.compile(r'\w+')
+
+# Validadores da última extração (cabeçalhos HTTP das requisições condicionais
+# e impressão digital do conteúdo); colunas adicionadas a bancos criados antes delas
+COLUNAS_VALIDADORES = {'etag': 'TEXT', 'last_modified': 'TEXT', 'impressao': 'TEXT', 'bytes_pagina': 'INTEGER'}
+
+# Preço em centavos e disponibilidade codificada, calculados ao salvar a
+# partir do texto extraído, para filtrar e ordenar pelos índices
+COLUNAS_NORMALIZADAS = {'preco_centavos': 'INTEGER', 'disponibilidade_codigo': 'INTEGER'}
+
+# Códigos de disponibilidade_codigo, pelo nome usado nas consultas
+DISPONIBILIDADES = {'nao_informado': 0, 'disponivel': 1, 'indisponivel': 2}
+CODIGOS_DISPONIBILIDADE = {'Disponível': DISPONIBILIDADES['disponivel'], 'Indisponível': DISPONIBILIDADES['indisponivel']}
+NOMES_DISPONIBILIDADE = {codigo: nome for nome, codigo in DISPONIBILIDADES.items()}
+
+_local = threading.local()
+
+# Produtos decodificados mantidos em memória neste worker
+cache_memoria = CacheLRU()
+
+# Conexões herdadas de um processo pai: não podem ser usadas nem fechadas no filho
+_conexoes_herdadas = []
+
+
+def _abrir_conexao(caminho):
+    conn = sqlite3.connect(
+        caminho,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # transações controladas explicitamente
+        cached_statements=COMANDOS_EM_CACHE,
+    )
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Em WAL, NORMAL só sincroniza nos checkpoints: seguro contra corrupção,
+    # podendo perder as últimas transações em uma queda de energia
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_BYTES}')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+def conexao():
+    """
+    Conexão persistente da thread atual. Uma nova conexão é aberta se o
+    processo foi bifurcado (workers do gunicorn) ou se DB_PATH mudou.
+    """
+    chave = (os.getpid(), DB_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.chave != chave:
+        if conn is not None and _local.chave[0] != chave[0]:
+            _conexoes_herdadas.append(conn)
+        elif conn is not None:
+            conn.close()
+        conn = _abrir_conexao(DB_PATH)
+        _local.conn = conn
+        _local.chave = chave
+    return conn
+
+
+def fechar_conexao():
+    """Fecha a conexão da thread atual, se houver"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        if _local.chave[0] == os.getpid():
+            conn.close()
+        _local.conn = None
+
+
+@contextlib.contextmanager
+def transacao():
+    """Transação de escrita (BEGIN IMMEDIATE), confirmada ao final do bloco"""
+    conn = conexao()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def init_db():
+    """Inicializa o banco de dados se não existir"""
+    with transacao() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS produtos (
+            url TEXT PRIMARY KEY,
+            nome TEXT,
+            preco TEXT,
+            disponibilidade TEXT,
+            codigo TEXT,
+            descricao TEXT,
+            especificacoes TEXT,
+            data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        existentes = {linha[1] for linha in conn.execute('PRAGMA table_info(produtos)')}
+        for coluna, tipo in COLUNAS_VALIDADORES.items():
+            if coluna not in existentes:
+                conn.execute(f'ALTER TABLE produtos ADD COLUMN {coluna} {tipo}')
+        # Instante exato (epoch) da última gravação ou confirmação, usado entre workers
+        if 'atualizado_em' not in existentes:
+            conn.execute('ALTER TABLE produtos ADD COLUMN atualizado_em REAL')
+        normalizar = False
+        for coluna, tipo in COLUNAS_NORMALIZADAS.items():
+            if coluna not in existentes:
+                conn.execute(f'ALTER TABLE produtos ADD COLUMN {coluna} {tipo}')
+                normalizar = True
+        if normalizar:
+            # Preencher as colunas normalizadas dos produtos salvos antes delas
+            linhas = conn.execute('SELECT url, preco, disponibilidade FROM produtos').fetchall()
+            conn.executemany(
+                'UPDATE produtos SET preco_centavos = ?, disponibilidade_codigo = ? WHERE url = ?',
+                [(*_valores_normalizados(preco, disponibilidade), url) for url, preco, disponibilidade in linhas]
+            )
+            if linhas:
+                logger.info(f"Preço e disponibilidade normalizados em {len(linhas)} produtos existentes")
+        # Acessos por URL, usados na prioridade das atualizações agendadas
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS acessos_produtos (
+            url TEXT PRIMARY KEY,
+            acessos INTEGER NOT NULL DEFAULT 0,
+            ultimo_acesso REAL
+        )
+        ''')
+        # Extrações em andamento, usadas para coalescer extrações entre workers
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS extracoes_em_andamento (
+            url TEXT PRIMARY KEY,
+            dono TEXT,
+            expira_em REAL
+        )
+        ''')
+        # Lideranças entre processos (um único agendador entre os workers)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS liderancas (
+            papel TEXT PRIMARY KEY,
+            dono TEXT,
+            expira_em REAL
+        )
+        ''')
+        # Progresso da varredura do catálogo pelo sitemap (varredura_catalogo.py)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS varredura_sitemaps (
+            sitemap TEXT PRIMARY KEY,
+            concluido_em REAL
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS varredura_urls (
+            url TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT,
+            atualizado_em REAL
+        )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_varredura_urls_status ON varredura_urls (status)')
+        # Fila persistente de extrações (fila_tarefas.py)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            prioridade INTEGER NOT NULL DEFAULT 0,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            disponivel_em REAL NOT NULL,
+            reservada_ate REAL,
+            dono TEXT,
+            erro TEXT,
+            criada_em REAL NOT NULL,
+            iniciada_em REAL,
+            concluida_em REAL
+        )
+        ''')
+        # Reserva por prioridade e contagem por status
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas (status, prioridade DESC, id)')
+        # Uma única tarefa aberta por URL
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_tarefas_url_aberta ON tarefas (url) "
+            "WHERE status IN ('pendente', 'em_andamento')"
+        )
+        # Latência das tarefas recentes e limpeza das antigas
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_tarefas_concluida_em ON tarefas (concluida_em) '
+            'WHERE concluida_em IS NOT NULL'
+        )
+        # Listagem e exportação por data de atualização (paginação por chave)
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_produtos_data_atualizacao ON produtos (data_atualizacao, url)'
+        )
+        # Consultas por faixa de preço, com ou sem filtro de disponibilidade
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos (preco_centavos, url)')
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_produtos_disponibilidade_preco '
+            'ON produtos (disponibilidade_codigo, preco_centavos, url)'
+        )
+        _criar_historico(conn)
+        _criar_busca(conn)
+    print(f"Banco de dados inicializado em {DB_PATH}")
+
+
+# Texto das especificações (lista JSON) indexado na busca, uma por linha
+SQL_TEXTO_ESPECIFICACOES = '''
+    CASE WHEN json_valid({0}) THEN (SELECT group_concat(value, char(10)) FROM json_each({0})) ELSE {0} END
+'''
+
+
+def _criar_busca(conn):
+    """
+    Índice de busca textual (FTS5) sobre nome, código, descrição e
+    especificações, com o mesmo rowid da tabela `produtos` e mantido pelos
+    gatilhos de inserção, atualização e remoção. Sem suporte a FTS5 no
+    SQLite, a busca fica indisponível e o restante do banco funciona.
+    """
+    novo = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'produtos_busca'"
+    ).fetchone() is None
+    try:
+        conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5(
+            nome, codigo, descricao, especificacoes,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Busca textual indisponível (SQLite sem FTS5): {e}")
+        return
+    texto_novo = SQL_TEXTO_ESPECIFICACOES.format('NEW.especificacoes')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_insercao AFTER INSERT ON produtos
+    BEGIN
+        INSERT INTO produtos_busca (rowid, nome, codigo, descricao, especificacoes)
+        VALUES (NEW.rowid, NEW.nome, NEW.codigo, NEW.descricao, {texto_novo});
+    END
+    ''')
+    # Recriado para que bancos antigos recebam a condição WHEN: o UPSERT
+    # atribui todas as colunas, e reindexar só vale se o texto mudou
+    conn.execute('DROP TRIGGER IF EXISTS trg_produtos_busca_atualizacao')
+    conn.execute(f'''
+    CREATE TRIGGER trg_produtos_busca_atualizacao
+    AFTER UPDATE OF nome, codigo, descricao, especificacoes ON produtos
+    WHEN OLD.nome IS NOT NEW.nome OR OLD.codigo IS NOT NEW.codigo
+        OR OLD.descricao IS NOT NEW.descricao OR OLD.especificacoes IS NOT NEW.especificacoes
+    BEGIN
+        DELETE FROM produtos_busca WHERE rowid = OLD.rowid;
+        INSERT INTO produtos_busca (rowid, nome, codigo, descricao, especificacoes)
+        VALUES (NEW.rowid, NEW.nome, NEW.codigo, NEW.descricao, {texto_novo});
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_remocao AFTER DELETE ON produtos
+    BEGIN
+        DELETE FROM produtos_busca WHERE rowid = OLD.rowid;
+    END
+    ''')
+    if novo:
+        # Indexar os produtos salvos antes da busca
+        conn.execute(f'''
+        INSERT INTO produtos_busca (rowid, nome, codigo, descricao, especificacoes)
+        SELECT rowid, nome, codigo, descricao, {SQL_TEXTO_ESPECIFICACOES.format('especificacoes')} FROM produtos
+        ''')
+
+
+def _criar_historico(conn):
+    """
+    Histórico de preço e disponibilidade dos produtos, apenas com as
+    mudanças: os gatilhos acrescentam uma linha quando o produto é salvo com
+    preço ou disponibilidade diferentes da última linha da URL, em qualquer
+    caminho de escrita (consultas, lotes, atualizações agendadas, varredura).
+    """
+    novo = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historico_precos'"
+    ).fetchone() is None
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS historico_precos (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL,
+        preco_centavos INTEGER,
+        disponibilidade_codigo INTEGER,
+        registrado_em TIMESTAMP NOT NULL
+    )
+    ''')
+    # Última linha de cada URL (o id acompanha o índice) e alterações desde uma data
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_precos_url ON historico_precos (url)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_precos_registrado_em ON historico_precos (registrado_em)')
+    for evento in ('INSERT', 'UPDATE OF preco_centavos, disponibilidade_codigo'):
+        nome = 'insercao' if evento == 'INSERT' else 'atualizacao'
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_historico_precos_{nome} AFTER {evento} ON produtos
+        WHEN NOT EXISTS (
+            SELECT 1 FROM (
+                SELECT preco_centavos, disponibilidade_codigo FROM historico_precos
+                WHERE url = NEW.url ORDER BY id DESC LIMIT 1
+            ) WHERE preco_centavos IS NEW.preco_centavos AND disponibilidade_codigo IS NEW.disponibilidade_codigo
+        )
+        BEGIN
+            INSERT INTO historico_precos (url, preco_centavos, disponibilidade_codigo, registrado_em)
+            VALUES (NEW.url, NEW.preco_centavos, NEW.disponibilidade_codigo, CURRENT_TIMESTAMP);
+        END
+        ''')
+    if novo:
+        # Estado atual dos produtos salvos antes do histórico
+        conn.execute('''
+        INSERT INTO historico_precos (url, preco_centavos, disponibilidade_codigo, registrado_em)
+        SELECT url, preco_centavos, disponibilidade_codigo, COALESCE(data_atualizacao, CURRENT_TIMESTAMP)
+        FROM produtos ORDER BY data_atualizacao
+        ''')
+
+
+def _linha_para_produto(result):
+    produto = dict(zip(COLUNAS, result))
+    # Converter especificações de volta para lista
+    produto['especificacoes'] = json.loads(produto['especificacoes']) if produto['especificacoes'] else []
+    return produto
+
+
+def _valores_normalizados(preco, disponibilidade):
+    """(preco_centavos, disponibilidade_codigo) a partir do preço e da disponibilidade extraídos"""
+    return (
+        preco_em_centavos(preco),
+        CODIGOS_DISPONIBILIDADE.get(disponibilidade, DISPONIBILIDADES['nao_informado'])
+    )
+
+
+def _parametros_produto(produto):
+    # Converter especificações para JSON
+    especificacoes_json = json.dumps(produto.get('especificacoes', []), ensure_ascii=False)
+    validadores = produto.get('validadores') or {}
+    return (
+        produto.get('url', ''),
+        produto.get('nome', ''),
+        produto.get('preco', ''),
+        produto.get('disponibilidade', ''),
+        produto.get('codigo', ''),
+        produto.get('descricao', ''),
+        especificacoes_json,
+        validadores.get('etag'),
+        validadores.get('last_modified'),
+        validadores.get('impressao'),
+        validadores.get('bytes'),
+        *_valores_normalizados(produto.get('preco'), produto.get('disponibilidade')),
+    )
+
+
+def get_produto_from_db(url):
+    """Busca um produto no cache em memória ou no banco de dados"""
+    produto = cache_memoria.obter(url)
+    if produto is not None:
+        return produto
+
+    geracao = cache_memoria.geracao()
+    result = conexao().execute(SQL_BUSCAR, (url,)).fetchone()
+    if not result:
+        return None
+    produto = _linha_para_produto(result)
+    cache_memoria.guardar(url, produto, geracao)
+    return produto
+
+
+def get_produtos_from_db(urls):
+    """Busca vários produtos no cache em memória ou no banco de dados, retornando um dicionário indexado pela URL"""
+    produtos = {}
+    faltantes = []
+    for url in dict.fromkeys(urls):
+        produto = cache_memoria.obter(url)
+        if produto is not None:
+            produtos[url] = produto
+        else:
+            faltantes.append(url)
+    if not faltantes:
+        return produtos
+
+    geracao = cache_memoria.geracao()
+    conn = conexao()
+    for inicio in range(0, len(faltantes), TAMANHO_BLOCO_CONSULTA):
+        bloco = faltantes[inicio:inicio + TAMANHO_BLOCO_CONSULTA]
+        # Completar o último bloco repetindo uma URL, mantendo o mesmo comando preparado
+        bloco += bloco[-1:] * (TAMANHO_BLOCO_CONSULTA - len(bloco))
+        for result in conn.execute(SQL_BUSCAR_BLOCO, bloco):
+            produto = _linha_para_produto(result)
+            produtos[produto['url']] = produto
+            cache_memoria.guardar(produto['url'], produto, geracao)
+
+    return produtos
+
+
+def save_produto_to_db(produto):
+    """Salva ou atualiza um produto no banco de dados"""
+    if not produto or 'url' not in produto:
+        return False
+
+    with transacao() as conn:
+        conn.execute(SQL_SALVAR, _parametros_produto(produto))
+    cache_memoria.invalidar(produto['url'])
+    return True
+
+
+def save_produtos_to_db(produtos):
+    """Salva ou atualiza vários produtos em uma única transação. Retorna quantos foram salvos"""
+    parametros = [_parametros_produto(produto) for produto in produtos if produto and 'url' in produto]
+    if not parametros:
+        return 0
+
+    with transacao() as conn:
+        conn.executemany(SQL_SALVAR, parametros)
+    for parametro in parametros:
+        cache_memoria.invalidar(parametro[0])
+    return len(parametros)
+
+
+def get_validadores_from_db(url):
+    """Validadores (etag, last_modified, impressao, bytes) da última extração do produto, ou None"""
+    result = conexao().execute(
+        'SELECT etag, last_modified, impressao, bytes_pagina FROM produtos WHERE url = ?', (url,)
+    ).fetchone()
+    if not result or not (result[0] or result[1] or result[2]):
+        return None
+    return {'etag': result[0], 'last_modified': result[1], 'impressao': result[2], 'bytes': result[3]}
+
+
+def confirmar_produto_no_db(url):
+    """
+    Marca o produto como atualizado agora, sem alterar os dados (página não
+    modificada desde a última extração). Retorna o produto, ou None se não existir.
+    """
+    with transacao() as conn:
+        cursor = conn.execute(SQL_CONFIRMAR, (url,))
+    cache_memoria.invalidar(url)
+    if cursor.rowcount == 0:
+        return None
+    return get_produto_from_db(url)
+
+
+def confirmar_produtos_no_db(urls):
+    """
+    Versão em lote de `confirmar_produto_no_db`, em uma única transação.
+    Retorna um dicionário indexado pela URL com os produtos existentes.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with transacao() as conn:
+        conn.executemany(SQL_CONFIRMAR, [(url,) for url in urls])
+    for url in urls:
+        cache_memoria.invalidar(url)
+    return get_produtos_from_db(urls)
+
+
+def codificar_cursor(chave, url):
+    """
+    Cursor opaco da paginação por chave, apontando para depois do produto
+    informado (`chave` é o valor da coluna de ordenação: data_atualizacao
+    na listagem, preco_centavos na consulta por preço)
+    """
+    return base64.urlsafe_b64encode(json.dumps([chave, url], separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, tipo_chave=str, tipo_desempate=str):
+    """(chave, url) de um cursor de `codificar_cursor`; ValueError se for inválido"""
+    try:
+        chave, desempate = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+    if type(chave) is not tipo_chave or type(desempate) is not tipo_desempate:
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return chave, desempate
+
+
+def _consulta_listagem(colunas, cursor=None):
+    """
+    SELECT da listagem de produtos (dos mais recentes para os mais antigos),
+    a partir do cursor, se informado. Retorna (sql, parâmetros), a completar
+    com LIMIT ? OFFSET ?. A ordem e o filtro do cursor seguem o índice
+    idx_produtos_data_atualizacao, sem ordenação nem varredura da tabela.
+    """
+    sql = f'SELECT {", ".join(colunas)} FROM produtos'
+    parametros = ()
+    if cursor:
+        sql += ' WHERE (data_atualizacao, url) < (?, ?)'
+        parametros = decodificar_cursor(cursor)
+    return sql + ' ORDER BY data_atualizacao DESC, url DESC LIMIT ? OFFSET ?', parametros
+
+
+def get_all_produtos_from_db(limit=100, offset=0, cursor=None, contar=True):
+    """
+    Obtém todos os produtos do banco de dados com paginação, por `offset` ou
+    por `cursor` (o `proximo_cursor` da página anterior, com custo constante
+    em qualquer profundidade). O total só é contado com `contar`.
+    """
+    conn = conexao()
+    total = contar_produtos_no_db() if contar else None
+
+    sql, parametros = _consulta_listagem(COLUNAS_LISTAGEM, cursor)
+    # Uma linha a mais indica se há uma próxima página
+    results = conn.execute(sql, (*parametros, limit + 1, offset)).fetchall()
+    proximo_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        proximo_cursor = codificar_cursor(results[-1][-1], results[-1][0])
+
+    produtos = [dict(zip(COLUNAS_LISTAGEM, result)) for result in results]
+
+    return {
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'produtos': produtos,
+        'proximo_cursor': proximo_cursor
+    }
+
+
+def consultar_produtos_no_db(preco_min=None, preco_max=None, disponibilidade=None, decrescente=False,
+                             limit=100, cursor=None):
+    """
+    Produtos com preço na faixa [preco_min, preco_max] (em centavos) e, se
+    informada, com a disponibilidade indicada (chave de DISPONIBILIDADES),
+    ordenados pelo preço (do maior para o menor com `decrescente`). Produtos
+    sem preço ficam de fora. A paginação é por `cursor`, como em
+    `get_all_produtos_from_db`, e a consulta usa os índices de preço.
+    Retorna {"produtos": [...], "proximo_cursor": str ou None}.
+    """
+    condicoes = ['preco_centavos IS NOT NULL']
+    parametros = []
+    if disponibilidade is not None:
+        if disponibilidade not in DISPONIBILIDADES:
+            raise ValueError(f"Disponibilidade inválida: {disponibilidade}")
+        condicoes.append('disponibilidade_codigo = ?')
+        parametros.append(DISPONIBILIDADES[disponibilidade])
+    if preco_min is not None:
+        condicoes.append('preco_centavos >= ?')
+        parametros.append(preco_min)
+    if preco_max is not None:
+        condicoes.append('preco_centavos <= ?')
+        parametros.append(preco_max)
+    comparacao, direcao = ('<', 'DESC') if decrescente else ('>', 'ASC')
+    if cursor:
+        condicoes.append(f'(preco_centavos, url) {comparacao} (?, ?)')
+        parametros.extend(decodificar_cursor(cursor, int))
+
+    colunas = COLUNAS_LISTAGEM + ['preco_centavos']
+    results = conexao().execute(
+        f'SELECT {", ".join(colunas)} FROM produtos WHERE {" AND ".join(condicoes)} '
+        f'ORDER BY preco_centavos {direcao}, url {direcao} LIMIT ?',
+        (*parametros, limit + 1)
+    ).fetchall()
+    proximo_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        proximo_cursor = codificar_cursor(results[-1][-1], results[-1][0])
+    return {
+        "produtos": [dict(zip(colunas, result)) for result in results],
+        "proximo_cursor": proximo_cursor
+    }
+
+
+def _data_sqlite(valor):
+    """Data ISO 8601 (com ou sem fuso; sem fuso é UTC) no formato de CURRENT_TIMESTAMP; ValueError se inválida"""
+    data = datetime.datetime.fromisoformat(valor.strip().replace('Z', '+00:00'))
+    if data.tzinfo is not None:
+        data = data.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return data.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _alteracao(linha):
+    _, url, preco_centavos, disponibilidade_codigo, registrado_em, preco_anterior, disponibilidade_anterior = linha
+    return {
+        "url": url,
+        "preco_centavos": preco_centavos,
+        "disponibilidade": NOMES_DISPONIBILIDADE.get(disponibilidade_codigo),
+        "registrado_em": registrado_em,
+        "preco_centavos_anterior": preco_anterior,
+        "disponibilidade_anterior": NOMES_DISPONIBILIDADE.get(disponibilidade_anterior),
+    }
+
+
+# Linha do histórico com o preço e a disponibilidade da linha anterior da mesma URL
+SQL_HISTORICO = '''
+    SELECT h.id, h.url, h.preco_centavos, h.disponibilidade_codigo, h.registrado_em, a.preco_centavos, a.disponibilidade_codigo
+    FROM historico_precos h
+    LEFT JOIN historico_precos a ON a.id = (
+        SELECT MAX(id) FROM historico_precos WHERE url = h.url AND id < h.id
+    )
+'''
+
+
+def get_historico_from_db(url):
+    """Mudanças de preço e disponibilidade do produto, da mais antiga para a mais recente"""
+    linhas = conexao().execute(SQL_HISTORICO + ' WHERE h.url = ? ORDER BY h.id', (url,)).fetchall()
+    return [_alteracao(linha) for linha in linhas]
+
+
+def get_alteracoes_from_db(desde=None, limit=100, cursor=None):
+    """
+    Mudanças de preço ou disponibilidade registradas depois de `desde` (data
+    ISO 8601), de todos os produtos, da mais antiga para a mais recente, pelo
+    índice de registrado_em. A paginação é por `cursor`, como em
+    `get_all_produtos_from_db`. Retorna {"alteracoes": [...], "proximo_cursor"}.
+    """
+    if cursor:
+        # O cursor já aponta para depois de `desde`
+        condicao, parametros = '(h.registrado_em, h.id) > (?, ?)', decodificar_cursor(cursor, str, int)
+    else:
+        try:
+            condicao, parametros = 'h.registrado_em > ?', (_data_sqlite(desde),)
+        except (ValueError, AttributeError) as e:
+            raise ValueError(f"Data inválida: {desde}") from e
+    linhas = conexao().execute(
+        SQL_HISTORICO + f' WHERE {condicao} ORDER BY h.registrado_em, h.id LIMIT ?',
+        (*parametros, limit + 1)
+    ).fetchall()
+    proximo_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        proximo_cursor = codificar_cursor(linhas[-1][4], linhas[-1][0])
+    return {"alteracoes": [_alteracao(linha) for linha in linhas], "proximo_cursor": proximo_cursor}
+
+
+def _consulta_fts(texto):
+    """
+    Consulta FTS5 a partir do texto livre: cada palavra vira um prefixo
+    entre aspas ("cab"* "vga"*), todas obrigatórias, sem interpretar a
+    sintaxe do FTS5 digitada pelo usuário. ValueError se não houver palavras.
+    """
+    palavras = PADRAO_PALAVRA.findall(texto or '')
+    if not palavras:
+        raise ValueError("Consulta vazia")
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def buscar_produtos_no_db(texto, limit=20):
+    """
+    Busca textual nos produtos do banco (nome, código, descrição e
+    especificações), por prefixo e sem diferenciar acentos, ordenada pela
+    relevância (BM25, com mais peso para nome e código). Cada resultado traz
+    um trecho com os termos encontrados destacados. ValueError se a consulta
+    for inválida; RuntimeError se a busca estiver indisponível (SQLite sem FTS5).
+    """
+    marcador_inicio, marcador_fim = MARCADORES_TRECHO
+    consulta = _consulta_fts(texto)
+    try:
+        results = conexao().execute(f'''
+        SELECT p.url, p.nome, p.preco, p.disponibilidade, p.codigo,
+               snippet(produtos_busca, -1, ?, ?, '…', {PALAVRAS_TRECHO}),
+               bm25(produtos_busca, {", ".join(map(str, PESOS_BUSCA))}) AS relevancia
+        FROM produtos_busca JOIN produtos p ON p.rowid = produtos_busca.rowid
+        WHERE produtos_busca MATCH ?
+        ORDER BY relevancia LIMIT ?
+        ''', (marcador_inicio, marcador_fim, consulta, limit)).fetchall()
+    except sqlite3.OperationalError as e:
+        # Sem FTS5, a tabela produtos_busca não existe (ou o módulo não carrega)
+        if 'no such' in str(e):
+            raise RuntimeError("Busca textual indisponível neste servidor") from e
+        raise ValueError(f"Consulta inválida: {texto}") from e
+
+    colunas = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'trecho']
+    resultados = []
+    for result in results:
+        resultado = dict(zip(colunas, result))
+        # No BM25 do FTS5, quanto menor, mais relevante
+        resultado['relevancia'] = round(-result[-1], 4)
+        resultados.append(resultado)
+    return resultados
+
+
+def contar_produtos_no_db():
+    """Total de produtos no banco (contados em um índice, sem ler a tabela)"""
+    return conexao().execute('SELECT COUNT(*) FROM produtos').fetchone()[0]
+
+
+def get_limites_pagina_from_db(limit=None, offset=0, cursor=None):
+    """
+    Consulta apenas o índice para saber se a página (como em
+    `iterar_produtos_from_db`) tem produtos e qual é o cursor da página
+    seguinte. Retorna {"vazia": bool, "proximo_cursor": str ou None}.
+    """
+    conn = conexao()
+    sql, parametros = _consulta_listagem(['data_atualizacao', 'url'], cursor)
+    vazia = limit == 0 or conn.execute(sql, (*parametros, 1, offset)).fetchone() is None
+    proximo_cursor = None
+    if not vazia and limit:
+        ultimas = conn.execute(sql, (*parametros, 2, offset + limit - 1)).fetchall()
+        if len(ultimas) == 2:
+            proximo_cursor = codificar_cursor(*ultimas[0])
+    return {"vazia": vazia, "proximo_cursor": proximo_cursor}
+
+
+def iterar_produtos_from_db(limit=None, offset=0, cursor=None, tamanho_bloco=1000):
+    """
+    Percorre os produtos (url, nome, preco, disponibilidade, codigo,
+    data_atualizacao) na ordem de `get_all_produtos_from_db`, lendo
+    `tamanho_bloco` linhas por vez do cursor; sem `limit`, até o fim da tabela.
+    Usa uma conexão própria, fechada ao final (ou quando o gerador é
+    descartado), para que a leitura longa não prenda a conexão da thread.
+    """
+    sql, parametros = _consulta_listagem(COLUNAS_LISTAGEM, cursor)
+    conn = _abrir_conexao(DB_PATH)
+    # Leitura sequencial: sem mapear o arquivo em memória, com cache de páginas
+    # pequeno e ordenação em disco, a memória não cresce com o tamanho da tabela
+    conn.execute('PRAGMA mmap_size=0')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_KB_LEITURA_SEQUENCIAL}')
+    conn.execute('PRAGMA temp_store=FILE')
+    try:
+        resultado = conn.execute(sql, (*parametros, limit if limit is not None else -1, offset))
+        while True:
+            linhas = resultado.fetchmany(tamanho_bloco)
+            if not linhas:
+                break
+            yield from linhas
+    finally:
+        conn.close()
+
+
+def delete_produtos_from_db(url=None):
+    """Remove um produto específico do banco de dados ou, sem URL, todos os produtos"""
+    with transacao() as conn:
+        if url:
+            conn.execute('DELETE FROM produtos WHERE url = ?', (url,))
+        else:
+            conn.execute('DELETE FROM produtos')
+    cache_memoria.invalidar(url or None)
+
+
+def registrar_acessos_no_db(contagens, instante=None):
+    """Soma as contagens de acessos {url: quantidade} às da tabela `acessos_produtos`"""
+    if not contagens:
+        return
+    instante = instante or time.time()
+    with transacao() as conn:
+        conn.executemany('''
+        INSERT INTO acessos_produtos (url, acessos, ultimo_acesso) VALUES (?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            acessos = acessos + excluded.acessos,
+            ultimo_acesso = MAX(COALESCE(ultimo_acesso, 0), excluded.ultimo_acesso)
+        ''', [(url, quantidade, instante) for url, quantidade in contagens.items()])
+
+
+def get_produtos_para_atualizar(limite, idade_minima):
+    """
+    Produtos com pelo menos `idade_minima` segundos desde a última
+    atualização, do mais prioritário para o menos. A prioridade é a idade
+    multiplicada pela popularidade: 1 + acessos / (1 + dias desde o último acesso).
+    Retorna uma lista de (url, prioridade).
+    """
+    agora = time.time()
+    # Corte no formato de CURRENT_TIMESTAMP, para filtrar pelo índice de
+    # data_atualizacao antes de calcular a prioridade
+    corte = datetime.datetime.fromtimestamp(agora - idade_minima, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return conexao().execute('''
+    SELECT p.url,
+           p.idade * (1.0 + COALESCE(a.acessos, 0) / (1.0 + (? - COALESCE(a.ultimo_acesso, ?)) / 86400.0)) AS prioridade
+    FROM (
+        SELECT url, (julianday('now') - julianday(data_atualizacao)) * 86400.0 AS idade
+        FROM produtos
+        WHERE data_atualizacao <= ?
+    ) AS p
+    LEFT JOIN acessos_produtos AS a ON a.url = p.url
+    ORDER BY prioridade DESC
+    LIMIT ?
+    ''', (agora, agora, corte, limite)).fetchall()
+
+
+def estatisticas_cache_memoria():
+    """Acertos, falhas, descartes e ocupação do cache em memória deste worker"""
+    return cache_memoria.estatisticas()
+
+
+class LockExtracao:
+    """
+    Lock entre workers para a extração de uma URL, guardado na tabela
+    `extracoes_em_andamento`. Usado pela coalescência de extrações
+    (`coalescencia.ExtracaoCoalescida`); locks de um worker que caiu
+    expiram após `duracao` segundos.
+    """
+
+    def __init__(self, duracao=None):
+        self.duracao = duracao if duracao is not None else DURACAO_LOCK_EXTRACAO
+
+    @staticmethod
+    def _dono():
+        return f"{os.getpid()}-{threading.get_ident()}"
+
+    def adquirir(self, url, dono=None):
+        """
+        Tenta adquirir o lock da URL; retorna False se outro worker já o detém.
+        O dono padrão é a thread atual; quem adquire e libera o lock em threads
+        diferentes (corrotinas, via `asyncio.to_thread`) passa o seu `dono`.
+        """
+        agora = time.time()
+        with transacao() as conn:
+            conn.execute('DELETE FROM extracoes_em_andamento WHERE url = ? AND expira_em < ?', (url, agora))
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO extracoes_em_andamento (url, dono, expira_em) VALUES (?, ?, ?)',
+                (url, dono or self._dono(), agora + self.duracao)
+            )
+            return cursor.rowcount == 1
+
+    def liberar(self, url, dono=None):
+        """Libera o lock da URL, se pertencer à thread atual (ou a `dono`)"""
+        with transacao() as conn:
+            conn.execute('DELETE FROM extracoes_em_andamento WHERE url = ? AND dono = ?', (url, dono or self._dono()))
+
+    def ativo(self, url):
+        """Indica se há uma extração da URL em andamento em algum worker"""
+        return conexao().execute(
+            'SELECT 1 FROM extracoes_em_andamento WHERE url = ? AND expira_em >= ?', (url, time.time())
+        ).fetchone() is not None
+
+    def agora(self):
+        """
+        Instante atual (epoch) no relógio do banco, o mesmo usado em
+        `atualizado_em`: a referência de `buscar_resultado` não depende do
+        relógio do worker
+        """
+        return conexao().execute(f'SELECT {SQL_AGORA_EPOCH}').fetchone()[0]
+
+    def buscar_resultado(self, url, desde):
+        """Produto salvo ou confirmado a partir de `desde` (instante de `agora()`), ou None se a extração falhou"""
+        result = conexao().execute('SELECT atualizado_em FROM produtos WHERE url = ?', (url,)).fetchone()
+        if not result or result[0] is None or result[0] < desde:
+            return None
+        # O cache em memória deste worker não vê a escrita feita pelo outro worker
+        cache_memoria.invalidar(url)
+        return get_produto_from_db(url)
+
+
+class Lideranca:
+    """
+    Liderança de um papel entre processos, guardada na tabela `liderancas`:
+    só um dono por vez exerce o papel (ex.: o agendador, entre os workers do
+    gunicorn). O líder renova a liderança ao chamar `adquirir` de novo; se
+    não a renovar em `duracao` segundos, outro processo pode assumi-la.
+    """
+
+    def __init__(self, papel, duracao=None):
+        self.papel = papel
+        self.duracao = duracao if duracao is not None else DURACAO_LIDERANCA
+
+    def adquirir(self, dono):
+        """Adquire ou renova a liderança para `dono`; retorna False se outro dono a detém"""
+        agora = time.time()
+        with transacao() as conn:
+            cursor = conn.execute('''
+            INSERT INTO liderancas (papel, dono, expira_em) VALUES (?, ?, ?)
+            ON CONFLICT(papel) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em
+            WHERE liderancas.dono = excluded.dono OR liderancas.expira_em < ?
+            ''', (self.papel, dono, agora + self.duracao, agora))
+            return cursor.rowcount == 1
+
+    def liberar(self, dono):
+        """Libera a liderança, se pertencer a `dono`"""
+        with transacao() as conn:
+            conn.execute('DELETE FROM liderancas WHERE papel = ? AND dono = ?', (self.papel, dono))
+
+    def lider(self):
+        """Dono atual da liderança, ou None se ela está livre ou expirou"""
+        result = conexao().execute(
+            'SELECT dono FROM liderancas WHERE papel = ? AND expira_em >= ?', (self.papel, time.time())
+        ).fetchone()
+        return result[0] if result else None
+
+
+class CheckpointVarredura:
+    """
+    Progresso da varredura do catálogo, guardado nas tabelas
+    `varredura_sitemaps` (sitemaps cujas URLs já foram todas registradas) e
+    `varredura_urls` (status de cada URL de produto: pendente, em_andamento,
+    concluida ou falha). Uma varredura interrompida retoma as URLs pendentes;
+    as que estavam em andamento voltam a ficar pendentes.
+    """
+
+    PENDENTE = 'pendente'
+    EM_ANDAMENTO = 'em_andamento'
+    CONCLUIDA = 'concluida'
+    FALHA = 'falha'
+
+    def __init__(self, max_tentativas=3):
+        self.max_tentativas = max_tentativas
+
+    def iniciar(self, reiniciar=False):
+        """Prepara a retomada da varredura ou, com `reiniciar`, descarta o progresso anterior"""
+        with transacao() as conn:
+            if reiniciar:
+                conn.execute('DELETE FROM varredura_sitemaps')
+                conn.execute('DELETE FROM varredura_urls')
+            else:
+                conn.execute('UPDATE varredura_urls SET status = ? WHERE status = ?', (self.PENDENTE, self.EM_ANDAMENTO))
+
+    def sitemap_concluido(self, sitemap):
+        """Indica se todas as URLs do sitemap já foram registradas"""
+        return conexao().execute(
+            'SELECT 1 FROM varredura_sitemaps WHERE sitemap = ? AND concluido_em IS NOT NULL', (sitemap,)
+        ).fetchone() is not None
+
+    def concluir_sitemap(self, sitemap):
+        with transacao() as conn:
+            conn.execute('INSERT OR REPLACE INTO varredura_sitemaps (sitemap, concluido_em) VALUES (?, ?)',
+                         (sitemap, time.time()))
+
+    def adicionar_urls(self, urls):
+        """Registra URLs de produto como pendentes (as já registradas são ignoradas). Retorna quantas eram novas"""
+        if not urls:
+            return 0
+        conn = conexao()
+        antes = conn.total_changes
+        with transacao() as conn:
+            conn.executemany('INSERT OR IGNORE INTO varredura_urls (url, atualizado_em) VALUES (?, ?)',
+                             [(url, time.time()) for url in urls])
+        return conn.total_changes - antes
+
+    def reservar(self, quantidade):
+        """Marca até `quantidade` URLs pendentes como em andamento e as retorna"""
+        with transacao() as conn:
+            urls = [linha[0] for linha in conn.execute(
+                'SELECT url FROM varredura_urls WHERE status = ? LIMIT ?', (self.PENDENTE, quantidade)
+            )]
+            conn.executemany('UPDATE varredura_urls SET status = ?, atualizado_em = ? WHERE url = ?',
+                             [(self.EM_ANDAMENTO, time.time(), url) for url in urls])
+        return urls
+
+    def liberar(self, urls):
+        """Devolve URLs reservadas e não processadas à fila"""
+        if not urls:
+            return
+        with transacao() as conn:
+            conn.executemany('UPDATE varredura_urls SET status = ? WHERE url = ? AND status = ?',
+                             [(self.PENDENTE, url, self.EM_ANDAMENTO) for url in urls])
+
+    def concluir(self, resultados):
+        """
+        Grava os resultados [(url, info_produto)] em uma única transação: os
+        produtos extraídos são salvos, os não modificados são confirmados e o
+        status das URLs é atualizado junto, de modo que o progresso nunca fica
+        à frente dos produtos salvos.
+        """
+        if not resultados:
+            return
+        agora = time.time()
+        salvos = []
+        confirmados = []
+        status = []
+        for url, info_produto in resultados:
+            if info_produto.get('nao_modificado'):
+                confirmados.append((url,))
+                status.append((self.CONCLUIDA, None, agora, url))
+            elif 'erro' in info_produto:
+                status.append((None, info_produto['erro'], agora, url))
+            else:
+                salvos.append(_parametros_produto(info_produto))
+                status.append((self.CONCLUIDA, None, agora, url))
+
+        with transacao() as conn:
+            conn.executemany(SQL_SALVAR, salvos)
+            conn.executemany(SQL_CONFIRMAR, confirmados)
+            conn.executemany('''
+            UPDATE varredura_urls SET
+                tentativas = tentativas + 1,
+                status = COALESCE(?, CASE WHEN tentativas + 1 >= ? THEN 'falha' ELSE 'pendente' END),
+                erro = ?,
+                atualizado_em = ?
+            WHERE url = ?
+            ''', [(novo_status, self.max_tentativas, erro, instante, url)
+                  for novo_status, erro, instante, url in status])
+        for url, _ in resultados:
+            cache_memoria.invalidar(url)
+
+    def progresso(self):
+        """Quantidade de URLs por status e de sitemaps concluídos"""
+        conn = conexao()
+        progresso = {status: 0 for status in (self.PENDENTE, self.EM_ANDAMENTO, self.CONCLUIDA, self.FALHA)}
+        for status, quantidade in conn.execute('SELECT status, COUNT(*) FROM varredura_urls GROUP BY status'):
+            progresso[status] = quantidade
+        progresso['sitemaps_concluidos'] = conn.execute(
+            'SELECT COUNT(*) FROM varredura_sitemaps WHERE concluido_em IS NOT NULL'
+        ).fetchone()[0]
+        return progresso
+
+
+class FilaTarefas:
+    """
+    Fila persistente de extrações de produtos, guardada na tabela `tarefas`.
+
+    Cada tarefa passa por pendente -> em_andamento -> concluida (ou falha).
+    `reservar` entrega as tarefas pendentes de maior prioridade (as mais
+    antigas primeiro, em caso de empate) com uma reserva de
+    `duracao_reserva` segundos: se o trabalhador cair, a reserva expira e a
+    tarefa volta para a fila. Cada reserva conta uma tentativa; uma tarefa
+    com erro volta a ficar pendente após `espera_tentativa` segundos
+    (dobrados a cada nova tentativa) até atingir `max_tentativas`.
+    Só existe uma tarefa aberta por URL: adicionar uma URL já na fila apenas
+    eleva a sua prioridade.
+    """
+
+    PENDENTE = 'pendente'
+    EM_ANDAMENTO = 'em_andamento'
+    CONCLUIDA = 'concluida'
+    FALHA = 'falha'
+
+    # Intervalo (segundos) das tarefas concluídas consideradas nas métricas de latência
+    JANELA_ESTATISTICAS = 300
+
+    def __init__(self, max_tentativas=3, duracao_reserva=120, espera_tentativa=30):
+        self.max_tentativas = max_tentativas
+        self.duracao_reserva = duracao_reserva
+        self.espera_tentativa = espera_tentativa
+
+    def adicionar(self, urls, prioridade=0):
+        """Coloca as URLs na fila; as que já têm uma tarefa aberta só têm a prioridade elevada. Retorna os ids"""
+        agora = time.time()
+        ids = []
+        with transacao() as conn:
+            for url in urls:
+                ids.append(conn.execute('''
+                INSERT INTO tarefas (url, prioridade, disponivel_em, criada_em) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) WHERE status IN ('pendente', 'em_andamento') DO UPDATE SET
+                    prioridade = MAX(prioridade, excluded.prioridade)
+                RETURNING id
+                ''', (url, prioridade, agora, agora)).fetchone()[0])
+        return ids
+
+    def reservar(self, quantidade, dono):
+        """
+        Reserva até `quantidade` tarefas disponíveis para `dono`, devolvendo
+        antes à fila as reservas expiradas. Retorna uma lista de (id, url)
+        """
+        agora = time.time()
+        with transacao() as conn:
+            conn.execute('''
+            UPDATE tarefas SET status = CASE WHEN tentativas >= ? THEN 'falha' ELSE 'pendente' END,
+                               dono = NULL, erro = 'Reserva expirada',
+                               concluida_em = CASE WHEN tentativas >= ? THEN ? END
+            WHERE status = 'em_andamento' AND reservada_ate < ?
+            ''', (self.max_tentativas, self.max_tentativas, agora, agora))
+            tarefas = conn.execute('''
+            SELECT id, url FROM tarefas
+            WHERE status = 'pendente' AND disponivel_em <= ?
+            ORDER BY prioridade DESC, id
+            LIMIT ?
+            ''', (agora, quantidade)).fetchall()
+            conn.executemany('''
+            UPDATE tarefas SET status = 'em_andamento', dono = ?, reservada_ate = ?, iniciada_em = ?,
+                               tentativas = tentativas + 1
+            WHERE id = ?
+            ''', [(dono, agora + self.duracao_reserva, agora, id_tarefa) for id_tarefa, _ in tarefas])
+        return tarefas
+
+    def liberar(self, ids, dono):
+        """Devolve à fila tarefas reservadas e não processadas, sem contar a tentativa"""
+        if not ids:
+            return
+        with transacao() as conn:
+            conn.executemany('''
+            UPDATE tarefas SET status = 'pendente', dono = NULL, tentativas = tentativas - 1
+            WHERE id = ? AND dono = ? AND status = 'em_andamento'
+            ''', [(id_tarefa, dono) for id_tarefa in ids])
+
+    def concluir(self, id_tarefa, dono, erro=None):
+        """
+        Registra o resultado de uma tarefa reservada por `dono`: concluída ou,
+        com `erro`, pendente para uma nova tentativa (ou falha, esgotadas as
+        tentativas). Retorna False se a reserva já tinha expirado.
+        """
+        agora = time.time()
+        with transacao() as conn:
+            if erro is None:
+                cursor = conn.execute('''
+                UPDATE tarefas SET status = 'concluida', dono = NULL, erro = NULL, concluida_em = ?
+                WHERE id = ? AND dono = ? AND status = 'em_andamento'
+                ''', (agora, id_tarefa, dono))
+            else:
+                cursor = conn.execute('''
+                UPDATE tarefas SET
+                    status = CASE WHEN tentativas >= ? THEN 'falha' ELSE 'pendente' END,
+                    concluida_em = CASE WHEN tentativas >= ? THEN ? END,
+                    disponivel_em = ? + ? * (1 << (tentativas - 1)),
+                    dono = NULL, erro = ?
+                WHERE id = ? AND dono = ? AND status = 'em_andamento'
+                ''', (self.max_tentativas, self.max_tentativas, agora, agora, self.espera_tentativa, erro,
+                      id_tarefa, dono))
+            return cursor.rowcount == 1
+
+    def buscar(self, id_tarefa):
+        """Estado de uma tarefa, ou None se ela não existir"""
+        cursor = conexao().execute('''
+        SELECT id, url, status, prioridade, tentativas, erro, criada_em, iniciada_em, concluida_em
+        FROM tarefas WHERE id = ?
+        ''', (id_tarefa,))
+        linha = cursor.fetchone()
+        if linha is None:
+            return None
+        return dict(zip([coluna[0] for coluna in cursor.description], linha))
+
+    def limpar(self, idade):
+        """Remove as tarefas concluídas ou com falha há mais de `idade` segundos. Retorna quantas"""
+        with transacao() as conn:
+            return conn.execute(
+                'DELETE FROM tarefas WHERE concluida_em < ? AND status IN (?, ?)',
+                (time.time() - idade, self.CONCLUIDA, self.FALHA)
+            ).rowcount
+
+    def estatisticas(self):
+        """
+        Tarefas por status, idade da tarefa pendente mais antiga e, nas
+        tarefas concluídas nos últimos JANELA_ESTATISTICAS segundos, a vazão
+        e os tempos médios de espera na fila e de processamento.
+        """
+        agora = time.time()
+        conn = conexao()
+        estatisticas = {status: 0 for status in (self.PENDENTE, self.EM_ANDAMENTO, self.CONCLUIDA, self.FALHA)}
+        for status, quantidade in conn.execute('SELECT status, COUNT(*) FROM tarefas GROUP BY status'):
+            estatisticas[status] = quantidade
+        mais_antiga = conn.execute(
+            "SELECT MIN(criada_em) FROM tarefas WHERE status = 'pendente'"
+        ).fetchone()[0]
+        estatisticas["idade_pendente_mais_antiga"] = round(agora - mais_antiga, 3) if mais_antiga else None
+        concluidas, espera, processamento = conn.execute('''
+        SELECT COUNT(*), AVG(iniciada_em - criada_em), AVG(concluida_em - iniciada_em)
+        FROM tarefas WHERE concluida_em >= ? AND status = 'concluida'
+        ''', (agora - self.JANELA_ESTATISTICAS,)).fetchone()
+        estatisticas["concluidas_por_minuto"] = round(concluidas * 60 / self.JANELA_ESTATISTICAS, 2)
+        estatisticas["espera_media"] = round(espera, 3) if espera is not None else None
+        estatisticas["processamento_medio"] = round(processamento, 3) if processamento is not None else None
+        return estatisticas
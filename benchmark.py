@@ -0,0 +1,1708 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks de desempenho do extrator de produtos.
+
+Uso:
+    python benchmark.py extracao [--repeticoes N] [--itens-menu N]
+    python benchmark.py parsers [--repeticoes N] [--itens-menu N]
+    python benchmark.py poda [--repeticoes N] [--itens-menu N]
+    python benchmark.py download [--repeticoes N] [--kb-scripts N]
+    python benchmark.py banco [--processos N] [--threads N] [--operacoes N]
+    python benchmark.py revalidacao [--produtos N] [--proporcao-alterados P]
+    python benchmark.py estruturados [--repeticoes N] [--itens-menu N]
+    python benchmark.py catalogo [--produtos N] [--concorrencia N]
+    python benchmark.py exportacao [--produtos N] [--formatos csv xlsx]
+    python benchmark.py paginacao [--tamanhos N ...] [--limit N]
+    python benchmark.py consulta [--produtos N] [--preco-min R] [--preco-max R]
+    python benchmark.py historico [--produtos N] [--atualizacoes N] [--proporcao-alterados P]
+    python benchmark.py busca [--produtos N] [--consultas TEXTO ...]
+    python benchmark.py inicializacao [--modulo webhook_handler] [--repeticoes N]
+    python benchmark.py webhook [--mensagens N] [--atraso-lento S] [--trabalhadores N]
+    python benchmark.py fila [--tarefas N] [--configuracoes PxT ...] [--duracao-reserva S]
+    python benchmark.py asgi [--requisicoes N] [--concorrencia N ...] [--workers N] [--atraso S]
+    python benchmark.py lojas [--lojas N ...] [--consultas N] [--repeticoes N]
+"""
+
+import os
+import re
+import sys
+import json
+import datetime
+import time
+import random
+import sqlite3
+import tempfile
+import argparse
+import subprocess
+import warnings
+import threading
+import contextlib
+import multiprocessing
+import gzip
+import hashlib
+import http.server
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from bs4 import BeautifulSoup
+from extracao import extrair_campos, extrair_campos_html, BACKENDS
+from produto_scraper import ProdutoScraper
+import banco_dados
+
+warnings.filterwarnings('ignore')
+
+
+# ---------------------------------------------------------------------------
+# Páginas de referência
+# ---------------------------------------------------------------------------
+
+def _menu(itens_menu):
+    """Menu de navegação com submenus aninhados, como no cabeçalho da loja"""
+    categorias = []
+    for i in range(itens_menu):
+        subitens = ''.join(
+            f'<li><a href="/categoria-{i}/sub-{j}">Subcategoria {i}-{j}</a></li>' for j in range(8)
+        )
+        categorias.append(
+            f'<li class="dropdown"><a href="/categoria-{i}">Categoria {i}</a>'
+            f'<div class="dropdown-menu"><div><div><ul>{subitens}</ul></div></div></div></li>'
+        )
+    return f'<nav><ul class="menu">{"".join(categorias)}</ul></nav>'
+
+
+def _rodape(itens_menu):
+    links = ''.join(f'<p><span>Institucional</span> <a href="/pagina-{i}">Página {i}</a></p>' for i in range(itens_menu))
+    return (
+        '<footer><div class="container"><div class="row"><div class="col">'
+        f'{links}<p>Telefone: (11) 0000-0000 - WhatsApp: (11) 90000-0000</p>'
+        '</div></div></div></footer>'
+    )
+
+
+def _script(tamanho):
+    dados = ','.join(f'{{"id":{i},"nome":"item {i}"}}' for i in range(tamanho))
+    return f'<script>var produtos = [{dados}];</script><style>.menu li {{ display: inline; }}</style>'
+
+
+PRODUTOS = {
+    # Seletores específicos de preço, código e descrição presentes
+    'padrao': '''
+        <div class="product-info"><div class="row"><div class="col">
+            <h1>Cabo VGA Macho x VGA Macho 15 Metros c/ Filtro</h1>
+            <div class="price-box"><span class="product-price">Por: R$ 49,90 à vista</span></div>
+            <p><strong>Código:</strong> CB-VGA-15</p>
+            <p><b>Estoque:</b> Disponível</p>
+            <div class="product-description"><p>Cabo VGA de alta qualidade com filtro.</p><p>Ideal para monitores e projetores.</p></div>
+            <table class="product-features">
+                <tr><td>Comprimento:</td><td>15 metros</td></tr>
+                <tr><td>Conector:</td><td>VGA macho - VGA macho</td></tr>
+            </table>
+        </div></div></div>''',
+    # Sem seletores de preço: o preço é encontrado em uma string do texto
+    'texto_livre': '''
+        <div class="product-info"><div class="row"><div class="col">
+            <div class="product-name">Memória DDR4 16GB 3200MHz XPG</div>
+            <div class="valor"><strong>Por apenas R$ 1.234,56</strong> no PIX</div>
+            <span class="sku">SKU: AX4U32001G16A-SB41</span>
+            <div class="stock">Produto disponível para entrega</div>
+            <p>Memória DDR4 com iluminação ARGB e perfil XMP 2.0 para overclock automático de alta frequência.</p>
+            <p>Curto.</p>
+            <ul class="specifications"><li>Capacidade: 16GB</li><li>Frequência - 3200MHz</li></ul>
+        </div></div></div>''',
+    # Preço dividido entre elementos: só aparece no texto concatenado
+    'preco_fragmentado': '''
+        <div class="product-info"><div class="row"><div class="col">
+            <h1>Mouse Óptico USB</h1>
+            <div class="valor"><span>R$</span><span>19,90</span></div>
+            <span class="product-code">Ref: MS-USB-01</span>
+            <p>Estoque: Esgotado</p>
+            <div class="tab-content"><div>Mouse com sensor óptico de 1000 DPI.</div></div>
+            <div class="specifications"><ul><li>DPI - 1000</li><li>Conexão - USB</li></ul></div>
+        </div></div></div>''',
+    # Preço presente apenas em um marcador de template e em um script
+    'marcador': '''
+        <div class="product-info"><div class="row"><div class="col">
+            <h1>Teclado ABNT2</h1>
+            <div class="valor">R$ --PRODUTO_PRECO--</div>
+            <p>Estoque: Indisponível no momento</p>
+            <ul><li>--PRODUTO_SPEC--</li><li>Layout - ABNT2</li></ul>
+        </div></div></div>
+        <script>window.dataLayer = [{"price": "R$ 89,90"}];</script>''',
+}
+
+
+def gerar_pagina(variante, itens_menu=60):
+    """Gera uma página de produto com cabeçalho, menus, scripts e rodapé realistas"""
+    return (
+        '<!DOCTYPE html><html><head><title>Cia da Informática</title>'
+        f'{_script(itens_menu * 10)}</head><body>'
+        f'<header><div class="container"><div class="row">{_menu(itens_menu)}</div></div></header>'
+        f'<main>{PRODUTOS[variante]}</main>'
+        f'{_rodape(itens_menu)}</body></html>'
+    )
+
+
+# ---------------------------------------------------------------------------
+# Implementação anterior (várias varreduras do documento), usada como referência
+# ---------------------------------------------------------------------------
+
+def extrair_campos_legado(soup):
+    """Extração original de `extrair_info_ciainfor`, antes da passagem única"""
+    nome_produto = soup.select_one('h1') or soup.select_one('.product-name')
+    nome_produto = nome_produto.text.strip() if nome_produto else None
+
+    preco = "Preço não disponível"
+
+    preco_element = soup.select_one('.product-price') or soup.select_one('.price-new') or soup.select_one('span[itemprop="price"]')
+    if preco_element:
+        preco_text = preco_element.text.strip()
+        preco_match = re.search(r'R\$\s*[\d.,]+', preco_text)
+        if preco_match:
+            preco = preco_match.group(0)
+        else:
+            preco = preco_text
+
+    if preco == "Preço não disponível":
+        for element in soup.find_all(text=True):
+            if 'R$' in element and not '--PRODUTO_PRECO' in element:
+                preco_match = re.search(r'R\$\s*[\d.,]+', element)
+                if preco_match:
+                    preco = preco_match.group(0)
+                    break
+
+    if preco == "Preço não disponível":
+        for element in soup.find_all(['span', 'div', 'p', 'strong']):
+            if element.text and 'R$' in element.text and not '--PRODUTO_PRECO' in element.text:
+                preco_match = re.search(r'R\$\s*[\d.,]+', element.text)
+                if preco_match:
+                    preco = preco_match.group(0)
+                    break
+
+    codigo = ""
+    codigo_element = soup.find(string=re.compile('Código:'))
+    if codigo_element:
+        codigo_next = codigo_element.next_element
+        if codigo_next:
+            codigo = codigo_next.strip()
+
+    if not codigo:
+        codigo_element = soup.select_one('.product-code') or soup.select_one('.sku')
+        if codigo_element:
+            codigo = codigo_element.text.strip()
+            codigo = re.sub(r'^(Código:|SKU:|Ref:)\s*', '', codigo)
+
+    disponibilidade = "Não informado"
+    disponibilidade_element = soup.find(string=re.compile('Estoque:'))
+    if disponibilidade_element:
+        disponibilidade_text = disponibilidade_element.parent.text if disponibilidade_element.parent else disponibilidade_element
+        if "Disponível" in disponibilidade_text:
+            disponibilidade = "Disponível"
+        elif "Indisponível" in disponibilidade_text or "Esgotado" in disponibilidade_text:
+            disponibilidade = "Indisponível"
+
+    if disponibilidade == "Não informado":
+        disponibilidade_element = soup.select_one('.stock') or soup.select_one('.availability')
+        if disponibilidade_element:
+            disponibilidade_text = disponibilidade_element.text.strip().lower()
+            if "disponível" in disponibilidade_text:
+                disponibilidade = "Disponível"
+            elif "indisponível" in disponibilidade_text or "esgotado" in disponibilidade_text:
+                disponibilidade = "Indisponível"
+
+    descricao_element = soup.select_one('.product-description') or soup.select_one('.tab-content')
+    descricao = ""
+    if descricao_element:
+        descricao = descricao_element.get_text(strip=True, separator='\n')
+    else:
+        paragrafos = soup.select('p')
+        descricao = '\n'.join([p.text.strip() for p in paragrafos if len(p.text.strip()) > 50])
+
+    especificacoes = []
+    specs_elements = soup.select('li') or soup.select('.product-features li')
+    for spec in specs_elements:
+        spec_text = spec.text.strip()
+        if spec_text and len(spec_text) > 5 and '-' in spec_text and not '--PRODUTO_' in spec_text:
+            especificacoes.append(spec_text)
+
+    especificacoes = [spec for spec in especificacoes if not '--PRODUTO_' in spec]
+
+    extra_specs = []
+    for element in soup.select('.product-features') or soup.select('.specifications'):
+        for item in element.select('tr') or element.select('li'):
+            item_text = item.text.strip()
+            if item_text and not item_text in especificacoes and not '--PRODUTO_' in item_text:
+                extra_specs.append(item_text)
+
+    if extra_specs:
+        especificacoes.extend(extra_specs)
+
+    return {
+        "nome": nome_produto,
+        "preco": preco,
+        "codigo": codigo,
+        "disponibilidade": disponibilidade,
+        "descricao": descricao,
+        "especificacoes": especificacoes,
+    }
+
+
+def _criar_tabela_legado(caminho):
+    """`init_db` original dos servidores, antes de `banco_dados.py`"""
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS produtos (
+        url TEXT PRIMARY KEY,
+        nome TEXT,
+        preco TEXT,
+        disponibilidade TEXT,
+        codigo TEXT,
+        descricao TEXT,
+        especificacoes TEXT,
+        data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def get_produto_legado(caminho, url):
+    """`get_produto_from_db` original: uma conexão nova por consulta"""
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM produtos WHERE url = ?', (url,))
+    result = cursor.fetchone()
+    conn.close()
+
+    if result:
+        colunas = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'descricao', 'especificacoes', 'data_atualizacao']
+        produto = dict(zip(colunas, result))
+        if produto['especificacoes']:
+            produto['especificacoes'] = json.loads(produto['especificacoes'])
+        else:
+            produto['especificacoes'] = []
+        return produto
+    return None
+
+
+def save_produto_legado(caminho, produto):
+    """`save_produto_to_db` original: uma conexão e uma transação por produto"""
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+    especificacoes_json = json.dumps(produto.get('especificacoes', []), ensure_ascii=False)
+    cursor.execute('''
+    INSERT OR REPLACE INTO produtos 
+    (url, nome, preco, disponibilidade, codigo, descricao, especificacoes, data_atualizacao) 
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (
+        produto.get('url', ''),
+        produto.get('nome', ''),
+        produto.get('preco', ''),
+        produto.get('disponibilidade', ''),
+        produto.get('codigo', ''),
+        produto.get('descricao', ''),
+        especificacoes_json
+    ))
+    conn.commit()
+    conn.close()
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Utilitários
+# ---------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def servidor_local(paginas, etag=True, acessos=None, atrasos=None):
+    """
+    Servidor HTTP/1.1 local (keep-alive) que serve o dicionário {caminho: bytes},
+    com ETag e respostas 304 a requisições condicionais (se `etag`). Conta as
+    requisições por caminho em `acessos` (Counter), se informado, e atrasa as
+    respostas pelos segundos de `atrasos` ({caminho: segundos}). Retorna a
+    URL base do servidor.
+    """
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Cabeçalhos e corpo são escritos separadamente; sem TCP_NODELAY o
+        # algoritmo de Nagle atrasa cada resposta em dezenas de milissegundos
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if acessos is not None:
+                acessos[self.path] += 1
+            if atrasos and self.path in atrasos:
+                time.sleep(atrasos[self.path])
+            corpo = paginas.get(self.path)
+            if corpo is None:
+                self.send_error(404)
+                return
+            valor_etag = '"' + hashlib.md5(corpo).hexdigest() + '"' if etag else None
+            if valor_etag and self.headers.get('If-None-Match') == valor_etag:
+                self.send_response(304)
+                self.send_header('ETag', valor_etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            if valor_etag:
+                self.send_header('ETag', valor_etag)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            try:
+                self.wfile.write(corpo)
+            except (BrokenPipeError, ConnectionResetError):
+                # Cliente encerrou a leitura antes do fim (download interrompido)
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    class Servidor(http.server.ThreadingHTTPServer):
+        daemon_threads = True
+        # Fila de conexões para os benchmarks com centenas de clientes simultâneos
+        request_queue_size = 256
+
+        def handle_error(self, request, client_address):
+            # Conexões encerradas pelo cliente no meio da resposta são esperadas
+            pass
+
+    servidor = Servidor(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+@contextlib.contextmanager
+def receptor_local(recebidos, falhar_a_cada=0):
+    """
+    Receptor HTTP local de callbacks: guarda o JSON de cada POST aceito na
+    lista `recebidos` e, com `falhar_a_cada` N, responde 503 a cada N-ésimo
+    POST (sem guardá-lo). Retorna a URL do receptor.
+    """
+    contador = Counter()
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            corpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with lock:
+                contador['posts'] += 1
+                recusar = falhar_a_cada and contador['posts'] % falhar_a_cada == 0
+                if not recusar:
+                    recebidos.append(json.loads(corpo))
+            self.send_response(503 if recusar else 200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    servidor = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    servidor.daemon_threads = True
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_address[1]}/callback"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def _cronometrar(funcao, repeticoes):
+    """Executa a função `repeticoes` vezes e retorna o tempo médio em milissegundos"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) * 1000 / repeticoes
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def benchmark_extracao(args):
+    """Compara a extração em várias varreduras (anterior) com a passagem única"""
+    print(f"{'Página':<20} {'Anterior (ms)':>14} {'Passagem única (ms)':>20} {'Ganho':>7}")
+    divergencias = 0
+    for variante in PRODUTOS:
+        html = gerar_pagina(variante, args.itens_menu)
+        soup = BeautifulSoup(html, 'lxml')
+
+        anterior = extrair_campos_legado(soup)
+        atual = extrair_campos(soup)
+        if anterior != atual:
+            divergencias += 1
+            print(f"DIVERGÊNCIA em '{variante}':")
+            print(json.dumps({"anterior": anterior, "atual": atual}, indent=2, ensure_ascii=False))
+
+        tempo_anterior = _cronometrar(lambda: extrair_campos_legado(soup), args.repeticoes)
+        tempo_atual = _cronometrar(lambda: extrair_campos(soup), args.repeticoes)
+        print(f"{variante:<20} {tempo_anterior:>14.2f} {tempo_atual:>20.2f} {tempo_anterior / tempo_atual:>6.1f}x")
+
+    if divergencias:
+        print(f"\n{divergencias} página(s) com resultado diferente da implementação anterior")
+        return 1
+    print("\nResultados idênticos à implementação anterior em todas as páginas")
+    return 0
+
+
+# Executa o comando recebido e imprime o pico de memória residente (KB) do processo filho
+SCRIPT_LANCADOR = """
+import sys
+import resource
+import subprocess
+subprocess.run(sys.argv[1:], check=True)
+print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+"""
+
+
+def _pico_memoria(script, base, medida, entrada=None):
+    """
+    Executa `script` em um interpretador novo com os argumentos `base` e depois
+    com `medida` e retorna (última linha impressa pela execução `medida`,
+    aumento do pico de memória residente em KB).
+
+    O pico (ru_maxrss) de um processo inclui a memória do processo pai no
+    fork, por isso cada execução é lançada por um interpretador mínimo
+    (`SCRIPT_LANCADOR`), que informa o pico do filho (RUSAGE_CHILDREN). O
+    interpretador, as importações e o aquecimento se cancelam na diferença com
+    a execução `base`, que faz o mesmo sem a carga medida. Os scripts importam
+    só o necessário: memória liberada por importações pesadas seria
+    reaproveitada pela carga medida, escondendo-a.
+    """
+    picos = []
+    for args in (base, medida):
+        saida = subprocess.run(
+            [sys.executable, '-c', SCRIPT_LANCADOR, sys.executable, '-c', script, *args],
+            input=entrada, capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip().splitlines()
+        picos.append(int(saida[-1]))
+    return (saida[-2] if len(saida) > 1 else None), max(picos[1] - picos[0], 0)
+
+
+SCRIPT_MEMORIA_ANALISE = """
+import sys
+from extracao import extrair_campos_html
+backend, podar, analisar = sys.argv[1], sys.argv[2] == 'true', sys.argv[3] == 'true'
+html = sys.stdin.read()
+extrair_campos_html('<html><body></body></html>', backend, podar)
+if analisar:
+    extrair_campos_html(html, backend, podar)
+"""
+
+
+def _pico_memoria_backend(backend, variante, itens_menu, podar=False):
+    """Aumento do pico de memória residente (KB) ao analisar uma página com o backend indicado"""
+    podar = str(podar).lower()
+    return _pico_memoria(
+        SCRIPT_MEMORIA_ANALISE, (backend, podar, 'false'), (backend, podar, 'true'),
+        entrada=gerar_pagina(variante, itens_menu),
+    )[1]
+
+
+def benchmark_parsers(args):
+    """Compara os backends de parser: contrato de extração, vazão e pico de memória por página"""
+    falhas = 0
+
+    print(f"{'Página':<20} {'Backend':<8} {'ms/página':>10} {'páginas/s':>10} {'Pico memória (KB)':>18}")
+    for variante in PRODUTOS:
+        html = gerar_pagina(variante, args.itens_menu)
+        resultados = {backend: extrair_campos_html(html, backend) for backend in BACKENDS}
+
+        referencia = resultados['bs4']
+        for backend, resultado in resultados.items():
+            if resultado != referencia:
+                falhas += 1
+                print(f"CONTRATO VIOLADO: backend '{backend}' em '{variante}':")
+                print(json.dumps({"bs4": referencia, backend: resultado}, indent=2, ensure_ascii=False))
+
+        for backend in BACKENDS:
+            tempo = _cronometrar(lambda: extrair_campos_html(html, backend), args.repeticoes)
+            memoria = _pico_memoria_backend(backend, variante, args.itens_menu)
+            print(f"{variante:<20} {backend:<8} {tempo:>10.2f} {1000 / tempo:>10.1f} {memoria:>18}")
+
+    if falhas:
+        print(f"\n{falhas} resultado(s) diferente(s) entre os backends")
+        return 1
+    print("\nTodos os backends produziram o mesmo resultado em todas as páginas")
+    return 0
+
+
+def benchmark_poda(args):
+    """Compara a análise do documento completo com a análise só das regiões do produto"""
+    falhas = 0
+
+    print(f"{'Página':<20} {'Backend':<8} {'Completo (ms)':>14} {'Poda (ms)':>10} {'Ganho':>7} "
+          f"{'Memória completo (KB)':>22} {'Memória poda (KB)':>18}")
+    alteracoes = {}
+    for variante in PRODUTOS:
+        html = gerar_pagina(variante, args.itens_menu)
+        resultados = {backend: extrair_campos_html(html, backend, True) for backend in BACKENDS}
+        if resultados['lxml'] != resultados['bs4']:
+            falhas += 1
+            print(f"CONTRATO VIOLADO: backends divergem com poda em '{variante}':")
+            print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+        completo = extrair_campos_html(html)
+        alteracoes[variante] = [campo for campo in completo if completo[campo] != resultados['bs4'][campo]]
+
+        for backend in BACKENDS:
+            tempo_completo = _cronometrar(lambda: extrair_campos_html(html, backend), args.repeticoes)
+            tempo_poda = _cronometrar(lambda: extrair_campos_html(html, backend, True), args.repeticoes)
+            memorias = [_pico_memoria_backend(backend, variante, args.itens_menu, podar) for podar in (False, True)]
+            print(f"{variante:<20} {backend:<8} {tempo_completo:>14.2f} {tempo_poda:>10.2f} "
+                  f"{tempo_completo / tempo_poda:>6.1f}x {memorias[0]:>22} {memorias[1]:>18}")
+
+    # Com a poda, menus e rodapé deixam de alimentar as heurísticas de texto livre
+    print("\nCampos alterados pela poda (em relação ao documento completo):")
+    for variante, campos in alteracoes.items():
+        print(f"  {variante:<20} {', '.join(campos) or '-'}")
+
+    if falhas:
+        print(f"\n{falhas} página(s) com resultado diferente entre os backends")
+        return 1
+    print("\nOs backends produziram o mesmo resultado com poda em todas as páginas")
+    return 0
+
+
+SCRIPT_MEMORIA_DOWNLOAD = """
+import sys
+import logging
+logging.disable(logging.INFO)
+from produto_scraper import ProdutoScraper
+url, streaming = sys.argv[1], sys.argv[2] == 'true'
+scraper = ProdutoScraper(streaming=streaming)
+scraper.extrair_info_ciainfor(url.rsplit('/', 1)[0] + '/vazia')
+scraper.extrair_info_ciainfor(url)
+"""
+
+
+def _pico_memoria_download(url, streaming):
+    """Aumento do pico de memória residente (KB) ao baixar e extrair uma página"""
+    vazia = url.rsplit('/', 1)[0] + '/vazia'
+    streaming = str(streaming).lower()
+    return _pico_memoria(SCRIPT_MEMORIA_DOWNLOAD, (vazia, streaming), (url, streaming))[1]
+
+
+def benchmark_download(args):
+    """Compara o download completo com o download em streaming com interrupção antecipada"""
+    import logging
+    logging.disable(logging.INFO)
+
+    # Página com scripts pesados depois do rodapé, como nas páginas reais da loja
+    scripts = '<script>' + 'var rastreamento = {"evento": "visualizacao"};' * (args.kb_scripts * 24) + '</script>'
+    html = gerar_pagina('padrao').replace('</body>', scripts + '</body>').encode('utf-8')
+    paginas = {'/produto': html, '/vazia': b'<html><body></body></html>'}
+
+    print(f"Página de {len(html) / 1024:.0f} KB\n")
+    print(f"{'Modo':<12} {'ms/página':>10} {'KB lidos/página':>16} {'Pico memória (KB)':>18}")
+    with servidor_local(paginas) as base:
+        url = base + '/produto'
+        resultados = {}
+        for modo, streaming in (('completo', False), ('streaming', True)):
+            scraper = ProdutoScraper(streaming=streaming)
+            resultados[modo] = scraper.extrair_info_ciainfor(url)
+            tempo = _cronometrar(lambda: scraper.extrair_info_ciainfor(url), args.repeticoes)
+            estatisticas = scraper.estatisticas_download()
+            kb_lidos = estatisticas['bytes_lidos'] / estatisticas['paginas'] / 1024
+            memoria = _pico_memoria_download(url, streaming)
+            print(f"{modo:<12} {tempo:>10.2f} {kb_lidos:>16.0f} {memoria:>18}")
+
+    # Os validadores registram os bytes lidos, diferentes em cada modo
+    for resultado in resultados.values():
+        resultado.pop('validadores', None)
+    if resultados['completo'] != resultados['streaming']:
+        print("\nO download em streaming produziu um resultado diferente do download completo")
+        return 1
+    print("\nMesmo resultado nos dois modos")
+    return 0
+
+
+def _produto_sintetico(indice):
+    return {
+        "url": f"https://www.ciainfor.com.br/produto-{indice}",
+        "nome": f"Produto {indice}",
+        "preco": f"R$ {indice % 1000},90",
+        "codigo": f"CB-{indice:06d}",
+        "disponibilidade": "Disponível",
+        "descricao": "Descrição do produto com texto de tamanho realista. " * 8,
+        "especificacoes": [f"Especificação {j}: valor {j}" for j in range(12)],
+    }
+
+
+def _carga_banco(implementacao, caminho, threads, operacoes, proporcao_escrita, total_produtos, semente):
+    """
+    Executado em um processo novo (como um worker do gunicorn): `threads`
+    threads fazem `operacoes` consultas/escritas cada. Retorna (operações,
+    erros "database is locked", segundos).
+    """
+    if implementacao == 'atual':
+        banco_dados.DB_PATH = caminho
+        buscar, salvar = banco_dados.get_produto_from_db, banco_dados.save_produto_to_db
+    else:
+        buscar = lambda url: get_produto_legado(caminho, url)
+        salvar = lambda produto: save_produto_legado(caminho, produto)
+
+    def executar(indice_thread):
+        aleatorio = random.Random(semente * 1000 + indice_thread)
+        erros = 0
+        for _ in range(operacoes):
+            indice = aleatorio.randrange(total_produtos)
+            try:
+                if aleatorio.random() < proporcao_escrita:
+                    salvar(_produto_sintetico(indice))
+                else:
+                    buscar(f"https://www.ciainfor.com.br/produto-{indice}")
+            except sqlite3.OperationalError:
+                erros += 1
+        return erros
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        erros = sum(executor.map(executar, range(threads)))
+    return threads * operacoes, erros, time.perf_counter() - inicio
+
+
+def benchmark_banco(args):
+    """Compara a persistência anterior (conexão por chamada) com banco_dados.py sob concorrência"""
+    contexto = multiprocessing.get_context('spawn')
+    cargas = (('leitura', 0.0), ('misto', 0.2), ('escrita', 1.0))
+    produtos = [_produto_sintetico(i) for i in range(args.produtos)]
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminhos = {}
+        for implementacao in ('anterior', 'atual'):
+            caminhos[implementacao] = os.path.join(diretorio, f'{implementacao}.db')
+        _criar_tabela_legado(caminhos['anterior'])
+        for produto in produtos:
+            save_produto_legado(caminhos['anterior'], produto)
+        banco_dados.DB_PATH = caminhos['atual']
+        banco_dados.init_db()
+        banco_dados.save_produtos_to_db(produtos)
+
+        print(f"\n{args.processos} processo(s) x {args.threads} thread(s), {args.operacoes} operações por thread\n")
+        print(f"{'Carga':<10} {'Implementação':<14} {'ops/s':>10} {'Erros de lock':>14}")
+
+        for carga, proporcao_escrita in cargas:
+            for implementacao, caminho in caminhos.items():
+                with ProcessPoolExecutor(max_workers=args.processos, mp_context=contexto) as executor:
+                    futuros = [
+                        executor.submit(_carga_banco, implementacao, caminho, args.threads, args.operacoes,
+                                        proporcao_escrita, args.produtos, semente)
+                        for semente in range(args.processos)
+                    ]
+                    resultados = [futuro.result() for futuro in futuros]
+                operacoes = sum(r[0] for r in resultados)
+                erros = sum(r[1] for r in resultados)
+                segundos = max(r[2] for r in resultados)
+                print(f"{carga:<10} {implementacao:<14} {operacoes / segundos:>10.0f} {erros:>14}")
+
+        # Escrita de um lote: uma transação por produto x uma transação para o lote
+        lote = produtos[:args.tamanho_lote]
+        inicio = time.perf_counter()
+        for produto in lote:
+            save_produto_legado(caminhos['anterior'], produto)
+        tempo_anterior = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        banco_dados.save_produtos_to_db(lote)
+        tempo_atual = (time.perf_counter() - inicio) * 1000
+        print(f"\nLote de {len(lote)} produtos: anterior {tempo_anterior:.1f} ms, "
+              f"atual {tempo_atual:.1f} ms ({tempo_anterior / tempo_atual:.1f}x)")
+        banco_dados.fechar_conexao()
+    return 0
+
+
+def _json_ld(produto):
+    return f'<script type="application/ld+json">{json.dumps(produto, ensure_ascii=False)}</script>'
+
+
+# Dados estruturados inseridos no <head> das páginas de referência
+OFERTA_PADRAO = {"@type": "Offer", "price": "49.90", "priceCurrency": "BRL", "availability": "https://schema.org/InStock"}
+PRODUTO_JSON_LD = {
+    "@context": "https://schema.org", "@type": "Product",
+    "name": "Cabo VGA Macho x VGA Macho 15 Metros c/ Filtro", "sku": "CB-VGA-15",
+    "description": "Cabo VGA de alta qualidade com filtro.\nIdeal para monitores e projetores.",
+    "offers": OFERTA_PADRAO,
+    "additionalProperty": [
+        {"@type": "PropertyValue", "name": "Comprimento", "value": "15 metros"},
+        {"@type": "PropertyValue", "name": "Conector", "value": "VGA macho - VGA macho"},
+    ],
+}
+DADOS_ESTRUTURADOS = {
+    # Todos os campos no JSON-LD: o DOM não é analisado
+    'json_ld_completo': ('padrao', _json_ld(PRODUTO_JSON_LD)),
+    # Sem especificações no JSON-LD: o DOM é analisado só para elas
+    'json_ld_parcial': ('padrao', _json_ld({k: v for k, v in PRODUTO_JSON_LD.items() if k != 'additionalProperty'})),
+    # Preço e estoque no OpenGraph, código nos microdados
+    'opengraph': ('texto_livre', '<meta property="product:price:amount" content="1234.56">'
+                                 '<meta property="product:price:currency" content="BRL">'
+                                 '<meta property="product:availability" content="in stock">'
+                                 '<meta itemprop="sku" content="AX4U32001G16A-SB41">'),
+    # Preço só no texto concatenado (DOM) e no JSON-LD; estoque divergente
+    'preco_fragmentado': ('preco_fragmentado', _json_ld({
+        "@type": "Product", "name": "Mouse Óptico USB",
+        "offers": {"@type": "Offer", "price": 19.9, "availability": "http://schema.org/OutOfStock"},
+    })),
+    # Sem dados estruturados: apenas as heurísticas do DOM
+    'sem_dados': ('padrao', ''),
+}
+
+
+def benchmark_estruturados(args):
+    """Compara a extração só pelo DOM com a leitura prévia dos dados estruturados"""
+    print(f"{'Página':<20} {'Backend':<8} {'Só DOM (ms)':>12} {'Estruturados (ms)':>18} {'Ganho':>7}  Campos alterados")
+    for nome, (variante, dados) in DADOS_ESTRUTURADOS.items():
+        html = gerar_pagina(variante, args.itens_menu).replace('</head>', dados + '</head>')
+        for backend in BACKENDS:
+            so_dom = extrair_campos_html(html, backend, estruturados=False)
+            estruturados = extrair_campos_html(html, backend)
+            alterados = [campo for campo in so_dom if so_dom[campo] != estruturados[campo]]
+            tempo_dom = _cronometrar(lambda: extrair_campos_html(html, backend, estruturados=False), args.repeticoes)
+            tempo_estruturados = _cronometrar(lambda: extrair_campos_html(html, backend), args.repeticoes)
+            print(f"{nome:<20} {backend:<8} {tempo_dom:>12.2f} {tempo_estruturados:>18.2f} "
+                  f"{tempo_dom / tempo_estruturados:>6.1f}x  {', '.join(alterados) or '-'}")
+    return 0
+
+
+def _sitemap(tipo, urls):
+    raiz = 'sitemapindex' if tipo == 'sitemap' else 'urlset'
+    entradas = ''.join(f'<{tipo}><loc>{url}</loc><lastmod>2024-01-01</lastmod></{tipo}>' for url in urls)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<{raiz} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entradas}</{raiz}>').encode('utf-8')
+
+
+def benchmark_catalogo(args):
+    """
+    Varre um catálogo de referência servido localmente (índice de sitemaps,
+    sitemap comprimido e sitemap de categorias filtrado), interrompe a
+    varredura no meio e a retoma, conferindo que cada produto foi baixado
+    uma única vez e que todos foram salvos
+    """
+    import logging
+    logging.disable(logging.INFO)
+    from varredura_catalogo import VarreduraCatalogo
+
+    html = gerar_pagina('padrao').encode('utf-8')
+    caminhos = [f'/produto-{i}' for i in range(args.produtos)]
+    paginas = {caminho: html.replace(b'</h1>', f' {i}</h1>'.encode()) for i, caminho in enumerate(caminhos)}
+    acessos = Counter()
+
+    with tempfile.TemporaryDirectory() as diretorio, servidor_local(paginas, acessos=acessos) as base:
+        metade = len(caminhos) // 2
+        paginas['/sitemap.xml'] = _sitemap('sitemap', [
+            base + '/sitemap-produtos-1.xml', base + '/sitemap-produtos-2.xml.gz', base + '/sitemap-categorias.xml'
+        ])
+        paginas['/sitemap-produtos-1.xml'] = _sitemap('url', [base + caminho for caminho in caminhos[:metade]])
+        paginas['/sitemap-produtos-2.xml.gz'] = gzip.compress(_sitemap('url', [base + caminho for caminho in caminhos[metade:]]))
+        paginas['/sitemap-categorias.xml'] = _sitemap('url', [base + f'/categoria/{i}' for i in range(20)])
+
+        banco_dados.DB_PATH = os.path.join(diretorio, 'catalogo.db')
+        banco_dados.init_db()
+
+        def varrer(interromper_apos=None):
+            checkpoint = banco_dados.CheckpointVarredura()
+            checkpoint.iniciar()
+            varredura = VarreduraCatalogo(
+                ProdutoScraper(), checkpoint, base + '/sitemap.xml', args.concorrencia,
+                args.requisicoes_por_minuto, filtro_url=r'/produto-\d+$',
+                buscar_validadores=banco_dados.get_validadores_from_db
+            )
+            if interromper_apos:
+                def interromper():
+                    while varredura.estatisticas()['extraidos'] < interromper_apos:
+                        time.sleep(0.01)
+                    varredura.parar()
+                threading.Thread(target=interromper, daemon=True).start()
+            inicio = time.perf_counter()
+            progresso = varredura.executar()
+            return progresso, time.perf_counter() - inicio
+
+        progresso, segundos = varrer(interromper_apos=len(caminhos) // 3)
+        print(f"Varredura interrompida: {progresso['concluida']} concluídas, {progresso['pendente']} pendentes "
+              f"({progresso['extraidos'] / segundos:.0f} produtos/s)")
+        progresso, segundos = varrer()
+        print(f"Varredura retomada: {progresso['concluida']} concluídas, {progresso['pendente']} pendentes, "
+              f"{progresso['extraidos']} extraídos ({progresso['extraidos'] / segundos:.0f} produtos/s)")
+
+        salvos = banco_dados.conexao().execute('SELECT COUNT(*) FROM produtos').fetchone()[0]
+        repetidos = sum(1 for caminho in caminhos if acessos[caminho] > 1)
+        banco_dados.fechar_conexao()
+
+    print(f"\n{salvos} de {len(caminhos)} produtos salvos, {repetidos} baixados mais de uma vez, "
+          f"{sum(acessos[f'/categoria/{i}'] for i in range(20))} páginas de categoria baixadas")
+    if salvos != len(caminhos) or repetidos:
+        return 1
+    return 0
+
+
+def exportar_legado(formato, limit):
+    """Exportação anterior de /produtos_excel: DataFrame com todas as linhas, arquivo montado em memória"""
+    import io
+    import datetime
+    import pandas as pd
+    resultado = banco_dados.get_all_produtos_from_db(limit, 0)
+    df_produtos = pd.DataFrame(resultado['produtos'])
+    df_produtos['data_atualizacao'] = pd.to_datetime(df_produtos['data_atualizacao']).dt.strftime('%d/%m/%Y %H:%M:%S')
+    df_produtos = df_produtos.rename(columns={
+        'url': 'URL', 'nome': 'Nome', 'preco': 'Preço', 'disponibilidade': 'Disponibilidade',
+        'codigo': 'Código', 'data_atualizacao': 'Data de Atualização'
+    })
+    if formato == 'csv':
+        output = io.StringIO()
+        df_produtos.to_csv(output, index=False)
+        yield output.getvalue().encode('utf-8')
+        return
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df_produtos.to_excel(writer, sheet_name='Produtos', index=False)
+        info = {
+            'Informação': ['Total de Produtos', 'Data de Exportação'],
+            'Valor': [resultado['total'], datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')]
+        }
+        pd.DataFrame(info).to_excel(writer, sheet_name='Informações', index=False)
+    yield output.getvalue()
+
+
+def exportar_atual(formato, limit):
+    """Exportação de /produtos_excel com exportacao.py, em blocos de bytes como na resposta"""
+    from exportacao import gerar_csv, escrever_xlsx
+    linhas = banco_dados.iterar_produtos_from_db(limit)
+    if formato == 'csv':
+        for bloco in gerar_csv(linhas):
+            yield bloco.encode('utf-8')
+        return
+    with tempfile.TemporaryFile() as arquivo:
+        escrever_xlsx(linhas, banco_dados.contar_produtos_no_db(), arquivo)
+        arquivo.seek(0)
+        while True:
+            bloco = arquivo.read(64 * 1024)
+            if not bloco:
+                break
+            yield bloco
+
+
+SCRIPT_MEMORIA_EXPORTACAO = """
+import sys
+import json
+import benchmark
+implementacao, formato, caminho, limit = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+print(json.dumps(benchmark._medir_exportacao(implementacao, formato, caminho, limit)))
+"""
+
+
+def _medir_exportacao(implementacao, formato, caminho, limit):
+    """
+    Executado em um processo novo: (segundos até o primeiro bloco, segundos
+    no total, bytes gerados) da exportação
+    """
+    banco_dados.DB_PATH = caminho
+    exportar = exportar_legado if implementacao == 'anterior' else exportar_atual
+    # Importar as dependências fora da medição
+    list(exportar(formato, 1))
+    inicio = time.perf_counter()
+    primeiro_bloco = None
+    tamanho = 0
+    for bloco in exportar(formato, limit):
+        if primeiro_bloco is None:
+            primeiro_bloco = time.perf_counter() - inicio
+        tamanho += len(bloco)
+    return primeiro_bloco, time.perf_counter() - inicio, tamanho
+
+
+def benchmark_exportacao(args):
+    """Compara a exportação anterior (pandas, em memória) com a exportação em streaming de /produtos_excel"""
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'exportacao.db')
+        banco_dados.DB_PATH = caminho
+        banco_dados.init_db()
+        for inicio in range(0, args.produtos, 10000):
+            banco_dados.save_produtos_to_db(
+                [_produto_sintetico(i) for i in range(inicio, min(inicio + 10000, args.produtos))]
+            )
+        banco_dados.fechar_conexao()
+
+        print(f"\n{args.produtos} produtos\n")
+        print(f"{'Formato':<8} {'Implementação':<14} {'1º bloco (s)':>13} {'Total (s)':>10} {'Pico (MB)':>10} {'Tamanho (MB)':>13}")
+        for formato in args.formatos:
+            for implementacao in ('anterior', 'atual'):
+                # A execução base exporta um único produto, como o aquecimento
+                resultado, pico_kb = _pico_memoria(
+                    SCRIPT_MEMORIA_EXPORTACAO,
+                    (implementacao, formato, caminho, '1'),
+                    (implementacao, formato, caminho, str(args.produtos)),
+                )
+                primeiro_bloco, segundos, tamanho = json.loads(resultado)
+                print(f"{formato:<8} {implementacao:<14} {primeiro_bloco:>13.2f} {segundos:>10.2f} "
+                      f"{pico_kb / 1024:>10.1f} {tamanho / 1024 / 1024:>13.1f}")
+    return 0
+
+
+def get_all_produtos_legado(limit, offset):
+    """Listagem anterior de /produtos: COUNT(*) e ORDER BY ... OFFSET sem índice em data_atualizacao"""
+    conn = banco_dados.conexao()
+    total = conn.execute('SELECT COUNT(*) FROM produtos NOT INDEXED').fetchone()[0]
+    results = conn.execute('''
+    SELECT url, nome, preco, disponibilidade, codigo, data_atualizacao
+    FROM produtos NOT INDEXED ORDER BY data_atualizacao DESC LIMIT ? OFFSET ?
+    ''', (limit, offset)).fetchall()
+    return total, results
+
+
+def benchmark_paginacao(args):
+    """Latência de uma página de /produtos em várias profundidades: anterior x offset com índice x cursor"""
+    print(f"\nPáginas de {args.limit} produtos, média de {args.repeticoes} consultas (ms)\n")
+    print(f"{'Produtos':>9} {'Página':>8} {'Anterior':>10} {'Offset':>10} {'Cursor':>10}")
+    with tempfile.TemporaryDirectory() as diretorio:
+        for tamanho in args.tamanhos:
+            banco_dados.DB_PATH = os.path.join(diretorio, f'paginacao-{tamanho}.db')
+            banco_dados.init_db()
+            for inicio in range(0, tamanho, 10000):
+                banco_dados.save_produtos_to_db(
+                    [_produto_sintetico(i) for i in range(inicio, min(inicio + 10000, tamanho))]
+                )
+            paginas = tamanho // args.limit
+            for pagina in sorted({1, paginas // 2, paginas}):
+                offset = (pagina - 1) * args.limit
+                # Cursor da página anterior, como o cliente o recebe ao percorrer a lista
+                cursor = banco_dados.get_limites_pagina_from_db(offset, 0)['proximo_cursor'] if offset else None
+                anterior = _cronometrar(lambda: get_all_produtos_legado(args.limit, offset), args.repeticoes)
+                indice = _cronometrar(lambda: banco_dados.get_all_produtos_from_db(args.limit, offset), args.repeticoes)
+                por_cursor = _cronometrar(
+                    lambda: banco_dados.get_all_produtos_from_db(args.limit, 0, cursor, contar=False), args.repeticoes
+                )
+                print(f"{tamanho:>9} {pagina:>8} {anterior:>10.2f} {indice:>10.2f} {por_cursor:>10.2f}")
+            banco_dados.fechar_conexao()
+    return 0
+
+
+def consultar_produtos_legado(preco_min, preco_max, disponibilidade, limit):
+    """Filtro por preço antes da coluna numérica: todas as linhas lidas e o preço interpretado em Python"""
+    from dados_estruturados import preco_em_centavos
+    encontrados = []
+    for linha in banco_dados.conexao().execute(
+        'SELECT url, nome, preco, disponibilidade, codigo, data_atualizacao FROM produtos'
+    ):
+        centavos = preco_em_centavos(linha[2])
+        if centavos is not None and preco_min <= centavos <= preco_max and linha[3] == disponibilidade:
+            encontrados.append((centavos, linha))
+    encontrados.sort(key=lambda item: (item[0], item[1][0]))
+    return encontrados[:limit]
+
+
+def benchmark_consulta(args):
+    """Consulta por faixa de preço e disponibilidade: interpretação em Python x colunas normalizadas com índice"""
+    with tempfile.TemporaryDirectory() as diretorio:
+        banco_dados.DB_PATH = os.path.join(diretorio, 'consulta.db')
+        banco_dados.init_db()
+        for inicio in range(0, args.produtos, 10000):
+            lote = [_produto_sintetico(i) for i in range(inicio, min(inicio + 10000, args.produtos))]
+            for produto in lote:
+                if int(produto['codigo'][3:]) % 3 == 0:
+                    produto['disponibilidade'] = "Indisponível"
+            banco_dados.save_produtos_to_db(lote)
+
+        preco_min, preco_max = args.preco_min * 100, args.preco_max * 100
+        legado = consultar_produtos_legado(preco_min, preco_max, "Disponível", args.limit)
+        atual = banco_dados.consultar_produtos_no_db(preco_min, preco_max, 'disponivel', limit=args.limit)['produtos']
+        iguais = [linha[0] for _, linha in legado] == [produto['url'] for produto in atual]
+
+        tempo_legado = _cronometrar(
+            lambda: consultar_produtos_legado(preco_min, preco_max, "Disponível", args.limit), args.repeticoes
+        )
+        tempo_atual = _cronometrar(
+            lambda: banco_dados.consultar_produtos_no_db(preco_min, preco_max, 'disponivel', limit=args.limit),
+            args.repeticoes
+        )
+        banco_dados.fechar_conexao()
+
+    print(f"\n{args.produtos} produtos, preço entre R$ {args.preco_min} e R$ {args.preco_max}, disponíveis, "
+          f"{args.limit} por página\n")
+    print(f"Interpretação em Python: {tempo_legado:>9.2f} ms")
+    print(f"Colunas com índice:      {tempo_atual:>9.2f} ms ({tempo_legado / tempo_atual:.0f}x)")
+    print(f"Mesmos produtos: {'sim' if iguais else 'NÃO'}")
+    return 0 if iguais else 1
+
+
+def benchmark_historico(args):
+    """
+    Histórico de preços: linhas gravadas (só mudanças x uma por atualização)
+    e consulta das alterações recentes pelo índice x varredura da tabela
+    """
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as diretorio:
+        banco_dados.DB_PATH = os.path.join(diretorio, 'historico.db')
+        banco_dados.init_db()
+        produtos = [_produto_sintetico(i) for i in range(args.produtos)]
+        inicio = time.perf_counter()
+        for _ in range(args.atualizacoes):
+            for produto in produtos:
+                if rng.random() < args.proporcao_alterados:
+                    produto['preco'] = f"R$ {rng.randint(1, 2000)},90"
+            banco_dados.save_produtos_to_db(produtos)
+        segundos = time.perf_counter() - inicio
+
+        conn = banco_dados.conexao()
+        linhas = conn.execute('SELECT COUNT(*) FROM historico_precos').fetchone()[0]
+        desde = conn.execute('SELECT registrado_em FROM historico_precos ORDER BY id DESC LIMIT 1').fetchone()[0]
+        desde = (datetime.datetime.fromisoformat(desde) - datetime.timedelta(seconds=1)).isoformat()
+        por_indice = _cronometrar(lambda: banco_dados.get_alteracoes_from_db(desde, args.limit), args.repeticoes)
+        sql_varredura = banco_dados.SQL_HISTORICO.replace('FROM historico_precos h', 'FROM historico_precos h NOT INDEXED')
+        parametros = (banco_dados._data_sqlite(desde), args.limit)
+        por_varredura = _cronometrar(
+            lambda: conn.execute(sql_varredura + ' WHERE h.registrado_em > ? ORDER BY h.registrado_em, h.id LIMIT ?',
+                                 parametros).fetchall(),
+            args.repeticoes
+        )
+        banco_dados.fechar_conexao()
+
+    gravacoes = args.produtos * args.atualizacoes
+    print(f"\n{args.produtos} produtos x {args.atualizacoes} atualizações, "
+          f"{args.proporcao_alterados:.0%} dos preços alterados a cada uma ({segundos:.1f} s)\n")
+    print(f"Linhas do histórico: {linhas} (uma por atualização seriam {gravacoes}, {linhas / gravacoes:.1%})")
+    print(f"Alterações desde o último segundo: índice {por_indice:.2f} ms, "
+          f"varredura {por_varredura:.2f} ms ({por_varredura / por_indice:.0f}x)")
+    return 0
+
+
+# Vocabulário dos nomes dos produtos sintéticos da busca
+TIPOS_PRODUTO = ['Cabo', 'Mouse', 'Teclado', 'Monitor', 'Adaptador', 'Fonte', 'Headset', 'Webcam', 'Roteador', 'Hub']
+ATRIBUTOS_PRODUTO = ['VGA', 'HDMI', 'USB', 'Óptico', 'Gamer', 'sem Fio', 'Bluetooth', 'Mecânico', 'Full HD', 'RGB',
+                     'Macho', 'Fêmea', 'Preto', 'Branco', 'Compacto', 'Profissional']
+
+
+def benchmark_busca(args):
+    """Busca por trecho do nome: LIKE sobre a tabela x índice FTS5 com prefixos"""
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as diretorio:
+        banco_dados.DB_PATH = os.path.join(diretorio, 'busca.db')
+        banco_dados.init_db()
+        for inicio in range(0, args.produtos, 10000):
+            lote = []
+            for i in range(inicio, min(inicio + 10000, args.produtos)):
+                produto = _produto_sintetico(i)
+                produto['nome'] = ' '.join([rng.choice(TIPOS_PRODUTO), *rng.sample(ATRIBUTOS_PRODUTO, 3), str(i)])
+                lote.append(produto)
+            banco_dados.save_produtos_to_db(lote)
+
+        conn = banco_dados.conexao()
+        # O LIKE para nos primeiros resultados, sem ordenar por relevância; o FTS5 ordena todos os encontrados
+        print(f"\n{args.produtos} produtos, {args.limit} resultados por consulta (ms)\n")
+        print(f"{'Consulta':<22} {'LIKE':>10} {'FTS5':>10} {'Resultados':>11}")
+        for consulta in args.consultas:
+            padroes = [f'%{palavra}%' for palavra in consulta.split()]
+            sql_like = ('SELECT url, nome FROM produtos WHERE '
+                        + ' AND '.join(['(nome LIKE ? OR codigo LIKE ? OR descricao LIKE ? OR especificacoes LIKE ?)'] * len(padroes))
+                        + ' LIMIT ?')
+            parametros = [padrao for padrao in padroes for _ in range(4)] + [args.limit]
+            tempo_like = _cronometrar(lambda: conn.execute(sql_like, parametros).fetchall(), args.repeticoes)
+            tempo_fts = _cronometrar(lambda: banco_dados.buscar_produtos_no_db(consulta, args.limit), args.repeticoes)
+            encontrados = len(banco_dados.buscar_produtos_no_db(consulta, args.limit))
+            print(f"{consulta:<22} {tempo_like:>10.2f} {tempo_fts:>10.2f} {encontrados:>11}")
+        banco_dados.fechar_conexao()
+    return 0
+
+
+# Executado em um interpretador novo: importa o aplicativo como um worker do
+# gunicorn e mede o tempo de importação e a memória do processo. Com `preload`,
+# o aplicativo é importado no "mestre" e a memória medida é a de um worker
+# criado por fork depois da importação.
+SCRIPT_INICIALIZACAO = """
+import os, sys, json, time
+def memoria():
+    campos = {}
+    with open('/proc/self/smaps_rollup') as smaps:
+        for linha in smaps:
+            partes = linha.split()
+            if len(partes) >= 2 and partes[1].isdigit():
+                campos[partes[0].rstrip(':')] = int(partes[1])
+    return campos.get('Rss', 0), campos.get('Private_Clean', 0) + campos.get('Private_Dirty', 0)
+inicio = time.perf_counter()
+for modulo in sys.argv[2:]:
+    __import__(modulo)
+importacao = (time.perf_counter() - inicio) * 1000
+if sys.argv[1] != 'preload':
+    rss, privada = memoria()
+    print(json.dumps([importacao, rss, privada]))
+    sys.exit(0)
+leitura, escrita = os.pipe()
+if os.fork() == 0:
+    # Worker: o aplicativo já está importado; mede a memória após atender uma requisição simples
+    modulo = sys.modules[sys.argv[-1]]
+    modulo.iniciar_worker()
+    modulo.app.test_client().get('/health')
+    os.write(escrita, json.dumps([0.0, *memoria()]).encode())
+    os._exit(0)
+os.wait()
+print(os.read(leitura, 1000).decode())
+"""
+
+
+def _medir_inicializacao(modo, modulos, ambiente):
+    saida = subprocess.run(
+        [sys.executable, '-c', SCRIPT_INICIALIZACAO, modo, *modulos],
+        env=ambiente, capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def benchmark_inicializacao(args):
+    """
+    Inicialização de um worker: importação com pandas/openpyxl e init_db em
+    cada worker (anterior) x dependências carregadas no primeiro uso x
+    aplicativo pré-carregado no mestre (gunicorn.conf.py)
+    """
+    import statistics
+    modos = (
+        ('anterior', 'worker', ['pandas', 'openpyxl', args.modulo], 'true'),
+        ('sob demanda', 'worker', [args.modulo], 'true'),
+        ('pré-carregado', 'preload', [args.modulo], 'false'),
+    )
+    with tempfile.TemporaryDirectory() as diretorio:
+        ambiente = dict(os.environ, PRODUTOS_DB_PATH=os.path.join(diretorio, 'inicializacao.db'))
+        banco_dados.DB_PATH = ambiente['PRODUTOS_DB_PATH']
+        banco_dados.init_db()
+        banco_dados.fechar_conexao()
+
+        print(f"\n{args.modulo}, mediana de {args.repeticoes} inicializações\n")
+        print(f"{'Modo':<15} {'Importação (ms)':>16} {'RSS (MB)':>10} {'Memória própria (MB)':>21}")
+        for nome, modo, modulos, iniciar_na_importacao in modos:
+            ambiente['SERVIDOR_INICIAR_NA_IMPORTACAO'] = iniciar_na_importacao
+            medidas = [_medir_inicializacao(modo, modulos, ambiente) for _ in range(args.repeticoes)]
+            importacao, rss, privada = (statistics.median(valores) for valores in zip(*medidas))
+            print(f"{nome:<15} {importacao:>16.0f} {rss / 1024:>10.1f} {privada / 1024:>21.1f}")
+    return 0
+
+
+def benchmark_webhook(args):
+    """
+    /webhook atendido por um único worker síncrono (uma requisição por vez,
+    como no gunicorn): resposta só depois da extração x 202 imediato com o
+    resultado entregue por callback a um receptor local, que recusa parte
+    das entregas para exercitar as novas tentativas
+    """
+    import statistics
+    from entrega_webhook import EntregaCallback
+    variantes = list(PRODUTOS)
+    paginas = {
+        f'/produto-{i}': gerar_pagina(variantes[i % len(variantes)]).encode('utf-8')
+        for i in range(args.mensagens)
+    }
+    lentas = set(random.Random(42).sample(sorted(paginas), int(args.mensagens * args.proporcao_lentas)))
+    atrasos = {caminho: args.atraso_lento if caminho in lentas else args.atraso for caminho in paginas}
+
+    with tempfile.TemporaryDirectory() as diretorio, servidor_local(paginas, etag=False, atrasos=atrasos) as base:
+        banco_dados.DB_PATH = os.path.join(diretorio, 'webhook.db')
+        import webhook_handler as modulo
+        # O servidor local é registrado como loja, aceita pela validação da mensagem
+        modulo.scraper.lojas.adicionar('benchmark', {"dominios": ["127.0.0.1"], "extrator": "heuristico"})
+        cliente = modulo.app.test_client()
+
+        print(f"\n{args.mensagens} mensagens, {len(lentas)} páginas lentas ({args.atraso_lento:g} s), "
+              f"demais com {args.atraso * 1000:.0f} ms; receptor recusa 1 a cada {args.falhar_a_cada} entregas\n")
+        print(f"{'Modo':<12} {'Resposta p50 (ms)':>18} {'p95 (ms)':>9} {'Máx. (ms)':>10} "
+              f"{'Último resultado (s)':>20} {'Entregues':>10} {'Novas tentativas':>17}")
+        for modo in ('síncrono', 'assíncrono'):
+            recebidos = []
+            with receptor_local(recebidos, args.falhar_a_cada) as callback:
+                modulo.entrega = EntregaCallback(
+                    modulo._processar_webhook, callback_url=callback, ativa=modo == 'assíncrono',
+                    trabalhadores=args.trabalhadores, espera_inicial=0.05
+                )
+                tempos = []
+                inicio = time.perf_counter()
+                for i, caminho in enumerate(paginas):
+                    mensagem = f"Preciso de ajuda com o produto {base}{caminho}"
+                    t0 = time.perf_counter()
+                    resposta = cliente.post('/webhook', json={'message': mensagem, 'ticket': i})
+                    tempos.append((time.perf_counter() - t0) * 1000)
+                    assert resposta.status_code == (202 if modulo.entrega.ativa else 200), resposta.status_code
+                modulo.entrega.aguardar()
+                total = time.perf_counter() - inicio
+                modulo.entrega.parar()
+
+            estatisticas = modulo.entrega.estatisticas()
+            if modulo.entrega.ativa:
+                tickets = sorted(corpo['requisicao']['ticket'] for corpo in recebidos)
+                assert tickets == list(range(args.mensagens)), "callbacks perdidos ou duplicados"
+                assert all(corpo['status'] == 'sucesso' for corpo in recebidos)
+            entregues = len(recebidos) if modulo.entrega.ativa else len(tempos)
+            print(f"{modo:<12} {statistics.median(tempos):>18.1f} {statistics.quantiles(tempos, n=20)[-1]:>9.1f} "
+                  f"{max(tempos):>10.1f} {total:>20.2f} {entregues:>10} {estatisticas['novas_tentativas']:>17}")
+        banco_dados.fechar_conexao()
+    return 0
+
+
+def _aguardar_fila(fila, timeout=300):
+    """Espera até não haver tarefas pendentes nem em andamento"""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        estatisticas = fila.estatisticas()
+        if not estatisticas['pendente'] and not estatisticas['em_andamento']:
+            return estatisticas
+        time.sleep(0.05)
+    raise TimeoutError("fila não esvaziou")
+
+
+def benchmark_fila(args):
+    """
+    Fila persistente de extrações: vazão do trabalhador (fila_tarefas.py) por
+    número de processos e threads, e recuperação de um trabalhador encerrado
+    à força (kill -9) no meio da fila
+    """
+    import signal
+    import subprocess
+    variantes = list(PRODUTOS)
+    paginas = {
+        f'/produto-{i}': gerar_pagina(variantes[i % len(variantes)]).encode('utf-8')
+        for i in range(args.tarefas)
+    }
+    atrasos = dict.fromkeys(paginas, args.atraso)
+    acessos = Counter()
+    cwd = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as diretorio, \
+            servidor_local(paginas, etag=False, acessos=acessos, atrasos=atrasos) as base:
+        urls = [base + caminho for caminho in paginas]
+
+        def iniciar_fila(nome):
+            banco_dados.DB_PATH = os.path.join(diretorio, f'{nome}.db')
+            banco_dados.init_db()
+            fila = banco_dados.FilaTarefas()
+            fila.adicionar(urls)
+            acessos.clear()
+            # Locks de extração de um trabalhador encerrado expiram junto com as reservas
+            ambiente = dict(os.environ, PRODUTOS_DB_PATH=banco_dados.DB_PATH, FILA_INTERVALO='0.05',
+                            FILA_DURACAO_RESERVA=str(args.duracao_reserva),
+                            BANCO_DURACAO_LOCK_EXTRACAO=str(args.duracao_reserva))
+            return fila, ambiente
+
+        def trabalhador(ambiente, processos, threads):
+            comando = [sys.executable, 'fila_tarefas.py', '--processos', str(processos), '--threads', str(threads),
+                       '--requisicoes-por-minuto', '0']
+            return subprocess.Popen(comando, env=ambiente, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        print(f"\n{args.tarefas} tarefas, páginas com {args.atraso * 1000:.0f} ms de atraso\n")
+        print(f"{'Processos':>9} {'Threads':>8} {'Tempo (s)':>10} {'Tarefas/s':>10} {'Espera média (s)':>17} "
+              f"{'Processamento médio (ms)':>25}")
+        for configuracao in args.configuracoes:
+            processos, threads = (int(valor) for valor in configuracao.split('x'))
+            fila, ambiente = iniciar_fila(f'fila-{configuracao}')
+            inicio = time.perf_counter()
+            processo = trabalhador(ambiente, processos, threads)
+            try:
+                estatisticas = _aguardar_fila(fila)
+            finally:
+                processo.terminate()
+                processo.wait()
+            tempo = time.perf_counter() - inicio
+            assert estatisticas['concluida'] == args.tarefas, estatisticas
+            print(f"{processos:>9} {threads:>8} {tempo:>10.2f} {args.tarefas / tempo:>10.1f} "
+                  f"{estatisticas['espera_media']:>17.2f} {estatisticas['processamento_medio'] * 1000:>25.0f}")
+
+        # Trabalhador encerrado sem chance de devolver as tarefas reservadas
+        processos, threads = (int(valor) for valor in args.configuracoes[-1].split('x'))
+        fila, ambiente = iniciar_fila('fila-recuperacao')
+        processo = trabalhador(ambiente, 1, threads)
+        while fila.estatisticas()['concluida'] < args.tarefas // 2:
+            time.sleep(0.01)
+        processo.send_signal(signal.SIGKILL)
+        processo.wait()
+        interrompidas = fila.estatisticas()
+        inicio = time.perf_counter()
+        processo = trabalhador(ambiente, 1, threads)
+        try:
+            estatisticas = _aguardar_fila(fila)
+        finally:
+            processo.terminate()
+            processo.wait()
+        tempo = time.perf_counter() - inicio
+        assert estatisticas['concluida'] == args.tarefas and not estatisticas['falha'], estatisticas
+        repetidas = sum(quantidade - 1 for quantidade in acessos.values())
+        print(f"\nkill -9 com {interrompidas['concluida']} concluídas e {interrompidas['em_andamento']} em andamento; "
+              f"o novo trabalhador concluiu o restante em {tempo:.2f} s (reserva de {args.duracao_reserva:g} s)")
+        print(f"Tarefas concluídas: {estatisticas['concluida']} de {args.tarefas}; "
+              f"páginas baixadas de novo: {repetidas}")
+        banco_dados.fechar_conexao()
+    return 0
+
+
+def _porta_livre():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def _servidor_aplicativo(comando, porta, ambiente, cwd, timeout=30):
+    """Executa o servidor (gunicorn ou uvicorn) em um subprocesso e aguarda o /health responder"""
+    import subprocess
+    import urllib.request
+    processo = subprocess.Popen(comando, env=ambiente, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{porta}/health", timeout=1):
+                    break
+            except OSError:
+                if processo.poll() is not None or time.monotonic() > limite:
+                    raise RuntimeError(f"servidor não iniciou: {' '.join(comando)}")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{porta}"
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def _carga_http(base, urls, concorrencia, timeout=120):
+    """
+    `concorrencia` clientes simultâneos pedindo /produto?force=true para as
+    URLs, uma requisição por URL. Retorna (tempo total, latências em ms, erros)
+    """
+    import asyncio
+    import httpx
+
+    async def executar():
+        fila = asyncio.Queue()
+        for url in urls:
+            fila.put_nowait(url)
+        tempos = []
+        erros = []
+        limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+        async with httpx.AsyncClient(base_url=base, limits=limites, timeout=timeout) as cliente:
+            async def usuario():
+                while not fila.empty():
+                    url = fila.get_nowait()
+                    t0 = time.perf_counter()
+                    try:
+                        resposta = await cliente.get('/produto', params={'url': url, 'force': 'true'})
+                        if resposta.status_code != 200 or resposta.json().get('dados_produto', {}).get('erro'):
+                            erros.append(resposta.status_code)
+                    except httpx.HTTPError as e:
+                        erros.append(type(e).__name__)
+                    tempos.append((time.perf_counter() - t0) * 1000)
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+            return time.perf_counter() - inicio, tempos, erros
+
+    return asyncio.run(executar())
+
+
+def benchmark_asgi(args):
+    """
+    /produto sob carga concorrente, com cada requisição extraindo uma página
+    lenta: gunicorn com workers síncronos (webhook_handler:app) x um único
+    processo uvicorn com as rotas assíncronas (servidor_asgi:app)
+    """
+    import statistics
+    variantes = list(PRODUTOS)
+    paginas = {
+        f'/produto-{i}': gerar_pagina(variantes[i % len(variantes)], itens_menu=5).encode('utf-8')
+        for i in range(args.requisicoes * len(args.concorrencia))
+    }
+    atrasos = dict.fromkeys(paginas, args.atraso)
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    servidores = [
+        (f"gunicorn ({args.workers} workers síncronos)",
+         lambda porta: [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--timeout', '120',
+                        '--bind', f'127.0.0.1:{porta}', 'webhook_handler:app']),
+        ("uvicorn (1 processo ASGI)",
+         lambda porta: [sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(porta),
+                        '--log-level', 'warning', 'servidor_asgi:app']),
+    ]
+
+    with tempfile.TemporaryDirectory() as diretorio, servidor_local(paginas, etag=False, atrasos=atrasos) as base:
+        caminhos = list(paginas)
+        print(f"\n{args.requisicoes} requisições por nível de concorrência, cada uma extraindo uma página "
+              f"com {args.atraso * 1000:.0f} ms de atraso\n")
+        print(f"{'Servidor':<32} {'Concorrência':>12} {'Req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'Erros':>6}")
+        for nome, comando in servidores:
+            porta = _porta_livre()
+            ambiente = dict(os.environ, PRODUTOS_DB_PATH=os.path.join(diretorio, f'{porta}.db'))
+            with _servidor_aplicativo(comando(porta), porta, ambiente, cwd) as servidor:
+                for indice, concorrencia in enumerate(args.concorrencia):
+                    # URLs diferentes em cada rodada: nenhuma extração é coalescida
+                    inicio = indice * args.requisicoes
+                    urls = [base + caminho for caminho in caminhos[inicio:inicio + args.requisicoes]]
+                    tempo, tempos, erros = _carga_http(servidor, urls, concorrencia)
+                    print(f"{nome:<32} {concorrencia:>12} {len(urls) / tempo:>8.1f} "
+                          f"{statistics.median(tempos):>9.0f} {statistics.quantiles(tempos, n=20)[-1]:>9.0f} "
+                          f"{len(erros):>6}")
+    return 0
+
+
+# Loja descrita por seletores para as páginas de referência (ver lojas.py)
+LOJA_SELETORES = {
+    "dominios": ["loja.exemplo"],
+    "dados_estruturados": False,
+    "campos": {
+        "nome": {"seletores": ["h1", ".product-name"]},
+        "preco": {"seletores": [".product-price", ".price-new", "[itemprop=price]", ".valor"],
+                  "regex": r"R\$\s*[\d.,]+"},
+        "codigo": {"xpath": ["//*[contains(@class, 'sku') or contains(@class, 'product-code')]"],
+                   "regex": r"(?:Código:|SKU:|Ref:)?\s*(\S+)"},
+        "disponibilidade": {"seletores": [".stock", ".availability"],
+                            "valores": {"Indisponível": ["indispon", "esgotado"], "Disponível": ["dispon"]}},
+        "descricao": {"seletores": [".product-description"],
+                      "xpath": ["//div[contains(@class, 'product-info')]//p[string-length(normalize-space()) > 50]"]},
+        "especificacoes": {"seletores": [".product-features tr", ".specifications li"]},
+    },
+}
+
+
+def benchmark_lojas(args):
+    """
+    Registro de lojas: loja de uma URL por busca linear nos domínios x
+    dicionário de hosts, com cada vez mais lojas; e custo da compilação do
+    plano de seletores (feita uma vez, na carga) x extração de cada página
+    """
+    from lojas import RegistroLojas, PlanoSeletores
+    rng = random.Random(3)
+
+    print(f"\nLoja de uma URL, {args.consultas} URLs (µs por URL; metade de hosts não registrados)\n")
+    print(f"{'Lojas':>8} {'Busca linear':>13} {'Dicionário':>11}")
+    for quantidade in args.lojas:
+        especificacoes = {
+            f'loja-{i}': {"dominios": [f"loja{i}.com.br"], "extrator": "heuristico"} for i in range(quantidade)
+        }
+        registro = RegistroLojas(especificacoes)
+        dominios = registro.dominios()
+        urls = [
+            f"https://www.loja{rng.randrange(quantidade)}.com.br/produto-{i}" if i % 2
+            else f"https://www.outra{i}.com.br/produto-{i}"
+            for i in range(args.consultas)
+        ]
+
+        def busca_linear():
+            # Equivalente a uma cadeia de `if "dominio" in url` por loja
+            for url in urls:
+                next((dominio for dominio in dominios if dominio in url), None)
+
+        def dicionario():
+            for url in urls:
+                registro.loja(url)
+
+        repeticoes = max(1, args.repeticoes // max(1, quantidade // 100))
+        tempo_linear = _cronometrar(busca_linear, repeticoes) * 1000 / len(urls)
+        tempo_dicionario = _cronometrar(dicionario, args.repeticoes) * 1000 / len(urls)
+        print(f"{quantidade:>8} {tempo_linear:>13.2f} {tempo_dicionario:>11.2f}")
+
+    paginas = [gerar_pagina(variante) for variante in PRODUTOS]
+    plano = PlanoSeletores(LOJA_SELETORES["campos"], dados_estruturados=False)
+
+    def compilado():
+        for html in paginas:
+            plano.extrair(html)
+
+    def heuristico():
+        for html in paginas:
+            extrair_campos_html(html, 'lxml', estruturados=False)
+
+    def compilar():
+        PlanoSeletores(LOJA_SELETORES["campos"], dados_estruturados=False)
+
+    print(f"\nExtração por página ({len(paginas)} páginas, ms)\n")
+    print(f"{'Compilação do plano (na carga)':<36} {_cronometrar(compilar, args.repeticoes * 10):>8.3f}")
+    print(f"{'Plano de seletores compilado':<36} {_cronometrar(compilado, args.repeticoes) / len(paginas):>8.3f}")
+    print(f"{'Motor heurístico (lxml)':<36} {_cronometrar(heuristico, args.repeticoes) / len(paginas):>8.3f}")
+    return 0
+
+
+def benchmark_revalidacao(args):
+    """
+    Atualiza todos os produtos, com parte das páginas alteradas: download e
+    análise completos x requisições condicionais (ETag) x impressão digital do
+    conteúdo (servidor sem ETag)
+    """
+    import logging
+    logging.disable(logging.INFO)
+    from cache_produtos import CacheProdutos
+
+    html = gerar_pagina('padrao').encode('utf-8')
+    paginas = {f'/produto/{i}': html.replace(b'</h1>', f' {i}</h1>'.encode()) for i in range(args.produtos)}
+    alterados = random.Random(0).sample(sorted(paginas), int(args.produtos * args.proporcao_alterados))
+    modos = (('completo', False, True), ('condicional', True, True), ('impressao', True, False))
+
+    linhas = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        for modo, revalidar, etag in modos:
+            banco_dados.DB_PATH = os.path.join(diretorio, f'{modo}.db')
+            banco_dados.init_db()
+            scraper = ProdutoScraper()
+            gravacoes = []
+
+            def salvar(produto):
+                gravacoes.append(produto['url'])
+                return banco_dados.save_produto_to_db(produto)
+
+            opcoes = {}
+            if revalidar:
+                opcoes = dict(buscar_validadores=banco_dados.get_validadores_from_db,
+                              confirmar=banco_dados.confirmar_produto_no_db)
+            cache = CacheProdutos(banco_dados.get_produto_from_db, salvar, scraper.extrair_info_ciainfor, **opcoes)
+
+            with servidor_local(paginas, etag=etag) as base:
+                urls = [base + caminho for caminho in paginas]
+                for url in urls:
+                    cache.atualizar(url)
+
+                # Alterar parte das páginas e atualizar todos os produtos (force=true)
+                for caminho in alterados:
+                    paginas[caminho] = paginas[caminho].replace(b'</h1>', b' (novo)</h1>')
+                antes = scraper.estatisticas_download()
+                del gravacoes[:]
+                inicio = time.perf_counter()
+                for url in urls:
+                    cache.obter(url, force=True)
+                tempo = (time.perf_counter() - inicio) * 1000 / len(urls)
+                depois = scraper.estatisticas_download()
+                for caminho in alterados:
+                    paginas[caminho] = paginas[caminho].replace(b' (novo)</h1>', b'</h1>')
+
+            kb_baixados = (depois['bytes_lidos'] - antes['bytes_lidos']) / 1024
+            sem_analise = depois['nao_modificadas'] + depois['conteudo_inalterado']
+            linhas.append(f"{modo:<13} {tempo:>11.2f} {kb_baixados:>12.0f} {sem_analise:>12} {len(gravacoes):>10}")
+            banco_dados.fechar_conexao()
+
+    print(f"\n{args.produtos} produtos, {len(alterados)} alterados entre as atualizações\n")
+    print(f"{'Modo':<13} {'ms/produto':>11} {'KB baixados':>12} {'Sem análise':>12} {'Gravações':>10}")
+    print("\n".join(linhas))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    extracao = subparsers.add_parser('extracao', help='extração de campos: várias varreduras x passagem única')
+    extracao.add_argument('--repeticoes', type=int, default=20)
+    extracao.add_argument('--itens-menu', type=int, default=60)
+    extracao.set_defaults(funcao=benchmark_extracao)
+
+    parsers = subparsers.add_parser('parsers', help='backends de parser: vazão e pico de memória por página')
+    parsers.add_argument('--repeticoes', type=int, default=20)
+    parsers.add_argument('--itens-menu', type=int, default=60)
+    parsers.set_defaults(funcao=benchmark_parsers)
+
+    poda = subparsers.add_parser('poda', help='documento completo x apenas as regiões do produto')
+    poda.add_argument('--repeticoes', type=int, default=20)
+    poda.add_argument('--itens-menu', type=int, default=60)
+    poda.set_defaults(funcao=benchmark_poda)
+
+    download = subparsers.add_parser('download', help='download completo x streaming com limite de bytes')
+    download.add_argument('--repeticoes', type=int, default=20)
+    download.add_argument('--kb-scripts', type=int, default=1024, help='tamanho dos scripts após o rodapé (KB)')
+    download.set_defaults(funcao=benchmark_download)
+
+    banco = subparsers.add_parser('banco', help='persistência: conexão por chamada x conexões persistentes em WAL')
+    banco.add_argument('--processos', type=int, default=4, help='processos simultâneos (workers)')
+    banco.add_argument('--threads', type=int, default=4, help='threads por processo')
+    banco.add_argument('--operacoes', type=int, default=200, help='operações por thread')
+    banco.add_argument('--produtos', type=int, default=2000, help='produtos no banco')
+    banco.add_argument('--tamanho-lote', type=int, default=100)
+    banco.set_defaults(funcao=benchmark_banco)
+
+    revalidacao = subparsers.add_parser('revalidacao', help='atualização completa x requisição condicional x impressão digital')
+    revalidacao.add_argument('--produtos', type=int, default=200)
+    revalidacao.add_argument('--proporcao-alterados', type=float, default=0.1,
+                             help='fração das páginas alteradas entre as atualizações')
+    revalidacao.set_defaults(funcao=benchmark_revalidacao)
+
+    estruturados = subparsers.add_parser('estruturados', help='só DOM x dados estruturados (JSON-LD, microdados, OpenGraph) antes do DOM')
+    estruturados.add_argument('--repeticoes', type=int, default=20)
+    estruturados.add_argument('--itens-menu', type=int, default=60)
+    estruturados.set_defaults(funcao=benchmark_estruturados)
+
+    catalogo = subparsers.add_parser('catalogo', help='varredura do catálogo pelo sitemap, interrompida e retomada')
+    catalogo.add_argument('--produtos', type=int, default=300)
+    catalogo.add_argument('--concorrencia', type=int, default=4)
+    catalogo.add_argument('--requisicoes-por-minuto', type=float, default=0, help='0: sem limite')
+    catalogo.set_defaults(funcao=benchmark_catalogo)
+
+    exportacao = subparsers.add_parser('exportacao', help='exportação de /produtos_excel: pandas em memória x streaming')
+    exportacao.add_argument('--produtos', type=int, default=100000)
+    exportacao.add_argument('--formatos', nargs='+', choices=['csv', 'xlsx'], default=['csv', 'xlsx'])
+    exportacao.set_defaults(funcao=benchmark_exportacao)
+
+    paginacao = subparsers.add_parser('paginacao', help='páginas de /produtos: offset sem índice x offset com índice x cursor')
+    paginacao.add_argument('--tamanhos', type=int, nargs='+', default=[10000, 100000])
+    paginacao.add_argument('--limit', type=int, default=100)
+    paginacao.add_argument('--repeticoes', type=int, default=10)
+    paginacao.set_defaults(funcao=benchmark_paginacao)
+
+    consulta = subparsers.add_parser('consulta', help='filtro por preço e disponibilidade: Python x colunas com índice')
+    consulta.add_argument('--produtos', type=int, default=100000)
+    consulta.add_argument('--preco-min', type=int, default=100, help='reais')
+    consulta.add_argument('--preco-max', type=int, default=200, help='reais')
+    consulta.add_argument('--limit', type=int, default=100)
+    consulta.add_argument('--repeticoes', type=int, default=5)
+    consulta.set_defaults(funcao=benchmark_consulta)
+
+    historico = subparsers.add_parser('historico', help='histórico de preços: só mudanças e consulta de alterações pelo índice')
+    historico.add_argument('--produtos', type=int, default=5000)
+    historico.add_argument('--atualizacoes', type=int, default=30)
+    historico.add_argument('--proporcao-alterados', type=float, default=0.05)
+    historico.add_argument('--limit', type=int, default=100)
+    historico.add_argument('--repeticoes', type=int, default=10)
+    historico.set_defaults(funcao=benchmark_historico)
+
+    busca = subparsers.add_parser('busca', help='busca por trecho do nome: LIKE x índice FTS5')
+    busca.add_argument('--produtos', type=int, default=100000)
+    busca.add_argument('--consultas', nargs='+', default=['cab vga', 'mouse gamer rgb', 'webcam full', 'teclado 12345'])
+    busca.add_argument('--limit', type=int, default=20)
+    busca.add_argument('--repeticoes', type=int, default=5)
+    busca.set_defaults(funcao=benchmark_busca)
+
+    inicializacao = subparsers.add_parser('inicializacao', help='inicialização de um worker: tempo de importação e memória')
+    inicializacao.add_argument('--modulo', default='webhook_handler', choices=['webhook_handler', 'webhook_handler_chatgpt'])
+    inicializacao.add_argument('--repeticoes', type=int, default=5)
+    inicializacao.set_defaults(funcao=benchmark_inicializacao)
+
+    webhook = subparsers.add_parser('webhook', help='/webhook síncrono x 202 com entrega por callback')
+    webhook.add_argument('--mensagens', type=int, default=100)
+    webhook.add_argument('--atraso', type=float, default=0.05, help='atraso (s) das páginas comuns')
+    webhook.add_argument('--atraso-lento', type=float, default=2.0, help='atraso (s) das páginas lentas')
+    webhook.add_argument('--proporcao-lentas', type=float, default=0.05)
+    webhook.add_argument('--trabalhadores', type=int, default=8)
+    webhook.add_argument('--falhar-a-cada', type=int, default=4, help='o receptor recusa 1 a cada N entregas')
+    webhook.set_defaults(funcao=benchmark_webhook)
+
+    fila = subparsers.add_parser('fila', help='fila persistente: vazão por threads e recuperação após kill -9')
+    fila.add_argument('--tarefas', type=int, default=200)
+    fila.add_argument('--atraso', type=float, default=0.05, help='atraso (s) de cada página')
+    fila.add_argument('--configuracoes', nargs='+', default=['1x1', '1x4', '1x16', '4x4'],
+                      help='processos x threads do trabalhador')
+    fila.add_argument('--duracao-reserva', type=float, default=2.0)
+    fila.set_defaults(funcao=benchmark_fila)
+
+    asgi = subparsers.add_parser('asgi', help='/produto sob carga: gunicorn com workers síncronos x uvicorn assíncrono')
+    asgi.add_argument('--requisicoes', type=int, default=400, help='requisições por nível de concorrência')
+    asgi.add_argument('--concorrencia', type=int, nargs='+', default=[10, 50, 200])
+    asgi.add_argument('--workers', type=int, default=4, help='workers síncronos do gunicorn')
+    asgi.add_argument('--atraso', type=float, default=0.2, help='atraso (s) de cada página')
+    asgi.set_defaults(funcao=benchmark_asgi)
+
+    lojas = subparsers.add_parser('lojas', help='loja da URL: busca linear x dicionário; plano de seletores compilado na carga')
+    lojas.add_argument('--lojas', type=int, nargs='+', default=[1, 100, 10000])
+    lojas.add_argument('--consultas', type=int, default=10000)
+    lojas.add_argument('--repeticoes', type=int, default=20)
+    lojas.set_defaults(funcao=benchmark_lojas)
+
+    args = parser.parse_args()
+    return args.funcao(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
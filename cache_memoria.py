@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache LRU em memória, por processo, dos produtos já decodificados.
+
+Fica na frente do SQLite em `banco_dados.py`: um acerto evita a consulta, o
+`json.loads` das especificações e a montagem do dicionário. O cache é
+limitado pelo número de itens e pelo tamanho aproximado em bytes; ao passar
+de qualquer um dos limites, os itens usados há mais tempo são descartados.
+
+Cada worker tem o seu cache. Como uma escrita feita em outro worker não
+invalida este cache, os itens também expiram após CACHE_MEMORIA_TTL segundos.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+# Limites do cache por worker
+MAX_ITENS = int(os.environ.get('CACHE_MEMORIA_ITENS', 1000))
+MAX_BYTES = int(os.environ.get('CACHE_MEMORIA_BYTES', 32 * 1024 * 1024))
+
+# Tempo máximo (segundos) de um item no cache, limitando a defasagem entre workers
+TTL = float(os.environ.get('CACHE_MEMORIA_TTL', 60))
+
+# Custo fixo aproximado de um dicionário de produto, além do texto dos campos
+_CUSTO_BASE_ITEM = 1024
+
+
+def tamanho_aproximado(produto):
+    """Tamanho aproximado em bytes de um dicionário de produto"""
+    tamanho = _CUSTO_BASE_ITEM
+    for valor in produto.values():
+        if isinstance(valor, str):
+            tamanho += sys.getsizeof(valor)
+        elif isinstance(valor, list):
+            tamanho += sys.getsizeof(valor) + sum(sys.getsizeof(item) for item in valor)
+    return tamanho
+
+
+class CacheLRU:
+    """
+    Cache LRU thread-safe limitado por número de itens e bytes aproximados.
+    Os valores retornados são compartilhados e devem ser tratados como somente leitura.
+    """
+
+    def __init__(self, max_itens=None, max_bytes=None, ttl=None):
+        self.max_itens = max_itens if max_itens is not None else MAX_ITENS
+        self.max_bytes = max_bytes if max_bytes is not None else MAX_BYTES
+        self.ttl = ttl if ttl is not None else TTL
+
+        self._lock = threading.Lock()
+        # chave -> (valor, tamanho, expira_em)
+        self._itens = OrderedDict()
+        self._bytes = 0
+        # Incrementada a cada invalidação; descarta valores lidos antes dela
+        self._geracao = 0
+        self._acertos = 0
+        self._falhas = 0
+        self._descartes = 0
+        self._expirados = 0
+
+    def obter(self, chave):
+        """Retorna o valor em cache (None se ausente ou expirado), marcando-o como usado"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self._falhas += 1
+                return None
+            if item[2] < time.monotonic():
+                self._remover(chave)
+                self._expirados += 1
+                self._falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self._acertos += 1
+            return item[0]
+
+    def geracao(self):
+        """Geração atual do cache, a ser obtida antes de ler o valor da fonte"""
+        return self._geracao
+
+    def guardar(self, chave, valor, geracao=None):
+        """
+        Guarda o valor, descartando os itens menos usados se os limites forem
+        excedidos. Se `geracao` for informada e houve uma invalidação desde
+        então, o valor (possivelmente desatualizado) não é guardado.
+        """
+        tamanho = tamanho_aproximado(valor)
+        if tamanho > self.max_bytes or self.max_itens <= 0:
+            return
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                return
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (valor, tamanho, time.monotonic() + self.ttl)
+            self._bytes += tamanho
+            while len(self._itens) > self.max_itens or self._bytes > self.max_bytes:
+                _, (_, tamanho_descartado, _) = self._itens.popitem(last=False)
+                self._bytes -= tamanho_descartado
+                self._descartes += 1
+
+    def invalidar(self, chave=None):
+        """Remove um item do cache ou, sem chave, todos os itens"""
+        with self._lock:
+            self._geracao += 1
+            if chave is None:
+                self._itens.clear()
+                self._bytes = 0
+            elif chave in self._itens:
+                self._remover(chave)
+
+    def estatisticas(self):
+        """Contadores de acertos, falhas e descartes, e ocupação atual"""
+        with self._lock:
+            consultas = self._acertos + self._falhas
+            return {
+                "acertos": self._acertos,
+                "falhas": self._falhas,
+                "descartes": self._descartes,
+                "expirados": self._expirados,
+                "taxa_acertos": round(self._acertos / consultas, 3) if consultas else 0.0,
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "max_itens": self.max_itens,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remover(self, chave):
+        _, tamanho, _ = self._itens.pop(chave)
+        self._bytes -= tamanho
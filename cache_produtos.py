@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Validade do cache de produtos com stale-while-revalidate.
+
+Cada produto salvo no banco é classificado pela idade de `data_atualizacao`:
+
+- fresco (até CACHE_TTL_FRESCO): servido diretamente do banco;
+- desatualizado (até CACHE_TTL_MAXIMO): servido imediatamente do banco e
+  atualizado em segundo plano;
+- expirado (acima de CACHE_TTL_MAXIMO): extraído novamente antes de responder.
+
+`CacheProdutosAssincrono` aplica a mesma política no servidor ASGI.
+"""
+
+import os
+import asyncio
+import datetime
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from coalescencia import ExtracaoCoalescida, ExtracaoCoalescidaAssincrona
+
+logger = logging.getLogger(__name__)
+
+# Idade (segundos) até a qual o produto é servido do cache sem atualização
+TTL_FRESCO = int(os.environ.get('CACHE_TTL_FRESCO', 3600))
+
+# Idade (segundos) a partir da qual o produto é extraído novamente antes de responder
+TTL_MAXIMO = int(os.environ.get('CACHE_TTL_MAXIMO', 86400))
+
+# Threads dedicadas às atualizações em segundo plano
+ATUALIZACAO_MAX_THREADS = int(os.environ.get('CACHE_ATUALIZACAO_THREADS', 4))
+
+# Valores do campo "fonte" das respostas
+FONTE_CACHE = "cache"
+FONTE_CACHE_DESATUALIZADO = "cache_desatualizado"
+FONTE_CACHE_EXPIRADO = "cache_expirado"
+FONTE_WEB = "web"
+FONTE_WEB_EXPIRADO = "web_expirado"
+
+FRESCO = "fresco"
+DESATUALIZADO = "desatualizado"
+EXPIRADO = "expirado"
+
+
+class CacheProdutos:
+    """
+    Decide, para cada consulta, se o produto vem do banco, do banco com
+    atualização em segundo plano ou de uma nova extração.
+
+    `buscar(url)` e `salvar(produto)` acessam o banco; `extrair(url)` faz a
+    extração do produto (retornando um dicionário com "erro" em caso de falha).
+    Com `buscar_validadores(url)` e `confirmar(url)`, a extração é uma
+    revalidação condicional: `extrair(url, validadores)` pode responder
+    {"nao_modificado": True} e o produto do banco é apenas confirmado.
+    `registrar_acesso(url)`, se informado, é chamado a cada consulta.
+    Extrações simultâneas da mesma URL são coalescidas em uma só; com
+    `lock_distribuido`, também entre workers.
+    """
+
+    def __init__(self, buscar, salvar, extrair, ttl_fresco=None, ttl_maximo=None, max_threads=None,
+                 lock_distribuido=None, buscar_validadores=None, confirmar=None, registrar_acesso=None):
+        self.buscar = buscar
+        self.salvar = salvar
+        self.extrair = extrair
+        self.buscar_validadores = buscar_validadores
+        self.confirmar = confirmar
+        self.registrar_acesso = registrar_acesso
+        self.ttl_fresco = ttl_fresco if ttl_fresco is not None else TTL_FRESCO
+        self.ttl_maximo = max(ttl_maximo if ttl_maximo is not None else TTL_MAXIMO, self.ttl_fresco)
+        self.extracao = self._criar_extracao(lock_distribuido)
+
+        self._executor = self._criar_executor(max_threads or ATUALIZACAO_MAX_THREADS)
+        self._lock = threading.Lock()
+        self._em_atualizacao = set()
+        self._estatisticas = {
+            FONTE_CACHE: 0,
+            FONTE_CACHE_DESATUALIZADO: 0,
+            FONTE_CACHE_EXPIRADO: 0,
+            FONTE_WEB: 0,
+            FONTE_WEB_EXPIRADO: 0,
+            "atualizacoes_segundo_plano": 0,
+            "falhas_segundo_plano": 0,
+            "nao_modificados": 0,
+        }
+
+    def idade(self, produto):
+        """Idade do produto em segundos, a partir de `data_atualizacao` (UTC, formato do SQLite)"""
+        data_atualizacao = produto.get('data_atualizacao')
+        if not data_atualizacao:
+            return float('inf')
+        try:
+            atualizado_em = datetime.datetime.fromisoformat(str(data_atualizacao))
+        except ValueError:
+            return float('inf')
+        if atualizado_em.tzinfo is not None:
+            atualizado_em = atualizado_em.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        agora = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (agora - atualizado_em).total_seconds()
+
+    def classificar(self, produto):
+        """Classifica o produto do banco como fresco, desatualizado ou expirado"""
+        idade = self.idade(produto)
+        if idade <= self.ttl_fresco:
+            return FRESCO
+        if idade <= self.ttl_maximo:
+            return DESATUALIZADO
+        return EXPIRADO
+
+    def obter(self, url, force=False):
+        """
+        Retorna (info_produto, fonte) para a URL, aplicando a política de validade.
+        Com `force`, o produto é sempre extraído novamente.
+        """
+        if self.registrar_acesso is not None:
+            self.registrar_acesso(url)
+        produto_db = None if force else self.buscar(url)
+        resposta = self._responder_do_banco(url, produto_db)
+        if resposta is not None:
+            return resposta
+        return self._responder_da_extracao(url, produto_db, self.atualizar(url))
+
+    def atualizar(self, url, acesso=False):
+        """
+        Extrai o produto e salva no banco. Chamadas simultâneas para a mesma
+        URL compartilham uma única extração. Com `acesso`, a chamada é contada
+        como uma consulta de cliente (`registrar_acesso`).
+        """
+        if acesso and self.registrar_acesso is not None:
+            self.registrar_acesso(url)
+        return self.extracao.obter(url)
+
+    def atualizar_em_segundo_plano(self, url):
+        """Agenda a atualização do produto, ignorando URLs que já estão sendo atualizadas"""
+        if not self._reservar_atualizacao(url):
+            return False
+        self._executor.submit(self._atualizar, url)
+        return True
+
+    def estatisticas(self):
+        """Respostas por fonte e atualizações em segundo plano desde o início do worker"""
+        with self._lock:
+            estatisticas = dict(self._estatisticas)
+            estatisticas["em_atualizacao"] = len(self._em_atualizacao)
+        estatisticas["ttl_fresco"] = self.ttl_fresco
+        estatisticas["ttl_maximo"] = self.ttl_maximo
+        return estatisticas
+
+    # Pontos de extensão da versão assíncrona
+
+    def _criar_extracao(self, lock_distribuido):
+        return ExtracaoCoalescida(self._extrair_e_salvar, lock_distribuido)
+
+    def _criar_executor(self, max_threads):
+        return ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='atualizacao-cache')
+
+    # Etapas comuns às versões síncrona e assíncrona
+
+    def _responder_do_banco(self, url, produto_db):
+        """
+        Resposta (info_produto, fonte) com o produto do banco, se fresco ou
+        desatualizado (agendando a atualização); None se o produto não está
+        no banco ou expirou e precisa ser extraído antes de responder.
+        """
+        if not produto_db:
+            return None
+        estado = self.classificar(produto_db)
+        if estado == FRESCO:
+            return self._registrar(produto_db, FONTE_CACHE)
+        if estado == DESATUALIZADO:
+            self.atualizar_em_segundo_plano(url)
+            return self._registrar(produto_db, FONTE_CACHE_DESATUALIZADO)
+        return None
+
+    def _responder_da_extracao(self, url, produto_db, info_produto):
+        """Resposta (info_produto, fonte) depois da extração feita antes de responder"""
+        if not produto_db:
+            return self._registrar(info_produto, FONTE_WEB)
+        if "erro" in info_produto:
+            # Melhor um dado antigo do que nenhum se o site estiver fora do ar
+            logger.warning(f"Falha ao atualizar produto expirado, servindo cache: {url}")
+            return self._registrar(produto_db, FONTE_CACHE_EXPIRADO)
+        return self._registrar(info_produto, FONTE_WEB_EXPIRADO)
+
+    def _reservar_atualizacao(self, url):
+        """Marca a URL como em atualização em segundo plano; False se ela já estava"""
+        with self._lock:
+            if url in self._em_atualizacao:
+                return False
+            self._em_atualizacao.add(url)
+            return True
+
+    def _concluir_atualizacao(self, url, info_produto):
+        """Libera a URL e contabiliza a atualização em segundo plano (`info_produto` None: exceção)"""
+        chave = "falhas_segundo_plano"
+        if info_produto is not None:
+            if "erro" in info_produto:
+                logger.warning(f"Falha na atualização em segundo plano de {url}: {info_produto['erro']}")
+            else:
+                chave = "atualizacoes_segundo_plano"
+        with self._lock:
+            self._em_atualizacao.discard(url)
+            self._estatisticas[chave] += 1
+
+    def _etapas_extracao(self, url):
+        """
+        Extração com revalidação condicional, escrita uma única vez para as
+        duas versões: gera cada operação de E/S como (função, argumentos) e
+        recebe o resultado de volta; o valor de retorno é o produto.
+        """
+        validadores = None
+        if self.buscar_validadores is not None and self.confirmar is not None:
+            validadores = yield self.buscar_validadores, (url,)
+
+        if validadores:
+            info_produto = yield self.extrair, (url, validadores)
+            if info_produto.get("nao_modificado"):
+                produto_db = yield self.confirmar, (url,)
+                if produto_db is not None:
+                    with self._lock:
+                        self._estatisticas["nao_modificados"] += 1
+                    return produto_db
+                # Produto removido do banco durante a revalidação
+                info_produto = yield self.extrair, (url,)
+        else:
+            info_produto = yield self.extrair, (url,)
+
+        if "erro" not in info_produto:
+            yield self.salvar, (info_produto,)
+        # Os validadores ficam apenas no banco
+        info_produto.pop("validadores", None)
+        return info_produto
+
+    def _atualizar(self, url):
+        info_produto = None
+        try:
+            info_produto = self.atualizar(url)
+        except Exception as e:
+            logger.error(f"Erro na atualização em segundo plano de {url}: {e}")
+        finally:
+            self._concluir_atualizacao(url, info_produto)
+
+    def _extrair_e_salvar(self, url):
+        etapas = self._etapas_extracao(url)
+        resultado = None
+        try:
+            while True:
+                funcao, argumentos = etapas.send(resultado)
+                resultado = funcao(*argumentos)
+        except StopIteration as fim:
+            return fim.value
+
+    def _registrar(self, info_produto, fonte):
+        with self._lock:
+            self._estatisticas[fonte] += 1
+        return info_produto, fonte
+
+
+class CacheProdutosAssincrono(CacheProdutos):
+    """
+    `CacheProdutos` para o servidor ASGI: `obter` e `atualizar` são
+    corrotinas e `extrair(url[, validadores])` é assíncrona. As funções de
+    banco, síncronas, rodam em threads, e as atualizações em segundo plano
+    são tarefas do event loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Referências às tarefas em segundo plano, que o event loop não mantém
+        self._tarefas = set()
+
+    async def obter(self, url, force=False):
+        """Versão assíncrona de `CacheProdutos.obter`: retorna (info_produto, fonte)"""
+        if self.registrar_acesso is not None:
+            await asyncio.to_thread(self.registrar_acesso, url)
+        produto_db = None if force else await asyncio.to_thread(self.buscar, url)
+        resposta = self._responder_do_banco(url, produto_db)
+        if resposta is not None:
+            return resposta
+        return self._responder_da_extracao(url, produto_db, await self.atualizar(url))
+
+    async def atualizar(self, url, acesso=False):
+        """Versão assíncrona de `CacheProdutos.atualizar`"""
+        if acesso and self.registrar_acesso is not None:
+            await asyncio.to_thread(self.registrar_acesso, url)
+        return await self.extracao.obter(url)
+
+    def atualizar_em_segundo_plano(self, url):
+        """Agenda a atualização do produto no event loop, ignorando URLs que já estão sendo atualizadas"""
+        if not self._reservar_atualizacao(url):
+            return False
+        tarefa = asyncio.get_running_loop().create_task(self._atualizar(url))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+        return True
+
+    def _criar_extracao(self, lock_distribuido):
+        return ExtracaoCoalescidaAssincrona(self._extrair_e_salvar, lock_distribuido)
+
+    def _criar_executor(self, max_threads):
+        # As atualizações em segundo plano são tarefas do event loop
+        return None
+
+    async def _atualizar(self, url):
+        info_produto = None
+        try:
+            info_produto = await self.atualizar(url)
+        except Exception as e:
+            logger.error(f"Erro na atualização em segundo plano de {url}: {e}")
+        finally:
+            self._concluir_atualizacao(url, info_produto)
+
+    async def _extrair_e_salvar(self, url):
+        etapas = self._etapas_extracao(url)
+        resultado = None
+        try:
+            while True:
+                funcao, argumentos = etapas.send(resultado)
+                if funcao is self.extrair:
+                    resultado = await funcao(*argumentos)
+                else:
+                    resultado = await asyncio.to_thread(funcao, *argumentos)
+        except StopIteration as fim:
+            return fim.value
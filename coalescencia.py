@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Coalescência de extrações simultâneas da mesma URL (single-flight).
+
+Quando várias requisições pedem a mesma URL ao mesmo tempo, apenas a
+primeira extrai a página; as demais aguardam e recebem o mesmo resultado.
+
+- Entre as threads de um worker, a espera é feita em memória.
+- Entre workers, um lock distribuído (por exemplo, uma tabela no banco
+  compartilhado) indica que outro processo já está extraindo a URL. Os
+  demais aguardam a liberação do lock e leem o resultado salvo por ele.
+
+`ExtracaoCoalescidaAssincrona` faz o mesmo entre as corrotinas de um event
+loop (servidor ASGI).
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo (segundos) de espera pela extração feita por outro worker
+ESPERA_MAX = float(os.environ.get('COALESCENCIA_ESPERA_MAX', 60))
+
+# Intervalo (segundos) entre as verificações do lock de outro worker
+INTERVALO_ESPERA = float(os.environ.get('COALESCENCIA_INTERVALO', 0.1))
+
+
+class _Voo:
+    """Extração em andamento de uma URL neste worker"""
+
+    __slots__ = ('evento', 'resultado', 'excecao')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.excecao = None
+
+
+class ExtracaoCoalescida:
+    """
+    Executa `executar(url)` no máximo uma vez por vez para cada URL.
+
+    `lock_distribuido`, se informado, coordena os workers e deve oferecer
+    `adquirir(url)`, `liberar(url)`, `ativo(url)`, `agora()` e
+    `buscar_resultado(url, desde)`, este último retornando o resultado salvo
+    por outro worker desde o instante `desde`, obtido de `agora()` (ou None).
+    """
+
+    def __init__(self, executar, lock_distribuido=None, espera_max=None, intervalo_espera=None):
+        self._executar = executar
+        self.lock_distribuido = lock_distribuido
+        self.espera_max = espera_max if espera_max is not None else ESPERA_MAX
+        self.intervalo_espera = intervalo_espera if intervalo_espera is not None else INTERVALO_ESPERA
+
+        self._lock = threading.Lock()
+        self._voos = {}
+        self._estatisticas = {
+            "extracoes": 0,
+            "compartilhadas_threads": 0,
+            "compartilhadas_workers": 0,
+            "esperas_esgotadas": 0,
+        }
+
+    def obter(self, url):
+        """Resultado da extração da URL, compartilhado com as chamadas simultâneas"""
+        with self._lock:
+            voo = self._voos.get(url)
+            lider = voo is None
+            if lider:
+                voo = self._voos[url] = _Voo()
+            else:
+                self._estatisticas["compartilhadas_threads"] += 1
+
+        if not lider:
+            voo.evento.wait()
+            if voo.excecao is not None:
+                raise voo.excecao
+            return voo.resultado
+
+        try:
+            voo.resultado = self._executar_entre_workers(url)
+            return voo.resultado
+        except BaseException as e:
+            voo.excecao = e
+            raise
+        finally:
+            with self._lock:
+                del self._voos[url]
+            voo.evento.set()
+
+    def estatisticas(self):
+        """Extrações feitas e chamadas atendidas por extrações de outras threads/workers"""
+        with self._lock:
+            estatisticas = dict(self._estatisticas)
+            estatisticas["em_andamento"] = len(self._voos)
+        return estatisticas
+
+    def _contar(self, chave):
+        with self._lock:
+            self._estatisticas[chave] += 1
+
+    def _extrair(self, url):
+        self._contar("extracoes")
+        return self._executar(url)
+
+    def _executar_entre_workers(self, url):
+        lock = self.lock_distribuido
+        if lock is None:
+            return self._extrair(url)
+
+        try:
+            adquirido, resultado = self._aguardar_vez(url)
+        except Exception as e:
+            logger.warning(f"Falha no lock distribuído de extração para {url}, extraindo diretamente: {e}")
+            return self._extrair(url)
+
+        if resultado is not None:
+            return resultado
+        if not adquirido:
+            logger.warning(f"Tempo de espera esgotado pela extração de {url} em outro worker, extraindo diretamente")
+            self._contar("esperas_esgotadas")
+            return self._extrair(url)
+
+        try:
+            return self._extrair(url)
+        finally:
+            try:
+                lock.liberar(url)
+            except Exception as e:
+                logger.warning(f"Falha ao liberar o lock distribuído de extração para {url}: {e}")
+
+    def _aguardar_vez(self, url):
+        """
+        Adquire o lock distribuído da URL ou aguarda o resultado da extração
+        feita por outro worker. Retorna (adquirido, resultado).
+        """
+        lock = self.lock_distribuido
+        # No relógio do lock, o mesmo das gravações dos resultados
+        inicio = lock.agora()
+        limite = time.monotonic() + self.espera_max
+        while time.monotonic() < limite:
+            if lock.adquirir(url):
+                return True, None
+
+            # Outro worker está extraindo a URL: aguardar a liberação do lock
+            while lock.ativo(url) and time.monotonic() < limite:
+                time.sleep(self.intervalo_espera)
+
+            resultado = lock.buscar_resultado(url, inicio)
+            if resultado is not None:
+                self._contar("compartilhadas_workers")
+                return False, resultado
+            # A extração do outro worker falhou: tentar assumir a extração
+        return False, None
+
+
+class ExtracaoCoalescidaAssincrona(ExtracaoCoalescida):
+    """
+    `ExtracaoCoalescida` para corrotinas: `executar(url)` é assíncrona e as
+    chamadas simultâneas da mesma URL aguardam a mesma tarefa. As operações
+    do lock distribuído (síncronas, no banco) rodam em threads, sem travar
+    o event loop.
+    """
+
+    async def obter(self, url):
+        """Resultado da extração da URL, compartilhado com as chamadas simultâneas"""
+        voo = self._voos.get(url)
+        if voo is None:
+            voo = self._voos[url] = asyncio.ensure_future(self._executar_entre_workers(url))
+            voo.add_done_callback(lambda _: self._voos.pop(url, None))
+        else:
+            self._contar("compartilhadas_threads")
+        # Uma chamada cancelada (cliente desconectado) não cancela a extração das demais
+        return await asyncio.shield(voo)
+
+    async def _extrair(self, url):
+        self._contar("extracoes")
+        return await self._executar(url)
+
+    async def _executar_entre_workers(self, url):
+        lock = self.lock_distribuido
+        if lock is None:
+            return await self._extrair(url)
+
+        # As operações do lock rodam em threads diferentes: o dono é a extração, e não a thread
+        dono = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        try:
+            adquirido, resultado = await self._aguardar_vez(url, dono)
+        except Exception as e:
+            logger.warning(f"Falha no lock distribuído de extração para {url}, extraindo diretamente: {e}")
+            return await self._extrair(url)
+
+        if resultado is not None:
+            return resultado
+        if not adquirido:
+            logger.warning(f"Tempo de espera esgotado pela extração de {url} em outro worker, extraindo diretamente")
+            self._contar("esperas_esgotadas")
+            return await self._extrair(url)
+
+        try:
+            return await self._extrair(url)
+        finally:
+            try:
+                await asyncio.to_thread(lock.liberar, url, dono)
+            except Exception as e:
+                logger.warning(f"Falha ao liberar o lock distribuído de extração para {url}: {e}")
+
+    async def _aguardar_vez(self, url, dono):
+        """Versão assíncrona de `ExtracaoCoalescida._aguardar_vez`. Retorna (adquirido, resultado)"""
+        lock = self.lock_distribuido
+        inicio = await asyncio.to_thread(lock.agora)
+        limite = time.monotonic() + self.espera_max
+        while time.monotonic() < limite:
+            if await asyncio.to_thread(lock.adquirir, url, dono):
+                return True, None
+
+            # Outro worker está extraindo a URL: aguardar a liberação do lock
+            while await asyncio.to_thread(lock.ativo, url) and time.monotonic() < limite:
+                await asyncio.sleep(self.intervalo_espera)
+
+            resultado = await asyncio.to_thread(lock.buscar_resultado, url, inicio)
+            if resultado is not None:
+                self._contar("compartilhadas_workers")
+                return False, resultado
+        return False, None
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Extração dos dados estruturados que as lojas embutem nas páginas de produto.
+
+Antes das heurísticas sobre o DOM (`extracao.py`), o HTML bruto é lido em
+busca de, em ordem de prioridade:
+
+- blocos JSON-LD (`<script type="application/ld+json">`) do tipo Product,
+  com as ofertas (Offer / AggregateOffer) e `additionalProperty`;
+- microdados schema.org com o valor em atributo (`<meta itemprop="sku"
+  content="...">`, `<link itemprop="availability" href="...">`);
+- OpenGraph de produto (`product:price:amount`, `product:availability`...).
+
+A leitura é feita com expressões regulares sobre o texto, sem construir a
+árvore do documento. Os campos retornados usam o mesmo formato da extração
+pelo DOM (preço "R$ 1.234,56", disponibilidade "Disponível"/"Indisponível").
+"""
+
+import re
+import json
+import html as html_lib
+from decimal import Decimal, InvalidOperation
+
+PADRAO_JSON_LD = re.compile(
+    r'<script[^>]*?type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.S | re.I
+)
+
+# Tags com microdados (itemprop) ou OpenGraph (property) cujo valor está em atributo
+PADRAO_TAG_META = re.compile(r'<[a-z][a-z0-9]*\s[^>]*?\b(?:itemprop|property)\s*=[^>]*>', re.I)
+PADRAO_ATRIBUTO = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+
+# Trechos que o HTML precisa conter para cada fonte; sem eles as expressões
+# regulares não são executadas (páginas sem dados estruturados). Como nas
+# expressões, maiúsculas e minúsculas não são diferenciadas: a busca é feita
+# no HTML em minúsculas, mais rápida que uma expressão com re.I
+MARCADOR_JSON_LD = 'ld+json'
+MARCADORES_ATRIBUTOS = ('itemprop', 'property')
+
+# Tags HTML dentro de descrições
+PADRAO_TAGS = re.compile(r'<[^>]+>')
+
+# Propriedades de cada campo, por fonte. Nos microdados, "name" e "description"
+# com valor em atributo costumam ser da marca ou da loja, e não do produto
+ITEMPROPS = {
+    'preco': ('price', 'lowPrice'),
+    'codigo': ('sku', 'mpn', 'productID'),
+    'disponibilidade': ('availability',),
+}
+# No OpenGraph, og:title e og:description trazem o nome da loja e resumos de
+# SEO; o título e a descrição do DOM são mais fiéis
+PROPRIEDADES_OPENGRAPH = {
+    'preco': ('product:price:amount', 'og:price:amount'),
+    'codigo': ('product:retailer_item_id', 'product:sku'),
+    'disponibilidade': ('product:availability', 'og:availability'),
+}
+
+MOEDAS_REAL = frozenset(['', 'BRL', 'R$'])
+
+# Valores de schema.org/ItemAvailability (e variações do OpenGraph)
+DISPONIVEL = frozenset(['instock', 'in stock', 'onlineonly', 'limitedavailability', 'instoreonly', 'preorder', 'presale'])
+INDISPONIVEL = frozenset(['outofstock', 'out of stock', 'soldout', 'discontinued', 'oos'])
+
+
+def _texto(valor):
+    """Texto limpo de um valor JSON-LD ou de atributo (None se vazio)"""
+    if isinstance(valor, list):
+        valor = valor[0] if valor else None
+    if isinstance(valor, dict):
+        valor = valor.get('name') or valor.get('@id')
+    if valor is None or isinstance(valor, bool):
+        return None
+    texto = html_lib.unescape(str(valor)).strip()
+    return texto or None
+
+
+def _descricao(valor):
+    """Descrição sem tags HTML, uma linha por bloco de texto"""
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    linhas = (linha.strip() for linha in PADRAO_TAGS.sub('\n', texto).splitlines())
+    return '\n'.join([linha for linha in linhas if linha]) or None
+
+
+def _valor_preco(texto):
+    """Valor decimal positivo de um preço em texto ("1234.5", "1.234,50", "R$ 49,90"), ou None"""
+    texto = texto.replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        numero = Decimal(texto)
+    except InvalidOperation:
+        return None
+    if not numero.is_finite() or numero <= 0:
+        return None
+    return numero
+
+
+def formatar_preco(valor, moeda=''):
+    """
+    Formata um preço numérico ("1234.5", 1234.5 ou "1.234,50") como
+    "R$ 1.234,50". Retorna None se o valor não for um preço em reais.
+    """
+    texto = _texto(valor)
+    if texto is None or (moeda or '').strip().upper() not in MOEDAS_REAL:
+        return None
+    numero = _valor_preco(texto)
+    if numero is None:
+        return None
+    formatado = f"{numero.quantize(Decimal('0.01')):,.2f}"
+    return "R$ " + formatado.replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def preco_em_centavos(preco):
+    """
+    Preço extraído ("R$ 1.234,56") em centavos (123456). Retorna None para
+    textos sem preço, como "Preço não disponível".
+    """
+    if not preco or 'R$' not in preco:
+        return None
+    # Texto da página, sempre no formato brasileiro: o ponto separa milhares
+    numero = _valor_preco(preco.replace('.', '').replace(',', '.'))
+    if numero is None:
+        return None
+    return int((numero * 100).quantize(Decimal('1')))
+
+
+def classificar_disponibilidade(valor):
+    """Converte um valor de schema.org/ItemAvailability em "Disponível"/"Indisponível" (None se desconhecido)"""
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    chave = texto.rsplit('/', 1)[-1].lower()
+    if chave in DISPONIVEL:
+        return "Disponível"
+    if chave in INDISPONIVEL:
+        return "Indisponível"
+    return None
+
+
+def _objetos_json_ld(dados):
+    """Percorre os objetos de um bloco JSON-LD (listas, @graph e objetos aninhados)"""
+    pilha = [dados]
+    while pilha:
+        atual = pilha.pop()
+        if isinstance(atual, list):
+            pilha.extend(reversed(atual))
+        elif isinstance(atual, dict):
+            yield atual
+            grafo = atual.get('@graph')
+            if grafo is not None:
+                pilha.append(grafo)
+            # Produto descrito dentro de uma página (WebPage.mainEntity, ItemPage...)
+            for chave in ('mainEntity', 'mainEntityOfPage', 'itemOffered'):
+                if isinstance(atual.get(chave), (dict, list)):
+                    pilha.append(atual[chave])
+
+
+def _eh_produto(objeto):
+    tipo = objeto.get('@type')
+    tipos = tipo if isinstance(tipo, list) else [tipo]
+    return any(isinstance(t, str) and t.rsplit('/', 1)[-1] == 'Product' for t in tipos)
+
+
+def _campos_json_ld(produto):
+    campos = {
+        'nome': _texto(produto.get('name')),
+        'codigo': _texto(produto.get('sku') or produto.get('mpn') or produto.get('productID')),
+        'descricao': _descricao(produto.get('description')),
+    }
+
+    ofertas = produto.get('offers')
+    ofertas = ofertas if isinstance(ofertas, list) else [ofertas]
+    for oferta in ofertas:
+        if not isinstance(oferta, dict):
+            continue
+        especificacao = oferta.get('priceSpecification')
+        if isinstance(especificacao, list):
+            especificacao = especificacao[0] if especificacao else None
+        especificacao = especificacao if isinstance(especificacao, dict) else {}
+        moeda = oferta.get('priceCurrency') or especificacao.get('priceCurrency') or ''
+        preco = formatar_preco(
+            oferta.get('price') or oferta.get('lowPrice') or especificacao.get('price'), moeda
+        )
+        if preco and not campos.get('preco'):
+            campos['preco'] = preco
+        disponibilidade = classificar_disponibilidade(oferta.get('availability'))
+        if disponibilidade and not campos.get('disponibilidade'):
+            campos['disponibilidade'] = disponibilidade
+
+    especificacoes = []
+    propriedades = produto.get('additionalProperty')
+    for propriedade in propriedades if isinstance(propriedades, list) else [propriedades]:
+        if isinstance(propriedade, dict):
+            nome, valor = _texto(propriedade.get('name')), _texto(propriedade.get('value'))
+            if nome and valor:
+                especificacoes.append(f"{nome}: {valor}")
+    campos['especificacoes'] = especificacoes
+
+    return {campo: valor for campo, valor in campos.items() if valor}
+
+
+def _campos_atributos(html):
+    """Campos dos microdados e do OpenGraph com valor em atributo"""
+    microdados = {}
+    opengraph = {}
+    for tag in PADRAO_TAG_META.finditer(html):
+        atributos = {}
+        for nome, aspas_duplas, aspas_simples, sem_aspas in PADRAO_ATRIBUTO.findall(tag.group(0)):
+            atributos[nome.lower()] = aspas_duplas or aspas_simples or sem_aspas
+        valor = atributos.get('content') or atributos.get('href')
+        if not valor:
+            continue
+        if 'itemprop' in atributos:
+            for itemprop in atributos['itemprop'].split():
+                microdados.setdefault(itemprop, valor)
+        if 'property' in atributos:
+            opengraph.setdefault(atributos['property'].lower(), valor)
+
+    campos = {}
+    for propriedades, fonte, moeda in ((ITEMPROPS, microdados, microdados.get('priceCurrency')),
+                                       (PROPRIEDADES_OPENGRAPH, opengraph,
+                                        opengraph.get('product:price:currency') or opengraph.get('og:price:currency'))):
+        for campo, chaves in propriedades.items():
+            if campo in campos:
+                continue
+            valor = next((fonte[chave] for chave in chaves if chave in fonte), None)
+            if campo == 'preco':
+                valor = formatar_preco(valor, moeda)
+            elif campo == 'disponibilidade':
+                valor = classificar_disponibilidade(valor)
+            else:
+                valor = _texto(valor)
+            if valor:
+                campos[campo] = valor
+    return campos
+
+
+def extrair_dados_estruturados(html):
+    """
+    Campos do produto encontrados nos dados estruturados da página (JSON-LD,
+    microdados e OpenGraph, nessa ordem de prioridade). Retorna um dicionário
+    apenas com os campos encontrados, entre nome, preco, codigo,
+    disponibilidade, descricao e especificacoes.
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+
+    campos = {}
+    minusculas = html.lower()
+    if MARCADOR_JSON_LD in minusculas:
+        for bloco in PADRAO_JSON_LD.finditer(html):
+            try:
+                dados = json.loads(bloco.group(1), strict=False)
+            except ValueError:
+                continue
+            for objeto in _objetos_json_ld(dados):
+                if _eh_produto(objeto):
+                    for campo, valor in _campos_json_ld(objeto).items():
+                        campos.setdefault(campo, valor)
+
+    if any(marcador in minusculas for marcador in MARCADORES_ATRIBUTOS):
+        for campo, valor in _campos_atributos(html).items():
+            campos.setdefault(campo, valor)
+    return campos
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Modo assíncrono do webhook, com entrega do resultado por callback.
+
+Com WEBHOOK_ASSINCRONO=true e WEBHOOK_CALLBACK_URL configurada, o `/webhook`
+apenas valida a mensagem (gatilho e URL), coloca a extração em uma fila e
+responde 202 Accepted na hora. Um conjunto de threads do worker faz as
+extrações e envia cada resultado, já formatado, por POST para a URL de
+callback, tentando novamente com espera exponencial em caso de falha.
+
+O corpo do callback é a mesma resposta do modo síncrono, acrescida de "id"
+(o mesmo devolvido na resposta 202) e "requisicao" (o JSON recebido pelo
+webhook, para o receptor associar a resposta à conversa).
+
+A fila fica em memória: extrações pendentes se perdem se o worker for
+reiniciado.
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Ativa o modo assíncrono do /webhook (exige WEBHOOK_CALLBACK_URL)
+ASSINCRONO = os.environ.get('WEBHOOK_ASSINCRONO', 'false').lower() == 'true'
+
+# URL que recebe, por POST, o resultado de cada mensagem
+CALLBACK_URL = os.environ.get('WEBHOOK_CALLBACK_URL', '')
+
+# Threads de extração e entrega por worker
+TRABALHADORES = int(os.environ.get('WEBHOOK_TRABALHADORES', 4))
+
+# Mensagens aguardando extração por worker; acima disso o /webhook responde 503
+FILA_MAXIMA = int(os.environ.get('WEBHOOK_FILA_MAXIMA', 1000))
+
+# Tentativas de entrega de cada resultado e espera (segundos) antes da segunda
+# tentativa, dobrada a cada nova falha até ESPERA_MAXIMA
+TENTATIVAS = int(os.environ.get('WEBHOOK_CALLBACK_TENTATIVAS', 5))
+ESPERA_INICIAL = float(os.environ.get('WEBHOOK_CALLBACK_ESPERA', 1))
+ESPERA_MAXIMA = 60
+
+# Timeout (segundos) de cada POST para o callback
+TIMEOUT = float(os.environ.get('WEBHOOK_CALLBACK_TIMEOUT', 10))
+
+# Respostas 4xx que ainda justificam uma nova tentativa; as demais 4xx são definitivas
+STATUS_TEMPORARIOS = {408, 425, 429}
+
+
+class EntregaCallback:
+    """
+    Fila de mensagens do webhook processadas em segundo plano.
+    `processar(tarefa)` recebe o dicionário com "id", "url" e os campos
+    passados a `enfileirar` e retorna o corpo (dicionário serializável em
+    JSON) a ser enviado para `callback_url`. Sem `callback_url`, ou com
+    `ativa=False`, a entrega fica desativada e o webhook segue síncrono.
+    """
+
+    def __init__(self, processar, callback_url=None, ativa=None, trabalhadores=None, fila_maxima=None,
+                 tentativas=None, espera_inicial=None, timeout=None):
+        self.processar = processar
+        self.callback_url = CALLBACK_URL if callback_url is None else callback_url
+        self.ativa = (ASSINCRONO if ativa is None else ativa) and bool(self.callback_url)
+        self.trabalhadores = trabalhadores or TRABALHADORES
+        self.tentativas = max(1, tentativas or TENTATIVAS)
+        self.espera_inicial = espera_inicial if espera_inicial is not None else ESPERA_INICIAL
+        self.timeout = timeout or TIMEOUT
+        if (ASSINCRONO if ativa is None else ativa) and not self.callback_url:
+            logger.warning("Modo assíncrono do webhook sem WEBHOOK_CALLBACK_URL; respondendo de forma síncrona")
+
+        self._fila = queue.Queue(maxsize=fila_maxima or FILA_MAXIMA)
+        self._parar = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._session = None
+        self._estatisticas = {
+            "aceitas": 0,
+            "rejeitadas_fila_cheia": 0,
+            "entregues": 0,
+            "falhas_entrega": 0,
+            "novas_tentativas": 0,
+            "erros_processamento": 0,
+        }
+        self._tempo_total_entrega = 0.0
+
+    def enfileirar(self, url, **campos):
+        """
+        Coloca a extração da URL na fila e retorna o id da tarefa, ou None se
+        a fila estiver cheia. As threads são iniciadas no primeiro uso (no
+        worker, depois do fork).
+        """
+        self.iniciar()
+        tarefa = {"id": uuid.uuid4().hex, "url": url, **campos, "_aceita_em": time.monotonic()}
+        try:
+            self._fila.put_nowait(tarefa)
+        except queue.Full:
+            self._contar("rejeitadas_fila_cheia")
+            logger.warning(f"Fila do webhook cheia ({self._fila.maxsize}), mensagem rejeitada: {url}")
+            return None
+        self._contar("aceitas")
+        return tarefa["id"]
+
+    def iniciar(self):
+        """Inicia as threads de extração e entrega (se ainda não estiverem rodando)"""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads:
+                return
+            self._parar.clear()
+            if self._session is None:
+                self._session = self._criar_sessao()
+            for i in range(self.trabalhadores):
+                thread = threading.Thread(target=self._executar, name=f'webhook-entrega-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def parar(self, timeout=None):
+        """Interrompe as threads; tarefas ainda na fila não são processadas"""
+        self._parar.set()
+        for thread in list(self._threads):
+            thread.join(timeout)
+
+    def aguardar(self, timeout=None):
+        """Espera a fila esvaziar e as tarefas em andamento terminarem. Retorna False no timeout"""
+        limite = time.monotonic() + timeout if timeout is not None else None
+        while self._fila.unfinished_tasks:
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def estatisticas(self):
+        """Mensagens aceitas, entregues e falhas de entrega desde o início do worker"""
+        with self._lock:
+            estatisticas = dict(self._estatisticas)
+            tempo_total = self._tempo_total_entrega
+        estatisticas["em_fila"] = self._fila.qsize()
+        estatisticas["tempo_medio_entrega"] = (
+            round(tempo_total / estatisticas["entregues"], 3) if estatisticas["entregues"] else None
+        )
+        estatisticas["ativa"] = self.ativa
+        estatisticas["trabalhadores"] = self.trabalhadores
+        return estatisticas
+
+    def _contar(self, chave, quantidade=1):
+        with self._lock:
+            self._estatisticas[chave] += quantidade
+
+    def _criar_sessao(self):
+        # Uma conexão keep-alive com o receptor por thread
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.trabalhadores)
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json; charset=utf-8'})
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                tarefa = self._fila.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._processar(tarefa)
+            except Exception as e:
+                logger.error(f"Erro na tarefa {tarefa['id']} do webhook: {e}")
+            finally:
+                self._fila.task_done()
+
+    def _processar(self, tarefa):
+        aceita_em = tarefa.pop("_aceita_em")
+        try:
+            corpo = self.processar(tarefa)
+        except Exception as e:
+            self._contar("erros_processamento")
+            logger.error(f"Erro ao processar a mensagem {tarefa['id']} ({tarefa['url']}): {e}")
+            corpo = {"status": "erro", "mensagem": f"Erro ao processar webhook: {str(e)}"}
+
+        corpo = {"id": tarefa["id"], **corpo, "requisicao": tarefa.get("requisicao")}
+        if self._entregar(tarefa["id"], json.dumps(corpo, ensure_ascii=False).encode('utf-8')):
+            with self._lock:
+                self._estatisticas["entregues"] += 1
+                self._tempo_total_entrega += time.monotonic() - aceita_em
+        else:
+            self._contar("falhas_entrega")
+
+    def _entregar(self, id_tarefa, corpo):
+        """Envia o corpo ao callback, com novas tentativas para erros de rede, 5xx e 408/425/429"""
+        espera = self.espera_inicial
+        for tentativa in range(1, self.tentativas + 1):
+            if tentativa > 1:
+                self._contar("novas_tentativas")
+                if self._parar.wait(espera):
+                    break
+                espera = min(espera * 2, ESPERA_MAXIMA)
+            try:
+                response = self._session.post(self.callback_url, data=corpo, timeout=self.timeout)
+                response.close()
+            except requests.RequestException as e:
+                logger.warning(f"Falha ao entregar a tarefa {id_tarefa} (tentativa {tentativa}): {e}")
+                continue
+            if response.status_code < 300:
+                return True
+            logger.warning(f"Callback respondeu {response.status_code} à tarefa {id_tarefa} (tentativa {tentativa})")
+            if 400 <= response.status_code < 500 and response.status_code not in STATUS_TEMPORARIOS:
+                break
+        logger.error(f"Resultado da tarefa {id_tarefa} não entregue ao callback")
+        return False
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Exportação da lista de produtos em CSV e XLSX com memória constante.
+
+As linhas vêm de um cursor do banco (`banco_dados.iterar_produtos_from_db`)
+e são escritas à medida que são lidas, sem montar um DataFrame:
+
+- CSV: gerado em blocos de texto, enviados como resposta em partes (chunked);
+- XLSX: escrito por uma planilha openpyxl em modo write-only, que grava as
+  linhas em arquivos temporários em vez de mantê-las em memória.
+"""
+
+import io
+import csv
+import datetime
+
+# Colunas exportadas (na ordem de `iterar_produtos_from_db`) e seus títulos
+COLUNAS_EXPORTACAO = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'data_atualizacao']
+TITULOS = {
+    'url': 'URL',
+    'nome': 'Nome',
+    'preco': 'Preço',
+    'disponibilidade': 'Disponibilidade',
+    'codigo': 'Código',
+    'data_atualizacao': 'Data de Atualização'
+}
+
+# Linhas acumuladas em cada bloco de texto do CSV
+LINHAS_POR_BLOCO = 500
+
+FORMATO_DATA = '%d/%m/%Y %H:%M:%S'
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def formatar_data(valor):
+    """Converte `data_atualizacao` (formato do SQLite) para dd/mm/aaaa hh:mm:ss; outros valores passam intactos"""
+    if not valor:
+        return valor
+    try:
+        return datetime.datetime.fromisoformat(str(valor)).strftime(FORMATO_DATA)
+    except ValueError:
+        return valor
+
+
+def _formatar_linha(linha):
+    *campos, data_atualizacao = linha
+    return [*campos, formatar_data(data_atualizacao)]
+
+
+def gerar_csv(linhas):
+    """Gera o CSV das linhas em blocos de texto, com a linha de títulos no início"""
+    saida = io.StringIO()
+    escritor = csv.writer(saida, lineterminator='\n')
+    escritor.writerow([TITULOS[coluna] for coluna in COLUNAS_EXPORTACAO])
+    pendentes = 0
+    for linha in linhas:
+        escritor.writerow(_formatar_linha(linha))
+        pendentes += 1
+        if pendentes >= LINHAS_POR_BLOCO:
+            yield saida.getvalue()
+            saida.seek(0)
+            saida.truncate()
+            pendentes = 0
+    yield saida.getvalue()
+
+
+def escrever_xlsx(linhas, total, destino):
+    """
+    Escreve no arquivo binário `destino` a planilha "Produtos" com as linhas
+    e a planilha "Informações" com o total de produtos e a data da exportação.
+    """
+    # O openpyxl só é carregado na primeira exportação em XLSX
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    planilha = Workbook(write_only=True)
+    produtos = planilha.create_sheet('Produtos')
+    negrito = Font(bold=True)
+
+    def titulos(folha, valores):
+        celulas = []
+        for valor in valores:
+            celula = WriteOnlyCell(folha, value=valor)
+            celula.font = negrito
+            celulas.append(celula)
+        folha.append(celulas)
+
+    titulos(produtos, [TITULOS[coluna] for coluna in COLUNAS_EXPORTACAO])
+    for linha in linhas:
+        produtos.append(_formatar_linha(linha))
+
+    informacoes = planilha.create_sheet('Informações')
+    titulos(informacoes, ['Informação', 'Valor'])
+    informacoes.append(['Total de Produtos', total])
+    informacoes.append(['Data de Exportação', datetime.datetime.now().strftime(FORMATO_DATA)])
+
+    planilha.save(destino)
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Motor de extração de campos de produto em uma única passagem pelo DOM.
+
+Em vez de varrer o documento inteiro uma vez para cada campo (preço, código,
+disponibilidade, descrição e especificações), o documento é percorrido uma
+única vez, registrando os elementos candidatos de cada campo. Os textos dos
+elementos são montados a partir de uma lista única com as strings do
+documento, evitando reconstruir o texto de cada subárvore repetidamente.
+
+Há dois backends de parser com o mesmo contrato de extração:
+
+- ``bs4``: árvore BeautifulSoup sobre o lxml (comportamento original);
+- ``lxml``: árvore nativa do lxml, sem construir a árvore BeautifulSoup.
+
+Antes do DOM, os dados estruturados da página (JSON-LD, microdados e
+OpenGraph, em ``dados_estruturados.py``) são lidos do HTML bruto. As
+heurísticas do DOM só resolvem os campos que eles não preencheram e, se
+todos foram preenchidos, o documento nem é analisado.
+
+No modo com poda (``podar=True``), scripts e estilos são removidos do HTML
+antes da análise e só as regiões do produto (título, preço, código, estoque,
+descrição e especificações) são percorridas; menus, cabeçalho e rodapé não
+entram na árvore. As heurísticas de texto livre (rótulos "Código:" e
+"Estoque:", preço em qualquer string, parágrafos e itens de lista) passam a
+considerar apenas essas regiões.
+"""
+
+import re
+import hashlib
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import NavigableString, CData
+from dados_estruturados import extrair_dados_estruturados
+
+# Padrões pré-compilados
+PADRAO_PRECO = re.compile(r'R\$\s*[\d.,]+')
+PADRAO_PREFIXO_CODIGO = re.compile(r'^(Código:|SKU:|Ref:)\s*')
+
+MARCADOR_PRECO = '--PRODUTO_PRECO'
+MARCADOR_PLACEHOLDER = '--PRODUTO_'
+PRECO_INDISPONIVEL = "Preço não disponível"
+
+# Campos de um produto extraídos da página
+CAMPOS = ('nome', 'preco', 'codigo', 'disponibilidade', 'descricao', 'especificacoes')
+
+# Strings consideradas por `.text` / `get_text()` do BeautifulSoup
+TIPOS_TEXTO = (NavigableString, CData)
+
+# Tags cujo conteúdo o BeautifulSoup não considera texto do documento
+TAGS_CONTENTORAS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+# Fora destas tags o BeautifulSoup reduz strings só de espaços a ' ' ou '\n'
+TAGS_PRESERVAM_ESPACOS = frozenset(['pre', 'textarea'])
+ESPACOS_ASCII = re.compile(r'[\x20\x0a\x09\x0c\x0d]+\Z')
+
+# Classes CSS das quais só interessa o primeiro elemento, em ordem de documento
+CLASSES_PRIMEIRO = frozenset([
+    'product-name', 'product-price', 'price-new', 'product-code', 'sku',
+    'stock', 'availability', 'product-description', 'tab-content',
+])
+
+# Elementos candidatos à busca de preço no texto completo do elemento
+TAGS_PRECO_TEXTO = frozenset(['span', 'div', 'p', 'strong'])
+
+# Regiões do produto mantidas no modo com poda (além de <h1> e span[itemprop=price])
+CLASSES_REGIAO = CLASSES_PRIMEIRO | frozenset(['product-features', 'specifications', 'product-info'])
+IDS_REGIAO = frozenset(['product'])
+
+# Scripts e estilos removidos antes da análise no modo com poda. Como no HTML,
+# o conteúdo termina no primeiro fechamento da própria tag.
+PADRAO_SCRIPTS_ESTILOS = re.compile(r'<(script|style)(?=[\s/>]).*?</\1\s*>', re.S | re.I)
+PADRAO_SCRIPTS_ESTILOS_BYTES = re.compile(PADRAO_SCRIPTS_ESTILOS.pattern.encode('ascii'), re.S | re.I)
+
+# Pré-filtro das regiões na árvore do lxml; as classes são conferidas em Python,
+# pois testar cada classe em XPath custa mais que a própria análise
+XPATH_CANDIDATOS_REGIAO = etree.XPath("//*[self::h1 or @class or @id or @itemprop]")
+
+# Trechos voláteis ignorados na impressão digital do conteúdo: scripts (exceto
+# dados estruturados JSON-LD), estilos, comentários, nonces e tokens de
+# formulário, que mudam a cada resposta sem alterar o produto
+PADRAO_VOLATIL = re.compile(
+    r'<script(?![^>]*application/ld\+json)(?=[\s/>]).*?</script\s*>'
+    r'|<style(?=[\s/>]).*?</style\s*>'
+    r'|<!--.*?-->'
+    r'|\snonce\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)'
+    r'|<(?:input|meta)\s[^>]*(?:csrf|token|nonce)[^>]*>',
+    re.S | re.I
+)
+
+
+def _verificar_disponibilidade(texto):
+    """Classifica a disponibilidade a partir de um texto livre (sensível a maiúsculas)"""
+    if "Disponível" in texto:
+        return "Disponível"
+    if "Indisponível" in texto or "Esgotado" in texto:
+        return "Indisponível"
+    return None
+
+
+def _eh_regiao(nome, attrs):
+    """Indica se a tag (nome e atributos brutos) é uma região do produto"""
+    if nome == 'h1' or (nome == 'span' and attrs.get('itemprop') == 'price'):
+        return True
+    if attrs.get('id') in IDS_REGIAO:
+        return True
+    classes = attrs.get('class')
+    if not classes:
+        return False
+    if isinstance(classes, str):
+        classes = classes.split()
+    return not CLASSES_REGIAO.isdisjoint(classes)
+
+
+class _FiltroRegioes(SoupStrainer):
+    """
+    SoupStrainer que só cria as regiões do produto (e seus descendentes);
+    o restante do documento nem chega a virar objetos do BeautifulSoup.
+    """
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return _eh_regiao(name, attrs or {})
+
+    def allow_string_creation(self, string):
+        return False
+
+    # Interface anterior ao BeautifulSoup 4.13
+
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        return _eh_regiao(markup_name, markup_attrs or {})
+
+    def search(self, markup):
+        return None
+
+
+def _regioes_lxml(raiz):
+    """Regiões do produto mais externas da árvore do lxml, em ordem de documento"""
+    regioes = []
+    for elemento in XPATH_CANDIDATOS_REGIAO(raiz):
+        if not _eh_regiao(elemento.tag, elemento.attrib):
+            continue
+        if regioes and any(ancestral is regioes[-1] for ancestral in elemento.iterancestors()):
+            # Já incluída na região anterior
+            continue
+        regioes.append(elemento)
+    return regioes
+
+
+def remover_scripts_estilos(html):
+    """Remove os blocos <script> e <style> do HTML antes da análise"""
+    if isinstance(html, bytes):
+        return PADRAO_SCRIPTS_ESTILOS_BYTES.sub(b'', html)
+    return PADRAO_SCRIPTS_ESTILOS.sub('', html)
+
+
+def impressao_digital(html):
+    """
+    Impressão digital (hash) do conteúdo normalizado da página: iguais para
+    páginas que só diferem em trechos voláteis (PADRAO_VOLATIL) e espaços
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    normalizado = ' '.join(PADRAO_VOLATIL.sub('', html).split())
+    return hashlib.blake2b(normalizado.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class _Varredura(ABC):
+    """
+    Percorre o documento uma única vez e guarda os candidatos de cada campo.
+
+    As faixas de texto dos elementos são guardadas como índices na lista de
+    strings do documento (`strings`), de modo que o texto de qualquer elemento
+    é um fatiamento dessa lista. Os elementos são guardados como pares
+    (elemento, faixa); cada backend implementa a travessia e a leitura de
+    texto dos elementos.
+    """
+
+    def __init__(self, raiz):
+        self.strings = []
+        self.posicoes = [0]
+
+        self.h1 = None
+        self.primeiros = {}
+        self.span_preco = None
+
+        self.preco_string = None
+        self.string_codigo = None
+        self.string_estoque = None
+
+        # Listas de faixas [inicio, fim, blocos abertos] em índices de `strings`
+        self.paragrafos = []
+        self.itens_lista = []
+        self.candidatos_preco = []
+
+        # Blocos de especificações: (faixas de <tr>, faixas de <li>)
+        self.blocos_features = []
+        self.blocos_specs = []
+
+        self._percorrer(raiz)
+
+    # Travessia e leitura de texto (específicas de cada backend)
+
+    @abstractmethod
+    def _percorrer(self, raiz):
+        """Visita as strings e as tags do documento, na ordem do documento"""
+
+    @abstractmethod
+    def texto_elemento(self, par):
+        """Equivalente a `elemento.text`"""
+
+    @abstractmethod
+    def texto_separado(self, par):
+        """Equivalente a `elemento.get_text(strip=True, separator='\\n')`"""
+
+    @abstractmethod
+    def codigo_rotulo(self):
+        """Texto do nó seguinte ao rótulo "Código:" (None se não houver rótulo)"""
+
+    @abstractmethod
+    def texto_estoque(self):
+        """Texto do elemento que contém o rótulo "Estoque:" (None se não houver rótulo)"""
+
+    # Registro de candidatos (comum aos backends)
+
+    def _adicionar_string(self, texto):
+        self.strings.append(texto)
+        self.posicoes.append(self.posicoes[-1] + len(texto))
+
+    def _visitar_string(self, texto, no):
+        # Preço em qualquer string do documento (inclusive scripts e comentários)
+        if self.preco_string is None and 'R$' in texto and MARCADOR_PRECO not in texto:
+            preco_match = PADRAO_PRECO.search(texto)
+            if preco_match:
+                self.preco_string = preco_match.group(0)
+
+        if self.string_codigo is None and 'Código:' in texto:
+            self.string_codigo = no
+
+        if self.string_estoque is None and 'Estoque:' in texto:
+            self.string_estoque = no
+
+    def _visitar_tag(self, nome, classes, itemprop, elemento, faixa, abertos):
+        if nome == 'h1':
+            if self.h1 is None:
+                self.h1 = (elemento, faixa)
+        elif nome == 'p':
+            self.paragrafos.append(faixa)
+        elif nome == 'li':
+            self.itens_lista.append(faixa)
+            for bloco in abertos:
+                bloco[1].append(faixa)
+        elif nome == 'tr':
+            for bloco in abertos:
+                bloco[0].append(faixa)
+        elif nome == 'span' and self.span_preco is None and itemprop == 'price':
+            self.span_preco = (elemento, faixa)
+
+        if nome in TAGS_PRECO_TEXTO:
+            self.candidatos_preco.append(faixa)
+
+        if classes:
+            for classe in classes:
+                if classe in CLASSES_PRIMEIRO and classe not in self.primeiros:
+                    self.primeiros[classe] = (elemento, faixa)
+
+            # Blocos cujos <tr>/<li> descendentes são especificações extras
+            for classe, blocos in (('product-features', self.blocos_features), ('specifications', self.blocos_specs)):
+                if classe in classes:
+                    bloco = ([], [])
+                    blocos.append(bloco)
+                    abertos.append(bloco)
+                    faixa[2] += 1
+
+    def texto(self, faixa):
+        """Texto concatenado das strings de uma faixa"""
+        return ''.join(self.strings[faixa[0]:faixa[1]])
+
+    def primeiro(self, *classes):
+        """Primeiro elemento da primeira classe encontrada (como `select_one(a) or select_one(b)`)"""
+        for classe in classes:
+            if classe in self.primeiros:
+                return self.primeiros[classe]
+        return None
+
+    def preco_por_elemento(self):
+        """
+        Primeiro elemento span/div/p/strong cujo texto completo contém um preço.
+
+        O texto do documento é concatenado uma única vez; para cada candidato
+        a busca é feita na faixa de caracteres correspondente ao elemento.
+        """
+        documento = ''.join(self.strings)
+        ocorrencias = [m.start() for m in re.finditer(re.escape('R$'), documento)]
+        if not ocorrencias:
+            return None
+        marcadores = [m.start() for m in re.finditer(re.escape(MARCADOR_PRECO), documento)]
+        posicoes = self.posicoes
+
+        for inicio, fim, _ in self.candidatos_preco:
+            inicio, fim = posicoes[inicio], posicoes[fim]
+
+            indice = bisect_left(ocorrencias, inicio)
+            if indice == len(ocorrencias) or ocorrencias[indice] + 2 > fim:
+                continue
+
+            indice_marcador = bisect_left(marcadores, inicio)
+            if indice_marcador < len(marcadores) and marcadores[indice_marcador] + len(MARCADOR_PRECO) <= fim:
+                continue
+
+            preco_match = PADRAO_PRECO.search(documento, ocorrencias[indice], fim)
+            if preco_match:
+                return preco_match.group(0)
+        return None
+
+    def campos(self, campos=CAMPOS):
+        """
+        Resolve os campos do produto a partir dos candidatos registrados.
+        Retorna um dicionário com nome (None se não encontrado), preco,
+        codigo, disponibilidade, descricao e especificacoes, limitado aos
+        `campos` pedidos.
+        """
+        resultado = {}
+
+        # Nome
+        if 'nome' in campos:
+            nome_element = self.h1 or self.primeiro('product-name')
+            resultado["nome"] = self.texto_elemento(nome_element).strip() if nome_element else None
+
+        if 'preco' in campos:
+            resultado["preco"] = self._preco()
+
+        if 'codigo' in campos:
+            resultado["codigo"] = self._codigo()
+
+        if 'disponibilidade' in campos:
+            resultado["disponibilidade"] = self._disponibilidade()
+
+        if 'descricao' in campos:
+            resultado["descricao"] = self._descricao()
+
+        if 'especificacoes' in campos:
+            resultado["especificacoes"] = self._especificacoes()
+
+        return resultado
+
+    def _preco(self):
+        # Método 1: seletores específicos
+        preco = PRECO_INDISPONIVEL
+        preco_element = self.primeiro('product-price', 'price-new') or self.span_preco
+        if preco_element:
+            preco_text = self.texto_elemento(preco_element).strip()
+            preco_match = PADRAO_PRECO.search(preco_text)
+            preco = preco_match.group(0) if preco_match else preco_text
+
+        # Método 2: primeira string contendo R$
+        if preco == PRECO_INDISPONIVEL and self.preco_string:
+            preco = self.preco_string
+
+        # Método 3: primeiro elemento cujo texto contém R$
+        if preco == PRECO_INDISPONIVEL:
+            preco = self.preco_por_elemento() or PRECO_INDISPONIVEL
+        return preco
+
+    def _codigo(self):
+        # Texto logo após o rótulo "Código:"
+        codigo = self.codigo_rotulo() or ""
+
+        if not codigo:
+            codigo_element = self.primeiro('product-code', 'sku')
+            if codigo_element:
+                codigo = PADRAO_PREFIXO_CODIGO.sub('', self.texto_elemento(codigo_element).strip())
+        return codigo
+
+    def _disponibilidade(self):
+        disponibilidade = "Não informado"
+        disponibilidade_text = self.texto_estoque()
+        if disponibilidade_text is not None:
+            disponibilidade = _verificar_disponibilidade(disponibilidade_text) or disponibilidade
+
+        if disponibilidade == "Não informado":
+            disponibilidade_element = self.primeiro('stock', 'availability')
+            if disponibilidade_element:
+                disponibilidade_text = self.texto_elemento(disponibilidade_element).strip().lower()
+                if "disponível" in disponibilidade_text:
+                    disponibilidade = "Disponível"
+                elif "indisponível" in disponibilidade_text or "esgotado" in disponibilidade_text:
+                    disponibilidade = "Indisponível"
+        return disponibilidade
+
+    def _descricao(self):
+        descricao_element = self.primeiro('product-description', 'tab-content')
+        if descricao_element:
+            descricao = self.texto_separado(descricao_element)
+        else:
+            textos = (self.texto(faixa).strip() for faixa in self.paragrafos)
+            descricao = '\n'.join([texto for texto in textos if len(texto) > 50])
+        return descricao
+
+    def _especificacoes(self):
+        especificacoes = []
+        for faixa in self.itens_lista:
+            spec_text = self.texto(faixa).strip()
+            if spec_text and len(spec_text) > 5 and '-' in spec_text and MARCADOR_PLACEHOLDER not in spec_text:
+                especificacoes.append(spec_text)
+
+        extra_specs = []
+        for linhas, itens in self.blocos_features or self.blocos_specs:
+            for faixa in linhas or itens:
+                item_text = self.texto(faixa).strip()
+                if item_text and item_text not in especificacoes and MARCADOR_PLACEHOLDER not in item_text:
+                    extra_specs.append(item_text)
+        especificacoes.extend(extra_specs)
+        return especificacoes
+
+
+class _VarreduraSoup(_Varredura):
+    """Varredura sobre uma árvore BeautifulSoup"""
+
+    def _percorrer(self, raiz):
+        strings = self.strings
+        abertos = []
+        pilha = [(None, iter(raiz.contents))]
+
+        while pilha:
+            faixa, filhos = pilha[-1]
+            filho = next(filhos, None)
+
+            if filho is None:
+                pilha.pop()
+                if faixa is not None:
+                    faixa[1] = len(strings)
+                    for _ in range(faixa[2]):
+                        abertos.pop()
+                continue
+
+            if isinstance(filho, NavigableString):
+                self._visitar_string(filho, filho)
+                if type(filho) in TIPOS_TEXTO:
+                    self._adicionar_string(filho)
+                continue
+
+            faixa = [len(strings), None, 0]
+            attrs = filho.attrs
+            self._visitar_tag(filho.name, attrs.get('class'), attrs.get('itemprop'), filho, faixa, abertos)
+            pilha.append((faixa, iter(filho.contents)))
+
+    def texto_elemento(self, par):
+        return par[0].text
+
+    def texto_separado(self, par):
+        return par[0].get_text(strip=True, separator='\n')
+
+    def codigo_rotulo(self):
+        if self.string_codigo is None:
+            return None
+        codigo_next = self.string_codigo.next_element
+        if isinstance(codigo_next, NavigableString):
+            return codigo_next.strip()
+        if codigo_next is not None:
+            return codigo_next.get_text().strip()
+        return None
+
+    def texto_estoque(self):
+        estoque = self.string_estoque
+        if estoque is None:
+            return None
+        return estoque.parent.text if estoque.parent else estoque
+
+
+class _VarreduraLxml(_Varredura):
+    """
+    Varredura sobre a árvore nativa do lxml (texto em `.text`/`.tail`),
+    a partir de uma sequência de raízes em ordem de documento.
+
+    Reproduz a visão de strings do BeautifulSoup: o conteúdo de scripts,
+    estilos, templates e comentários é visitado, mas não faz parte do texto
+    dos elementos.
+    """
+
+    def __init__(self, raiz):
+        self._contentores = 0
+        self._preservam_espacos = 0
+        self._aguardando_codigo = False
+        self._proximo_codigo = None
+        super().__init__(raiz)
+
+    def _string(self, texto, principal, elemento_pai, faixa_pai):
+        if not texto:
+            return
+        if not self._preservam_espacos and ESPACOS_ASCII.match(texto):
+            texto = '\n' if '\n' in texto else ' '
+        if self._aguardando_codigo:
+            self._aguardando_codigo = False
+            self._proximo_codigo = (texto, None)
+
+        rotulo_pendente = self.string_codigo is None
+        self._visitar_string(texto, (texto, elemento_pai, faixa_pai))
+        if rotulo_pendente and self.string_codigo is not None:
+            # O nó seguinte ao rótulo "Código:" contém o código
+            self._aguardando_codigo = True
+
+        if principal:
+            self._adicionar_string(texto)
+
+    def _percorrer(self, raizes):
+        abertos = []
+        pilha = [(None, None, iter(raizes), False)]
+
+        while pilha:
+            elemento, faixa, filhos, contentor = pilha[-1]
+            filho = next(filhos, None)
+
+            if filho is None:
+                pilha.pop()
+                if faixa is not None:
+                    faixa[1] = len(self.strings)
+                    for _ in range(faixa[2]):
+                        abertos.pop()
+                    if contentor:
+                        self._contentores -= 1
+                    if elemento.tag in TAGS_PRESERVAM_ESPACOS:
+                        self._preservam_espacos -= 1
+                    # O texto após uma raiz está fora do trecho percorrido
+                    if pilha[-1][1] is not None:
+                        self._string(elemento.tail, not self._contentores, pilha[-1][0], pilha[-1][1])
+                continue
+
+            tag = filho.tag
+            if not isinstance(tag, str):
+                # Comentários e instruções de processamento
+                self._string(filho.text, False, elemento, faixa)
+                self._string(filho.tail, not self._contentores, elemento, faixa)
+                continue
+
+            faixa_filho = [len(self.strings), None, 0]
+            if self._aguardando_codigo:
+                self._aguardando_codigo = False
+                self._proximo_codigo = (None, (filho, faixa_filho))
+
+            classes = filho.get('class')
+            self._visitar_tag(tag, classes.split() if classes else None, filho.get('itemprop'), filho, faixa_filho, abertos)
+
+            contentor = tag in TAGS_CONTENTORAS
+            if contentor:
+                self._contentores += 1
+            if tag in TAGS_PRESERVAM_ESPACOS:
+                self._preservam_espacos += 1
+            pilha.append((filho, faixa_filho, iter(filho), contentor))
+            self._string(filho.text, not self._contentores, filho, faixa_filho)
+
+    def texto_elemento(self, par):
+        elemento, faixa = par
+        if elemento.tag in TAGS_CONTENTORAS:
+            return ''.join(elemento.itertext())
+        return self.texto(faixa)
+
+    def texto_separado(self, par):
+        elemento, faixa = par
+        if elemento.tag in TAGS_CONTENTORAS:
+            strings = elemento.itertext()
+        else:
+            strings = self.strings[faixa[0]:faixa[1]]
+        return '\n'.join([texto for texto in (s.strip() for s in strings) if texto])
+
+    def codigo_rotulo(self):
+        if self._proximo_codigo is None:
+            return None
+        texto, par = self._proximo_codigo
+        if texto is not None:
+            return texto.strip()
+        return self.texto_elemento(par).strip()
+
+    def texto_estoque(self):
+        if self.string_estoque is None:
+            return None
+        texto, elemento, faixa = self.string_estoque
+        if elemento is None:
+            return texto
+        return self.texto_elemento((elemento, faixa))
+
+
+def extrair_campos(soup, campos=CAMPOS):
+    """
+    Extrai os campos de um produto de um documento BeautifulSoup em uma única
+    passagem. Retorna um dicionário com nome (None se não encontrado), preco,
+    codigo, disponibilidade, descricao e especificacoes, limitado aos `campos` pedidos.
+    """
+    return _VarreduraSoup(soup).campos(campos)
+
+
+def _analisar_bs4(html, podar=False, campos=CAMPOS):
+    if podar:
+        return extrair_campos(BeautifulSoup(remover_scripts_estilos(html), 'lxml', parse_only=_FiltroRegioes()), campos)
+    return extrair_campos(BeautifulSoup(html, 'lxml'), campos)
+
+
+def _analisar_lxml(html, podar=False, campos=CAMPOS):
+    if podar:
+        html = remover_scripts_estilos(html)
+    try:
+        raiz = lxml.html.document_fromstring(html)
+    except ValueError:
+        # Strings com declaração de encoding precisam ser passadas como bytes
+        raiz = lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        # Documento vazio
+        return _VarreduraLxml(()).campos(campos)
+    return _VarreduraLxml(_regioes_lxml(raiz) if podar else (raiz,)).campos(campos)
+
+
+# Backends de parser disponíveis, selecionados pelo nome
+BACKENDS = {
+    'bs4': _analisar_bs4,
+    'lxml': _analisar_lxml,
+}
+
+
+def extrair_campos_html(html, backend='bs4', podar=False, estruturados=True):
+    """
+    Extrai os campos de um produto a partir do HTML usando o backend de parser
+    indicado. Com `podar`, só as regiões do produto são analisadas. Com
+    `estruturados`, os dados estruturados da página têm prioridade e o DOM só
+    é analisado para os campos que eles não preencheram.
+    """
+    try:
+        analisar = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de parser desconhecido: {backend}. Opções: {', '.join(BACKENDS)}")
+    if not estruturados:
+        return analisar(html, podar)
+
+    campos = extrair_dados_estruturados(html)
+    faltantes = tuple(campo for campo in CAMPOS if campo not in campos)
+    if faltantes:
+        campos.update(analisar(html, podar, faltantes))
+    return {campo: campos[campo] for campo in CAMPOS}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Trabalhador da fila persistente de extrações.
+
+As tarefas (uma URL de produto cada) ficam na tabela `tarefas` do banco
+(`banco_dados.FilaTarefas`) e sobrevivem a reinícios: uma tarefa reservada
+por um trabalhador que caiu volta para a fila quando a reserva expira, e
+tarefas com erro são tentadas novamente com espera exponencial. As tarefas
+são adicionadas pelo servidor (POST /tarefas) ou por `FilaTarefas.adicionar`.
+
+O trabalhador roda separado dos servidores, com FILA_THREADS threads em
+cada um de FILA_PROCESSOS processos, e o seu próprio limite de requisições
+ao site: a vazão da fila não depende dos workers que atendem as requisições.
+As extrações são coalescidas com as dos servidores e salvas no banco, como
+as do agendador.
+
+Uso:
+    python fila_tarefas.py [--threads N] [--processos N] [--requisicoes-por-minuto N]
+"""
+
+import os
+import sys
+import uuid
+import signal
+import argparse
+import threading
+import multiprocessing
+import logging
+from limite_taxa import LimiteTaxa
+
+logger = logging.getLogger(__name__)
+
+# Threads de extração por processo e processos do trabalhador
+THREADS = int(os.environ.get('FILA_THREADS', 4))
+PROCESSOS = int(os.environ.get('FILA_PROCESSOS', 1))
+
+# Requisições ao site por minuto, somando todos os processos
+REQUISICOES_POR_MINUTO = float(os.environ.get('FILA_REQUISICOES_POR_MINUTO', 60))
+
+# Tentativas de cada tarefa e espera (segundos) antes da segunda tentativa, dobrada a cada nova falha
+MAX_TENTATIVAS = int(os.environ.get('FILA_MAX_TENTATIVAS', 3))
+ESPERA_TENTATIVA = float(os.environ.get('FILA_ESPERA_TENTATIVA', 30))
+
+# Duração (segundos) da reserva de uma tarefa; deve ser maior que a extração mais lenta
+DURACAO_RESERVA = float(os.environ.get('FILA_DURACAO_RESERVA', 120))
+
+# Espera (segundos) entre as consultas à fila quando não há tarefas disponíveis
+INTERVALO = float(os.environ.get('FILA_INTERVALO', 1))
+
+# Tempo (segundos) que as tarefas concluídas ou com falha ficam no banco
+RETENCAO = float(os.environ.get('FILA_RETENCAO', 7 * 86400))
+
+# Intervalo (segundos) entre as limpezas das tarefas antigas e os registros de progresso
+INTERVALO_MANUTENCAO = 60
+
+
+def criar_fila():
+    """`FilaTarefas` com a configuração das variáveis de ambiente"""
+    from banco_dados import FilaTarefas
+    return FilaTarefas(MAX_TENTATIVAS, DURACAO_RESERVA, ESPERA_TENTATIVA)
+
+
+class TrabalhadorFila:
+    """
+    Consome a `fila` com `threads` threads, cada uma reservando uma tarefa
+    por vez e extraindo o produto com `processar(url)` (que retorna o
+    dicionário do produto, com "erro" em caso de falha), dentro do limite de
+    requisições por minuto.
+    """
+
+    def __init__(self, fila, processar, threads=None, requisicoes_por_minuto=None, intervalo=None):
+        self.fila = fila
+        self.processar = processar
+        self.threads = threads or THREADS
+        self.limite = LimiteTaxa(requisicoes_por_minuto if requisicoes_por_minuto is not None else REQUISICOES_POR_MINUTO)
+        self.intervalo = intervalo if intervalo is not None else INTERVALO
+
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._estatisticas = {
+            "concluidas": 0,
+            "erros": 0,
+            "reservas_perdidas": 0,
+        }
+
+    def parar(self):
+        """Interrompe o trabalhador; as tarefas em andamento são concluídas antes"""
+        self._parar.set()
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self._estatisticas)
+
+    def _contar(self, chave):
+        with self._lock:
+            self._estatisticas[chave] += 1
+
+    def _executar_tarefa(self, dono, id_tarefa, url):
+        try:
+            info_produto = self.processar(url)
+            erro = info_produto.get("erro")
+        except Exception as e:
+            erro = str(e)
+        if erro:
+            logger.warning(f"Falha na tarefa {id_tarefa} ({url}): {erro}")
+            self._contar("erros")
+        else:
+            self._contar("concluidas")
+        if not self.fila.concluir(id_tarefa, dono, erro):
+            logger.warning(f"Reserva da tarefa {id_tarefa} expirou antes da conclusão ({url})")
+            self._contar("reservas_perdidas")
+
+    def _executar_tarefas(self):
+        dono = f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:8]}"
+        # A ficha do limite de requisições é obtida antes da reserva, para que a
+        # reserva não expire durante a espera; sem tarefas, fica para a próxima
+        com_ficha = False
+        while not self._parar.is_set():
+            if not com_ficha:
+                if not self.limite.aguardar(self._parar):
+                    break
+                com_ficha = True
+            try:
+                tarefas = self.fila.reservar(1, dono)
+                if not tarefas:
+                    self._parar.wait(self.intervalo)
+                    continue
+                com_ficha = False
+                self._executar_tarefa(dono, *tarefas[0])
+            except Exception as e:
+                # Um erro do banco não pode encerrar a thread em silêncio
+                logger.error(f"Erro no trabalhador da fila: {e}")
+                self._parar.wait(self.intervalo)
+
+    def executar(self):
+        """Executa as threads até `parar()`, limpando periodicamente as tarefas antigas"""
+        logger.info(f"Trabalhador da fila iniciado ({self.threads} threads, "
+                    f"{self.limite.por_minuto:g} requisições/minuto)")
+        threads = [
+            threading.Thread(target=self._executar_tarefas, name=f'fila-tarefas-{i}', daemon=True)
+            for i in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        while not self._parar.wait(INTERVALO_MANUTENCAO):
+            try:
+                removidas = self.fila.limpar(RETENCAO)
+                logger.info(f"Fila: {self.fila.estatisticas()}; trabalhador: {self.estatisticas()}"
+                            + (f"; {removidas} tarefas antigas removidas" if removidas else ""))
+            except Exception as e:
+                logger.error(f"Erro na manutenção da fila: {e}")
+        for thread in threads:
+            thread.join()
+        logger.info("Trabalhador da fila encerrado")
+
+
+def executar_processo(threads, requisicoes_por_minuto):
+    """Trabalhador completo de um processo: extração coalescida com os servidores, salvando no banco"""
+    from produto_scraper import ProdutoScraper
+    from cache_produtos import CacheProdutos
+    from banco_dados import (
+        get_produto_from_db, save_produto_to_db, get_validadores_from_db, confirmar_produto_no_db, LockExtracao
+    )
+
+    scraper = ProdutoScraper()
+    cache = CacheProdutos(
+        get_produto_from_db, save_produto_to_db, scraper.extrair_info_ciainfor,
+        lock_distribuido=LockExtracao(),
+        buscar_validadores=get_validadores_from_db, confirmar=confirmar_produto_no_db
+    )
+    trabalhador = TrabalhadorFila(criar_fila(), cache.atualizar, threads, requisicoes_por_minuto)
+
+    def encerrar(signum, frame):
+        trabalhador.parar()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+    trabalhador.executar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=THREADS, help='threads de extração por processo')
+    parser.add_argument('--processos', type=int, default=PROCESSOS)
+    parser.add_argument('--requisicoes-por-minuto', type=float, default=REQUISICOES_POR_MINUTO,
+                        help='limite somando todos os processos')
+    args = parser.parse_args()
+
+    from banco_dados import init_db, fechar_conexao
+    init_db()
+    # Conexões SQLite não podem atravessar o fork
+    fechar_conexao()
+
+    # O limite de requisições é dividido entre os processos
+    requisicoes_por_minuto = args.requisicoes_por_minuto / max(1, args.processos)
+    if args.processos <= 1:
+        executar_processo(args.threads, requisicoes_por_minuto)
+        return 0
+
+    processos = [
+        multiprocessing.Process(target=executar_processo, args=(args.threads, requisicoes_por_minuto),
+                                name=f'fila-tarefas-{i}')
+        for i in range(args.processos)
+    ]
+    for processo in processos:
+        processo.start()
+
+    def encerrar(signum, frame):
+        for processo in processos:
+            if processo.is_alive():
+                processo.terminate()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+    for processo in processos:
+        processo.join()
+    return 0 if all(processo.exitcode == 0 for processo in processos) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
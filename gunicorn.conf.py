@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Configuração do gunicorn (carregada automaticamente a partir do diretório
+de trabalho).
+
+O aplicativo é pré-carregado no processo mestre (GUNICORN_PRELOAD=true): os
+módulos são importados uma única vez e compartilhados com os workers por
+cópia na escrita, e o banco é inicializado uma vez, antes do fork, em vez de
+em cada worker. As tarefas em segundo plano de cada worker (threads, como o
+agendador) só são iniciadas depois do fork, em `iniciar_worker()` do módulo
+do aplicativo.
+"""
+
+import os
+import sys
+
+# O banco e as tarefas do worker são iniciados pelos ganchos abaixo, e não na importação do aplicativo
+os.environ.setdefault('SERVIDOR_INICIAR_NA_IMPORTACAO', 'false')
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def on_starting(server):
+    """No processo mestre, antes de importar o aplicativo e de criar os workers"""
+    from banco_dados import init_db, fechar_conexao
+    init_db()
+    # Conexões SQLite não podem atravessar o fork
+    fechar_conexao()
+
+
+def post_worker_init(worker):
+    """No worker, depois do fork e da importação do aplicativo"""
+    app_uri = worker.app.app_uri or worker.cfg.wsgi_app or ''
+    modulo = sys.modules.get(app_uri.split(':')[0])
+    iniciar_worker = getattr(modulo, 'iniciar_worker', None)
+    if iniciar_worker is not None:
+        iniciar_worker()
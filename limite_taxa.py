@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Limite de requisições por minuto (token bucket), compartilhado entre threads.
+
+Usado pelas tarefas que fazem requisições ao site sem um cliente esperando
+(atualização agendada e varredura do catálogo), para não sobrecarregar a loja.
+"""
+
+import time
+import threading
+
+
+class LimiteTaxa:
+    """
+    Libera até `por_minuto` requisições por minuto, com rajadas de até
+    `rajada` requisições. Com `por_minuto` <= 0, não há limite.
+    """
+
+    def __init__(self, por_minuto, rajada=1):
+        self.por_minuto = por_minuto
+        self.intervalo = 60.0 / por_minuto if por_minuto > 0 else 0.0
+        self.capacidade = max(1, rajada)
+
+        self._lock = threading.Lock()
+        self._fichas = float(self.capacidade)
+        self._ultimo = time.monotonic()
+
+    def _espera(self):
+        """Consome uma ficha, se houver; senão, retorna os segundos até a próxima"""
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) / self.intervalo)
+            self._ultimo = agora
+            if self._fichas >= 1:
+                self._fichas -= 1
+                return 0.0
+            return (1 - self._fichas) * self.intervalo
+
+    def aguardar(self, parar=None):
+        """
+        Bloqueia até que uma requisição seja liberada. Retorna False se o
+        evento `parar` for sinalizado durante a espera.
+        """
+        if self.intervalo <= 0:
+            return not (parar is not None and parar.is_set())
+        while True:
+            espera = self._espera()
+            if espera <= 0:
+                return True
+            if parar is not None:
+                if parar.wait(espera):
+                    return False
+            else:
+                time.sleep(espera)
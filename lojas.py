@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Registro das lojas suportadas e dos seus planos de extração.
+
+As lojas são descritas em um arquivo JSON (SCRAPER_LOJAS, por padrão
+`lojas.json` ao lado deste módulo), sem código Python:
+
+    {
+        "ciainfor": {
+            "nome": "Cia da Informática",
+            "dominios": ["ciainfor.com.br"],
+            "extrator": "heuristico"
+        },
+        "outra_loja": {
+            "dominios": ["outraloja.com.br"],
+            "campos": {
+                "nome": {"seletores": ["h1.produto-titulo"]},
+                "preco": {"seletores": [".preco-por", "[itemprop=price]"], "atributo": "content"},
+                "disponibilidade": {"seletores": [".estoque"],
+                                    "valores": {"Indisponível": ["esgotado"], "Disponível": ["em estoque"]}},
+                "especificacoes": {"xpath": ["//table[@id='ficha']//tr"]}
+            }
+        }
+    }
+
+O extrator "heuristico" é o motor de passagem única de `extracao.py`. Com
+"campos", cada campo é resolvido pelos seletores CSS (`seletores`) e XPath
+(`xpath`), na ordem, com um `regex` opcional sobre o texto encontrado; se
+nenhum seletor resolver o campo, `regex_html` é procurado no HTML bruto e,
+por fim, vale o `padrao`. Seletores e expressões regulares são compilados
+uma única vez, na carga do registro: a extração de cada página só avalia o
+plano já compilado. Com "dados_estruturados" (padrão: true), os dados
+estruturados da página (JSON-LD, microdados e OpenGraph) têm prioridade,
+como no motor heurístico.
+
+Os domínios ficam em um dicionário: a loja de uma URL é encontrada pelo
+host, sem percorrer as lojas, e um subdomínio (www., m., ...) é atendido
+pela loja do domínio registrado. URLs de hosts não registrados são
+extraídas pelo motor heurístico, mas não são aceitas pelo /webhook.
+"""
+
+import os
+import re
+import json
+import threading
+import urllib.parse
+import logging
+import lxml.html
+from lxml import etree
+from extracao import extrair_campos_html, CAMPOS, PRECO_INDISPONIVEL
+from dados_estruturados import extrair_dados_estruturados
+
+logger = logging.getLogger(__name__)
+
+# Arquivo JSON com as lojas suportadas
+ARQUIVO = os.environ.get('SCRAPER_LOJAS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lojas.json'))
+
+# Extratores disponíveis para as lojas
+EXTRATOR_HEURISTICO = 'heuristico'
+EXTRATOR_SELETORES = 'seletores'
+
+# Valor de cada campo quando nada é encontrado na página
+PADROES = {
+    'nome': None,
+    'preco': PRECO_INDISPONIVEL,
+    'codigo': "",
+    'disponibilidade': "Não informado",
+    'descricao': "",
+    'especificacoes': [],
+}
+
+# Campos com uma lista de valores (um por elemento encontrado)
+CAMPOS_LISTA = frozenset(['especificacoes'])
+
+# Chaves aceitas na descrição de um campo
+CHAVES_CAMPO = frozenset(['seletores', 'xpath', 'atributo', 'regex', 'regex_html', 'valores', 'padrao'])
+
+
+def _lista(valor):
+    if valor is None:
+        return []
+    return [valor] if isinstance(valor, str) else list(valor)
+
+
+def _normalizar_host(host):
+    return (host or '').strip().lower().rstrip('.')
+
+
+def _grupo(encontrado):
+    """Primeiro grupo da expressão regular (ou o trecho inteiro, sem grupos); None se o grupo não participou"""
+    return encontrado.group(1) if encontrado.groups() else encontrado.group(0)
+
+
+class PlanoHeuristico:
+    """Plano das lojas com o motor heurístico de passagem única (`extracao.py`)"""
+
+    def __init__(self, dados_estruturados=True):
+        self.dados_estruturados = dados_estruturados
+
+    def extrair(self, html, backend='bs4', podar=False, estruturados=True):
+        """Campos do produto (como `extracao.extrair_campos_html`)"""
+        return extrair_campos_html(html, backend, podar, estruturados and self.dados_estruturados)
+
+
+class _PlanoCampo:
+    """Seletores, expressões regulares e valor padrão de um campo, já compilados"""
+
+    def __init__(self, campo, especificacao):
+        desconhecidas = set(especificacao) - CHAVES_CAMPO
+        if desconhecidas:
+            raise ValueError(f"chaves desconhecidas no campo {campo}: {', '.join(sorted(desconhecidas))}")
+        self.campo = campo
+        self.lista = campo in CAMPOS_LISTA
+        self.atributo = especificacao.get('atributo')
+        self.padrao = especificacao.get('padrao', PADROES[campo])
+
+        self.seletores = []
+        seletores_css = _lista(especificacao.get('seletores'))
+        if seletores_css:
+            # O cssselect (usado pelo lxml) só é necessário para lojas com seletores CSS
+            from lxml.cssselect import CSSSelector
+            for seletor in seletores_css:
+                try:
+                    self.seletores.append(CSSSelector(seletor))
+                except Exception as e:
+                    raise ValueError(f"seletor CSS inválido no campo {campo} ({seletor!r}): {e}")
+        for expressao in _lista(especificacao.get('xpath')):
+            try:
+                self.seletores.append(etree.XPath(expressao))
+            except etree.XPathSyntaxError as e:
+                raise ValueError(f"XPath inválido no campo {campo} ({expressao!r}): {e}")
+
+        self.regex = self._compilar(especificacao.get('regex'))
+        self.regex_html = self._compilar(especificacao.get('regex_html'))
+
+        # {valor: [trechos]} -> [(trecho em minúsculas, valor)], na ordem do arquivo
+        self.valores = [
+            (trecho.lower(), valor)
+            for valor, trechos in (especificacao.get('valores') or {}).items()
+            for trecho in _lista(trechos)
+        ]
+
+    def _compilar(self, padrao):
+        if padrao is None:
+            return None
+        try:
+            return re.compile(padrao)
+        except re.error as e:
+            raise ValueError(f"expressão regular inválida no campo {self.campo} ({padrao!r}): {e}")
+
+    def _texto(self, resultado):
+        if isinstance(resultado, str):
+            # Atributos e textos selecionados pelo XPath
+            texto = str(resultado)
+        elif self.atributo:
+            texto = resultado.get(self.atributo) or ''
+        elif self.campo == 'descricao':
+            return '\n'.join([texto for texto in (s.strip() for s in resultado.itertext()) if texto])
+        else:
+            texto = resultado.text_content()
+        return ' '.join(texto.split())
+
+    def _valor(self, texto):
+        """Valor do campo a partir de um texto encontrado, ou None para tentar o próximo"""
+        if not texto:
+            return None
+        if self.regex is not None:
+            encontrado = self.regex.search(texto)
+            if encontrado is None:
+                return None
+            texto = _grupo(encontrado)
+            if not texto:
+                return None
+        if self.valores:
+            minusculas = texto.lower()
+            return next((valor for trecho, valor in self.valores if trecho in minusculas), None)
+        return texto
+
+    def extrair(self, raiz, html):
+        for seletor in self.seletores:
+            resultados = seletor(raiz) if raiz is not None else []
+            if not isinstance(resultados, list):
+                # XPath com resultado escalar (string(), count(), ...)
+                resultados = [str(resultados)]
+            valores = []
+            for resultado in resultados:
+                valor = self._valor(self._texto(resultado))
+                if valor is not None:
+                    if not self.lista:
+                        return valor
+                    valores.append(valor)
+            if valores:
+                return valores
+
+        if self.regex_html is not None:
+            encontrados = [
+                texto for texto in map(_grupo, self.regex_html.finditer(html)) if texto
+            ]
+            if encontrados:
+                return encontrados if self.lista else encontrados[0]
+        return list(self.padrao) if self.lista else self.padrao
+
+
+class PlanoSeletores:
+    """
+    Plano de uma loja descrita por seletores: o documento é analisado uma vez
+    pelo lxml e cada campo é resolvido pelo seu `_PlanoCampo`.
+    """
+
+    def __init__(self, campos, dados_estruturados=True):
+        desconhecidos = set(campos) - set(CAMPOS)
+        if desconhecidos:
+            raise ValueError(f"campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+        self.dados_estruturados = dados_estruturados
+        self.campos = {campo: _PlanoCampo(campo, campos.get(campo) or {}) for campo in CAMPOS}
+
+    def extrair(self, html, backend='bs4', podar=False, estruturados=True):
+        """Campos do produto; `backend` e `podar` não se aplicam (o plano usa o lxml)"""
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', errors='replace')
+        resultado = {}
+        if estruturados and self.dados_estruturados:
+            resultado = extrair_dados_estruturados(html)
+            if all(campo in resultado for campo in CAMPOS):
+                return {campo: resultado[campo] for campo in CAMPOS}
+
+        try:
+            raiz = lxml.html.document_fromstring(html)
+        except ValueError:
+            # Strings com declaração de encoding precisam ser passadas como bytes
+            raiz = lxml.html.document_fromstring(html.encode('utf-8'))
+        except etree.ParserError:
+            # Documento vazio
+            raiz = None
+
+        for campo, plano in self.campos.items():
+            if campo not in resultado:
+                resultado[campo] = plano.extrair(raiz, html)
+        return {campo: resultado[campo] for campo in CAMPOS}
+
+
+class Loja:
+    """Loja suportada: nome, domínios e plano de extração já compilado"""
+
+    def __init__(self, chave, especificacao):
+        self.chave = chave
+        self.nome = especificacao.get('nome', chave)
+        self.dominios = [_normalizar_host(dominio) for dominio in _lista(especificacao.get('dominios'))]
+        if not self.dominios:
+            raise ValueError(f"loja {chave} sem domínios")
+
+        extrator = especificacao.get('extrator', EXTRATOR_SELETORES if 'campos' in especificacao else EXTRATOR_HEURISTICO)
+        dados_estruturados = especificacao.get('dados_estruturados', True)
+        if extrator == EXTRATOR_HEURISTICO:
+            self.plano = PlanoHeuristico(dados_estruturados)
+        elif extrator == EXTRATOR_SELETORES:
+            try:
+                self.plano = PlanoSeletores(especificacao.get('campos') or {}, dados_estruturados)
+            except ValueError as e:
+                raise ValueError(f"loja {chave}: {e}")
+        else:
+            raise ValueError(f"loja {chave}: extrator desconhecido: {extrator}. "
+                             f"Opções: {EXTRATOR_HEURISTICO}, {EXTRATOR_SELETORES}")
+
+
+class RegistroLojas:
+    """
+    Lojas indexadas pelo domínio. `loja(url)` retorna a loja da URL (ou None);
+    `plano(url)` retorna o plano de extração, com o motor heurístico para
+    hosts não registrados.
+    """
+
+    def __init__(self, especificacoes=None):
+        self._lojas = {}
+        self._por_host = {}
+        self._lock = threading.Lock()
+        self.plano_padrao = PlanoHeuristico()
+        for chave, especificacao in (especificacoes or {}).items():
+            self.adicionar(chave, especificacao)
+
+    @classmethod
+    def carregar(cls, caminho=None):
+        """Registro com as lojas do arquivo JSON"""
+        caminho = caminho or ARQUIVO
+        with open(caminho, encoding='utf-8') as arquivo:
+            especificacoes = json.load(arquivo)
+        registro = cls(especificacoes)
+        logger.info(f"{len(registro._lojas)} lojas carregadas de {caminho}")
+        return registro
+
+    def adicionar(self, chave, especificacao):
+        """Compila e registra uma loja (substituindo a de mesma chave)"""
+        loja = Loja(chave, especificacao)
+        with self._lock:
+            anterior = self._lojas.get(chave)
+            # Copiado na escrita: as leituras não precisam do lock
+            por_host = dict(self._por_host)
+            if anterior is not None:
+                for dominio in anterior.dominios:
+                    por_host.pop(dominio, None)
+            for dominio in loja.dominios:
+                if por_host.get(dominio, loja).chave != chave:
+                    raise ValueError(f"domínio {dominio} já registrado pela loja {por_host[dominio].chave}")
+                por_host[dominio] = loja
+            self._lojas[chave] = loja
+            self._por_host = por_host
+        return loja
+
+    def lojas(self):
+        return list(self._lojas.values())
+
+    def dominios(self):
+        """Domínios registrados, na ordem das lojas"""
+        return [dominio for loja in self._lojas.values() for dominio in loja.dominios]
+
+    def loja(self, url):
+        """Loja da URL, pelo host ou por um domínio pai (subdomínios), ou None"""
+        try:
+            host = _normalizar_host(urllib.parse.urlsplit(url).hostname)
+        except ValueError:
+            return None
+        por_host = self._por_host
+        loja = por_host.get(host)
+        while loja is None and '.' in host:
+            host = host.split('.', 1)[1]
+            loja = por_host.get(host)
+        return loja
+
+    def plano(self, url):
+        """Plano de extração da URL"""
+        loja = self.loja(url)
+        return loja.plano if loja is not None else self.plano_padrao
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def registro_padrao():
+    """Registro com as lojas de SCRAPER_LOJAS, carregado uma única vez por processo"""
+    global _registro
+    if _registro is None:
+        with _registro_lock:
+            if _registro is None:
+                _registro = RegistroLojas.carregar()
+    return _registro
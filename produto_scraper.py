@@ -1,29 +1,344 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import re
+import codecs
+import threading
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from bs4 import BeautifulSoup
+from collections import Counter
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
 import json
 import logging
+from extracao import impressao_digital, BACKENDS
+from lojas import registro_padrao
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Configuração do pool de conexões HTTP (pode ser ajustada por variáveis de ambiente)
+POOL_HOSTS = int(os.environ.get('SCRAPER_POOL_HOSTS', 10))
+POOL_CONEXOES_POR_HOST = int(os.environ.get('SCRAPER_POOL_CONEXOES', 10))
+TIMEOUT_CONEXAO = float(os.environ.get('SCRAPER_TIMEOUT_CONEXAO', 3.05))
+TIMEOUT_LEITURA = float(os.environ.get('SCRAPER_TIMEOUT_LEITURA', 10))
+MAX_TENTATIVAS = int(os.environ.get('SCRAPER_MAX_TENTATIVAS', 3))
+FATOR_BACKOFF = float(os.environ.get('SCRAPER_FATOR_BACKOFF', 0.3))
+STATUS_TRANSITORIOS = (500, 502, 503, 504)
+
+# Download em streaming com limite de bytes e interrupção antecipada
+STREAMING = os.environ.get('SCRAPER_STREAMING', 'false').lower() == 'true'
+MAX_BYTES_PAGINA = int(os.environ.get('SCRAPER_MAX_BYTES', 2 * 1024 * 1024))
+# Marcadores que aparecem depois do bloco do produto: a leitura para no primeiro encontrado
+MARCADORES_FIM = [m for m in os.environ.get('SCRAPER_MARCADORES_FIM', '<footer').split(',') if m]
+TAMANHO_BLOCO_LEITURA = 16 * 1024
+# Se faltar pouco para o fim da resposta, o restante é descartado para manter a conexão no pool
+LIMITE_DRENAGEM = 64 * 1024
+PADRAO_CHARSET_META = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.I)
+
+# Backend de parser HTML: 'bs4' (BeautifulSoup) ou 'lxml' (árvore nativa, mais rápido)
+PARSER_PADRAO = os.environ.get('SCRAPER_PARSER', 'bs4')
+
+# Analisa apenas as regiões do produto, descartando menus, rodapé, scripts e estilos
+PODA_DOM = os.environ.get('SCRAPER_PODA', 'false').lower() == 'true'
+
+# Lê primeiro os dados estruturados (JSON-LD, microdados, OpenGraph); o DOM só
+# é analisado para os campos que eles não preencheram
+DADOS_ESTRUTURADOS = os.environ.get('SCRAPER_DADOS_ESTRUTURADOS', 'true').lower() == 'true'
+
+# Limites de concorrência da extração em lote
+LOTE_MAX_CONCORRENCIA = int(os.environ.get('SCRAPER_LOTE_CONCORRENCIA', 16))
+LOTE_MAX_POR_HOST = int(os.environ.get('SCRAPER_LOTE_POR_HOST', 4))
+
+class _AdapterContado(HTTPAdapter):
+    """
+    HTTPAdapter que conta as conexões TCP efetivamente abertas por host.
+    O contador `num_connections` do urllib3 não inclui as reconexões feitas
+    quando o servidor fecha uma conexão ociosa, o que inflaria a taxa de reuso.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        self.conexoes_por_host = Counter()
+        self._lock_conexoes = threading.Lock()
+        super().__init__(*args, **kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+        
+        def contar(conexao, scheme):
+            with adapter._lock_conexoes:
+                adapter.conexoes_por_host[f"{scheme}://{conexao.host}:{conexao.port}"] += 1
+        
+        class ConexaoHTTP(HTTPConnection):
+            def connect(self):
+                super().connect()
+                contar(self, 'http')
+        
+        class ConexaoHTTPS(HTTPSConnection):
+            def connect(self):
+                super().connect()
+                contar(self, 'https')
+        
+        class PoolHTTP(HTTPConnectionPool):
+            ConnectionCls = ConexaoHTTP
+        
+        class PoolHTTPS(HTTPSConnectionPool):
+            ConnectionCls = ConexaoHTTPS
+        
+        self.poolmanager.pool_classes_by_scheme = {'http': PoolHTTP, 'https': PoolHTTPS}
+
 class ProdutoScraper:
     """
     Classe para extrair informações de produtos a partir de URLs da Cia da Informática
     e outros sites de e-commerce.
     """
     
-    def __init__(self):
+    def __init__(self, pool_conexoes_por_host=None, timeout_conexao=None, timeout_leitura=None,
+                 max_tentativas=None, fator_backoff=None, parser=None, podar=None,
+                 streaming=None, max_bytes=None, marcadores_fim=None, dados_estruturados=None, lojas=None):
+        self.parser = parser or PARSER_PADRAO
+        if self.parser not in BACKENDS:
+            raise ValueError(f"Backend de parser desconhecido: {self.parser}. Opções: {', '.join(BACKENDS)}")
+        self.podar = PODA_DOM if podar is None else podar
+        self.dados_estruturados = DADOS_ESTRUTURADOS if dados_estruturados is None else dados_estruturados
+        
+        # Lojas suportadas e os seus planos de extração (lojas.json)
+        self.lojas = lojas or registro_padrao()
+        
+        # Download em streaming
+        self.streaming = STREAMING if streaming is None else streaming
+        self.max_bytes = max_bytes or MAX_BYTES_PAGINA
+        marcadores_fim = MARCADORES_FIM if marcadores_fim is None else marcadores_fim
+        self.padrao_fim = re.compile(
+            b'|'.join(re.escape(m.encode('utf-8')) for m in marcadores_fim), re.I
+        ) if marcadores_fim else None
+        self._maior_marcador = max((len(m.encode('utf-8')) for m in marcadores_fim), default=0)
+        
+        self._lock_estatisticas = threading.Lock()
+        self._estatisticas_download = {
+            "paginas": 0,
+            "bytes_lidos": 0,
+            "interrompidas_marcador": 0,
+            "interrompidas_limite": 0,
+            "revalidacoes": 0,
+            "nao_modificadas": 0,
+            "bytes_economizados": 0,
+            "conteudo_inalterado": 0,
+        }
+        
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
         }
         
+        # Timeouts separados de conexão e leitura
+        self.timeout = (
+            timeout_conexao if timeout_conexao is not None else TIMEOUT_CONEXAO,
+            timeout_leitura if timeout_leitura is not None else TIMEOUT_LEITURA,
+        )
+        
+        # Sessão compartilhada com keep-alive; o pool do urllib3 é thread-safe,
+        # então a mesma instância pode ser usada pelas threads do worker
+        self.session = self._criar_sessao(
+            pool_conexoes_por_host if pool_conexoes_por_host is not None else POOL_CONEXOES_POR_HOST,
+            max_tentativas if max_tentativas is not None else MAX_TENTATIVAS,
+            fator_backoff if fator_backoff is not None else FATOR_BACKOFF,
+        )
+    
+    def _criar_sessao(self, pool_conexoes_por_host, max_tentativas, fator_backoff):
+        """Cria a sessão HTTP com pool de conexões e retentativas com backoff"""
+        retry = Retry(
+            total=max_tentativas,
+            connect=max_tentativas,
+            read=max_tentativas,
+            status=max_tentativas,
+            status_forcelist=STATUS_TRANSITORIOS,
+            backoff_factor=fator_backoff,
+            raise_on_status=False,
+        )
+        adapter = _AdapterContado(
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=pool_conexoes_por_host,
+            max_retries=retry,
+            pool_block=False,
+        )
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    @staticmethod
+    def _cabecalhos_condicionais(validadores):
+        """Cabeçalhos If-None-Match / If-Modified-Since a partir dos validadores da última extração"""
+        cabecalhos = {}
+        if validadores:
+            if validadores.get('etag'):
+                cabecalhos['If-None-Match'] = validadores['etag']
+            if validadores.get('last_modified'):
+                cabecalhos['If-Modified-Since'] = validadores['last_modified']
+        return cabecalhos
+    
+    def _baixar_pagina(self, url, validadores=None):
+        """
+        Faz o download de uma página usando o pool de conexões da sessão.
+        Com `validadores` (etag / last_modified), a requisição é condicional
+        e o servidor pode responder 304 sem corpo.
+        """
+        cabecalhos = self._cabecalhos_condicionais(validadores)
+        response = self.session.get(url, headers=cabecalhos, timeout=self.timeout, stream=self.streaming)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        return response
+    
+    def _ler_html(self, response):
+        """
+        Lê o corpo da resposta como texto (inteiro ou em streaming, conforme
+        configurado). Retorna (html, bytes lidos).
+        """
+        if not self.streaming:
+            self._contabilizar_download(len(response.content))
+            return response.text, len(response.content)
+        
+        conteudo, motivo = self._ler_corpo_limitado(response)
+        self._contabilizar_download(len(conteudo), motivo)
+        
+        # Decodificação incremental: um caractere cortado no fim do buffer é descartado
+        decoder = codecs.getincrementaldecoder(self._detectar_encoding(response, conteudo))(errors='replace')
+        return decoder.decode(conteudo, final=motivo is None), len(conteudo)
+    
+    def _ler_corpo_limitado(self, response):
+        """
+        Lê o corpo em blocos até o fim, até o limite de bytes ou até encontrar um
+        marcador de fim do bloco do produto. Retorna (conteúdo, motivo da interrupção).
+        """
+        buffer = bytearray()
+        motivo = None
+        try:
+            for bloco in response.iter_content(chunk_size=TAMANHO_BLOCO_LEITURA):
+                motivo = self._acrescentar_bloco(buffer, bloco, response.url)
+                if motivo:
+                    break
+        finally:
+            self._liberar_conexao(response, interrompida=motivo is not None)
+        return bytes(buffer), motivo
+    
+    def _acrescentar_bloco(self, buffer, bloco, url):
+        """
+        Acrescenta o bloco ao buffer, cortando-o no marcador de fim ou no
+        limite de bytes. Retorna o motivo da interrupção da leitura, ou None.
+        """
+        inicio_busca = max(len(buffer) - self._maior_marcador + 1, 0)
+        buffer.extend(bloco)
+        
+        if self.padrao_fim is not None:
+            marcador = self.padrao_fim.search(buffer, inicio_busca)
+            if marcador:
+                del buffer[marcador.start():]
+                return "marcador"
+        
+        if len(buffer) >= self.max_bytes:
+            del buffer[self.max_bytes:]
+            logger.warning(f"Página excedeu o limite de {self.max_bytes} bytes: {url}")
+            return "limite"
+        return None
+    
+    def _liberar_conexao(self, response, interrompida):
+        """
+        Devolve a conexão ao pool. Se a leitura foi interrompida e falta pouco
+        para o fim da resposta, o restante é descartado para manter a conexão
+        keep-alive; caso contrário a conexão é fechada.
+        """
+        if interrompida:
+            tamanho = response.headers.get('Content-Length')
+            restante = int(tamanho) - response.raw.tell() if tamanho and tamanho.isdigit() else None
+            if restante is not None and restante <= LIMITE_DRENAGEM:
+                response.raw.drain_conn()
+                response.raw.release_conn()
+                return
+        response.close()
+    
+    def _detectar_encoding(self, response, conteudo):
+        """Encoding declarado no cabeçalho Content-Type, na tag <meta> ou UTF-8"""
+        if 'charset' in response.headers.get('Content-Type', '').lower() and response.encoding:
+            encoding = response.encoding
+        else:
+            meta = PADRAO_CHARSET_META.search(conteudo, 0, 4096)
+            encoding = meta.group(1).decode('ascii') if meta else 'utf-8'
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            return 'utf-8'
+    
+    def _contabilizar_revalidacao(self, validadores, nao_modificada):
+        with self._lock_estatisticas:
+            self._estatisticas_download["revalidacoes"] += 1
+            if nao_modificada:
+                self._estatisticas_download["nao_modificadas"] += 1
+                self._estatisticas_download["bytes_economizados"] += validadores.get('bytes') or 0
+    
+    def _contabilizar_download(self, tamanho, motivo=None):
+        with self._lock_estatisticas:
+            self._estatisticas_download["paginas"] += 1
+            self._estatisticas_download["bytes_lidos"] += tamanho
+            if motivo:
+                self._estatisticas_download[f"interrompidas_{motivo}"] += 1
+    
+    def estatisticas_download(self):
+        """
+        Retorna estatísticas de download: páginas, bytes lidos, leituras
+        interrompidas, revalidações condicionais (304 e bytes economizados) e
+        páginas com conteúdo inalterado, cuja análise foi evitada
+        """
+        with self._lock_estatisticas:
+            estatisticas = dict(self._estatisticas_download)
+        revalidacoes = estatisticas["revalidacoes"]
+        estatisticas["taxa_nao_modificadas"] = round(estatisticas["nao_modificadas"] / revalidacoes, 3) if revalidacoes else 0.0
+        estatisticas["streaming"] = self.streaming
+        estatisticas["max_bytes"] = self.max_bytes
+        return estatisticas
+    
+    def estatisticas_conexoes(self):
+        """
+        Retorna estatísticas de reutilização das conexões do pool, por host.
+        Uma requisição que não abriu conexão nova reaproveitou uma conexão keep-alive.
+        """
+        hosts = {}
+        for adapter in set(self.session.adapters.values()):
+            with adapter._lock_conexoes:
+                conexoes_por_host = dict(adapter.conexoes_por_host)
+            pools = adapter.poolmanager.pools
+            for chave in list(pools.keys()):
+                pool = pools.get(chave)
+                if pool is None:
+                    continue
+                host = f"{pool.scheme}://{pool.host}:{pool.port}"
+                conexoes = conexoes_por_host.get(host, 0)
+                hosts[host] = {
+                    "conexoes_abertas": conexoes,
+                    "requisicoes": pool.num_requests,
+                    "reutilizadas": max(pool.num_requests - conexoes, 0),
+                }
+        
+        total_requisicoes = sum(h["requisicoes"] for h in hosts.values())
+        total_reutilizadas = sum(h["reutilizadas"] for h in hosts.values())
+        return {
+            "hosts": hosts,
+            "requisicoes": total_requisicoes,
+            "conexoes_abertas": sum(h["conexoes_abertas"] for h in hosts.values()),
+            "reutilizadas": total_reutilizadas,
+            "taxa_reutilizacao": round(total_reutilizadas / total_requisicoes, 4) if total_requisicoes else 0.0,
+        }
+        
     def extrair_nome_produto_da_url(self, url):
         """Extrai o nome do produto a partir da URL"""
         try:
@@ -37,133 +352,31 @@ class ProdutoScraper:
             logger.error(f"Erro ao extrair nome do produto da URL: {e}")
             return "Produto"
     
-    def extrair_info_ciainfor(self, url):
+    def extrair_info_ciainfor(self, url, validadores=None):
         """
-        Extrai informações de produtos do site ciainfor.com.br
+        Extrai informações de um produto com o plano de extração da loja da URL
+        (lojas.json); hosts não registrados usam o motor heurístico
+
+        Com `validadores` (etag / last_modified / impressao / bytes da última
+        extração), a página é revalidada com uma requisição condicional; se o
+        servidor responder 304, ou se a impressão digital do conteúdo
+        normalizado for a mesma da última extração, retorna
+        {"url": url, "nao_modificado": True} sem analisar a página. O
+        resultado inclui em "validadores" os valores para a próxima revalidação.
         """
         try:
             logger.info(f"Extraindo informações do produto: {url}")
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'lxml')
-            
-            # Extrair informações básicas
-            nome_produto = soup.select_one('h1') or soup.select_one('.product-name')
-            nome_produto = nome_produto.text.strip() if nome_produto else self.extrair_nome_produto_da_url(url)
-            
-            # Extrair preço - VERSÃO MELHORADA
-            preco = "Preço não disponível"
-            
-            # Método 1: Seletores específicos
-            preco_element = soup.select_one('.product-price') or soup.select_one('.price-new') or soup.select_one('span[itemprop="price"]')
-            if preco_element:
-                preco_text = preco_element.text.strip()
-                preco_match = re.search(r'R\$\s*[\d.,]+', preco_text)
-                if preco_match:
-                    preco = preco_match.group(0)
-                else:
-                    preco = preco_text
-            
-            # Método 2: Busca por texto contendo R$
-            if preco == "Preço não disponível":
-                for element in soup.find_all(text=True):
-                    if 'R$' in element and not '--PRODUTO_PRECO' in element:
-                        preco_match = re.search(r'R\$\s*[\d.,]+', element)
-                        if preco_match:
-                            preco = preco_match.group(0)
-                            break
-            
-            # Método 3: Busca por elementos com R$ no texto
-            if preco == "Preço não disponível":
-                for element in soup.find_all(['span', 'div', 'p', 'strong']):
-                    if element.text and 'R$' in element.text and not '--PRODUTO_PRECO' in element.text:
-                        preco_match = re.search(r'R\$\s*[\d.,]+', element.text)
-                        if preco_match:
-                            preco = preco_match.group(0)
-                            break
-            
-            # Extrair código do produto
-            codigo = ""
-            codigo_element = soup.find(string=re.compile('Código:'))
-            if codigo_element:
-                codigo_next = codigo_element.next_element
-                if codigo_next:
-                    codigo = codigo_next.strip()
-            
-            # Se não encontrou pelo método acima, tenta outro método
-            if not codigo:
-                codigo_element = soup.select_one('.product-code') or soup.select_one('.sku')
-                if codigo_element:
-                    codigo = codigo_element.text.strip()
-                    # Remover prefixos comuns
-                    codigo = re.sub(r'^(Código:|SKU:|Ref:)\s*', '', codigo)
-            
-            # Extrair disponibilidade
-            disponibilidade = "Não informado"
-            disponibilidade_element = soup.find(string=re.compile('Estoque:'))
-            if disponibilidade_element:
-                disponibilidade_text = disponibilidade_element.parent.text if disponibilidade_element.parent else disponibilidade_element
-                if "Disponível" in disponibilidade_text:
-                    disponibilidade = "Disponível"
-                elif "Indisponível" in disponibilidade_text or "Esgotado" in disponibilidade_text:
-                    disponibilidade = "Indisponível"
-            
-            # Se não encontrou pelo método acima, tenta outro método
-            if disponibilidade == "Não informado":
-                disponibilidade_element = soup.select_one('.stock') or soup.select_one('.availability')
-                if disponibilidade_element:
-                    disponibilidade_text = disponibilidade_element.text.strip().lower()
-                    if "disponível" in disponibilidade_text:
-                        disponibilidade = "Disponível"
-                    elif "indisponível" in disponibilidade_text or "esgotado" in disponibilidade_text:
-                        disponibilidade = "Indisponível"
-            
-            # Extrair descrição
-            descricao_element = soup.select_one('.product-description') or soup.select_one('.tab-content')
-            descricao = ""
-            if descricao_element:
-                descricao = descricao_element.get_text(strip=True, separator='\n')
-            else:
-                # Tentar extrair de parágrafos
-                paragrafos = soup.select('p')
-                descricao = '\n'.join([p.text.strip() for p in paragrafos if len(p.text.strip()) > 50])
-            
-            # Extrair especificações técnicas
-            especificacoes = []
-            specs_elements = soup.select('li') or soup.select('.product-features li')
-            for spec in specs_elements:
-                spec_text = spec.text.strip()
-                if spec_text and len(spec_text) > 5 and '-' in spec_text and not '--PRODUTO_' in spec_text:
-                    especificacoes.append(spec_text)
-            
-            # Filtrar especificações para remover placeholders
-            especificacoes = [spec for spec in especificacoes if not '--PRODUTO_' in spec]
-            
-            # Adicionar especificações extras se encontradas
-            extra_specs = []
-            for element in soup.select('.product-features') or soup.select('.specifications'):
-                for item in element.select('tr') or element.select('li'):
-                    item_text = item.text.strip()
-                    if item_text and not item_text in especificacoes and not '--PRODUTO_' in item_text:
-                        extra_specs.append(item_text)
-            
-            # Adicionar especificações extras se houver
-            if extra_specs:
-                especificacoes.extend(extra_specs)
-            
-            # Montar resultado
-            resultado = {
-                "nome": nome_produto,
-                "preco": preco,
-                "codigo": codigo,
-                "disponibilidade": disponibilidade,
-                "descricao": descricao,
-                "especificacoes": especificacoes,
-                "url": url
-            }
-            
-            return resultado
+            response = self._baixar_pagina(url, validadores)
+            if validadores and (validadores.get('etag') or validadores.get('last_modified')):
+                nao_modificada = response.status_code == 304
+                self._contabilizar_revalidacao(validadores, nao_modificada)
+                if nao_modificada:
+                    # Consome o corpo vazio para devolver a conexão ao pool
+                    response.content
+                    logger.info(f"Produto não modificado desde a última extração: {url}")
+                    return {"url": url, "nao_modificado": True}
+            html, tamanho = self._ler_html(response)
+            return self._analisar_pagina(url, html, tamanho, response.headers, validadores)
             
         except Exception as e:
             logger.error(f"Erro ao extrair informações do produto: {e}")
@@ -172,44 +385,125 @@ class ProdutoScraper:
                 "url": url
             }
     
-    def processar_mensagem(self, mensagem):
+    def _analisar_pagina(self, url, html, tamanho, cabecalhos, validadores=None):
+        """
+        Extrai os campos do HTML baixado e monta o resultado, com os
+        validadores da resposta (`cabecalhos`). Retorna {"nao_modificado": True}
+        se a impressão digital do conteúdo for a mesma da última extração.
+        """
+        impressao = impressao_digital(html)
+        if validadores and validadores.get('impressao') == impressao:
+            with self._lock_estatisticas:
+                self._estatisticas_download["conteudo_inalterado"] += 1
+            logger.info(f"Conteúdo do produto inalterado desde a última extração: {url}")
+            return {"url": url, "nao_modificado": True}
+        
+        # Extrair os campos com o plano da loja (compilado na carga do registro)
+        campos = self.lojas.plano(url).extrair(html, self.parser, self.podar, self.dados_estruturados)
+        
+        nome_produto = campos["nome"]
+        if nome_produto is None:
+            nome_produto = self.extrair_nome_produto_da_url(url)
+        
+        # Montar resultado
+        return {
+            "nome": nome_produto,
+            "preco": campos["preco"],
+            "codigo": campos["codigo"],
+            "disponibilidade": campos["disponibilidade"],
+            "descricao": campos["descricao"],
+            "especificacoes": campos["especificacoes"],
+            "url": url,
+            "validadores": {
+                "etag": cabecalhos.get('ETag'),
+                "last_modified": cabecalhos.get('Last-Modified'),
+                "impressao": impressao,
+                "bytes": tamanho,
+            },
+        }
+    
+    def extrair_lote(self, urls, max_concorrencia=None, max_por_host=None, validadores=None):
+        """
+        Extrai informações de vários produtos em paralelo, respeitando um limite
+        global de concorrência e um limite de requisições simultâneas por host.
+        Os resultados são retornados na mesma ordem das URLs de entrada.
+        `validadores` (URL -> validadores) torna condicionais as requisições
+        dessas URLs, como em `extrair_info_ciainfor`.
+        """
+        validadores = validadores or {}
+        max_concorrencia = max_concorrencia or LOTE_MAX_CONCORRENCIA
+        max_por_host = max_por_host or LOTE_MAX_POR_HOST
+        
+        # URLs repetidas são extraídas uma única vez
+        urls_unicas = list(dict.fromkeys(urls))
+        if not urls_unicas:
+            return []
+        
+        semaforos = {}
+        semaforos_lock = threading.Lock()
+        
+        def semaforo_do_host(url):
+            host = urllib.parse.urlparse(url).netloc.lower()
+            with semaforos_lock:
+                if host not in semaforos:
+                    semaforos[host] = threading.BoundedSemaphore(max_por_host)
+                return semaforos[host]
+        
+        def extrair(url):
+            with semaforo_do_host(url):
+                return self.extrair_info_ciainfor(url, validadores.get(url))
+        
+        logger.info(f"Extraindo lote de {len(urls_unicas)} produtos (concorrência {max_concorrencia}, {max_por_host} por host)")
+        with ThreadPoolExecutor(max_workers=min(max_concorrencia, len(urls_unicas))) as executor:
+            resultados = dict(zip(urls_unicas, executor.map(extrair, urls_unicas)))
+        
+        return [resultados[url] for url in urls]
+    
+    def identificar_url(self, mensagem):
         """
-        Processa uma mensagem para identificar o gatilho e extrair informações do produto
+        Verifica o gatilho e a URL da mensagem, sem extrair o produto.
+        Retorna (url, None) se a mensagem pede um produto de um domínio
+        suportado, ou (None, erro) com o dicionário de erro da resposta.
         """
         # Decodificar a mensagem (substituir %20 por espaços, etc)
         mensagem_decodificada = urllib.parse.unquote(mensagem)
         
         # Verificar se contém o gatilho
         gatilho = "Preciso de ajuda com o produto"
-        if gatilho.lower() in mensagem_decodificada.lower():
-            logger.info("Gatilho detectado na mensagem")
-            
-            # Extrair URL usando expressão regular
-            urls = re.findall(r'https?://[^\s]+', mensagem_decodificada)
-            
-            if urls:
-                url = urls[0]
-                logger.info(f"URL encontrada: {url}")
-                
-                # Verificar domínio e chamar o extrator apropriado
-                if "ciainfor.com.br" in url:
-                    return self.extrair_info_ciainfor(url)
-                else:
-                    # Implementar outros extratores conforme necessário
-                    return {
-                        "erro": "Domínio não suportado. Atualmente só extraímos informações de ciainfor.com.br",
-                        "url": url
-                    }
-            else:
-                return {
-                    "erro": "Nenhuma URL encontrada na mensagem",
-                    "mensagem_original": mensagem_decodificada
-                }
-        else:
-            return {
+        if gatilho.lower() not in mensagem_decodificada.lower():
+            return None, {
                 "erro": "Gatilho não encontrado na mensagem",
                 "mensagem_original": mensagem_decodificada
             }
+        logger.info("Gatilho detectado na mensagem")
+        
+        # Extrair URL usando expressão regular
+        urls = re.findall(r'https?://[^\s]+', mensagem_decodificada)
+        if not urls:
+            return None, {
+                "erro": "Nenhuma URL encontrada na mensagem",
+                "mensagem_original": mensagem_decodificada
+            }
+        url = urls[0]
+        logger.info(f"URL encontrada: {url}")
+        
+        # Verificar domínio (lojas registradas em lojas.json)
+        if self.lojas.loja(url) is None:
+            return None, {
+                "erro": f"Domínio não suportado. Atualmente só extraímos informações de {', '.join(self.lojas.dominios())}",
+                "url": url
+            }
+        return url, None
+    
+    def processar_mensagem(self, mensagem, extrair=None):
+        """
+        Processa uma mensagem para identificar o gatilho e extrair informações do produto.
+        `extrair(url)` substitui `extrair_info_ciainfor` (por exemplo, para coalescer extrações).
+        """
+        url, erro = self.identificar_url(mensagem)
+        if erro is not None:
+            return erro
+        return (extrair or self.extrair_info_ciainfor)(url)
     
     def formatar_resposta(self, info_produto):
         """
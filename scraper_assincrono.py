@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Versão assíncrona (asyncio) do download das páginas de produto.
+
+`ProdutoScraperAssincrono` faz as mesmas extrações de `ProdutoScraper`, mas
+baixa as páginas com um cliente httpx assíncrono: enquanto uma página é
+baixada, o event loop atende as demais requisições, e um único processo
+mantém centenas de downloads em andamento. O que não é E/S continua igual:
+requisições condicionais, streaming com marcador de fim, impressão digital
+e extração dos campos (esta em um pequeno pool de threads, para não travar
+o event loop com a análise do HTML).
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from produto_scraper import (
+    ProdutoScraper, POOL_HOSTS, POOL_CONEXOES_POR_HOST, MAX_TENTATIVAS, FATOR_BACKOFF,
+    STATUS_TRANSITORIOS, TAMANHO_BLOCO_LEITURA
+)
+
+logger = logging.getLogger(__name__)
+
+# Downloads simultâneos (conexões abertas) por processo
+MAX_CONEXOES = int(os.environ.get('ASGI_MAX_CONEXOES', 200))
+
+# Threads que analisam o HTML baixado
+ANALISE_THREADS = int(os.environ.get('ASGI_ANALISE_THREADS', 2))
+
+
+class ProdutoScraperAssincrono(ProdutoScraper):
+    """
+    `ProdutoScraper` com `extrair_info_ciainfor_async`, que baixa a página
+    sem bloquear o event loop. O cliente HTTP é criado no primeiro uso, no
+    event loop em que ele roda, e fechado por `fechar()`.
+    """
+
+    def __init__(self, max_conexoes=None, analise_threads=None, max_tentativas=None, fator_backoff=None, **kwargs):
+        super().__init__(max_tentativas=max_tentativas, fator_backoff=fator_backoff, **kwargs)
+        self.max_conexoes = max_conexoes or MAX_CONEXOES
+        self.max_tentativas = max_tentativas if max_tentativas is not None else MAX_TENTATIVAS
+        self.fator_backoff = fator_backoff if fator_backoff is not None else FATOR_BACKOFF
+        self._executor_analise = ThreadPoolExecutor(
+            max_workers=analise_threads or ANALISE_THREADS,
+            thread_name_prefix='analise-html'
+        )
+        self._cliente = None
+        self._loop_cliente = None
+        self._estatisticas_assincronas = {
+            "requisicoes": 0,
+            "retentativas": 0,
+            "em_andamento": 0,
+            "pico_em_andamento": 0,
+        }
+
+    def _obter_cliente(self):
+        loop = asyncio.get_running_loop()
+        if self._cliente is None or self._loop_cliente is not loop:
+            self._cliente = httpx.AsyncClient(
+                headers=self.headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_conexoes,
+                    max_keepalive_connections=min(self.max_conexoes, POOL_HOSTS * POOL_CONEXOES_POR_HOST),
+                ),
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                follow_redirects=True,
+            )
+            self._loop_cliente = loop
+        return self._cliente
+
+    async def fechar(self):
+        """Fecha o cliente HTTP (e as conexões keep-alive)"""
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+    def estatisticas_conexoes(self):
+        """Requisições feitas, retentativas e downloads simultâneos (atual e pico)"""
+        with self._lock_estatisticas:
+            estatisticas = dict(self._estatisticas_assincronas)
+        estatisticas["max_conexoes"] = self.max_conexoes
+        return estatisticas
+
+    def _contar(self, chave, quantidade=1):
+        with self._lock_estatisticas:
+            self._estatisticas_assincronas[chave] += quantidade
+            if chave == "em_andamento":
+                self._estatisticas_assincronas["pico_em_andamento"] = max(
+                    self._estatisticas_assincronas["pico_em_andamento"], self._estatisticas_assincronas["em_andamento"]
+                )
+
+    async def _baixar_pagina_async(self, url, validadores=None):
+        """
+        Envia a requisição e retorna a resposta com o corpo ainda não lido.
+        Erros de conexão e respostas 5xx transitórias são tentados novamente
+        com espera exponencial, como no pool do `ProdutoScraper`.
+        """
+        cliente = self._obter_cliente()
+        cabecalhos = self._cabecalhos_condicionais(validadores)
+        for tentativa in range(self.max_tentativas + 1):
+            if tentativa:
+                self._contar("retentativas")
+                await asyncio.sleep(self.fator_backoff * 2 ** (tentativa - 1))
+            self._contar("requisicoes")
+            requisicao = cliente.build_request('GET', url, headers=cabecalhos)
+            try:
+                response = await cliente.send(requisicao, stream=True)
+            except httpx.TransportError:
+                if tentativa == self.max_tentativas:
+                    raise
+                continue
+            if response.status_code in STATUS_TRANSITORIOS and tentativa < self.max_tentativas:
+                await response.aclose()
+                continue
+            if response.status_code >= 400:
+                await response.aclose()
+                response.raise_for_status()
+            return response
+
+    async def _ler_html_async(self, response):
+        """Lê o corpo (inteiro ou até o marcador de fim) e o decodifica. Retorna (html, bytes lidos)"""
+        motivo = None
+        try:
+            if not self.streaming:
+                conteudo = await response.aread()
+            else:
+                buffer = bytearray()
+                async for bloco in response.aiter_bytes(TAMANHO_BLOCO_LEITURA):
+                    motivo = self._acrescentar_bloco(buffer, bloco, str(response.url))
+                    if motivo:
+                        break
+                conteudo = bytes(buffer)
+        finally:
+            # Uma resposta lida só em parte tem a conexão fechada
+            await response.aclose()
+        self._contabilizar_download(len(conteudo), motivo)
+        return conteudo.decode(self._detectar_encoding(response, conteudo), errors='replace'), len(conteudo)
+
+    async def extrair_info_ciainfor_async(self, url, validadores=None):
+        """Versão assíncrona de `extrair_info_ciainfor`, com o mesmo resultado"""
+        self._contar("em_andamento")
+        try:
+            logger.info(f"Extraindo informações do produto: {url}")
+            response = await self._baixar_pagina_async(url, validadores)
+            if validadores and (validadores.get('etag') or validadores.get('last_modified')):
+                nao_modificada = response.status_code == 304
+                self._contabilizar_revalidacao(validadores, nao_modificada)
+                if nao_modificada:
+                    await response.aclose()
+                    logger.info(f"Produto não modificado desde a última extração: {url}")
+                    return {"url": url, "nao_modificado": True}
+            html, tamanho = await self._ler_html_async(response)
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor_analise, self._analisar_pagina, url, html, tamanho, response.headers, validadores
+            )
+        except Exception as e:
+            logger.error(f"Erro ao extrair informações do produto: {e}")
+            return {
+                "erro": f"Não foi possível extrair informações do produto: {str(e)}",
+                "url": url
+            }
+        finally:
+            self._contar("em_andamento", -1)
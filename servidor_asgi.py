@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Modo ASGI dos servidores, com extração assíncrona.
+
+Os aplicativos Flask rodam em workers síncronos: cada worker atende uma
+requisição por vez e passa quase todo o tempo esperando o site da loja.
+Aqui, as rotas que extraem produtos (/produto, /webhook e, no aplicativo do
+ChatGPT, /chatgpt_produto) são corrotinas que usam
+`ProdutoScraperAssincrono`, e um único processo mantém centenas de
+extrações em andamento. As respostas JSON são as mesmas das rotas Flask. As
+demais rotas (consultas ao banco, exportação, fila, etc.) são atendidas
+pelo próprio aplicativo Flask, montado como WSGI.
+
+Uso:
+    uvicorn servidor_asgi:app [--workers N]           (rotas de webhook_handler.py)
+    uvicorn servidor_asgi:app_chatgpt [--workers N]   (rotas de webhook_handler_chatgpt.py)
+"""
+
+import os
+import sys
+import json
+import asyncio
+import importlib
+import contextlib
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route, Mount
+from scraper_assincrono import ProdutoScraperAssincrono
+from cache_produtos import CacheProdutosAssincrono
+from banco_dados import (
+    get_produto_from_db, save_produto_to_db, get_validadores_from_db, confirmar_produto_no_db, LockExtracao
+)
+
+# Aplicativos ASGI exportados e o módulo Flask de cada um
+MODULOS = {
+    'app': 'webhook_handler',
+    'app_chatgpt': 'webhook_handler_chatgpt',
+}
+
+# Threads que atendem as rotas repassadas ao aplicativo Flask
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+_aplicativos = {}
+
+
+def _json(corpo, status=200):
+    return Response(json.dumps(corpo, ensure_ascii=False), status_code=status, media_type='application/json')
+
+
+def criar_app(nome_modulo='webhook_handler'):
+    """
+    Aplicativo ASGI com as rotas do módulo Flask `nome_modulo`: as de
+    extração são assíncronas e as demais são repassadas ao aplicativo Flask.
+    """
+    modulo = importlib.import_module(nome_modulo)
+    chatgpt = hasattr(modulo, 'formatar_para_chatgpt')
+
+    scraper = ProdutoScraperAssincrono()
+    # Mesma política de validade e coalescência do aplicativo Flask, com a extração assíncrona
+    cache = CacheProdutosAssincrono(
+        get_produto_from_db, save_produto_to_db, scraper.extrair_info_ciainfor_async,
+        lock_distribuido=LockExtracao(),
+        buscar_validadores=get_validadores_from_db, confirmar=confirmar_produto_no_db,
+        registrar_acesso=modulo.acessos.registrar
+    )
+
+    async def health_check(request):
+        """Endpoint para verificar se o serviço está online"""
+        return _json({"status": "online"})
+
+    async def metricas(request):
+        """Métricas do aplicativo Flask, com as do scraper e do cache assíncronos"""
+        def metricas_flask():
+            with modulo.app.app_context():
+                return modulo.metricas().get_json()
+
+        corpo = await asyncio.to_thread(metricas_flask)
+        corpo.update({
+            "conexoes_http": scraper.estatisticas_conexoes(),
+            "downloads": scraper.estatisticas_download(),
+            "cache": cache.estatisticas(),
+            "coalescencia": cache.extracao.estatisticas(),
+        })
+        return _json(corpo)
+
+    async def get_produto(request):
+        """Endpoint para extrair informações de um produto a partir da URL"""
+        url = request.query_params.get('url')
+        if not url:
+            return _json({"status": "erro", "mensagem": "URL não fornecida"}, 400)
+        force_update = request.query_params.get('force', 'false').lower() == 'true'
+        formato = request.query_params.get('formato', 'completo').lower()
+
+        info_produto, fonte = await cache.obter(url, force_update)
+
+        if chatgpt and formato == 'chatgpt':
+            resposta = modulo.formatar_para_chatgpt(info_produto)
+            resposta["fonte"] = fonte
+        else:
+            resposta = {
+                "status": "sucesso",
+                "resposta": scraper.formatar_resposta(info_produto),
+                "dados_produto": info_produto,
+                "fonte": fonte
+            }
+        return _json(resposta)
+
+    async def chatgpt_produto(request):
+        """Endpoint específico para retornar informações de produto formatadas para o ChatGPT"""
+        url = request.query_params.get('url')
+        if not url:
+            return _json({"status": "erro", "mensagem": "URL não fornecida"}, 400)
+        force_update = request.query_params.get('force', 'false').lower() == 'true'
+
+        info_produto, fonte = await cache.obter(url, force_update)
+
+        resposta = modulo.formatar_para_chatgpt(info_produto)
+        resposta["fonte"] = fonte
+        return _json(resposta)
+
+    async def webhook(request):
+        """Endpoint para processar webhooks do Whaticket"""
+        formato = request.query_params.get('formato', 'chatgpt').lower()
+
+        def resposta_webhook(resultado):
+            return modulo._resposta_webhook(resultado, formato) if chatgpt else modulo._resposta_webhook(resultado)
+
+        try:
+            data = await request.json()
+            mensagem = data.get('message', '')
+
+            url, erro = scraper.identificar_url(mensagem)
+            if erro is not None:
+                resultado = erro
+            elif modulo.entrega.ativa:
+                # Modo assíncrono com callback: a entrega é a mesma do aplicativo Flask
+                campos = {"formato": formato} if chatgpt else {}
+                id_tarefa = modulo.entrega.enfileirar(url, requisicao=data, **campos)
+                if id_tarefa is None:
+                    return _json({"status": "erro", "mensagem": "Fila de mensagens cheia, tente novamente"}, 503)
+                return _json({"status": "aceito", "id": id_tarefa, "url": url}, 202)
+            else:
+                resultado = await cache.atualizar(url, acesso=True)
+
+            return _json(resposta_webhook(resultado))
+        except Exception as e:
+            corpo = {
+                "status": "erro",
+                "mensagem": f"Erro ao processar webhook: {str(e)}"
+            }
+            if chatgpt:
+                corpo["chatgpt_texto"] = f"Não foi possível processar a mensagem. Erro: {str(e)}"
+            return _json(corpo, 500)
+
+    rotas = [
+        Route('/health', health_check),
+        Route('/metricas', metricas),
+        Route('/produto', get_produto),
+        Route('/webhook', webhook, methods=['POST']),
+    ]
+    if chatgpt:
+        rotas.append(Route('/chatgpt_produto', chatgpt_produto))
+    # Demais rotas: aplicativo Flask, executado em um pool de threads próprio
+    rotas.append(Mount('/', app=WSGIMiddleware(modulo.app, workers=WSGI_THREADS)))
+
+    @contextlib.asynccontextmanager
+    async def ciclo_de_vida(app):
+        yield
+        await scraper.fechar()
+
+    aplicativo = Starlette(routes=rotas, lifespan=ciclo_de_vida)
+    aplicativo.state.scraper = scraper
+    aplicativo.state.cache = cache
+    return aplicativo
+
+
+def iniciar_worker():
+    """Tarefas em segundo plano dos aplicativos Flask carregados (ver gunicorn.conf.py)"""
+    for nome_modulo in MODULOS.values():
+        modulo = sys.modules.get(nome_modulo)
+        if modulo is not None:
+            modulo.iniciar_worker()
+
+
+def __getattr__(nome):
+    # Cada aplicativo (e o seu módulo Flask) só é criado quando importado pelo servidor
+    if nome in MODULOS:
+        if nome not in _aplicativos:
+            _aplicativos[nome] = criar_app(MODULOS[nome])
+        return _aplicativos[nome]
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
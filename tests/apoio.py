@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""Páginas de produto e servidor HTTP local usados pelos testes."""
+
+import time
+import hashlib
+import threading
+import http.server
+from collections import Counter
+
+
+def pagina_produto(nome='Produto de Teste', preco='R$ 10,00', codigo='ABC-1', disponibilidade='Disponível',
+                   descricao='Descrição do produto de teste.', especificacoes=('Cor - Preta',), cabeca=''):
+    """HTML de uma página de produto no formato da loja"""
+    itens = ''.join(f'<li>{item}</li>' for item in especificacoes)
+    return (
+        f'<html><head><title>Loja</title>{cabeca}</head><body>'
+        f'<h1>{nome}</h1>'
+        f'<span class="product-price">{preco}</span>'
+        f'<p><strong>Código:</strong> {codigo}</p>'
+        f'<div class="stock">{disponibilidade}</div>'
+        f'<div class="product-description"><p>{descricao}</p></div>'
+        f'<ul>{itens}</ul>'
+        f'</body></html>'
+    )
+
+
+class ServidorPaginas:
+    """
+    Servidor HTTP/1.1 local que serve `paginas` ({caminho: str ou bytes}),
+    com ETag e respostas 304 (se `etag`). Conta as requisições por caminho em
+    `acessos` e guarda os cabeçalhos recebidos em `requisicoes`; `status`
+    ({caminho: código}), `falhas` ({caminho: quantas das primeiras respostas
+    são 503}) e `atrasos` ({caminho: segundos}) alteram as respostas.
+    Também recebe POSTs (como um receptor de callbacks), guardando
+    (caminho, corpo) em `recebidos`.
+    """
+
+    def __init__(self, etag=True):
+        self.etag = etag
+        self.paginas = {}
+        self.status = {}
+        self.falhas = {}
+        self.atrasos = {}
+        self.acessos = Counter()
+        self.requisicoes = []
+        self.recebidos = []
+        self._servidor = None
+
+    def url(self, caminho):
+        return f"http://127.0.0.1:{self._servidor.server_address[1]}{caminho}"
+
+    def _handler(self):
+        servidor = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                servidor.acessos[self.path] += 1
+                servidor.requisicoes.append((self.path, dict(self.headers)))
+                if self.path in servidor.atrasos:
+                    time.sleep(servidor.atrasos[self.path])
+                corpo = servidor.paginas.get(self.path)
+                status = servidor.status.get(self.path, 200 if corpo is not None else 404)
+                if servidor.acessos[self.path] <= servidor.falhas.get(self.path, 0):
+                    status = 503
+                if isinstance(corpo, str):
+                    corpo = corpo.encode('utf-8')
+                corpo = corpo or b''
+                valor_etag = '"' + hashlib.md5(corpo).hexdigest() + '"' if servidor.etag else None
+                if status == 200 and valor_etag and self.headers.get('If-None-Match') == valor_etag:
+                    status, corpo = 304, b''
+                self.send_response(status)
+                if valor_etag:
+                    self.send_header('ETag', valor_etag)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                try:
+                    self.wfile.write(corpo)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_POST(self):
+                servidor.acessos[self.path] += 1
+                corpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status = servidor.status.get(self.path, 200)
+                if servidor.acessos[self.path] <= servidor.falhas.get(self.path, 0):
+                    status = 503
+                if status < 300:
+                    servidor.recebidos.append((self.path, corpo))
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._servidor = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Antes de importar os módulos do projeto: banco descartável e nada iniciado na importação dos servidores
+os.environ['PRODUTOS_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='produtos-testes-'), 'produtos.db')
+os.environ['SERVIDOR_INICIAR_NA_IMPORTACAO'] = 'false'
+
+import pytest
+import banco_dados
+from apoio import ServidorPaginas
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Banco novo e inicializado, com o cache em memória vazio"""
+    monkeypatch.setattr(banco_dados, 'DB_PATH', str(tmp_path / 'produtos.db'))
+    banco_dados.cache_memoria.invalidar()
+    banco_dados.init_db()
+    yield banco_dados
+    banco_dados.fechar_conexao()
+    banco_dados.cache_memoria.invalidar()
+
+
+@pytest.fixture
+def servidor():
+    """Servidor HTTP local com as páginas de `servidor.paginas`"""
+    with ServidorPaginas() as servidor:
+        yield servidor
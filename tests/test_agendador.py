@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import time
+
+from agendador import AgendadorAtualizacoes, ContadorAcessos
+
+
+def _salvar(banco, url, horas_atras):
+    banco.save_produto_to_db({"url": url, "nome": url, "preco": "R$ 10,00", "especificacoes": []})
+    with banco.transacao() as conn:
+        conn.execute(
+            "UPDATE produtos SET data_atualizacao = datetime('now', ?) WHERE url = ?", (f'-{horas_atras} hours', url)
+        )
+
+
+def test_candidatos_filtrados_pela_idade_minima(banco):
+    _salvar(banco, 'https://loja/novo', 0)
+    _salvar(banco, 'https://loja/velho', 5)
+    candidatos = banco.get_produtos_para_atualizar(10, 3600)
+    assert [url for url, _ in candidatos] == ['https://loja/velho']
+    assert abs(candidatos[0][1] - 5 * 3600) < 60
+    assert {url for url, _ in banco.get_produtos_para_atualizar(10, 0)} == {'https://loja/novo', 'https://loja/velho'}
+
+
+def test_candidatos_usam_o_indice_de_data_atualizacao(banco):
+    plano = banco.conexao().execute('''
+    EXPLAIN QUERY PLAN SELECT url FROM produtos WHERE data_atualizacao <= ?
+    ''', ('2000-01-01 00:00:00',)).fetchall()
+    assert 'idx_produtos_data_atualizacao' in ' '.join(linha[-1] for linha in plano)
+
+
+def test_candidatos_ordenados_por_idade_e_popularidade(banco):
+    _salvar(banco, 'https://loja/velho', 10)
+    _salvar(banco, 'https://loja/popular', 4)
+    _salvar(banco, 'https://loja/medio', 6)
+    banco.registrar_acessos_no_db({'https://loja/popular': 5})
+    # popular: 4h x (1 + 5) = 24h; velho: 10h; medio: 6h
+    candidatos = banco.get_produtos_para_atualizar(2, 3600)
+    assert [url for url, _ in candidatos] == ['https://loja/popular', 'https://loja/velho']
+
+
+def test_rodada_atualiza_na_ordem_e_suspende_as_falhas():
+    atualizados = []
+
+    def atualizar(url):
+        atualizados.append(url)
+        return {"erro": "falhou"} if url == 'b' else {"url": url}
+
+    agendador = AgendadorAtualizacoes(
+        atualizar, lambda limite, idade: [('a', 3), ('b', 2), ('c', 1)][:limite], requisicoes_por_minuto=0
+    )
+    assert agendador.rodada() == 3
+    assert atualizados == ['a', 'b', 'c']
+    assert agendador.rodada() == 2
+    assert atualizados[3:] == ['a', 'c']
+    estatisticas = agendador.estatisticas()
+    assert (estatisticas["atualizados"], estatisticas["falhas"], estatisticas["suspensos_por_falha"]) == (4, 1, 1)
+
+
+def test_um_unico_lider_entre_agendadores(banco):
+    atualizados = []
+    candidatos = lambda limite, idade: [('a', 1)]
+    primeiro = AgendadorAtualizacoes(atualizados.append, candidatos, requisicoes_por_minuto=0,
+                                     lideranca=banco.Lideranca('agendador'))
+    segundo = AgendadorAtualizacoes(atualizados.append, candidatos, requisicoes_por_minuto=0,
+                                    lideranca=banco.Lideranca('agendador'))
+    assert primeiro.rodada() == 1
+    assert segundo.rodada() == 0
+    assert atualizados == ['a']
+    assert (primeiro.estatisticas()["lider"], segundo.estatisticas()["lider"]) == (True, False)
+    assert segundo.estatisticas()["sem_lideranca"] == 1
+    assert banco.Lideranca('agendador').lider() == f"{os.getpid()}-{id(primeiro)}"
+
+
+def test_lideranca_expirada_e_assumida_por_outro(banco):
+    assert banco.Lideranca('agendador', duracao=-1).adquirir('worker-1')
+    lideranca = banco.Lideranca('agendador')
+    assert lideranca.adquirir('worker-2')
+    assert not lideranca.adquirir('worker-1')
+    assert lideranca.lider() == 'worker-2'
+
+
+def test_lideranca_liberada_ao_encerrar(banco):
+    agendador = AgendadorAtualizacoes(lambda url: {}, lambda limite, idade: [], requisicoes_por_minuto=0,
+                                      intervalo=60, lideranca=banco.Lideranca('agendador'))
+    thread = threading.Thread(target=agendador.executar)
+    thread.start()
+    while not agendador.estatisticas()["rodadas"]:
+        time.sleep(0.01)
+    agendador.parar()
+    thread.join(5)
+    assert banco.Lideranca('agendador').lider() is None
+
+
+def test_contador_grava_em_lote_apos_o_intervalo():
+    gravados = []
+    contador = ContadorAcessos(gravados.append, intervalo_gravacao=3600)
+    contador.registrar('a')
+    contador.registrar('a')
+    contador.registrar('b', 3)
+    assert gravados == []
+    contador.descarregar()
+    assert gravados == [{'a': 2, 'b': 3}]
+    assert contador.estatisticas() == {"registrados": 5, "gravacoes": 1, "pendentes": 0}
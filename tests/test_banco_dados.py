@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+
+def _produto(indice, **campos):
+    produto = {
+        "url": f"https://www.ciainfor.com.br/produto-{indice}",
+        "nome": f"Produto {indice}",
+        "preco": "R$ 10,00",
+        "codigo": f"P-{indice}",
+        "disponibilidade": "Disponível",
+        "descricao": "Descrição",
+        "especificacoes": ["Cor - Preta", "Peso: 1 kg"],
+    }
+    produto.update(campos)
+    return produto
+
+
+def test_banco_em_wal_com_busy_timeout(banco):
+    conn = banco.conexao()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == banco.BUSY_TIMEOUT_MS
+
+
+def test_conexao_reaproveitada_por_thread(banco):
+    assert banco.conexao() is banco.conexao()
+    outras = []
+    thread = threading.Thread(target=lambda: (outras.append(banco.conexao()), banco.fechar_conexao()))
+    thread.start()
+    thread.join()
+    assert outras[0] is not banco.conexao()
+
+
+def test_nova_conexao_quando_o_caminho_muda(banco, tmp_path, monkeypatch):
+    anterior = banco.conexao()
+    monkeypatch.setattr(banco, 'DB_PATH', str(tmp_path / 'outro.db'))
+    assert banco.conexao() is not anterior
+
+
+def test_salvar_e_buscar_produto(banco):
+    assert banco.save_produto_to_db(_produto(1))
+    produto = banco.get_produto_from_db(_produto(1)["url"])
+    assert produto["nome"] == 'Produto 1'
+    assert produto["especificacoes"] == ["Cor - Preta", "Peso: 1 kg"]
+    assert produto["data_atualizacao"]
+    assert banco.get_produto_from_db('https://www.ciainfor.com.br/inexistente') is None
+
+
+def test_produto_sem_url_nao_e_salvo(banco):
+    assert banco.save_produto_to_db({"nome": "Sem URL"}) is False
+    assert banco.save_produtos_to_db([None, {"nome": "Sem URL"}]) == 0
+
+
+def test_buscar_varios_produtos_em_blocos(banco):
+    total = banco.TAMANHO_BLOCO_CONSULTA * 2 + 7
+    assert banco.save_produtos_to_db([_produto(i) for i in range(total)]) == total
+    urls = [_produto(i)["url"] for i in range(total)] + ['https://www.ciainfor.com.br/inexistente']
+    produtos = banco.get_produtos_from_db(urls)
+    assert len(produtos) == total
+    assert produtos[_produto(150)["url"]]["codigo"] == 'P-150'
+
+
+def test_transacao_desfeita_em_erro(banco):
+    with pytest.raises(RuntimeError):
+        with banco.transacao() as conn:
+            conn.execute(banco.SQL_SALVAR, banco._parametros_produto(_produto(1)))
+            raise RuntimeError()
+    assert banco.get_produto_from_db(_produto(1)["url"]) is None
+
+
+def test_escritas_simultaneas_sem_database_is_locked(banco):
+    erros = []
+
+    def escrever(indice_thread):
+        try:
+            for i in range(30):
+                banco.save_produto_to_db(_produto(indice_thread * 100 + i))
+        except Exception as e:
+            erros.append(e)
+        finally:
+            banco.fechar_conexao()
+
+    threads = [threading.Thread(target=escrever, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert erros == []
+    assert banco.contar_produtos_no_db() == 180
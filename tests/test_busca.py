@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import webhook_handler
+
+
+@pytest.fixture
+def produtos(banco):
+    banco.save_produtos_to_db([
+        {"url": "https://loja/cabo-vga", "nome": "Cabo VGA 1,8m", "codigo": "CB-VGA", "preco": "R$ 19,90",
+         "descricao": "Cabo para monitor.", "especificacoes": ["Cor - Preta"]},
+        {"url": "https://loja/adaptador", "nome": "Adaptador HDMI", "codigo": "AD-1", "preco": "R$ 29,90",
+         "descricao": "Converte HDMI para cabo VGA.", "especificacoes": ["Conexão: VGA"]},
+        {"url": "https://loja/teclado", "nome": "Teclado Sem Fio", "codigo": "TC-2", "preco": "R$ 99,90",
+         "descricao": "Teclado com pilhas.", "especificacoes": ["Alimentação - Pilhas"]},
+    ])
+    return banco
+
+
+def _urls(resultados):
+    return [resultado["url"] for resultado in resultados]
+
+
+def test_busca_por_prefixo_sem_acentos_e_por_relevancia(produtos):
+    resultados = produtos.buscar_produtos_no_db('cab vga')
+    # O nome pesa mais que a descrição
+    assert _urls(resultados) == ['https://loja/cabo-vga', 'https://loja/adaptador']
+    assert '*Cabo*' in resultados[0]["trecho"]
+    assert _urls(produtos.buscar_produtos_no_db('alimentacao')) == ['https://loja/teclado']
+    assert produtos.buscar_produtos_no_db('"cabo') == produtos.buscar_produtos_no_db('cabo')
+
+
+def test_indice_acompanha_atualizacoes_e_remocoes(produtos):
+    produtos.save_produto_to_db({"url": "https://loja/teclado", "nome": "Teclado Mecânico", "especificacoes": []})
+    assert _urls(produtos.buscar_produtos_no_db('mecanico')) == ['https://loja/teclado']
+    assert produtos.buscar_produtos_no_db('pilhas') == []
+    produtos.delete_produtos_from_db("https://loja/teclado")
+    assert produtos.buscar_produtos_no_db('teclado') == []
+
+
+def test_indice_nao_reescrito_quando_o_texto_nao_muda(produtos):
+    conn = produtos.conexao()
+    antes = conn.total_changes
+    # Só o preço muda: a linha do produto e a do histórico, sem reindexar a busca
+    produtos.save_produto_to_db({"url": "https://loja/cabo-vga", "nome": "Cabo VGA 1,8m", "codigo": "CB-VGA",
+                                 "preco": "R$ 21,90", "descricao": "Cabo para monitor.",
+                                 "especificacoes": ["Cor - Preta"]})
+    assert conn.total_changes - antes == 2
+
+
+def test_gatilho_antigo_recriado_com_when(produtos):
+    conn = produtos.conexao()
+    conn.execute('DROP TRIGGER trg_produtos_busca_atualizacao')
+    conn.execute('''
+    CREATE TRIGGER trg_produtos_busca_atualizacao AFTER UPDATE OF nome ON produtos
+    BEGIN SELECT 1; END
+    ''')
+    conn.commit()
+    produtos.init_db()
+    sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'trg_produtos_busca_atualizacao'"
+    ).fetchone()[0]
+    assert 'WHEN OLD.nome IS NOT NEW.nome' in sql
+
+
+def test_consulta_invalida_e_busca_indisponivel(produtos, monkeypatch):
+    cliente = webhook_handler.app.test_client()
+    assert cliente.get('/produtos/busca?q=!!!').status_code == 400
+
+    # Sintaxe do FTS5 inválida (aspas sem fechar) chegando ao MATCH
+    with monkeypatch.context() as contexto:
+        contexto.setattr(produtos, '_consulta_fts', lambda texto: '"cabo')
+        resposta = cliente.get('/produtos/busca?q=cabo')
+    assert resposta.status_code == 400
+    assert 'Consulta inválida' in resposta.get_json()["mensagem"]
+
+    # SQLite sem FTS5: a tabela de busca não existe
+    conn = produtos.conexao()
+    conn.execute('DROP TABLE produtos_busca')
+    conn.commit()
+    resposta = cliente.get('/produtos/busca?q=cabo')
+    assert resposta.status_code == 503
+    assert 'indisponível' in resposta.get_json()["mensagem"]
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import datetime
+
+import pytest
+
+from cache_produtos import (
+    CacheProdutos, CacheProdutosAssincrono,
+    FONTE_CACHE, FONTE_CACHE_DESATUALIZADO, FONTE_CACHE_EXPIRADO, FONTE_WEB, FONTE_WEB_EXPIRADO,
+)
+from coalescencia import ExtracaoCoalescidaAssincrona
+
+URL = 'https://www.ciainfor.com.br/produto'
+
+
+def _data(segundos_atras):
+    instante = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=segundos_atras)
+    return instante.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class BancoFalsoAssincrono:
+    """Banco em memória com extração assíncrona, contando as extrações e confirmações"""
+
+    def __init__(self, falhar=False, nao_modificado=False):
+        self.produtos = {}
+        self.extracoes = []
+        self.confirmacoes = []
+        self.falhar = falhar
+        self.nao_modificado = nao_modificado
+
+    def buscar(self, url):
+        return self.produtos.get(url)
+
+    def salvar(self, produto):
+        self.produtos[produto["url"]] = dict(produto, data_atualizacao=_data(0))
+
+    def buscar_validadores(self, url):
+        return {"etag": '"v1"'} if url in self.produtos else None
+
+    def confirmar(self, url):
+        self.confirmacoes.append(url)
+        produto = self.produtos.get(url)
+        if produto is not None:
+            produto["data_atualizacao"] = _data(0)
+        return produto
+
+    async def extrair(self, url, validadores=None):
+        self.extracoes.append((url, validadores))
+        await asyncio.sleep(0.01)
+        if self.falhar:
+            return {"erro": "site fora do ar", "url": url}
+        if validadores and self.nao_modificado:
+            return {"nao_modificado": True, "url": url}
+        return {"url": url, "nome": f"Extraído {len(self.extracoes)}", "validadores": {"etag": '"v2"'}}
+
+
+def _cache(banco_falso, **kwargs):
+    return CacheProdutosAssincrono(banco_falso.buscar, banco_falso.salvar, banco_falso.extrair,
+                                   ttl_fresco=60, ttl_maximo=600, **kwargs)
+
+
+def _no_banco(banco_falso, segundos_atras):
+    banco_falso.produtos[URL] = {"url": URL, "nome": "Do banco", "data_atualizacao": _data(segundos_atras)}
+
+
+def test_sem_executor_de_threads_e_com_coalescencia_assincrona():
+    cache = _cache(BancoFalsoAssincrono())
+    assert cache._executor is None
+    assert isinstance(cache.extracao, ExtracaoCoalescidaAssincrona)
+
+
+def test_fabricas_substituiveis():
+    class CacheSemExecutor(CacheProdutos):
+        def _criar_executor(self, max_threads):
+            return 'executor'
+
+    banco_falso = BancoFalsoAssincrono()
+    assert CacheSemExecutor(banco_falso.buscar, banco_falso.salvar, banco_falso.extrair)._executor == 'executor'
+
+
+@pytest.mark.parametrize('segundos_atras, fonte, extracoes', [
+    (None, FONTE_WEB, 1),
+    (10, FONTE_CACHE, 0),
+    (3600, FONTE_WEB_EXPIRADO, 1),
+])
+def test_politica_de_validade(segundos_atras, fonte, extracoes):
+    banco_falso = BancoFalsoAssincrono()
+    if segundos_atras is not None:
+        _no_banco(banco_falso, segundos_atras)
+    produto, fonte_obtida = asyncio.run(_cache(banco_falso).obter(URL))
+    assert fonte_obtida == fonte
+    assert len(banco_falso.extracoes) == extracoes
+    assert "validadores" not in produto
+
+
+def test_desatualizado_servido_e_atualizado_no_event_loop():
+    banco_falso = BancoFalsoAssincrono()
+    _no_banco(banco_falso, 120)
+    cache = _cache(banco_falso)
+
+    async def cenario():
+        resposta = await cache.obter(URL)
+        # A segunda consulta não agenda outra atualização da mesma URL
+        await cache.obter(URL)
+        await asyncio.gather(*cache._tarefas)
+        return resposta
+
+    produto, fonte = asyncio.run(cenario())
+    assert (produto["nome"], fonte) == ("Do banco", FONTE_CACHE_DESATUALIZADO)
+    assert len(banco_falso.extracoes) == 1
+    assert banco_falso.produtos[URL]["nome"] == "Extraído 1"
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["atualizacoes_segundo_plano"], estatisticas["em_atualizacao"]) == (1, 0)
+
+
+def test_expirado_servido_se_a_extracao_falhar():
+    banco_falso = BancoFalsoAssincrono(falhar=True)
+    _no_banco(banco_falso, 3600)
+    produto, fonte = asyncio.run(_cache(banco_falso).obter(URL))
+    assert (produto["nome"], fonte) == ("Do banco", FONTE_CACHE_EXPIRADO)
+
+
+def test_extracoes_simultaneas_coalescidas():
+    banco_falso = BancoFalsoAssincrono()
+    cache = _cache(banco_falso)
+
+    async def cenario():
+        return await asyncio.gather(*(cache.obter(URL) for _ in range(5)))
+
+    respostas = asyncio.run(cenario())
+    assert len(banco_falso.extracoes) == 1
+    assert {produto["nome"] for produto, _ in respostas} == {"Extraído 1"}
+
+
+def test_revalidacao_confirma_o_produto_nao_modificado():
+    banco_falso = BancoFalsoAssincrono(nao_modificado=True)
+    _no_banco(banco_falso, 3600)
+    cache = _cache(banco_falso, buscar_validadores=banco_falso.buscar_validadores, confirmar=banco_falso.confirmar)
+    produto, fonte = asyncio.run(cache.obter(URL))
+    assert (produto["nome"], fonte) == ("Do banco", FONTE_WEB_EXPIRADO)
+    assert banco_falso.extracoes == [(URL, {"etag": '"v1"'})]
+    assert banco_falso.confirmacoes == [URL]
+    assert cache.estatisticas()["nao_modificados"] == 1
+
+
+def test_produto_removido_durante_a_revalidacao_e_extraido_de_novo():
+    banco_falso = BancoFalsoAssincrono(nao_modificado=True)
+    _no_banco(banco_falso, 3600)
+
+    def confirmar(url):
+        banco_falso.produtos.pop(url)
+        return None
+
+    cache = _cache(banco_falso, buscar_validadores=banco_falso.buscar_validadores, confirmar=confirmar)
+    produto, _ = asyncio.run(cache.obter(URL))
+    assert banco_falso.extracoes == [(URL, {"etag": '"v1"'}), (URL, None)]
+    assert produto["nome"] == "Extraído 2"
+    assert banco_falso.produtos[URL]["nome"] == "Extraído 2"
+
+
+def test_rotas_do_flask_atendidas_pelo_aplicativo_asgi(banco):
+    import httpx
+    import servidor_asgi
+
+    banco.save_produto_to_db({"url": URL, "nome": "Do banco"})
+    aplicativo = servidor_asgi.criar_app('webhook_handler')
+
+    async def cenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=aplicativo), base_url='http://asgi') as cliente:
+            return await cliente.get('/produtos?limit=5'), await cliente.get('/health')
+
+    produtos, saude = asyncio.run(cenario())
+    assert produtos.status_code == 200
+    assert [produto["nome"] for produto in produtos.json()["produtos"]] == ["Do banco"]
+    assert saude.json() == {"status": "online"}
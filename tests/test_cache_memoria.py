@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import cache_memoria
+from cache_memoria import CacheLRU
+
+
+def test_descarta_o_menos_usado_ao_exceder_os_itens():
+    cache = CacheLRU(max_itens=2, max_bytes=10 ** 9, ttl=60)
+    cache.guardar('a', {"nome": "A"})
+    cache.guardar('b', {"nome": "B"})
+    assert cache.obter('a') == {"nome": "A"}
+    cache.guardar('c', {"nome": "C"})
+    assert cache.obter('b') is None
+    assert cache.obter('a') is not None and cache.obter('c') is not None
+    assert cache.estatisticas()["descartes"] == 1
+
+
+def test_respeita_o_limite_de_bytes():
+    grande = {"descricao": "x" * 5000}
+    limite = cache_memoria.tamanho_aproximado(grande) * 2
+    cache = CacheLRU(max_itens=100, max_bytes=limite, ttl=60)
+    for chave in 'abc':
+        cache.guardar(chave, grande)
+    estatisticas = cache.estatisticas()
+    assert estatisticas["itens"] == 2
+    assert estatisticas["bytes"] <= limite
+    # Itens maiores que o cache inteiro não são guardados
+    cache.guardar('enorme', {"descricao": "x" * limite})
+    assert cache.obter('enorme') is None
+
+
+def test_itens_expiram_pelo_ttl(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cache_memoria.time, 'monotonic', lambda: agora[0])
+    cache = CacheLRU(max_itens=10, max_bytes=10 ** 9, ttl=5)
+    cache.guardar('a', {"nome": "A"})
+    agora[0] += 4
+    assert cache.obter('a') is not None
+    agora[0] += 2
+    assert cache.obter('a') is None
+    assert cache.estatisticas()["expirados"] == 1
+
+
+def test_valor_lido_antes_de_uma_invalidacao_nao_e_guardado():
+    cache = CacheLRU(max_itens=10, max_bytes=10 ** 9, ttl=60)
+    geracao = cache.geracao()
+    cache.invalidar('a')
+    cache.guardar('a', {"nome": "antigo"}, geracao)
+    assert cache.obter('a') is None
+
+
+def test_escrita_no_banco_invalida_o_cache(banco):
+    url = 'https://www.ciainfor.com.br/produto'
+    banco.save_produto_to_db({"url": url, "nome": "Primeiro"})
+    assert banco.get_produto_from_db(url)["nome"] == 'Primeiro'
+    assert banco.cache_memoria.obter(url) is not None
+
+    banco.save_produto_to_db({"url": url, "nome": "Segundo"})
+    assert banco.get_produto_from_db(url)["nome"] == 'Segundo'
+
+    banco.delete_produtos_from_db(url)
+    assert banco.get_produto_from_db(url) is None
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+
+import pytest
+
+from cache_produtos import (
+    CacheProdutos, FRESCO, DESATUALIZADO, EXPIRADO,
+    FONTE_CACHE, FONTE_CACHE_DESATUALIZADO, FONTE_CACHE_EXPIRADO, FONTE_WEB, FONTE_WEB_EXPIRADO,
+)
+
+URL = 'https://www.ciainfor.com.br/produto'
+
+
+def _data(segundos_atras):
+    """data_atualizacao no formato do SQLite (UTC)"""
+    instante = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=segundos_atras)
+    return instante.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class BancoFalso:
+    """Banco e extração em memória, contando as extrações"""
+
+    def __init__(self, falhar=False):
+        self.produtos = {}
+        self.extracoes = []
+        self.falhar = falhar
+
+    def buscar(self, url):
+        return self.produtos.get(url)
+
+    def salvar(self, produto):
+        self.produtos[produto["url"]] = dict(produto, data_atualizacao=_data(0))
+
+    def extrair(self, url, validadores=None):
+        self.extracoes.append((url, validadores))
+        if self.falhar:
+            return {"erro": "site fora do ar", "url": url}
+        return {"url": url, "nome": f"Extraído {len(self.extracoes)}"}
+
+
+@pytest.fixture
+def banco_falso():
+    return BancoFalso()
+
+
+def _cache(banco_falso, **kwargs):
+    return CacheProdutos(banco_falso.buscar, banco_falso.salvar, banco_falso.extrair,
+                         ttl_fresco=60, ttl_maximo=600, **kwargs)
+
+
+def test_classificacao_pela_idade(banco_falso):
+    cache = _cache(banco_falso)
+    assert cache.classificar({"data_atualizacao": _data(10)}) == FRESCO
+    assert cache.classificar({"data_atualizacao": _data(120)}) == DESATUALIZADO
+    assert cache.classificar({"data_atualizacao": _data(3600)}) == EXPIRADO
+    assert cache.classificar({"data_atualizacao": None}) == EXPIRADO
+    assert cache.classificar({"data_atualizacao": "não é data"}) == EXPIRADO
+
+
+def test_ttl_maximo_nunca_menor_que_o_fresco(banco_falso):
+    cache = CacheProdutos(banco_falso.buscar, banco_falso.salvar, banco_falso.extrair, ttl_fresco=100, ttl_maximo=10)
+    assert cache.ttl_maximo == 100
+
+
+def test_produto_ausente_e_extraido_e_salvo(banco_falso):
+    cache = _cache(banco_falso)
+    produto, fonte = cache.obter(URL)
+    assert fonte == FONTE_WEB
+    assert produto["nome"] == 'Extraído 1'
+    assert URL in banco_falso.produtos
+
+
+def test_produto_fresco_vem_do_banco(banco_falso):
+    banco_falso.produtos[URL] = {"url": URL, "nome": "Do banco", "data_atualizacao": _data(10)}
+    cache = _cache(banco_falso)
+    produto, fonte = cache.obter(URL)
+    assert (produto["nome"], fonte) == ("Do banco", FONTE_CACHE)
+    assert banco_falso.extracoes == []
+
+
+def test_produto_desatualizado_e_servido_e_atualizado_em_segundo_plano(banco_falso):
+    banco_falso.produtos[URL] = {"url": URL, "nome": "Do banco", "data_atualizacao": _data(120)}
+    cache = _cache(banco_falso)
+    produto, fonte = cache.obter(URL)
+    assert (produto["nome"], fonte) == ("Do banco", FONTE_CACHE_DESATUALIZADO)
+
+    cache._executor.shutdown(wait=True)
+    assert len(banco_falso.extracoes) == 1
+    assert banco_falso.produtos[URL]["nome"] == 'Extraído 1'
+    assert cache.estatisticas()["atualizacoes_segundo_plano"] == 1
+    assert cache.estatisticas()["em_atualizacao"] == 0
+
+
+def test_atualizacao_em_segundo_plano_ignora_url_ja_agendada(banco_falso):
+    cache = _cache(banco_falso)
+    cache._em_atualizacao.add(URL)
+    assert cache.atualizar_em_segundo_plano(URL) is False
+    assert banco_falso.extracoes == []
+
+
+def test_produto_expirado_e_extraido_antes_de_responder(banco_falso):
+    banco_falso.produtos[URL] = {"url": URL, "nome": "Do banco", "data_atualizacao": _data(3600)}
+    cache = _cache(banco_falso)
+    produto, fonte = cache.obter(URL)
+    assert (produto["nome"], fonte) == ('Extraído 1', FONTE_WEB_EXPIRADO)
+
+
+def test_produto_expirado_e_servido_se_a_extracao_falhar():
+    banco_falso = BancoFalso(falhar=True)
+    banco_falso.produtos[URL] = {"url": URL, "nome": "Do banco", "data_atualizacao": _data(3600)}
+    cache = _cache(banco_falso)
+    produto, fonte = cache.obter(URL)
+    assert (produto["nome"], fonte) == ("Do banco", FONTE_CACHE_EXPIRADO)
+
+
+def test_force_ignora_o_banco(banco_falso):
+    banco_falso.produtos[URL] = {"url": URL, "nome": "Do banco", "data_atualizacao": _data(10)}
+    cache = _cache(banco_falso)
+    produto, fonte = cache.obter(URL, force=True)
+    assert (produto["nome"], fonte) == ('Extraído 1', FONTE_WEB)
+
+
+def test_estatisticas_por_fonte(banco_falso):
+    banco_falso.produtos[URL] = {"url": URL, "nome": "Do banco", "data_atualizacao": _data(10)}
+    cache = _cache(banco_falso)
+    cache.obter(URL)
+    cache.obter(URL)
+    cache.obter(URL + '-2')
+    estatisticas = cache.estatisticas()
+    assert estatisticas[FONTE_CACHE] == 2
+    assert estatisticas[FONTE_WEB] == 1
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+from apoio import pagina_produto
+from produto_scraper import ProdutoScraper
+
+
+def test_requisicoes_reaproveitam_a_conexao_do_pool(servidor):
+    servidor.paginas['/produto'] = pagina_produto()
+    scraper = ProdutoScraper()
+    for _ in range(5):
+        assert scraper.extrair_info_ciainfor(servidor.url('/produto'))["nome"] == 'Produto de Teste'
+    estatisticas = scraper.estatisticas_conexoes()
+    assert estatisticas["requisicoes"] == 5
+    assert estatisticas["conexoes_abertas"] == 1
+    assert estatisticas["reutilizadas"] == 4
+
+
+def test_erros_transitorios_sao_repetidos(servidor):
+    servidor.paginas['/produto'] = pagina_produto()
+    servidor.falhas['/produto'] = 2
+    scraper = ProdutoScraper(max_tentativas=3, fator_backoff=0)
+    resultado = scraper.extrair_info_ciainfor(servidor.url('/produto'))
+    assert resultado["nome"] == 'Produto de Teste'
+    assert servidor.acessos['/produto'] == 3
+
+
+def test_erro_definitivo_retorna_dicionario_de_erro(servidor):
+    scraper = ProdutoScraper(max_tentativas=3, fator_backoff=0)
+    resultado = scraper.extrair_info_ciainfor(servidor.url('/inexistente'))
+    assert "erro" in resultado
+    assert resultado["url"] == servidor.url('/inexistente')
+    # 404 não é transitório: uma única requisição
+    assert servidor.acessos['/inexistente'] == 1
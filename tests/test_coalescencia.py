@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+import pytest
+
+from coalescencia import ExtracaoCoalescida
+
+URL = 'https://www.ciainfor.com.br/produto'
+
+
+def _simultaneas(funcao, quantidade):
+    """Executa `funcao()` em `quantidade` threads ao mesmo tempo e retorna os resultados"""
+    barreira = threading.Barrier(quantidade)
+    resultados = [None] * quantidade
+
+    def executar(indice):
+        barreira.wait()
+        try:
+            resultados[indice] = funcao()
+        except Exception as e:
+            resultados[indice] = e
+
+    threads = [threading.Thread(target=executar, args=(i,)) for i in range(quantidade)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def test_chamadas_simultaneas_compartilham_uma_extracao():
+    chamadas = []
+
+    def extrair(url):
+        chamadas.append(url)
+        time.sleep(0.2)
+        return {"url": url, "nome": "Produto"}
+
+    extracao = ExtracaoCoalescida(extrair)
+    resultados = _simultaneas(lambda: extracao.obter(URL), 8)
+    assert chamadas == [URL]
+    assert all(resultado == {"url": URL, "nome": "Produto"} for resultado in resultados)
+    assert extracao.estatisticas()["compartilhadas_threads"] == 7
+    assert extracao.estatisticas()["em_andamento"] == 0
+
+
+def test_excecao_da_extracao_chega_a_todas_as_chamadas():
+    def extrair(url):
+        time.sleep(0.1)
+        raise RuntimeError("falhou")
+
+    extracao = ExtracaoCoalescida(extrair)
+    resultados = _simultaneas(lambda: extracao.obter(URL), 4)
+    assert all(isinstance(resultado, RuntimeError) for resultado in resultados)
+    # A próxima chamada tenta novamente
+    with pytest.raises(RuntimeError):
+        extracao.obter(URL)
+
+
+def test_workers_compartilham_a_extracao_pelo_banco(banco):
+    chamadas = []
+
+    def extrair_e_salvar(url):
+        chamadas.append(url)
+        time.sleep(0.3)
+        banco.save_produto_to_db({"url": url, "nome": "Salvo pelo primeiro worker"})
+        return banco.get_produto_from_db(url)
+
+    # Duas instâncias com o mesmo lock distribuído simulam dois workers
+    primeiro = ExtracaoCoalescida(extrair_e_salvar, banco.LockExtracao(), intervalo_espera=0.02)
+    segundo = ExtracaoCoalescida(extrair_e_salvar, banco.LockExtracao(), intervalo_espera=0.02)
+    resultados = {}
+
+    def executar(nome, extracao):
+        resultados[nome] = extracao.obter(URL)
+        banco.fechar_conexao()
+
+    thread = threading.Thread(target=executar, args=('primeiro', primeiro))
+    thread.start()
+    time.sleep(0.1)
+    executar('segundo', segundo)
+    thread.join()
+
+    assert chamadas == [URL]
+    assert resultados['segundo']["nome"] == 'Salvo pelo primeiro worker'
+    assert segundo.estatisticas()["compartilhadas_workers"] == 1
+
+
+def test_referencia_no_relogio_do_banco(banco, monkeypatch):
+    # O relógio deste worker está adiantado em relação ao do banco
+    tempo = time.time
+    monkeypatch.setattr(time, 'time', lambda: tempo() + 5)
+    lock = banco.LockExtracao()
+    assert lock.adquirir(URL, dono='outro worker')
+
+    def concluir_no_outro_worker():
+        time.sleep(0.1)
+        banco.save_produto_to_db({"url": URL, "nome": "Salvo pelo outro worker"})
+        lock.liberar(URL, dono='outro worker')
+        banco.fechar_conexao()
+
+    def extrair(url):
+        raise AssertionError("resultado do outro worker descartado")
+
+    thread = threading.Thread(target=concluir_no_outro_worker)
+    thread.start()
+    resultado = ExtracaoCoalescida(extrair, lock, intervalo_espera=0.02).obter(URL)
+    thread.join()
+    assert resultado["nome"] == 'Salvo pelo outro worker'
+
+
+def test_lock_de_extracao_entre_donos(banco):
+    lock = banco.LockExtracao()
+    assert lock.adquirir(URL, dono='a')
+    assert not lock.adquirir(URL, dono='b')
+    assert lock.ativo(URL)
+    lock.liberar(URL, dono='b')
+    assert lock.ativo(URL)
+    lock.liberar(URL, dono='a')
+    assert not lock.ativo(URL)
+
+
+def test_lock_expirado_pode_ser_assumido(banco):
+    assert banco.LockExtracao(duracao=-1).adquirir(URL, dono='a')
+    assert banco.LockExtracao().adquirir(URL, dono='b')
+
+
+def test_resultado_salvo_antes_da_espera_nao_e_aceito(banco):
+    banco.save_produto_to_db({"url": URL, "nome": "Antigo"})
+    time.sleep(0.01)
+    # Mesmo segundo da gravação: a comparação é pelo instante exato
+    lock = banco.LockExtracao()
+    desde = lock.agora()
+    assert lock.buscar_resultado(URL, desde) is None
+
+    time.sleep(0.01)
+    banco.save_produto_to_db({"url": URL, "nome": "Novo"})
+    assert lock.buscar_resultado(URL, desde)["nome"] == 'Novo'
+
+
+def test_confirmacao_conta_como_resultado(banco):
+    banco.save_produto_to_db({"url": URL, "nome": "Produto"})
+    time.sleep(0.01)
+    desde = banco.LockExtracao().agora()
+    time.sleep(0.01)
+    banco.confirmar_produto_no_db(URL)
+    assert banco.LockExtracao().buscar_resultado(URL, desde)["nome"] == 'Produto'
+
+
+def test_espera_sem_resultado_nao_invalida_o_cache(banco):
+    banco.save_produto_to_db({"url": URL, "nome": "Produto"})
+    banco.get_produto_from_db(URL)
+    geracao = banco.cache_memoria.geracao()
+    lock = banco.LockExtracao()
+    for _ in range(5):
+        assert lock.buscar_resultado(URL, time.time() + 60) is None
+    assert banco.cache_memoria.geracao() == geracao
+    assert banco.cache_memoria.obter(URL) is not None
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import webhook_handler
+from dados_estruturados import preco_em_centavos
+
+PRODUTOS = [
+    ('barato', 'R$ 9,90', 'Disponível'),
+    ('medio', 'R$ 150,00', 'Indisponível'),
+    ('caro', 'R$ 1.234,56', 'Disponível'),
+    ('empate', 'R$ 150,00', 'Disponível'),
+    ('sem-preco', 'Preço não disponível', 'Disponível'),
+]
+
+
+@pytest.fixture
+def produtos(banco):
+    banco.save_produtos_to_db([
+        {"url": f"https://loja/{nome}", "nome": nome, "preco": preco, "disponibilidade": disponibilidade,
+         "especificacoes": []}
+        for nome, preco, disponibilidade in PRODUTOS
+    ])
+    return banco
+
+
+def _nomes(resultado):
+    return [produto["nome"] for produto in resultado["produtos"]]
+
+
+@pytest.mark.parametrize('preco, centavos', [
+    ('R$ 9,90', 990), ('R$ 1.234,56', 123456), ('R$ 10', 1000), ('Preço não disponível', None), (None, None),
+])
+def test_preco_em_centavos(preco, centavos):
+    assert preco_em_centavos(preco) == centavos
+
+
+def test_faixa_de_preco_ordenada(produtos):
+    assert _nomes(produtos.consultar_produtos_no_db()) == ['barato', 'empate', 'medio', 'caro']
+    assert _nomes(produtos.consultar_produtos_no_db(1000, 15000)) == ['empate', 'medio']
+    assert _nomes(produtos.consultar_produtos_no_db(decrescente=True)) == ['caro', 'medio', 'empate', 'barato']
+
+
+def test_filtro_de_disponibilidade(produtos):
+    assert _nomes(produtos.consultar_produtos_no_db(disponibilidade='indisponivel')) == ['medio']
+    assert _nomes(produtos.consultar_produtos_no_db(disponibilidade='disponivel', decrescente=True)) == [
+        'caro', 'empate', 'barato'
+    ]
+    with pytest.raises(ValueError):
+        produtos.consultar_produtos_no_db(disponibilidade='talvez')
+
+
+@pytest.mark.parametrize('decrescente', [False, True])
+def test_cursor_da_consulta_com_precos_empatados(produtos, decrescente):
+    nomes, cursor = [], None
+    while True:
+        pagina = produtos.consultar_produtos_no_db(decrescente=decrescente, limit=1, cursor=cursor)
+        nomes += _nomes(pagina)
+        cursor = pagina["proximo_cursor"]
+        if not cursor:
+            break
+    assert nomes == _nomes(produtos.consultar_produtos_no_db(decrescente=decrescente))
+
+
+@pytest.mark.parametrize('disponibilidade, indice', [(None, 'idx_produtos_preco'),
+                                                     ('disponivel', 'idx_produtos_disponibilidade_preco')])
+def test_consulta_usa_os_indices_de_preco(produtos, monkeypatch, disponibilidade, indice):
+    planos = []
+    conexao = produtos.conexao()
+    executar = conexao.execute
+
+    class Conexao:
+        def execute(self, sql, parametros=()):
+            planos.extend(linha[-1] for linha in executar(f'EXPLAIN QUERY PLAN {sql}', parametros))
+            return executar(sql, parametros)
+
+    monkeypatch.setattr(produtos, 'conexao', Conexao)
+    produtos.consultar_produtos_no_db(100, 20000, disponibilidade)
+    assert any(indice in plano for plano in planos)
+    assert not any('TEMP B-TREE' in plano for plano in planos)
+
+
+def test_endpoint_consulta(produtos):
+    cliente = webhook_handler.app.test_client()
+    resposta = cliente.get('/produtos/consulta?preco_min=100,00&preco_max=1500&ordem=-preco&disponibilidade=disponivel')
+    assert resposta.status_code == 200
+    assert [produto["nome"] for produto in resposta.get_json()["produtos"]] == ['caro', 'empate']
+    assert cliente.get('/produtos/consulta?preco_min=barato').status_code == 400
+    assert cliente.get('/produtos/consulta?preco_max=-1').status_code == 400
+    assert cliente.get('/produtos/consulta?ordem=nome').status_code == 400
+    assert cliente.get('/produtos/consulta?disponibilidade=talvez').status_code == 400
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+import dados_estruturados
+import extracao
+from apoio import pagina_produto
+from dados_estruturados import extrair_dados_estruturados, formatar_preco, classificar_disponibilidade
+from extracao import extrair_campos_html
+
+
+def _json_ld(dados):
+    return f'<script type="application/ld+json">{json.dumps(dados)}</script>'
+
+
+PRODUTO_JSON_LD = {
+    "@context": "https://schema.org",
+    "@type": "Product",
+    "name": "Cabo HDMI 2.0",
+    "sku": "HDMI-2",
+    "description": "<p>Cabo HDMI</p><p>4K a 60 Hz</p>",
+    "offers": {"@type": "Offer", "price": "1234.5", "priceCurrency": "BRL",
+               "availability": "https://schema.org/InStock"},
+    "additionalProperty": [{"name": "Comprimento", "value": "2 m"}],
+}
+
+
+def test_produto_json_ld():
+    assert extrair_dados_estruturados(_json_ld(PRODUTO_JSON_LD)) == {
+        "nome": "Cabo HDMI 2.0",
+        "codigo": "HDMI-2",
+        "descricao": "Cabo HDMI\n4K a 60 Hz",
+        "preco": "R$ 1.234,50",
+        "disponibilidade": "Disponível",
+        "especificacoes": ["Comprimento: 2 m"],
+    }
+
+
+def test_produto_dentro_de_grafo_com_oferta_agregada():
+    dados = {"@graph": [
+        {"@type": "WebPage", "name": "Página"},
+        {"@type": ["Thing", "Product"], "name": "Mouse", "offers": {
+            "@type": "AggregateOffer", "lowPrice": 19.9, "availability": "OutOfStock"}},
+    ]}
+    campos = extrair_dados_estruturados(_json_ld(dados))
+    assert campos == {"nome": "Mouse", "preco": "R$ 19,90", "disponibilidade": "Indisponível"}
+
+
+def test_json_ld_invalido_e_moeda_estrangeira_sao_ignorados():
+    html = ('<script type="application/ld+json">{inválido</script>'
+            + _json_ld({"@type": "Product", "name": "X", "offers": {"price": "10", "priceCurrency": "USD"}}))
+    assert extrair_dados_estruturados(html) == {"nome": "X"}
+
+
+def test_microdados_e_opengraph():
+    html = (
+        '<meta itemprop="price" content="49.90"><meta itemprop="priceCurrency" content="BRL">'
+        '<meta itemprop="sku" content="CB-1">'
+        '<meta property="product:availability" content="out of stock">'
+        '<meta property="og:title" content="Loja">'
+    )
+    assert extrair_dados_estruturados(html) == {
+        "preco": "R$ 49,90", "codigo": "CB-1", "disponibilidade": "Indisponível"
+    }
+
+
+def test_json_ld_tem_prioridade_sobre_microdados():
+    html = '<meta itemprop="sku" content="MICRO">' + _json_ld(PRODUTO_JSON_LD)
+    assert extrair_dados_estruturados(html)["codigo"] == 'HDMI-2'
+
+
+def test_marcadores_em_maiusculas():
+    html = ('<script type="application/LD+JSON">{"@type": "Product", "name": "Teclado"}</script>'
+            '<META ITEMPROP="sku" CONTENT="TK-1">')
+    assert extrair_dados_estruturados(html) == {"nome": "Teclado", "codigo": "TK-1"}
+
+
+def test_pagina_sem_marcadores_nao_executa_as_expressoes(monkeypatch):
+    class SemUso:
+        def finditer(self, html):
+            raise AssertionError("expressão executada em página sem dados estruturados")
+
+    monkeypatch.setattr(dados_estruturados, 'PADRAO_JSON_LD', SemUso())
+    monkeypatch.setattr(dados_estruturados, 'PADRAO_TAG_META', SemUso())
+    assert extrair_dados_estruturados(pagina_produto()) == {}
+
+
+def test_pagina_completa_nao_e_analisada(monkeypatch):
+    def analisar(*args):
+        raise AssertionError("DOM analisado com todos os campos preenchidos")
+
+    monkeypatch.setitem(extracao.BACKENDS, 'bs4', analisar)
+    html = pagina_produto(cabeca=_json_ld(PRODUTO_JSON_LD))
+    assert extrair_campos_html(html)["nome"] == 'Cabo HDMI 2.0'
+
+
+def test_dom_preenche_os_campos_faltantes():
+    html = pagina_produto(cabeca=_json_ld({"@type": "Product", "name": "Do JSON-LD", "sku": "J-1"}))
+    campos = extrair_campos_html(html)
+    assert campos["nome"] == 'Do JSON-LD'
+    assert campos["codigo"] == 'J-1'
+    assert campos["preco"] == 'R$ 10,00'
+    assert campos["descricao"] == 'Descrição do produto de teste.'
+
+
+def test_dados_estruturados_alteram_disponibilidade_e_especificacoes():
+    # Comportamento esperado: a oferta e additionalProperty substituem as heurísticas do DOM
+    html = pagina_produto(disponibilidade='Consulte', cabeca=_json_ld(PRODUTO_JSON_LD))
+    so_dom = extrair_campos_html(html, estruturados=False)
+    com_dados = extrair_campos_html(html)
+    assert so_dom["disponibilidade"] == 'Não informado'
+    assert com_dados["disponibilidade"] == 'Disponível'
+    assert so_dom["especificacoes"] == ['Cor - Preta']
+    assert com_dados["especificacoes"] == ['Comprimento: 2 m']
+
+
+@pytest.mark.parametrize('valor, moeda, esperado', [
+    ("1234.5", "BRL", "R$ 1.234,50"),
+    ("1.234,50", "", "R$ 1.234,50"),
+    (49.9, "R$", "R$ 49,90"),
+    ("0", "BRL", None),
+    ("abc", "BRL", None),
+    ("10", "USD", None),
+])
+def test_formatar_preco(valor, moeda, esperado):
+    assert formatar_preco(valor, moeda) == esperado
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ("https://schema.org/InStock", "Disponível"),
+    ("PreOrder", "Disponível"),
+    ("http://schema.org/SoldOut", "Indisponível"),
+    ("Desconhecido", None),
+])
+def test_classificar_disponibilidade(valor, esperado):
+    assert classificar_disponibilidade(valor) == esperado
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from apoio import pagina_produto
+from produto_scraper import ProdutoScraper
+
+
+def _pagina_com_rodape(kb_scripts=200):
+    scripts = '<script>' + 'var rastreamento = {"evento": "visualizacao"};' * (kb_scripts * 24) + '</script>'
+    return pagina_produto().replace('</body>', '<footer>Rodapé</footer>' + scripts + '</body>')
+
+
+def _sem_validadores(resultado):
+    resultado = dict(resultado)
+    resultado.pop('validadores', None)
+    return resultado
+
+
+def test_streaming_para_no_marcador_com_o_mesmo_resultado(servidor):
+    servidor.paginas['/produto'] = _pagina_com_rodape()
+    completo = ProdutoScraper(streaming=False).extrair_info_ciainfor(servidor.url('/produto'))
+
+    scraper = ProdutoScraper(streaming=True)
+    parcial = scraper.extrair_info_ciainfor(servidor.url('/produto'))
+
+    assert _sem_validadores(parcial) == _sem_validadores(completo)
+    estatisticas = scraper.estatisticas_download()
+    assert estatisticas["interrompidas_marcador"] == 1
+    assert estatisticas["bytes_lidos"] < len(servidor.paginas['/produto']) / 10
+
+
+def test_streaming_respeita_o_limite_de_bytes(servidor):
+    servidor.paginas['/produto'] = pagina_produto(descricao='x' * 100000)
+    scraper = ProdutoScraper(streaming=True, max_bytes=20000, marcadores_fim=[])
+    resultado = scraper.extrair_info_ciainfor(servidor.url('/produto'))
+
+    assert resultado["nome"] == 'Produto de Teste'
+    estatisticas = scraper.estatisticas_download()
+    assert estatisticas["interrompidas_limite"] == 1
+    assert estatisticas["bytes_lidos"] == 20000
+
+
+def test_caractere_cortado_no_limite_nao_quebra_a_decodificacao(servidor):
+    # 'ç' ocupa 2 bytes em UTF-8: o limite cai no meio de um deles
+    html = pagina_produto(descricao='ç' * 50000)
+    servidor.paginas['/produto'] = html
+    inicio = html.encode('utf-8').index('ç'.encode('utf-8'))
+    scraper = ProdutoScraper(streaming=True, max_bytes=inicio + 1001, marcadores_fim=[])
+    resultado = scraper.extrair_info_ciainfor(servidor.url('/produto'))
+    assert resultado["descricao"] == 'ç' * 500
+
+
+def test_conexao_volta_ao_pool_quando_falta_pouco(servidor):
+    servidor.paginas['/produto'] = pagina_produto().replace('</body>', '<footer>Rodapé</footer></body>')
+    scraper = ProdutoScraper(streaming=True)
+    for _ in range(3):
+        scraper.extrair_info_ciainfor(servidor.url('/produto'))
+    assert scraper.estatisticas_conexoes()["conexoes_abertas"] == 1
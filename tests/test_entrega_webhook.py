@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import threading
+
+import pytest
+
+import webhook_handler
+from entrega_webhook import EntregaCallback
+
+
+@pytest.fixture
+def criar_entrega(servidor):
+    entregas = []
+
+    def criar(processar=lambda tarefa: {"status": "sucesso", "url": tarefa["url"]}, **opcoes):
+        opcoes = {"ativa": True, "trabalhadores": 1, "tentativas": 3, "espera_inicial": 0, "timeout": 5, **opcoes}
+        entrega = EntregaCallback(processar, callback_url=servidor.url('/callback'), **opcoes)
+        entregas.append(entrega)
+        return entrega
+
+    yield criar
+    for entrega in entregas:
+        entrega.parar(5)
+
+
+def _corpos(servidor):
+    return [json.loads(corpo) for _, corpo in servidor.recebidos]
+
+
+def test_resultado_entregue_com_id_e_requisicao(servidor, criar_entrega):
+    entrega = criar_entrega()
+    id_tarefa = entrega.enfileirar('https://loja/produto', requisicao={"number": "5511"})
+    assert entrega.aguardar(5)
+    assert _corpos(servidor) == [
+        {"id": id_tarefa, "status": "sucesso", "url": "https://loja/produto", "requisicao": {"number": "5511"}}
+    ]
+    assert entrega.estatisticas()["entregues"] == 1
+
+
+@pytest.mark.parametrize('status', [503, 429])
+def test_novas_tentativas_em_falhas_temporarias(servidor, criar_entrega, status):
+    servidor.falhas['/callback'] = 2
+    if status != 503:
+        servidor.status['/callback'] = status
+        servidor.falhas['/callback'] = 0
+    entrega = criar_entrega()
+    entrega.enfileirar('https://loja/produto')
+    assert entrega.aguardar(5)
+    estatisticas = entrega.estatisticas()
+    assert servidor.acessos['/callback'] == 3
+    assert estatisticas["novas_tentativas"] == 2
+    assert (estatisticas["entregues"], estatisticas["falhas_entrega"]) == ((1, 0) if status == 503 else (0, 1))
+
+
+def test_erro_4xx_definitivo_sem_novas_tentativas(servidor, criar_entrega):
+    servidor.status['/callback'] = 400
+    entrega = criar_entrega()
+    entrega.enfileirar('https://loja/produto')
+    assert entrega.aguardar(5)
+    assert servidor.acessos['/callback'] == 1
+    assert entrega.estatisticas()["falhas_entrega"] == 1
+
+
+def test_erro_no_processamento_tambem_e_entregue(servidor, criar_entrega):
+    def processar(tarefa):
+        raise RuntimeError("site fora do ar")
+
+    entrega = criar_entrega(processar)
+    entrega.enfileirar('https://loja/produto')
+    assert entrega.aguardar(5)
+    corpo, = _corpos(servidor)
+    assert corpo["status"] == "erro" and "site fora do ar" in corpo["mensagem"]
+    assert entrega.estatisticas()["erros_processamento"] == 1
+
+
+def test_fila_cheia_rejeita_a_mensagem(criar_entrega):
+    liberar = threading.Event()
+    entrega = criar_entrega(lambda tarefa: liberar.wait(5) and {}, fila_maxima=1)
+    assert entrega.enfileirar('https://loja/1')
+    # A primeira tarefa está em processamento; a segunda ocupa a fila
+    while entrega.estatisticas()["em_fila"]:
+        time.sleep(0.01)
+    assert entrega.enfileirar('https://loja/2')
+    assert entrega.enfileirar('https://loja/3') is None
+    liberar.set()
+    assert entrega.aguardar(5)
+    assert entrega.estatisticas()["rejeitadas_fila_cheia"] == 1
+
+
+def test_webhook_responde_202_no_modo_assincrono(banco, servidor, criar_entrega, monkeypatch):
+    entrega = criar_entrega(lambda tarefa: {"status": "sucesso"})
+    monkeypatch.setattr(webhook_handler, 'entrega', entrega)
+    cliente = webhook_handler.app.test_client()
+    mensagem = "Preciso de ajuda com o produto https://www.ciainfor.com.br/produto/cabo"
+    resposta = cliente.post('/webhook', json={"message": mensagem})
+    assert resposta.status_code == 202
+    assert resposta.get_json()["status"] == "aceito"
+    assert entrega.aguardar(5)
+    assert _corpos(servidor)[0]["id"] == resposta.get_json()["id"]
+
+    # Mensagem sem o gatilho: respondida na hora, sem callback
+    resposta = cliente.post('/webhook', json={"message": "Olá"})
+    assert resposta.status_code == 200
+    assert len(servidor.recebidos) == 1
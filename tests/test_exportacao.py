@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+
+import pytest
+
+import exportacao
+import webhook_handler
+
+
+@pytest.fixture
+def cliente(banco):
+    for indice in range(5):
+        banco.save_produto_to_db({
+            "url": f"https://www.ciainfor.com.br/produto-{indice}", "nome": f"Produto {indice}",
+            "preco": "R$ 10,00", "codigo": f"P-{indice}", "especificacoes": [],
+        })
+    return webhook_handler.app.test_client()
+
+
+def _linhas_csv(resposta):
+    return list(csv.reader(io.StringIO(resposta.get_data(as_text=True))))
+
+
+def test_csv_gerado_em_blocos(monkeypatch):
+    monkeypatch.setattr(exportacao, 'LINHAS_POR_BLOCO', 2)
+    linhas = [(f'url-{i}', 'Nome', 'R$ 1,00', 'Disponível', 'C', '2024-05-01 12:30:00') for i in range(5)]
+    blocos = list(exportacao.gerar_csv(iter(linhas)))
+    assert len(blocos) == 3
+    conteudo = list(csv.reader(io.StringIO(''.join(blocos))))
+    assert conteudo[0] == [exportacao.TITULOS[coluna] for coluna in exportacao.COLUNAS_EXPORTACAO]
+    assert conteudo[1] == ['url-0', 'Nome', 'R$ 1,00', 'Disponível', 'C', '01/05/2024 12:30:00']
+    assert len(conteudo) == 6
+
+
+def test_csv_paginado_pelo_cursor(cliente):
+    primeira = cliente.get('/produtos_excel?formato=csv&limit=3')
+    assert primeira.status_code == 200
+    cursor = primeira.headers['X-Proximo-Cursor']
+    segunda = cliente.get(f'/produtos_excel?formato=csv&limit=3&cursor={cursor}')
+    assert 'X-Proximo-Cursor' not in segunda.headers
+    urls = [linha[0] for linha in _linhas_csv(primeira)[1:] + _linhas_csv(segunda)[1:]]
+    assert sorted(urls) == sorted(f"https://www.ciainfor.com.br/produto-{indice}" for indice in range(5))
+
+
+def test_tudo_exporta_o_catalogo_inteiro(cliente):
+    resposta = cliente.get('/produtos_excel?formato=csv&limit=2&tudo=true')
+    assert len(_linhas_csv(resposta)) == 6
+    assert 'X-Proximo-Cursor' not in resposta.headers
+
+
+def test_limit_zero_nao_exporta_nenhum_produto(cliente):
+    resposta = cliente.get('/produtos_excel?formato=csv&limit=0')
+    assert resposta.status_code == 404
+
+
+def test_xlsx_com_produtos_e_informacoes(cliente):
+    from openpyxl import load_workbook
+
+    resposta = cliente.get('/produtos_excel?limit=2')
+    assert resposta.status_code == 200
+    assert resposta.mimetype == exportacao.MIMETYPE_XLSX
+    planilha = load_workbook(io.BytesIO(resposta.get_data()), read_only=True)
+    assert len(list(planilha['Produtos'].values)) == 3
+    assert list(planilha['Informações'].values)[1] == ('Total de Produtos', 5)
+
+
+@pytest.mark.parametrize('parametros, parametro', [
+    ('limit=-1', 'limit'), ('offset=-5', 'offset'), ('limit=dez', 'limit'), ('offset=1.5', 'offset'),
+])
+def test_parametros_invalidos_rejeitados(cliente, parametros, parametro):
+    resposta = cliente.get(f'/produtos_excel?formato=csv&{parametros}')
+    assert resposta.status_code == 400
+    assert parametro in resposta.get_json()["mensagem"]
+
+
+def test_cursor_invalido_e_banco_vazio(banco):
+    cliente = webhook_handler.app.test_client()
+    assert cliente.get('/produtos_excel?cursor=invalido').status_code == 400
+    assert cliente.get('/produtos_excel').status_code == 404
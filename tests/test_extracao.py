@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from bs4 import BeautifulSoup
+
+import extracao
+from benchmark import PRODUTOS, gerar_pagina, extrair_campos_legado
+from extracao import extrair_campos_html, BACKENDS
+
+# O extrator legado usa a API antiga do BeautifulSoup
+pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
+
+# Páginas com casos de borda das heurísticas do DOM
+PAGINAS_BORDA = {
+    'vazia': '<html><body></body></html>',
+    'comentario_com_preco': '<html><body><!-- R$ 1,00 --><h1>Produto</h1><p>Estoque: Disponível</p></body></html>',
+    'entidades_e_espacos': (
+        '<html><body><h1>  Cabo &amp; Adaptador  </h1><pre>  R$ 5,00  </pre>'
+        '<div class="product-description">\n\n  <p>Linha 1</p>\n  <p>  Linha 2 </p></div></body></html>'
+    ),
+    'codigo_no_rotulo': '<html><body><h1>X</h1><span class="sku">SKU: XYZ-9</span><p>Código: ABC-123</p></body></html>',
+    'specs_aninhadas': (
+        '<html><body><h1>X</h1><div class="product-features"><table><tr><td>A</td><td>1</td></tr></table>'
+        '<ul><li>B - 2</li><li>C - 3</li></ul></div><ul><li>fora</li></ul></body></html>'
+    ),
+    'sem_h1': '<html><body><div class="product-name">Nome Alternativo</div><span itemprop="price">R$ 7,50</span></body></html>',
+}
+
+
+def _legado(html):
+    return extrair_campos_legado(BeautifulSoup(html, 'lxml'))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('variante', PRODUTOS)
+def test_paridade_com_extrator_legado(variante, backend):
+    html = gerar_pagina(variante, itens_menu=5)
+    assert extrair_campos_html(html, backend, estruturados=False) == _legado(html)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('nome', PAGINAS_BORDA)
+def test_paridade_em_casos_de_borda(nome, backend):
+    html = PAGINAS_BORDA[nome]
+    assert extrair_campos_html(html, backend, estruturados=False) == _legado(html)
+
+
+def test_campos_da_pagina_padrao():
+    campos = extrair_campos_html(gerar_pagina('padrao', itens_menu=0), estruturados=False)
+    assert campos["nome"] == 'Cabo VGA Macho x VGA Macho 15 Metros c/ Filtro'
+    assert campos["preco"] == 'R$ 49,90'
+    assert campos["codigo"] == 'CB-VGA-15'
+    assert campos["especificacoes"] == ['Comprimento:15 metros', 'Conector:VGA macho - VGA macho']
+
+
+def test_varredura_exige_os_ganchos_do_backend():
+    with pytest.raises(TypeError):
+        extracao._Varredura(None)
+
+    class VarreduraIncompleta(extracao._Varredura):
+        def _percorrer(self, raiz):
+            pass
+
+    with pytest.raises(TypeError):
+        VarreduraIncompleta(None)
+
+
+def test_backend_desconhecido_e_rejeitado():
+    from produto_scraper import ProdutoScraper
+    with pytest.raises(ValueError):
+        ProdutoScraper(parser='html5lib')
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_medicao_de_memoria_do_benchmark_ve_a_analise(backend):
+    # O pico de memória medido pelo benchmark não pode ser mascarado pelo processo pai
+    import benchmark
+    assert benchmark._pico_memoria_backend(backend, 'padrao', 60) > 0
+
+
+@pytest.mark.parametrize('variante', PRODUTOS)
+def test_poda_tem_o_mesmo_resultado_nos_backends(variante):
+    html = gerar_pagina(variante, itens_menu=5)
+    resultados = [extrair_campos_html(html, backend, podar=True, estruturados=False) for backend in BACKENDS]
+    assert all(resultado == resultados[0] for resultado in resultados)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_poda_descarta_menus_e_rodape(backend):
+    completo = extrair_campos_html(gerar_pagina('texto_livre', itens_menu=5), backend, estruturados=False)
+    podado = extrair_campos_html(gerar_pagina('texto_livre', itens_menu=5), backend, podar=True, estruturados=False)
+
+    assert any('Subcategoria' in item for item in completo["especificacoes"])
+    assert sorted(podado["especificacoes"]) == ['Capacidade: 16GB', 'Frequência - 3200MHz']
+    assert 'Telefone' not in podado["descricao"]
+    for campo in ('nome', 'preco', 'codigo', 'disponibilidade'):
+        assert podado[campo] == completo[campo]
+
+
+def test_remover_scripts_e_estilos():
+    html = '<p>a</p><script type="x">var p = "</p>";</script><STYLE>p {}</STYLE><scripts>b</scripts>'
+    assert extracao.remover_scripts_estilos(html) == '<p>a</p><scripts>b</scripts>'
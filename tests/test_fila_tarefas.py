@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import time
+import sqlite3
+import threading
+
+import pytest
+
+import webhook_handler
+from fila_tarefas import TrabalhadorFila
+
+
+@pytest.fixture
+def fila(banco):
+    return banco.FilaTarefas(max_tentativas=2, duracao_reserva=60, espera_tentativa=0)
+
+
+def _expirar_reservas(banco):
+    with banco.transacao() as conn:
+        conn.execute("UPDATE tarefas SET reservada_ate = 0 WHERE status = 'em_andamento'")
+
+
+def test_reserva_por_prioridade_e_ordem_de_chegada(fila):
+    fila.adicionar(['https://loja/a', 'https://loja/b'])
+    fila.adicionar(['https://loja/c'], prioridade=5)
+    assert [url for _, url in fila.reservar(3, 'w1')] == ['https://loja/c', 'https://loja/a', 'https://loja/b']
+    assert fila.reservar(1, 'w2') == []
+
+
+def test_url_aberta_apenas_eleva_a_prioridade(fila):
+    primeiro, = fila.adicionar(['https://loja/a'])
+    segundo, = fila.adicionar(['https://loja/a'], prioridade=3)
+    assert primeiro == segundo
+    assert fila.buscar(primeiro)["prioridade"] == 3
+    fila.reservar(1, 'w1')
+    fila.concluir(primeiro, 'w1')
+    # Concluída, a URL pode voltar à fila como uma nova tarefa
+    assert fila.adicionar(['https://loja/a']) != [primeiro]
+
+
+def test_reserva_expirada_volta_para_a_fila(banco, fila):
+    id_tarefa, = fila.adicionar(['https://loja/a'])
+    fila.reservar(1, 'caiu')
+    _expirar_reservas(banco)
+    assert fila.reservar(1, 'w2') == [(id_tarefa, 'https://loja/a')]
+    # O trabalhador que caiu não pode mais concluir a tarefa
+    assert not fila.concluir(id_tarefa, 'caiu')
+    assert fila.concluir(id_tarefa, 'w2')
+    assert fila.buscar(id_tarefa)["status"] == 'concluida'
+
+
+def test_reserva_expirada_conta_tentativa_ate_falhar(banco, fila):
+    id_tarefa, = fila.adicionar(['https://loja/a'])
+    for _ in range(2):
+        fila.reservar(1, 'caiu')
+        _expirar_reservas(banco)
+    assert fila.reservar(1, 'w') == []
+    tarefa = fila.buscar(id_tarefa)
+    assert (tarefa["status"], tarefa["erro"], tarefa["tentativas"]) == ('falha', 'Reserva expirada', 2)
+
+
+def test_erro_com_espera_crescente_e_falha_definitiva(banco):
+    fila = banco.FilaTarefas(max_tentativas=3, espera_tentativa=100)
+    id_tarefa, = fila.adicionar(['https://loja/a'])
+    esperas = []
+    for _ in range(3):
+        with banco.transacao() as conn:
+            conn.execute('UPDATE tarefas SET disponivel_em = 0')
+        fila.reservar(1, 'w')
+        antes = time.time()
+        assert fila.concluir(id_tarefa, 'w', erro='503')
+        disponivel_em, = banco.conexao().execute(
+            'SELECT disponivel_em FROM tarefas WHERE id = ?', (id_tarefa,)
+        ).fetchone()
+        esperas.append(disponivel_em - antes)
+        if len(esperas) == 1:
+            # A nova tentativa só fica disponível depois da espera
+            assert fila.reservar(1, 'w') == []
+    assert esperas[:2] == [pytest.approx(100, abs=1), pytest.approx(200, abs=1)]
+    tarefa = fila.buscar(id_tarefa)
+    assert (tarefa["status"], tarefa["tentativas"], tarefa["erro"]) == ('falha', 3, '503')
+
+
+def test_liberar_nao_conta_a_tentativa(fila):
+    id_tarefa, = fila.adicionar(['https://loja/a'])
+    fila.reservar(1, 'w')
+    fila.liberar([id_tarefa], 'outro')
+    assert fila.buscar(id_tarefa)["status"] == 'em_andamento'
+    fila.liberar([id_tarefa], 'w')
+    tarefa = fila.buscar(id_tarefa)
+    assert (tarefa["status"], tarefa["tentativas"]) == ('pendente', 0)
+
+
+def test_reservas_simultaneas_nao_repetem_tarefas(fila):
+    fila.adicionar([f'https://loja/{indice}' for indice in range(40)])
+    reservadas = []
+
+    def reservar(dono):
+        while True:
+            tarefas = fila.reservar(3, dono)
+            if not tarefas:
+                return
+            reservadas.extend(id_tarefa for id_tarefa, _ in tarefas)
+
+    threads = [threading.Thread(target=reservar, args=(f'w{indice}',)) for indice in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(reservadas) == sorted(set(reservadas)) and len(reservadas) == 40
+
+
+def test_trabalhador_processa_e_tenta_novamente(fila):
+    fila.adicionar(['https://loja/ok', 'https://loja/instavel'])
+    falhas = {'https://loja/instavel': 1}
+
+    def processar(url):
+        if falhas.get(url):
+            falhas[url] -= 1
+            return {"erro": "503"}
+        return {"url": url}
+
+    trabalhador = TrabalhadorFila(fila, processar, threads=2, requisicoes_por_minuto=0, intervalo=0.01)
+    threads = [threading.Thread(target=trabalhador._executar_tarefas) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while fila.estatisticas()["concluida"] < 2:
+        time.sleep(0.01)
+    trabalhador.parar()
+    for thread in threads:
+        thread.join(5)
+    assert trabalhador.estatisticas() == {"concluidas": 2, "erros": 1, "reservas_perdidas": 0}
+
+
+def test_trabalhador_sobrevive_a_erros_do_banco_e_reserva_depois_da_ficha(fila):
+    fila.adicionar(['https://loja/a'])
+    reservar = fila.reservar
+    eventos = []
+
+    class LimiteRegistrado:
+        def aguardar(self, parar):
+            eventos.append('ficha')
+            return not parar.is_set()
+
+    def reservar_instavel(quantidade, dono):
+        eventos.append('reserva')
+        if eventos.count('reserva') == 1:
+            raise sqlite3.OperationalError('database is locked')
+        return reservar(quantidade, dono)
+
+    fila.reservar = reservar_instavel
+    trabalhador = TrabalhadorFila(fila, lambda url: {"url": url}, threads=1, intervalo=0.01)
+    trabalhador.limite = LimiteRegistrado()
+    thread = threading.Thread(target=trabalhador._executar_tarefas)
+    thread.start()
+    while fila.estatisticas()["concluida"] < 1:
+        time.sleep(0.01)
+    trabalhador.parar()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert trabalhador.estatisticas()["concluidas"] == 1
+    # A ficha é obtida antes da primeira reserva e guardada após a reserva que falhou
+    assert eventos[:3] == ['ficha', 'reserva', 'reserva']
+
+
+def test_endpoints_da_fila(banco, fila, monkeypatch):
+    monkeypatch.setattr(webhook_handler, 'fila', fila)
+    cliente = webhook_handler.app.test_client()
+    assert cliente.post('/tarefas', json={"urls": ["ftp://loja/a"]}).status_code == 400
+    assert cliente.post('/tarefas', json={"urls": ["https://loja/a"], "prioridade": "alta"}).status_code == 400
+    resposta = cliente.post('/tarefas', json={"urls": ["https://loja/a"], "prioridade": 2})
+    assert resposta.status_code == 202
+    id_tarefa, = resposta.get_json()["ids"]
+    tarefa = cliente.get(f'/tarefas/{id_tarefa}').get_json()["tarefa"]
+    assert (tarefa["status"], tarefa["prioridade"]) == ('pendente', 2)
+    assert cliente.get('/tarefas/999999').status_code == 404
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import webhook_handler
+
+URL = 'https://www.ciainfor.com.br/produto'
+
+
+def _salvar(banco, preco='R$ 10,00', disponibilidade='Disponível', **campos):
+    banco.save_produto_to_db({"url": URL, "nome": "Produto", "preco": preco, "disponibilidade": disponibilidade,
+                              "especificacoes": [], **campos})
+
+
+def _rowid(banco):
+    return banco.conexao().execute('SELECT rowid FROM produtos WHERE url = ?', (URL,)).fetchone()[0]
+
+
+def test_upsert_mantem_o_rowid(banco):
+    _salvar(banco)
+    rowid = _rowid(banco)
+    banco.save_produto_to_db({"url": 'https://www.ciainfor.com.br/outro', "nome": "Outro", "especificacoes": []})
+    _salvar(banco, nome="Produto renomeado")
+    assert _rowid(banco) == rowid
+    assert banco.get_produto_from_db(URL)["nome"] == "Produto renomeado"
+    assert banco.contar_produtos_no_db() == 2
+
+
+def test_historico_registra_apenas_mudancas(banco):
+    _salvar(banco)
+    _salvar(banco, descricao="Só a descrição mudou")
+    banco.confirmar_produto_no_db(URL)
+    _salvar(banco, preco='R$ 12,50')
+    _salvar(banco, preco='R$ 12,50', disponibilidade='Indisponível')
+    _salvar(banco, preco='R$ 12,50', disponibilidade='Indisponível')
+
+    historico = banco.get_historico_from_db(URL)
+    assert [(linha["preco_centavos"], linha["disponibilidade"]) for linha in historico] == [
+        (1000, 'disponivel'), (1250, 'disponivel'), (1250, 'indisponivel')
+    ]
+    assert historico[1]["preco_centavos_anterior"] == 1000
+    assert historico[2]["disponibilidade_anterior"] == 'disponivel'
+    assert historico[0]["preco_centavos_anterior"] is None
+
+
+def test_alteracoes_desde_uma_data_com_cursor(banco):
+    _salvar(banco)
+    _salvar(banco, preco='R$ 11,00')
+    _salvar(banco, preco='R$ 12,00')
+    primeira = banco.get_alteracoes_from_db('2000-01-01T00:00:00Z', limit=2)
+    segunda = banco.get_alteracoes_from_db(limit=2, cursor=primeira["proximo_cursor"])
+    precos = [linha["preco_centavos"] for linha in primeira["alteracoes"] + segunda["alteracoes"]]
+    assert precos == [1000, 1100, 1200]
+    assert segunda["proximo_cursor"] is None
+    assert banco.get_alteracoes_from_db('2999-01-01')["alteracoes"] == []
+
+
+def test_endpoints_de_historico(banco):
+    _salvar(banco)
+    _salvar(banco, preco='R$ 11,00')
+    cliente = webhook_handler.app.test_client()
+    assert cliente.get('/produtos/alteracoes?desde=ontem').status_code == 400
+    resposta = cliente.get('/produtos/alteracoes?desde=2000-01-01')
+    assert len(resposta.get_json()["alteracoes"]) == 2
+    assert cliente.get('/produto/historico').status_code == 400
+    historico = cliente.get('/produto/historico', query_string={"url": URL}).get_json()["historico"]
+    assert [linha["preco_centavos"] for linha in historico] == [1000, 1100]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import types
+import runpy
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importa os servidores como um worker pré-carregado e informa o que foi carregado e iniciado
+SCRIPT_IMPORTACAO = '''
+import sys, json, threading
+import webhook_handler, webhook_handler_chatgpt
+print(json.dumps({
+    "modulos": sorted(m for m in ("pandas", "numpy", "openpyxl") if m in sys.modules),
+    "threads": threading.active_count(),
+}))
+'''
+
+
+def test_importacao_sem_dependencias_pesadas_nem_threads(tmp_path):
+    ambiente = dict(os.environ, SERVIDOR_INICIAR_NA_IMPORTACAO='false', PRODUTOS_DB_PATH=str(tmp_path / 'produtos.db'))
+    saida = subprocess.run([sys.executable, '-c', SCRIPT_IMPORTACAO], cwd=RAIZ, env=ambiente,
+                           capture_output=True, text=True, check=True).stdout
+    resultado = json.loads(saida.strip().splitlines()[-1])
+    assert resultado == {"modulos": [], "threads": 1}
+    # Sem iniciar na importação, o banco também não é criado
+    assert not (tmp_path / 'produtos.db').exists()
+
+
+def test_ganchos_do_gunicorn(banco, monkeypatch):
+    configuracao = runpy.run_path(os.path.join(RAIZ, 'gunicorn.conf.py'))
+    assert configuracao['preload_app'] is True
+
+    chamadas = []
+    modulo = types.ModuleType('aplicativo_teste')
+    modulo.iniciar_worker = lambda: chamadas.append('iniciar_worker')
+    monkeypatch.setitem(sys.modules, 'aplicativo_teste', modulo)
+    worker = types.SimpleNamespace(
+        app=types.SimpleNamespace(app_uri='aplicativo_teste:app'), cfg=types.SimpleNamespace(wsgi_app=None)
+    )
+    configuracao['post_worker_init'](worker)
+    assert chamadas == ['iniciar_worker']
+
+    # O banco é inicializado no mestre e a conexão fechada antes do fork
+    with banco.transacao() as conn:
+        conn.execute('DROP TABLE produtos_busca')
+    configuracao['on_starting'](None)
+    assert banco.conexao().execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'produtos_busca'"
+    ).fetchone() is not None
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+from lojas import RegistroLojas, PlanoHeuristico, PlanoSeletores, ARQUIVO
+
+CAMPOS_OUTRA_LOJA = {
+    "nome": {"seletores": ["h1.titulo"]},
+    "preco": {"seletores": ["[itemprop=price]"], "atributo": "content", "regex": r"R\$ [\d.,]+"},
+    "codigo": {"seletores": [".sku"], "regex": r"SKU:\s*([\w-]+)"},
+    "disponibilidade": {"seletores": [".estoque"],
+                        "valores": {"Indisponível": ["esgotado"], "Disponível": ["em estoque"]}},
+    "especificacoes": {"xpath": ["//table[@id='ficha']//tr"]},
+}
+
+PAGINA = '''<html><body>
+<h1 class="titulo">Mouse Óptico</h1>
+<meta itemprop="price" content="Por R$ 49,90 à vista">
+<span class="sku">Código interno</span><span class="sku">SKU: MO-7</span>
+<div class="estoque">Produto EM ESTOQUE</div>
+<table id="ficha"><tr><td>Cor</td> <td>Preta</td></tr><tr><td>DPI</td> <td>1600</td></tr></table>
+</body></html>'''
+
+
+@pytest.fixture
+def registro():
+    return RegistroLojas({
+        "ciainfor": {"dominios": ["ciainfor.com.br"], "extrator": "heuristico"},
+        "outra": {"nome": "Outra Loja", "dominios": ["outraloja.com.br"], "campos": CAMPOS_OUTRA_LOJA,
+                  "dados_estruturados": False},
+    })
+
+
+def test_loja_pelo_dominio_e_subdominios(registro):
+    assert registro.loja('https://www.ciainfor.com.br/produto').chave == 'ciainfor'
+    assert registro.loja('https://m.loja.OutraLoja.com.br./p').chave == 'outra'
+    assert registro.loja('https://ciainfor.com.br.golpe.com/p') is None
+    assert registro.loja('http://[::1') is None
+    assert isinstance(registro.plano('https://desconhecida.com/p'), PlanoHeuristico)
+    assert isinstance(registro.plano('https://outraloja.com.br/p'), PlanoSeletores)
+    assert registro.dominios() == ['ciainfor.com.br', 'outraloja.com.br']
+
+
+def test_dominio_duplicado_e_substituicao(registro):
+    with pytest.raises(ValueError, match='já registrado'):
+        registro.adicionar('copia', {"dominios": ["ciainfor.com.br"]})
+    # Substituir a loja libera os domínios anteriores
+    registro.adicionar('outra', {"dominios": ["nova.com.br"]})
+    assert registro.loja('https://outraloja.com.br/p') is None
+    assert registro.loja('https://nova.com.br/p').chave == 'outra'
+
+
+@pytest.mark.parametrize('especificacao, mensagem', [
+    ({"dominios": []}, 'sem domínios'),
+    ({"dominios": ["a.com"], "extrator": "magico"}, 'extrator desconhecido'),
+    ({"dominios": ["a.com"], "campos": {"nome": {"regex": "("}}}, 'expressão regular inválida'),
+    ({"dominios": ["a.com"], "campos": {"nome": {"xpath": ["//["]}}}, 'XPath inválido'),
+    ({"dominios": ["a.com"], "campos": {"nome": {"css": ["h1"]}}}, 'chaves desconhecidas'),
+    ({"dominios": ["a.com"], "campos": {"cor": {}}}, 'campos desconhecidos'),
+])
+def test_especificacoes_invalidas(especificacao, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        RegistroLojas({"loja": especificacao})
+
+
+def test_plano_de_seletores(registro):
+    produto = registro.plano('https://outraloja.com.br/p').extrair(PAGINA)
+    assert produto == {
+        "nome": "Mouse Óptico",
+        "preco": "R$ 49,90",
+        # O primeiro .sku não satisfaz o regex: vale o próximo elemento
+        "codigo": "MO-7",
+        "disponibilidade": "Disponível",
+        "descricao": "",
+        "especificacoes": ["Cor Preta", "DPI 1600"],
+    }
+
+
+def test_grupo_opcional_vazio_tenta_o_proximo_seletor():
+    registro = RegistroLojas({"loja": {"dominios": ["a.com"], "campos": {
+        "codigo": {"seletores": [".primeiro", ".segundo"], "regex": r"Código(?:: (\w+))?"},
+        "disponibilidade": {"seletores": [".estoque"], "regex": r"Estoque(?:: (\w+))?",
+                            "valores": {"Disponível": ["sim"]}},
+        "nome": {"regex_html": r"<h2>(?:Nome: ([^<]+))?"},
+    }}})
+    html = ('<p class="primeiro">Código</p><p class="segundo">Código: XYZ</p>'
+            '<p class="estoque">Estoque</p><h2></h2><h2>Nome: Teclado</h2>')
+    produto = registro.plano('https://a.com/p').extrair(html)
+    assert produto["codigo"] == "XYZ"
+    assert produto["disponibilidade"] == "Não informado"
+    assert produto["nome"] == "Teclado"
+
+
+def test_carregar_do_arquivo(tmp_path):
+    caminho = tmp_path / 'lojas.json'
+    caminho.write_text(json.dumps({"x": {"dominios": ["x.com"]}}), encoding='utf-8')
+    assert RegistroLojas.carregar(str(caminho)).loja('https://x.com/p').chave == 'x'
+    # O arquivo distribuído com o projeto é válido
+    assert RegistroLojas.carregar(ARQUIVO).loja('https://www.ciainfor.com.br/p') is not None
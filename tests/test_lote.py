@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import webhook_handler
+from apoio import pagina_produto
+from produto_scraper import LOTE_MAX_CONCORRENCIA, LOTE_MAX_POR_HOST
+
+
+@pytest.fixture
+def cliente(banco):
+    yield webhook_handler.app.test_client()
+    webhook_handler.acessos.descarregar()
+
+
+@pytest.fixture
+def chamadas(monkeypatch):
+    """Substitui a extração do lote, registrando os argumentos recebidos"""
+    chamadas = []
+
+    def extrair_lote(urls, max_concorrencia=None, max_por_host=None, validadores=None):
+        chamadas.append({"urls": urls, "max_concorrencia": max_concorrencia, "max_por_host": max_por_host})
+        return [{"erro": "não extraído"} for _ in urls]
+
+    monkeypatch.setattr(webhook_handler.scraper, 'extrair_lote', extrair_lote)
+    return chamadas
+
+
+@pytest.mark.parametrize('corpo', [
+    {},
+    {"urls": "https://www.ciainfor.com.br/produto"},
+    {"urls": []},
+    {"urls": ["ftp://www.ciainfor.com.br/produto"]},
+    {"urls": ["https://www.ciainfor.com.br/produto", 42]},
+    {"urls": [["https://www.ciainfor.com.br/produto"]]},
+    {"urls": [{"url": "https://www.ciainfor.com.br/produto"}]},
+    {"urls": ["https://www.ciainfor.com.br/produto"], "max_concorrencia": "muitas"},
+    {"urls": ["https://www.ciainfor.com.br/produto"], "max_por_host": [4]},
+    {"urls": ["https://www.ciainfor.com.br/produto"], "max_concorrencia": -1},
+])
+def test_lote_rejeita_entrada_invalida(cliente, chamadas, corpo):
+    resposta = cliente.post('/produtos/lote', json=corpo)
+    assert resposta.status_code == 400
+    assert resposta.get_json()["status"] == "erro"
+    assert chamadas == []
+
+
+def test_lote_limita_quantidade_de_urls(cliente, chamadas, monkeypatch):
+    monkeypatch.setattr(webhook_handler, 'LOTE_MAX_URLS', 2)
+    urls = [f"https://www.ciainfor.com.br/produto-{i}" for i in range(3)]
+    resposta = cliente.post('/produtos/lote', json={"urls": urls})
+    assert resposta.status_code == 400
+    assert "2 URLs" in resposta.get_json()["mensagem"]
+    assert chamadas == []
+
+
+def test_lote_limita_concorrencia_ao_maximo_do_servidor(cliente, chamadas):
+    resposta = cliente.post('/produtos/lote', json={
+        "urls": ["https://www.ciainfor.com.br/produto"],
+        "max_concorrencia": 10 ** 9,
+        "max_por_host": "1000",
+    })
+    assert resposta.status_code == 200
+    assert chamadas[0]["max_concorrencia"] == LOTE_MAX_CONCORRENCIA
+    assert chamadas[0]["max_por_host"] == LOTE_MAX_POR_HOST
+
+
+def test_lote_aceita_concorrencia_menor(cliente, chamadas):
+    cliente.post('/produtos/lote', json={
+        "urls": ["https://www.ciainfor.com.br/produto"],
+        "max_concorrencia": 2,
+        "max_por_host": 1,
+    })
+    assert chamadas[0]["max_concorrencia"] == 2
+    assert chamadas[0]["max_por_host"] == 1
+
+
+def test_lote_extrai_paginas_na_ordem_pedida(cliente, servidor):
+    servidor.paginas['/a'] = pagina_produto(nome='Produto A', codigo='A-1')
+    servidor.paginas['/b'] = pagina_produto(nome='Produto B', codigo='B-1')
+    urls = [servidor.url('/b'), servidor.url('/a'), servidor.url('/b')]
+    resposta = cliente.post('/produtos/lote', json={"urls": urls})
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    nomes = [produto["dados_produto"]["nome"] for produto in dados["produtos"]]
+    assert nomes == ['Produto B', 'Produto A', 'Produto B']
+    # URLs repetidas são baixadas uma única vez
+    assert servidor.acessos['/b'] == 1
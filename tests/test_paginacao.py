@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import webhook_handler
+
+
+def _salvar(banco, quantidade, inicio=0):
+    banco.save_produtos_to_db([
+        {"url": f"https://www.ciainfor.com.br/produto-{indice:03d}", "nome": f"Produto {indice}", "especificacoes": []}
+        for indice in range(inicio, inicio + quantidade)
+    ])
+
+
+def _percorrer(banco, limit):
+    urls, cursor, paginas = [], None, 0
+    while True:
+        pagina = banco.get_all_produtos_from_db(limit, cursor=cursor, contar=False)
+        urls += [produto["url"] for produto in pagina["produtos"]]
+        paginas += 1
+        cursor = pagina["proximo_cursor"]
+        if not cursor:
+            return urls, paginas
+
+
+def test_cursor_percorre_todos_os_produtos_sem_repetir(banco):
+    # Salvos na mesma transação: a mesma data_atualizacao, desempatada pela URL
+    _salvar(banco, 25)
+    urls, paginas = _percorrer(banco, 10)
+    assert paginas == 3
+    assert urls == sorted(urls, reverse=True)
+    assert len(set(urls)) == 25
+
+
+def test_cursor_estavel_com_insercoes_durante_a_paginacao(banco):
+    _salvar(banco, 10)
+    with banco.transacao() as conn:
+        conn.execute("UPDATE produtos SET data_atualizacao = datetime('now', '-1 hour')")
+    primeira = banco.get_all_produtos_from_db(5, contar=False)
+    # Produtos novos entram no topo da listagem e não deslocam as páginas seguintes
+    _salvar(banco, 3, inicio=100)
+    segunda = banco.get_all_produtos_from_db(5, cursor=primeira["proximo_cursor"], contar=False)
+    urls = [produto["url"] for produto in primeira["produtos"] + segunda["produtos"]]
+    assert len(set(urls)) == 10
+    assert segunda["proximo_cursor"] is None
+
+
+def test_cursor_codificado_e_decodificado(banco):
+    cursor = banco.codificar_cursor('2024-05-01 12:00:00', 'https://loja/produto')
+    assert '=' not in cursor
+    assert banco.decodificar_cursor(cursor) == ('2024-05-01 12:00:00', 'https://loja/produto')
+    assert banco.decodificar_cursor(banco.codificar_cursor(1990, 'u'), int) == (1990, 'u')
+
+
+@pytest.mark.parametrize('cursor', ['nao-e-base64!', 'W10', 'WzEsMl0'])
+def test_cursor_invalido(banco, cursor):
+    with pytest.raises(ValueError, match='Cursor inválido'):
+        banco.get_all_produtos_from_db(10, cursor=cursor)
+
+
+def test_listagem_por_cursor_usa_o_indice(banco):
+    sql, parametros = banco._consulta_listagem(banco.COLUNAS_LISTAGEM, banco.codificar_cursor('2024-01-01', 'u'))
+    plano = ' '.join(linha[-1] for linha in banco.conexao().execute(f'EXPLAIN QUERY PLAN {sql}', (*parametros, 10, 0)))
+    assert 'idx_produtos_data_atualizacao' in plano
+    assert 'TEMP B-TREE' not in plano
+
+
+def test_endpoint_produtos_com_cursor(banco):
+    _salvar(banco, 7)
+    cliente = webhook_handler.app.test_client()
+    primeira = cliente.get('/produtos?limit=5').get_json()
+    assert primeira["total"] == 7
+    segunda = cliente.get(f'/produtos?limit=5&cursor={primeira["proximo_cursor"]}').get_json()
+    assert segunda["total"] is None
+    assert len(segunda["produtos"]) == 2 and segunda["proximo_cursor"] is None
+    assert cliente.get('/produtos?cursor=invalido').status_code == 400
+
+
+@pytest.mark.parametrize('rota', ['/produtos', '/produtos/consulta', '/produtos/busca?q=cabo',
+                                  '/produtos/alteracoes?desde=2024-01-01'])
+@pytest.mark.parametrize('parametros', ['limit=abc', 'limit=0', 'limit=-1', 'limit=1.5'])
+def test_limit_invalido_nas_listagens(banco, rota, parametros):
+    separador = '&' if '?' in rota else '?'
+    resposta = webhook_handler.app.test_client().get(f'{rota}{separador}{parametros}')
+    assert resposta.status_code == 400
+    assert 'limit' in resposta.get_json()["mensagem"]
+
+
+def test_limit_reduzido_ao_maximo_e_offset_validado(banco, monkeypatch):
+    _salvar(banco, 3)
+    monkeypatch.setattr(webhook_handler, 'LISTAGEM_MAX_LIMIT', 2)
+    cliente = webhook_handler.app.test_client()
+    resposta = cliente.get('/produtos?limit=1000000').get_json()
+    assert resposta["limit"] == 2 and len(resposta["produtos"]) == 2
+    assert cliente.get('/produtos?offset=-1').status_code == 400
+    assert cliente.get('/produtos?offset=x').status_code == 400
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from apoio import pagina_produto, ServidorPaginas
+from cache_produtos import CacheProdutos
+from extracao import impressao_digital
+from produto_scraper import ProdutoScraper
+
+
+@pytest.fixture
+def servidor_sem_etag():
+    with ServidorPaginas(etag=False) as servidor:
+        yield servidor
+
+
+def _cache(banco, scraper):
+    return CacheProdutos(
+        banco.get_produto_from_db, banco.save_produto_to_db, scraper.extrair_info_ciainfor,
+        buscar_validadores=banco.get_validadores_from_db, confirmar=banco.confirmar_produto_no_db,
+    )
+
+
+def test_requisicao_condicional_recebe_304(servidor):
+    servidor.paginas['/produto'] = pagina_produto()
+    scraper = ProdutoScraper()
+    primeiro = scraper.extrair_info_ciainfor(servidor.url('/produto'))
+    assert primeiro["validadores"]["etag"]
+
+    segundo = scraper.extrair_info_ciainfor(servidor.url('/produto'), primeiro["validadores"])
+    assert segundo == {"url": servidor.url('/produto'), "nao_modificado": True}
+    assert servidor.requisicoes[-1][1].get('If-None-Match') == primeiro["validadores"]["etag"]
+    estatisticas = scraper.estatisticas_download()
+    assert estatisticas["revalidacoes"] == 1
+    assert estatisticas["nao_modificadas"] == 1
+
+
+def test_pagina_alterada_e_extraida_novamente(servidor):
+    servidor.paginas['/produto'] = pagina_produto(preco='R$ 10,00')
+    scraper = ProdutoScraper()
+    validadores = scraper.extrair_info_ciainfor(servidor.url('/produto'))["validadores"]
+
+    servidor.paginas['/produto'] = pagina_produto(preco='R$ 12,00')
+    resultado = scraper.extrair_info_ciainfor(servidor.url('/produto'), validadores)
+    assert resultado["preco"] == 'R$ 12,00'
+    assert resultado["validadores"]["etag"] != validadores["etag"]
+
+
+def test_cache_confirma_produto_nao_modificado(banco, servidor):
+    servidor.paginas['/produto'] = pagina_produto()
+    url = servidor.url('/produto')
+    cache = _cache(banco, ProdutoScraper())
+    cache.atualizar(url)
+    assert banco.get_validadores_from_db(url)["etag"]
+
+    salvos = []
+    cache.salvar = salvos.append
+    produto = cache.atualizar(url)
+    assert produto["nome"] == 'Produto de Teste'
+    assert salvos == []
+    assert cache.estatisticas()["nao_modificados"] == 1
+    # Os validadores ficam apenas no banco
+    assert "validadores" not in produto
+
+
+def test_produto_removido_durante_a_revalidacao_e_extraido(banco, servidor):
+    servidor.paginas['/produto'] = pagina_produto()
+    url = servidor.url('/produto')
+    cache = _cache(banco, ProdutoScraper())
+    cache.atualizar(url)
+
+    validadores = banco.get_validadores_from_db(url)
+    cache.buscar_validadores = lambda _: validadores
+    banco.delete_produtos_from_db(url)
+    assert cache.atualizar(url)["nome"] == 'Produto de Teste'
+    assert banco.get_produto_from_db(url) is not None
+
+
+def test_impressao_digital_ignora_trechos_volateis():
+    base = pagina_produto()
+    volatil = base.replace('</head>', '<script>var t = 123;</script><!-- gerado em 10:00 -->'
+                                      '<meta name="csrf-token" content="abc"></head>')
+    assert impressao_digital(base) == impressao_digital(volatil)
+    assert impressao_digital(base.replace('<h1>', ' <h1>')) == impressao_digital(base.replace('<h1>', '\n\t  <h1>'))
+    assert impressao_digital(base) != impressao_digital(pagina_produto(preco='R$ 11,00'))
+    # Dados estruturados fazem parte do conteúdo
+    json_ld = '<script type="application/ld+json">{"price": "%s"}</script>'
+    assert impressao_digital(base + json_ld % 1) != impressao_digital(base + json_ld % 2)
+
+
+def test_conteudo_inalterado_nao_e_analisado_sem_etag(servidor_sem_etag):
+    servidor_sem_etag.paginas['/produto'] = pagina_produto()
+    scraper = ProdutoScraper()
+    validadores = scraper.extrair_info_ciainfor(servidor_sem_etag.url('/produto'))["validadores"]
+    assert validadores["etag"] is None
+
+    servidor_sem_etag.paginas['/produto'] = pagina_produto().replace('</head>', '<script>var t = 2;</script></head>')
+    resultado = scraper.extrair_info_ciainfor(servidor_sem_etag.url('/produto'), validadores)
+    assert resultado.get("nao_modificado") is True
+    assert scraper.estatisticas_download()["conteudo_inalterado"] == 1
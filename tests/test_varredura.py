@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+
+from apoio import pagina_produto
+from produto_scraper import ProdutoScraper
+from varredura_catalogo import VarreduraCatalogo, ler_sitemap
+
+
+def _indice(*locs):
+    entradas = ''.join(f'<sitemap><loc>{loc}</loc></sitemap>' for loc in locs)
+    return f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entradas}</sitemapindex>'
+
+
+def _sitemap(*locs):
+    entradas = ''.join(f'<url><loc>{loc}</loc></url>' for loc in locs)
+    return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entradas}</urlset>'
+
+
+def _varredura(banco, servidor):
+    checkpoint = banco.CheckpointVarredura(max_tentativas=1)
+    checkpoint.iniciar()
+    return VarreduraCatalogo(
+        ProdutoScraper(fator_backoff=0), checkpoint, servidor.url('/sitemap.xml'), concorrencia=2,
+        requisicoes_por_minuto=0, filtro_url='/produto-', buscar_validadores=banco.get_validadores_from_db
+    )
+
+
+def test_ler_sitemap_em_blocos_e_comprimido():
+    xml = _sitemap('https://loja/produto-1', 'https://loja/produto-2').encode()
+    blocos = [xml[i:i + 7] for i in range(0, len(xml), 7)]
+    assert list(ler_sitemap(blocos)) == [('url', 'https://loja/produto-1'), ('url', 'https://loja/produto-2')]
+    comprimido = gzip.compress(_indice('https://loja/a.xml').encode())
+    assert list(ler_sitemap([comprimido[:5], comprimido[5:]])) == [('sitemap', 'https://loja/a.xml')]
+
+
+def test_varredura_retomada_do_checkpoint(banco, servidor):
+    servidor.paginas['/sitemap.xml'] = _indice(servidor.url('/a.xml'), servidor.url('/b.xml'))
+    servidor.paginas['/a.xml'] = _sitemap(servidor.url('/produto-1'), servidor.url('/produto-2'), servidor.url('/sobre'))
+    servidor.paginas['/b.xml'] = _sitemap(servidor.url('/produto-3'))
+    servidor.status['/b.xml'] = 503
+    for indice in (1, 2, 3):
+        servidor.paginas[f'/produto-{indice}'] = pagina_produto(nome=f'Produto {indice}', codigo=f'P-{indice}')
+
+    progresso = _varredura(banco, servidor).executar()
+    assert (progresso['concluida'], progresso['pendente'], progresso['sitemaps_concluidos']) == (2, 0, 1)
+    assert banco.get_produto_from_db(servidor.url('/produto-3')) is None
+
+    # Segunda execução: só o sitemap que falhou e o índice são lidos de novo,
+    # e os produtos já concluídos não são baixados outra vez
+    del servidor.status['/b.xml']
+    progresso = _varredura(banco, servidor).executar()
+    assert (progresso['concluida'], progresso['sitemaps_concluidos']) == (3, 3)
+    assert progresso['extraidos'] == 1
+    assert servidor.acessos['/a.xml'] == 1
+    assert servidor.acessos['/sitemap.xml'] == 2
+    assert [servidor.acessos[f'/produto-{indice}'] for indice in (1, 2, 3)] == [1, 1, 1]
+    assert banco.get_produto_from_db(servidor.url('/produto-3'))["nome"] == 'Produto 3'
+    assert servidor.acessos['/sobre'] == 0
+
+
+def test_urls_em_andamento_voltam_para_a_fila(banco, servidor):
+    servidor.paginas['/sitemap.xml'] = _sitemap(servidor.url('/produto-1'), servidor.url('/produto-2'))
+    for indice in (1, 2):
+        servidor.paginas[f'/produto-{indice}'] = pagina_produto(nome=f'Produto {indice}', codigo=f'P-{indice}')
+    checkpoint = banco.CheckpointVarredura()
+    checkpoint.adicionar_urls([servidor.url('/produto-1'), servidor.url('/produto-2')])
+    checkpoint.concluir_sitemap(servidor.url('/sitemap.xml'))
+    # Processo interrompido com as duas URLs reservadas
+    assert len(checkpoint.reservar(10)) == 2
+    assert checkpoint.progresso()['em_andamento'] == 2
+
+    progresso = _varredura(banco, servidor).executar()
+    assert (progresso['concluida'], progresso['em_andamento'], progresso['extraidos']) == (2, 0, 2)
+    assert servidor.acessos['/sitemap.xml'] == 0
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Varredura do catálogo completo da loja a partir do sitemap.
+
+Lê o índice de sitemaps da loja, registra as URLs de produto de cada sitemap
+e extrai os produtos com várias threads, dentro de um limite de requisições
+por minuto, salvando-os na tabela `produtos`. Assim o webhook quase nunca
+precisa extrair uma página na hora.
+
+Os sitemaps são lidos em streaming (também comprimidos em .gz), sem carregar
+o XML inteiro na memória. O progresso fica no banco
+(`banco_dados.CheckpointVarredura`): uma varredura interrompida é retomada
+de onde parou, e produtos já salvos são revalidados com requisições
+condicionais.
+
+Uso:
+    python varredura_catalogo.py [--sitemap URL] [--concorrencia N]
+                                 [--requisicoes-por-minuto N] [--filtro-url REGEX]
+                                 [--reiniciar]
+"""
+
+import os
+import re
+import sys
+import zlib
+import time
+import signal
+import argparse
+import threading
+import logging
+from lxml import etree
+from limite_taxa import LimiteTaxa
+
+logger = logging.getLogger(__name__)
+
+# Índice de sitemaps (ou sitemap simples) da loja
+SITEMAP = os.environ.get('CATALOGO_SITEMAP', 'https://www.ciainfor.com.br/sitemap.xml')
+
+# Threads de extração e requisições ao site por minuto
+CONCORRENCIA = int(os.environ.get('CATALOGO_CONCORRENCIA', 4))
+REQUISICOES_POR_MINUTO = float(os.environ.get('CATALOGO_REQUISICOES_POR_MINUTO', 60))
+
+# Expressão regular que as URLs de produto devem satisfazer (vazia: todas as URLs dos sitemaps)
+FILTRO_URL = os.environ.get('CATALOGO_FILTRO_URL', '')
+
+# Tentativas de extração de uma URL antes de marcá-la como falha
+MAX_TENTATIVAS = int(os.environ.get('CATALOGO_MAX_TENTATIVAS', 3))
+
+# URLs registradas por transação durante a leitura dos sitemaps
+TAMANHO_LOTE_URLS = 500
+
+# URLs reservadas por thread de extração a cada vez
+TAMANHO_RESERVA = 10
+
+# Intervalo (segundos) entre os registros de progresso no log
+INTERVALO_PROGRESSO = 30
+
+# Tamanho dos blocos lidos da resposta do sitemap
+TAMANHO_BLOCO = 64 * 1024
+
+ASSINATURA_GZIP = b'\x1f\x8b'
+
+
+def _descomprimir(blocos):
+    """Descomprime os blocos de um sitemap .xml.gz (detectado pela assinatura); outros passam intactos"""
+    descompressor = None
+    for bloco in blocos:
+        if not bloco:
+            continue
+        if descompressor is None:
+            if not bloco.startswith(ASSINATURA_GZIP):
+                yield bloco
+                yield from blocos
+                return
+            descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield descompressor.decompress(bloco)
+    if descompressor is not None:
+        yield descompressor.flush()
+
+
+def ler_sitemap(blocos):
+    """
+    Lê um sitemap em streaming a partir de blocos de bytes (comprimidos com
+    gzip ou não), gerando pares (tipo, url): ('sitemap', url) para as
+    entradas de um índice de sitemaps e ('url', url) para as páginas de um
+    sitemap comum.
+    """
+    parser = etree.XMLPullParser(events=('end',), huge_tree=True, resolve_entities=False)
+    for bloco in _descomprimir(iter(blocos)):
+        parser.feed(bloco)
+        for _, elemento in parser.read_events():
+            nome = etree.QName(elemento).localname
+            if nome not in ('sitemap', 'url'):
+                continue
+            for filho in elemento:
+                if etree.QName(filho).localname == 'loc' and filho.text and filho.text.strip():
+                    yield nome, filho.text.strip()
+                    break
+            # Descartar os elementos já lidos, mantendo a memória constante
+            elemento.clear()
+            while elemento.getprevious() is not None:
+                del elemento.getparent()[0]
+    parser.close()
+
+
+class VarreduraCatalogo:
+    """
+    Varre o catálogo a partir do `sitemap`: uma thread lê os sitemaps e
+    registra as URLs no `checkpoint`, enquanto `concorrencia` threads
+    reservam as URLs pendentes e as extraem com o `scraper`.
+    `buscar_validadores(url)`, se informado, torna condicionais as
+    requisições dos produtos já salvos.
+    """
+
+    def __init__(self, scraper, checkpoint, sitemap=None, concorrencia=None, requisicoes_por_minuto=None,
+                 filtro_url=None, buscar_validadores=None):
+        self.scraper = scraper
+        self.checkpoint = checkpoint
+        self.sitemap = sitemap or SITEMAP
+        self.concorrencia = concorrencia or CONCORRENCIA
+        self.limite = LimiteTaxa(requisicoes_por_minuto if requisicoes_por_minuto is not None else REQUISICOES_POR_MINUTO)
+        filtro_url = FILTRO_URL if filtro_url is None else filtro_url
+        self.filtro_url = re.compile(filtro_url) if filtro_url else None
+        self.buscar_validadores = buscar_validadores
+
+        self._parar = threading.Event()
+        self._descoberta_concluida = threading.Event()
+        self._lock = threading.Lock()
+        self._estatisticas = {
+            "sitemaps_lidos": 0,
+            "urls_novas": 0,
+            "extraidos": 0,
+            "nao_modificados": 0,
+            "falhas": 0,
+        }
+
+    def parar(self):
+        """Interrompe a varredura; as URLs reservadas e não processadas voltam a ficar pendentes"""
+        self._parar.set()
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self._estatisticas)
+
+    def _contar(self, chave, quantidade=1):
+        with self._lock:
+            self._estatisticas[chave] += quantidade
+
+    # Leitura dos sitemaps
+
+
+    def _descobrir(self, sitemap, visitados):
+        """
+        Registra as URLs de produto do sitemap, percorrendo os índices
+        recursivamente. Retorna True se o sitemap (e todos os seus filhos)
+        foi registrado por completo.
+        """
+        if sitemap in visitados:
+            return True
+        visitados.add(sitemap)
+        if self.checkpoint.sitemap_concluido(sitemap):
+            logger.info(f"Sitemap já registrado em uma varredura anterior: {sitemap}")
+            return True
+        if not self.limite.aguardar(self._parar):
+            return False
+
+        logger.info(f"Lendo sitemap: {sitemap}")
+        filhos = []
+        lote = []
+        try:
+            response = self.scraper.session.get(sitemap, timeout=self.scraper.timeout, stream=True)
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Erro ao baixar o sitemap {sitemap}: {e}")
+            return False
+        try:
+            # iter_content já desfaz o Content-Encoding; sitemaps .xml.gz são descomprimidos em ler_sitemap
+            for tipo, url in ler_sitemap(response.iter_content(TAMANHO_BLOCO)):
+                if self._parar.is_set():
+                    return False
+                if tipo == 'sitemap':
+                    filhos.append(url)
+                elif self.filtro_url is None or self.filtro_url.search(url):
+                    lote.append(url)
+                    if len(lote) >= TAMANHO_LOTE_URLS:
+                        self._contar("urls_novas", self.checkpoint.adicionar_urls(lote))
+                        lote = []
+        except Exception as e:
+            # As URLs já registradas ficam; o sitemap é lido novamente na próxima execução
+            logger.error(f"Erro ao ler o sitemap {sitemap}: {e}")
+            self._contar("urls_novas", self.checkpoint.adicionar_urls(lote))
+            return False
+        finally:
+            response.close()
+        self._contar("urls_novas", self.checkpoint.adicionar_urls(lote))
+
+        # Um sitemap filho com erro não impede a leitura dos demais
+        completo = True
+        for filho in filhos:
+            completo = self._descobrir(filho, visitados) and completo
+        if not completo:
+            # O índice é lido novamente na próxima execução
+            return False
+        self.checkpoint.concluir_sitemap(sitemap)
+        self._contar("sitemaps_lidos")
+        return True
+
+    def _executar_descoberta(self):
+        try:
+            self._descobrir(self.sitemap, set())
+        except Exception as e:
+            logger.error(f"Erro ao ler os sitemaps ({self.sitemap}): {e}")
+        finally:
+            self._descoberta_concluida.set()
+
+    # Extração dos produtos
+
+    def _extrair(self, url):
+        validadores = self.buscar_validadores(url) if self.buscar_validadores else None
+        info_produto = self.scraper.extrair_info_ciainfor(url, validadores)
+        if info_produto.get("nao_modificado"):
+            self._contar("nao_modificados")
+        elif "erro" in info_produto:
+            self._contar("falhas")
+        else:
+            self._contar("extraidos")
+        return info_produto
+
+    def _executar_extracoes(self):
+        while not self._parar.is_set():
+            # Verificar antes de reservar: URLs registradas depois não ficam para trás
+            descoberta_concluida = self._descoberta_concluida.is_set()
+            urls = self.checkpoint.reservar(TAMANHO_RESERVA)
+            if not urls:
+                if descoberta_concluida:
+                    return
+                self._parar.wait(0.5)
+                continue
+
+            resultados = []
+            try:
+                for url in urls:
+                    if not self.limite.aguardar(self._parar):
+                        break
+                    resultados.append((url, self._extrair(url)))
+            finally:
+                self.checkpoint.concluir(resultados)
+                self.checkpoint.liberar(urls[len(resultados):])
+
+    def _registrar_progresso(self, inicio):
+        progresso = self.checkpoint.progresso()
+        estatisticas = self.estatisticas()
+        processados = estatisticas["extraidos"] + estatisticas["nao_modificados"] + estatisticas["falhas"]
+        minutos = (time.monotonic() - inicio) / 60
+        logger.info(f"Progresso: {progresso['concluida']} concluídas, {progresso['pendente']} pendentes, "
+                    f"{progresso['falha']} com falha ({processados / minutos:.0f} produtos/min)")
+
+    def executar(self):
+        """Executa a varredura até o fim (ou até `parar()`). Retorna o progresso final"""
+        inicio = time.monotonic()
+        descoberta = threading.Thread(target=self._executar_descoberta, name='varredura-sitemaps', daemon=True)
+        descoberta.start()
+        extratores = [
+            threading.Thread(target=self._executar_extracoes, name=f'varredura-extracao-{i}', daemon=True)
+            for i in range(self.concorrencia)
+        ]
+        for extrator in extratores:
+            extrator.start()
+
+        while True:
+            ativos = [extrator for extrator in extratores if extrator.is_alive()]
+            if not ativos:
+                break
+            ativos[0].join(INTERVALO_PROGRESSO)
+            if ativos[0].is_alive():
+                self._registrar_progresso(inicio)
+
+        self._parar.set()
+        descoberta.join()
+        progresso = self.checkpoint.progresso()
+        progresso.update(self.estatisticas())
+        return progresso
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sitemap', default=SITEMAP, help='índice de sitemaps ou sitemap da loja')
+    parser.add_argument('--concorrencia', type=int, default=CONCORRENCIA, help='threads de extração')
+    parser.add_argument('--requisicoes-por-minuto', type=float, default=REQUISICOES_POR_MINUTO)
+    parser.add_argument('--filtro-url', default=FILTRO_URL, help='expressão regular das URLs de produto')
+    parser.add_argument('--max-tentativas', type=int, default=MAX_TENTATIVAS)
+    parser.add_argument('--reiniciar', action='store_true', help='descarta o progresso da varredura anterior')
+    args = parser.parse_args()
+
+    from produto_scraper import ProdutoScraper
+    from banco_dados import init_db, get_validadores_from_db, CheckpointVarredura
+
+    init_db()
+    checkpoint = CheckpointVarredura(args.max_tentativas)
+    checkpoint.iniciar(args.reiniciar)
+    varredura = VarreduraCatalogo(
+        ProdutoScraper(), checkpoint, args.sitemap, args.concorrencia, args.requisicoes_por_minuto,
+        args.filtro_url, buscar_validadores=get_validadores_from_db
+    )
+
+    def encerrar(signum, frame):
+        logger.info("Interrompendo a varredura; o progresso foi salvo e será retomado na próxima execução")
+        varredura.parar()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    progresso = varredura.executar()
+    logger.info(f"Varredura encerrada: {progresso}")
+    return 0 if not progresso['pendente'] and not progresso['em_andamento'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,124 +3,83 @@
 
 import os
 import json
-import sqlite3
+import atexit
 import datetime
 import io
 import csv
-import pandas as pd
+import tempfile
+from decimal import Decimal, InvalidOperation
 from flask import Flask, request, jsonify, Response, send_file
-from produto_scraper import ProdutoScraper
+from produto_scraper import ProdutoScraper, LOTE_MAX_CONCORRENCIA, LOTE_MAX_POR_HOST
+from banco_dados import (
+    init_db, get_produto_from_db, get_produtos_from_db, save_produto_to_db,
+    save_produtos_to_db, get_all_produtos_from_db, delete_produtos_from_db,
+    estatisticas_cache_memoria, get_validadores_from_db, confirmar_produto_no_db, confirmar_produtos_no_db,
+    registrar_acessos_no_db, get_produtos_para_atualizar, contar_produtos_no_db, iterar_produtos_from_db,
+    get_limites_pagina_from_db, consultar_produtos_no_db,
+    get_historico_from_db, get_alteracoes_from_db, buscar_produtos_no_db, LockExtracao, Lideranca
+)
+from cache_produtos import (
+    CacheProdutos, DESATUALIZADO, EXPIRADO,
+    FONTE_CACHE, FONTE_CACHE_DESATUALIZADO, FONTE_CACHE_EXPIRADO, FONTE_WEB, FONTE_WEB_EXPIRADO
+)
+from exportacao import gerar_csv, escrever_xlsx, MIMETYPE_XLSX
+from agendador import AgendadorAtualizacoes, ContadorAcessos, EM_THREAD as AGENDADOR_EM_THREAD, PAPEL as PAPEL_AGENDADOR
+from entrega_webhook import EntregaCallback
+from fila_tarefas import criar_fila
+
+# Inicializa o banco e as tarefas do worker na importação do módulo
+# (desativado pelo gunicorn.conf.py, que faz isso antes e depois do fork)
+INICIAR_NA_IMPORTACAO = os.environ.get('SERVIDOR_INICIAR_NA_IMPORTACAO', 'true').lower() == 'true'
+
+# URLs aceitas por requisição em /produtos/lote
+LOTE_MAX_URLS = int(os.environ.get('LOTE_MAX_URLS', 100))
+
+# Itens por página nas listagens (/produtos, /produtos/consulta, /produtos/busca
+# e /produtos/alteracoes); um `limit` maior é reduzido a este valor
+LISTAGEM_MAX_LIMIT = int(os.environ.get('LISTAGEM_MAX_LIMIT', 1000))
 
 app = Flask(__name__)
 scraper = ProdutoScraper()
 
-# Configuração do banco de dados
-DB_PATH = os.path.join(os.path.dirname(__file__), 'produtos.db')
-
-def init_db():
-    """Inicializa o banco de dados se não existir"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS produtos (
-        url TEXT PRIMARY KEY,
-        nome TEXT,
-        preco TEXT,
-        disponibilidade TEXT,
-        codigo TEXT,
-        descricao TEXT,
-        especificacoes TEXT,
-        data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    conn.commit()
-    conn.close()
-    print(f"Banco de dados inicializado em {DB_PATH}")
-
-def get_produto_from_db(url):
-    """Busca um produto no banco de dados"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM produtos WHERE url = ?', (url,))
-    result = cursor.fetchone()
-    conn.close()
-    
-    if result:
-        colunas = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'descricao', 'especificacoes', 'data_atualizacao']
-        produto = dict(zip(colunas, result))
-        
-        # Converter especificações de volta para lista
-        if produto['especificacoes']:
-            produto['especificacoes'] = json.loads(produto['especificacoes'])
-        else:
-            produto['especificacoes'] = []
-            
-        return produto
-    return None
-
-def save_produto_to_db(produto):
-    """Salva ou atualiza um produto no banco de dados"""
-    if not produto or 'url' not in produto:
-        return False
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Converter especificações para JSON
-    especificacoes_json = json.dumps(produto.get('especificacoes', []), ensure_ascii=False)
-    
-    cursor.execute('''
-    INSERT OR REPLACE INTO produtos 
-    (url, nome, preco, disponibilidade, codigo, descricao, especificacoes, data_atualizacao) 
-    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-    ''', (
-        produto.get('url', ''),
-        produto.get('nome', ''),
-        produto.get('preco', ''),
-        produto.get('disponibilidade', ''),
-        produto.get('codigo', ''),
-        produto.get('descricao', ''),
-        especificacoes_json
-    ))
-    
-    conn.commit()
-    conn.close()
-    return True
-
-def get_all_produtos_from_db(limit=100, offset=0):
-    """Obtém todos os produtos do banco de dados com paginação"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM produtos')
-    total = cursor.fetchone()[0]
-    
-    cursor.execute('''
-    SELECT url, nome, preco, disponibilidade, codigo, data_atualizacao 
-    FROM produtos ORDER BY data_atualizacao DESC LIMIT ? OFFSET ?
-    ''', (limit, offset))
-    
-    results = cursor.fetchall()
-    conn.close()
-    
-    produtos = []
-    for result in results:
-        colunas = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'data_atualizacao']
-        produto = dict(zip(colunas, result))
-        produtos.append(produto)
-    
-    return {
-        'total': total,
-        'limit': limit,
-        'offset': offset,
-        'produtos': produtos
-    }
+# Fila persistente de extrações, consumida pelo trabalhador separado (python fila_tarefas.py)
+fila = criar_fila()
+
+acessos = ContadorAcessos(registrar_acessos_no_db)
+atexit.register(acessos.descarregar)
+
+# Política de validade do cache (fresco / desatualizado / expirado)
+# Extrações simultâneas da mesma URL são coalescidas, inclusive entre workers
+cache = CacheProdutos(
+    get_produto_from_db, save_produto_to_db, scraper.extrair_info_ciainfor,
+    lock_distribuido=LockExtracao(),
+    # Revalidação condicional (ETag / Last-Modified) dos produtos já salvos
+    buscar_validadores=get_validadores_from_db, confirmar=confirmar_produto_no_db,
+    # Acessos por URL, usados na prioridade das atualizações agendadas
+    registrar_acesso=acessos.registrar
+)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint para verificar se o serviço está online"""
     return jsonify({"status": "online"})
 
+@app.route('/metricas', methods=['GET'])
+def metricas():
+    """Endpoint com métricas de desempenho do worker (conexões HTTP, downloads e cache)"""
+    return jsonify({
+        "status": "sucesso",
+        "conexoes_http": scraper.estatisticas_conexoes(),
+        "downloads": scraper.estatisticas_download(),
+        "cache": cache.estatisticas(),
+        "cache_memoria": estatisticas_cache_memoria(),
+        "coalescencia": cache.extracao.estatisticas(),
+        "acessos": acessos.estatisticas(),
+        "agendador": agendador.estatisticas(),
+        "webhook_assincrono": entrega.estatisticas(),
+        "fila_tarefas": fila.estatisticas()
+    })
+
 @app.route('/produto', methods=['GET'])
 def get_produto():
     """Endpoint para extrair informações de um produto a partir da URL"""
@@ -131,29 +90,8 @@ def get_produto():
     # Verificar se deve forçar atualização
     force_update = request.args.get('force', 'false').lower() == 'true'
     
-    # Verificar se o produto já está no banco de dados
-    produto_db = None if force_update else get_produto_from_db(url)
-    
-    if produto_db and not force_update:
-        # Produto encontrado no banco, retornar diretamente
-        resposta = scraper.formatar_resposta(produto_db)
-        return Response(
-            json.dumps({
-                "status": "sucesso",
-                "resposta": resposta,
-                "dados_produto": produto_db,
-                "fonte": "cache"
-            }, ensure_ascii=False),
-            status=200,
-            mimetype='application/json'
-        )
-    
-    # Produto não encontrado no banco ou forçando atualização, extrair informações
-    info_produto = scraper.extrair_info_ciainfor(url)
-    
-    # Salvar no banco de dados
-    if "erro" not in info_produto:
-        save_produto_to_db(info_produto)
+    # Buscar no cache conforme a validade, ou extrair informações
+    info_produto, fonte = cache.obter(url, force_update)
     
     # Formatar resposta
     resposta = scraper.formatar_resposta(info_produto)
@@ -163,7 +101,115 @@ def get_produto():
             "status": "sucesso",
             "resposta": resposta,
             "dados_produto": info_produto,
-            "fonte": "web"
+            "fonte": fonte
+        }, ensure_ascii=False),
+        status=200,
+        mimetype='application/json'
+    )
+
+@app.route('/produtos/lote', methods=['POST'])
+def get_produtos_lote():
+    """Endpoint para extrair informações de vários produtos de uma vez (cache + extração concorrente)"""
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not urls or not isinstance(urls, list):
+        return jsonify({"status": "erro", "mensagem": "Lista de URLs não fornecida"}), 400
+    if len(urls) > LOTE_MAX_URLS:
+        return jsonify({"status": "erro", "mensagem": f"No máximo {LOTE_MAX_URLS} URLs por requisição"}), 400
+    if not all(isinstance(url, str) and url.startswith(('http://', 'https://')) for url in urls):
+        return jsonify({"status": "erro", "mensagem": "URLs inválidas"}), 400
+    
+    # Concorrência pedida pelo cliente, limitada aos máximos do servidor
+    try:
+        max_concorrencia = min(int(data.get('max_concorrencia') or LOTE_MAX_CONCORRENCIA), LOTE_MAX_CONCORRENCIA)
+        max_por_host = min(int(data.get('max_por_host') or LOTE_MAX_POR_HOST), LOTE_MAX_POR_HOST)
+    except (TypeError, ValueError):
+        return jsonify({"status": "erro", "mensagem": "max_concorrencia e max_por_host devem ser inteiros"}), 400
+    if max_concorrencia < 1 or max_por_host < 1:
+        return jsonify({"status": "erro", "mensagem": "max_concorrencia e max_por_host devem ser positivos"}), 400
+    
+    for url in urls:
+        acessos.registrar(url)
+    
+    # Verificar se deve forçar atualização
+    force_update = bool(data.get('force', False))
+    
+    # Buscar no banco os produtos já conhecidos; os desatualizados são servidos
+    # e atualizados em segundo plano, os expirados são extraídos novamente
+    produtos_db = {} if force_update else get_produtos_from_db(urls)
+    fontes = {}
+    expirados = {}
+    for url, produto_db in list(produtos_db.items()):
+        estado = cache.classificar(produto_db)
+        if estado == EXPIRADO:
+            expirados[url] = produtos_db.pop(url)
+            fontes[url] = FONTE_WEB_EXPIRADO
+        elif estado == DESATUALIZADO:
+            cache.atualizar_em_segundo_plano(url)
+            fontes[url] = FONTE_CACHE_DESATUALIZADO
+        else:
+            fontes[url] = FONTE_CACHE
+    
+    # Extrair apenas os produtos que não estão no cache
+    faltantes = [url for url in dict.fromkeys(urls) if url not in produtos_db]
+    extraidos = {}
+    if faltantes:
+        # Produtos já salvos (expirados ou forçados) são revalidados condicionalmente
+        validadores = {}
+        for url in faltantes:
+            validadores_url = get_validadores_from_db(url)
+            if validadores_url:
+                validadores[url] = validadores_url
+        resultados = scraper.extrair_lote(
+            faltantes,
+            max_concorrencia=max_concorrencia,
+            max_por_host=max_por_host,
+            validadores=validadores
+        )
+        nao_modificados = []
+        for url, info_produto in zip(faltantes, resultados):
+            if info_produto.get("nao_modificado"):
+                nao_modificados.append(url)
+            elif "erro" not in info_produto:
+                extraidos[url] = info_produto
+            elif url in expirados:
+                # Falha ao atualizar um produto expirado: servir o dado antigo
+                produtos_db[url] = expirados[url]
+                fontes[url] = FONTE_CACHE_EXPIRADO
+            else:
+                extraidos[url] = info_produto
+        
+        # Salvar os produtos extraídos em uma única transação
+        save_produtos_to_db([info for info in extraidos.values() if "erro" not in info])
+        for info_produto in extraidos.values():
+            info_produto.pop("validadores", None)
+        
+        # Páginas não modificadas: apenas confirmar os produtos do banco, sem regravá-los
+        confirmados = confirmar_produtos_no_db(nao_modificados)
+        for url in nao_modificados:
+            if url in confirmados:
+                extraidos[url] = confirmados[url]
+            elif url in expirados:
+                produtos_db[url] = expirados[url]
+                fontes[url] = FONTE_CACHE_EXPIRADO
+            else:
+                extraidos[url] = {"erro": "Produto removido durante a revalidação", "url": url}
+    
+    # Montar resultados na ordem de entrada
+    produtos = []
+    for url in urls:
+        if url in produtos_db:
+            produtos.append({"dados_produto": produtos_db[url], "fonte": fontes[url]})
+        else:
+            produtos.append({"dados_produto": extraidos[url], "fonte": fontes.get(url, FONTE_WEB)})
+    
+    return Response(
+        json.dumps({
+            "status": "sucesso",
+            "total": len(produtos),
+            "cache": sum(1 for url in urls if url in produtos_db),
+            "extraidos": len(faltantes),
+            "produtos": produtos
         }, ensure_ascii=False),
         status=200,
         mimetype='application/json'
@@ -179,21 +225,8 @@ def get_produto_tabular():
     # Verificar se deve forçar atualização
     force_update = request.args.get('force', 'false').lower() == 'true'
     
-    # Verificar se o produto já está no banco de dados
-    produto_db = None if force_update else get_produto_from_db(url)
-    
-    if produto_db and not force_update:
-        # Produto encontrado no banco, usar dados do cache
-        info_produto = produto_db
-        fonte = "cache"
-    else:
-        # Produto não encontrado no banco ou forçando atualização, extrair informações
-        info_produto = scraper.extrair_info_ciainfor(url)
-        fonte = "web"
-        
-        # Salvar no banco de dados
-        if "erro" not in info_produto:
-            save_produto_to_db(info_produto)
+    # Buscar no cache conforme a validade, ou extrair informações
+    info_produto, fonte = cache.obter(url, force_update)
     
     # Organizar dados em formato tabular
     dados_tabulares = {
@@ -250,19 +283,12 @@ def get_produto_excel():
     # Verificar se deve forçar atualização
     force_update = request.args.get('force', 'false').lower() == 'true'
     
-    # Verificar se o produto já está no banco de dados
-    produto_db = None if force_update else get_produto_from_db(url)
+    # Buscar no cache conforme a validade, ou extrair informações
+    info_produto, fonte = cache.obter(url, force_update)
     
-    if produto_db and not force_update:
-        # Produto encontrado no banco, usar dados do cache
-        info_produto = produto_db
-    else:
-        # Produto não encontrado no banco ou forçando atualização, extrair informações
-        info_produto = scraper.extrair_info_ciainfor(url)
-        
-        # Salvar no banco de dados
-        if "erro" not in info_produto:
-            save_produto_to_db(info_produto)
+    # O pandas (e com ele o NumPy) só é carregado no primeiro uso, e não na
+    # inicialização de cada worker
+    import pandas as pd
     
     # Criar DataFrame com informações principais
     dados_principais = {
@@ -320,7 +346,8 @@ def get_produto_excel():
             output.getvalue(),
             mimetype='text/csv',
             headers={
-                'Content-Disposition': f'attachment; filename="{nome_arquivo}"'
+                'Content-Disposition': f'attachment; filename="{nome_arquivo}"',
+                'X-Fonte': fonte
             }
         )
     else:
@@ -345,85 +372,100 @@ def get_produto_excel():
         nome_produto = info_produto.get('nome', 'produto').replace(' ', '_')[:30]
         nome_arquivo = f"{nome_produto}.xlsx"
         
-        return send_file(
+        resposta = send_file(
             output,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name=nome_arquivo
         )
+        resposta.headers['X-Fonte'] = fonte
+        return resposta
+
+def _inteiro(nome, padrao, minimo=0):
+    """Parâmetro inteiro da URL (`padrao` se ausente); ValueError se não for inteiro ou for menor que `minimo`"""
+    valor = request.args.get(nome)
+    if valor is None or valor == '':
+        return padrao
+    try:
+        numero = int(valor)
+    except ValueError:
+        numero = None
+    if numero is None or numero < minimo:
+        raise ValueError(f"Parâmetro {nome} inválido: {valor}")
+    return numero
 
 @app.route('/produtos_excel', methods=['GET'])
 def get_produtos_excel():
-    """Endpoint para listar todos os produtos do banco de dados como arquivo Excel"""
+    """
+    Endpoint para listar todos os produtos do banco de dados como arquivo Excel.
+    As linhas são lidas do banco e escritas aos poucos (memória constante);
+    tudo=true exporta o catálogo inteiro. Como em /produtos, aceita `cursor`;
+    o cursor da parte seguinte vem no cabeçalho X-Proximo-Cursor.
+    """
     # Verificar formato de saída (csv ou xlsx)
     formato = request.args.get('formato', 'xlsx').lower()
     if formato not in ['csv', 'xlsx']:
         formato = 'xlsx'  # Padrão para Excel
     
-    # Obter produtos do banco de dados
-    limit = int(request.args.get('limit', 1000))
-    offset = int(request.args.get('offset', 0))
+    cursor = request.args.get('cursor') or None
+    tudo = request.args.get('tudo', 'false').lower() == 'true'
     
-    resultado = get_all_produtos_from_db(limit, offset)
-    produtos = resultado['produtos']
-    
-    if not produtos:
+    try:
+        limit = None if tudo else _inteiro('limit', 1000)
+        offset = _inteiro('offset', 0)
+        limites = get_limites_pagina_from_db(limit, offset, cursor)
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+    if limites['vazia']:
         return jsonify({"status": "erro", "mensagem": "Nenhum produto encontrado no banco de dados"}), 404
+    cabecalhos = {'X-Proximo-Cursor': limites['proximo_cursor']} if limites['proximo_cursor'] else {}
     
-    # Criar DataFrame com produtos
-    df_produtos = pd.DataFrame(produtos)
-    
-    # Formatar data de atualização
-    if 'data_atualizacao' in df_produtos.columns:
-        df_produtos['data_atualizacao'] = pd.to_datetime(df_produtos['data_atualizacao']).dt.strftime('%d/%m/%Y %H:%M:%S')
-    
-    # Renomear colunas para português
-    colunas_pt = {
-        'url': 'URL',
-        'nome': 'Nome',
-        'preco': 'Preço',
-        'disponibilidade': 'Disponibilidade',
-        'codigo': 'Código',
-        'data_atualizacao': 'Data de Atualização'
-    }
-    df_produtos = df_produtos.rename(columns=colunas_pt)
+    linhas = iterar_produtos_from_db(limit, offset, cursor)
     
-    # Criar arquivo de saída
     if formato == 'csv':
-        # Criar CSV
-        output = io.StringIO()
-        df_produtos.to_csv(output, index=False)
-        output.seek(0)
-        
+        # CSV enviado em partes, à medida que as linhas são lidas
         return Response(
-            output.getvalue(),
+            gerar_csv(linhas),
             mimetype='text/csv',
             headers={
-                'Content-Disposition': 'attachment; filename="produtos.csv"'
+                'Content-Disposition': 'attachment; filename="produtos.csv"',
+                **cabecalhos
             }
         )
-    else:
-        # Criar Excel (XLSX)
-        output = io.BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df_produtos.to_excel(writer, sheet_name='Produtos', index=False)
-            
-            # Adicionar informações sobre a exportação
-            info = {
-                'Informação': ['Total de Produtos', 'Data de Exportação'],
-                'Valor': [resultado['total'], datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')]
-            }
-            pd.DataFrame(info).to_excel(writer, sheet_name='Informações', index=False)
-        
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name='produtos.xlsx'
-        )
+    
+    # Excel (XLSX) escrito em um arquivo temporário e enviado em blocos
+    arquivo = tempfile.TemporaryFile()
+    try:
+        escrever_xlsx(linhas, contar_produtos_no_db(), arquivo)
+    except BaseException:
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    
+    resposta = send_file(
+        arquivo,
+        mimetype=MIMETYPE_XLSX,
+        as_attachment=True,
+        download_name='produtos.xlsx'
+    )
+    resposta.headers.update(cabecalhos)
+    return resposta
+
+def _resposta_webhook(resultado):
+    """Corpo da resposta do webhook (e do callback, no modo assíncrono)"""
+    return {
+        "status": "sucesso",
+        "resposta": scraper.formatar_resposta(resultado),
+        "dados_produto": resultado
+    }
+
+def _processar_webhook(tarefa):
+    """Extração de uma mensagem aceita no modo assíncrono, executada pelas threads de entrega"""
+    return _resposta_webhook(cache.atualizar(tarefa["url"], acesso=True))
+
+# Modo assíncrono do webhook (WEBHOOK_ASSINCRONO=true e WEBHOOK_CALLBACK_URL):
+# responde 202 e entrega o resultado por POST na URL de callback
+entrega = EntregaCallback(_processar_webhook)
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
@@ -432,22 +474,23 @@ def webhook():
         data = request.json
         mensagem = data.get('message', '')
         
-        # Processar a mensagem
-        resultado = scraper.processar_mensagem(mensagem)
-        
-        # Se encontrou um produto, salvar no banco
-        if "erro" not in resultado and "url" in resultado:
-            save_produto_to_db(resultado)
-        
-        # Formatar resposta
-        resposta = scraper.formatar_resposta(resultado)
+        if entrega.ativa:
+            url, erro = scraper.identificar_url(mensagem)
+            if erro is None:
+                # A extração e a resposta ficam para as threads de entrega
+                id_tarefa = entrega.enfileirar(url, requisicao=data)
+                if id_tarefa is None:
+                    return jsonify({"status": "erro", "mensagem": "Fila de mensagens cheia, tente novamente"}), 503
+                return jsonify({"status": "aceito", "id": id_tarefa, "url": url}), 202
+            # Mensagem sem pedido de produto válido: respondida na hora, sem callback
+            resultado = erro
+        else:
+            # Processar a mensagem; a extração (coalescida com as simultâneas
+            # da mesma URL) salva o produto no banco
+            resultado = scraper.processar_mensagem(mensagem, extrair=lambda url: cache.atualizar(url, acesso=True))
         
         return Response(
-            json.dumps({
-                "status": "sucesso",
-                "resposta": resposta,
-                "dados_produto": resultado
-            }, ensure_ascii=False),
+            json.dumps(_resposta_webhook(resultado), ensure_ascii=False),
             status=200,
             mimetype='application/json'
         )
@@ -461,13 +504,27 @@ def webhook():
             mimetype='application/json'
         )
 
+def _limit_listagem(padrao):
+    """`limit` de uma listagem, de 1 até LISTAGEM_MAX_LIMIT; ValueError se inválido"""
+    return min(_inteiro('limit', padrao, minimo=1), LISTAGEM_MAX_LIMIT)
+
 @app.route('/produtos', methods=['GET'])
 def listar_produtos():
-    """Endpoint para listar todos os produtos no banco de dados"""
-    limit = int(request.args.get('limit', 100))
-    offset = int(request.args.get('offset', 0))
+    """
+    Endpoint para listar todos os produtos no banco de dados. Para percorrer
+    a lista inteira, passe em `cursor` o `proximo_cursor` da página anterior
+    (custo constante em qualquer página, ao contrário de `offset`). O total
+    é contado por padrão apenas sem cursor; `total=true|false` decide.
+    """
+    cursor = request.args.get('cursor') or None
+    contar = request.args.get('total', 'false' if cursor else 'true').lower() == 'true'
     
-    resultado = get_all_produtos_from_db(limit, offset)
+    try:
+        limit = _limit_listagem(100)
+        offset = _inteiro('offset', 0)
+        resultado = get_all_produtos_from_db(limit, offset, cursor, contar)
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
     
     return Response(
         json.dumps({
@@ -475,39 +532,192 @@ def listar_produtos():
             "total": resultado['total'],
             "limit": resultado['limit'],
             "offset": resultado['offset'],
+            "proximo_cursor": resultado['proximo_cursor'],
             "produtos": resultado['produtos']
         }, ensure_ascii=False),
         status=200,
         mimetype='application/json'
     )
 
+def _centavos(valor):
+    """Preço em reais de um parâmetro ("1234.56" ou "1234,56") em centavos; ValueError se inválido"""
+    try:
+        numero = Decimal(valor.strip().replace(',', '.'))
+    except InvalidOperation as e:
+        raise ValueError(f"Preço inválido: {valor}") from e
+    if not numero.is_finite() or numero < 0:
+        raise ValueError(f"Preço inválido: {valor}")
+    return int((numero * 100).quantize(Decimal('1')))
+
+@app.route('/produtos/consulta', methods=['GET'])
+def consultar_produtos():
+    """
+    Endpoint para consultar os produtos do banco por faixa de preço (em reais,
+    `preco_min` e `preco_max`) e disponibilidade (`disponivel`,
+    `indisponivel` ou `nao_informado`), ordenados pelo preço (`ordem=preco`
+    ou `ordem=-preco`). A paginação é por `cursor`, como em /produtos.
+    """
+    ordem = request.args.get('ordem', 'preco')
+    if ordem not in ('preco', '-preco'):
+        return jsonify({"status": "erro", "mensagem": f"Ordem inválida: {ordem}"}), 400
+    
+    try:
+        limit = _limit_listagem(100)
+        preco_min = _centavos(request.args['preco_min']) if request.args.get('preco_min') else None
+        preco_max = _centavos(request.args['preco_max']) if request.args.get('preco_max') else None
+        resultado = consultar_produtos_no_db(
+            preco_min, preco_max, request.args.get('disponibilidade') or None,
+            decrescente=ordem == '-preco', limit=limit, cursor=request.args.get('cursor') or None
+        )
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+    
+    return Response(
+        json.dumps({
+            "status": "sucesso",
+            "limit": limit,
+            "proximo_cursor": resultado['proximo_cursor'],
+            "produtos": resultado['produtos']
+        }, ensure_ascii=False),
+        status=200,
+        mimetype='application/json'
+    )
+
+@app.route('/produtos/busca', methods=['GET'])
+def buscar_produtos():
+    """
+    Endpoint de busca textual nos produtos do banco (nome, código, descrição
+    e especificações) a partir de um trecho do nome (`q`), com as palavras
+    tratadas como prefixos, resultados ordenados por relevância e um trecho
+    com os termos destacados
+    """
+    consulta = request.args.get('q', '')
+    
+    try:
+        resultados = buscar_produtos_no_db(consulta, _limit_listagem(20))
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 503
+    
+    return Response(
+        json.dumps({
+            "status": "sucesso",
+            "consulta": consulta,
+            "resultados": resultados
+        }, ensure_ascii=False),
+        status=200,
+        mimetype='application/json'
+    )
+
+@app.route('/produto/historico', methods=['GET'])
+def get_historico_produto():
+    """Endpoint com as mudanças de preço e disponibilidade de um produto"""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({"status": "erro", "mensagem": "URL não fornecida"}), 400
+    
+    return Response(
+        json.dumps({
+            "status": "sucesso",
+            "url": url,
+            "historico": get_historico_from_db(url)
+        }, ensure_ascii=False),
+        status=200,
+        mimetype='application/json'
+    )
+
+@app.route('/produtos/alteracoes', methods=['GET'])
+def get_alteracoes_produtos():
+    """
+    Endpoint com as mudanças de preço e disponibilidade de todos os produtos
+    registradas depois de `desde` (data ISO 8601, UTC se sem fuso), paginadas
+    por `cursor`, como em /produtos
+    """
+    desde = request.args.get('desde')
+    cursor = request.args.get('cursor') or None
+    if not desde and not cursor:
+        return jsonify({"status": "erro", "mensagem": "Data inicial (desde) não fornecida"}), 400
+    
+    try:
+        limit = _limit_listagem(100)
+        resultado = get_alteracoes_from_db(desde, limit, cursor)
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+    
+    return Response(
+        json.dumps({
+            "status": "sucesso",
+            "limit": limit,
+            "proximo_cursor": resultado['proximo_cursor'],
+            "alteracoes": resultado['alteracoes']
+        }, ensure_ascii=False),
+        status=200,
+        mimetype='application/json'
+    )
+
+@app.route('/tarefas', methods=['POST'])
+def adicionar_tarefas():
+    """Endpoint para colocar extrações na fila persistente (processadas por fila_tarefas.py)"""
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not urls or not isinstance(urls, list):
+        return jsonify({"status": "erro", "mensagem": "Lista de URLs não fornecida"}), 400
+    if not all(isinstance(url, str) and url.startswith(('http://', 'https://')) for url in urls):
+        return jsonify({"status": "erro", "mensagem": "URLs inválidas"}), 400
+    try:
+        prioridade = int(data.get('prioridade', 0))
+    except (TypeError, ValueError):
+        return jsonify({"status": "erro", "mensagem": "Prioridade inválida"}), 400
+    
+    ids = fila.adicionar(urls, prioridade)
+    return jsonify({"status": "aceito", "ids": ids}), 202
+
+@app.route('/tarefas/<int:id_tarefa>', methods=['GET'])
+def get_tarefa(id_tarefa):
+    """Endpoint para consultar o estado de uma tarefa da fila"""
+    tarefa = fila.buscar(id_tarefa)
+    if tarefa is None:
+        return jsonify({"status": "erro", "mensagem": "Tarefa não encontrada"}), 404
+    return jsonify({"status": "sucesso", "tarefa": tarefa})
+
 @app.route('/limpar_cache', methods=['POST'])
 def limpar_cache():
     """Endpoint para limpar o cache de um produto específico ou todos os produtos"""
     url = request.json.get('url', None)
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    delete_produtos_from_db(url)
     
     if url:
         # Limpar cache de um produto específico
-        cursor.execute('DELETE FROM produtos WHERE url = ?', (url,))
         mensagem = f"Cache limpo para o produto: {url}"
     else:
         # Limpar todo o cache
-        cursor.execute('DELETE FROM produtos')
         mensagem = "Cache de todos os produtos foi limpo"
     
-    conn.commit()
-    conn.close()
-    
     return jsonify({
         "status": "sucesso",
         "mensagem": mensagem
     })
 
-# Inicializar o banco de dados ao iniciar o aplicativo
-init_db()
+# Atualização agendada dos produtos em uma thread do servidor (AGENDADOR_THREAD=true);
+# cada worker inicia a sua, mas só o que detém a liderança no banco atualiza.
+# De preferência, rodar o agendador em processo separado (python agendador.py)
+agendador = AgendadorAtualizacoes(
+    cache.atualizar, get_produtos_para_atualizar, lideranca=Lideranca(PAPEL_AGENDADOR)
+)
+
+def iniciar_worker():
+    """Tarefas em segundo plano do worker; com o app pré-carregado, chamada depois do fork"""
+    if AGENDADOR_EM_THREAD:
+        agendador.iniciar()
+
+# Inicializar o banco de dados e o worker ao importar o aplicativo; com o
+# gunicorn.conf.py, o banco é inicializado uma vez no processo mestre e cada
+# worker é iniciado depois do fork
+if INICIAR_NA_IMPORTACAO:
+    init_db()
+    iniciar_worker()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
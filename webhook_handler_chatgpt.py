@@ -3,87 +3,26 @@
 
 import os
 import json
-import sqlite3
+import atexit
 import datetime
 from flask import Flask, request, jsonify, Response
 from produto_scraper import ProdutoScraper
+from banco_dados import (
+    init_db, get_produto_from_db, save_produto_to_db, estatisticas_cache_memoria,
+    get_validadores_from_db, confirmar_produto_no_db, registrar_acessos_no_db,
+    get_produtos_para_atualizar, LockExtracao, Lideranca
+)
+from cache_produtos import CacheProdutos
+from agendador import AgendadorAtualizacoes, ContadorAcessos, EM_THREAD as AGENDADOR_EM_THREAD, PAPEL as PAPEL_AGENDADOR
+from entrega_webhook import EntregaCallback
+
+# Inicializa o banco e as tarefas do worker na importação do módulo
+# (desativado pelo gunicorn.conf.py, que faz isso antes e depois do fork)
+INICIAR_NA_IMPORTACAO = os.environ.get('SERVIDOR_INICIAR_NA_IMPORTACAO', 'true').lower() == 'true'
 
 app = Flask(__name__)
 scraper = ProdutoScraper()
 
-# Configuração do banco de dados
-DB_PATH = os.path.join(os.path.dirname(__file__), 'produtos.db')
-
-def init_db():
-    """Inicializa o banco de dados se não existir"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS produtos (
-        url TEXT PRIMARY KEY,
-        nome TEXT,
-        preco TEXT,
-        disponibilidade TEXT,
-        codigo TEXT,
-        descricao TEXT,
-        especificacoes TEXT,
-        data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    conn.commit()
-    conn.close()
-    print(f"Banco de dados inicializado em {DB_PATH}")
-
-def get_produto_from_db(url):
-    """Busca um produto no banco de dados"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM produtos WHERE url = ?', (url,))
-    result = cursor.fetchone()
-    conn.close()
-    
-    if result:
-        colunas = ['url', 'nome', 'preco', 'disponibilidade', 'codigo', 'descricao', 'especificacoes', 'data_atualizacao']
-        produto = dict(zip(colunas, result))
-        
-        # Converter especificações de volta para lista
-        if produto['especificacoes']:
-            produto['especificacoes'] = json.loads(produto['especificacoes'])
-        else:
-            produto['especificacoes'] = []
-            
-        return produto
-    return None
-
-def save_produto_to_db(produto):
-    """Salva ou atualiza um produto no banco de dados"""
-    if not produto or 'url' not in produto:
-        return False
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Converter especificações para JSON
-    especificacoes_json = json.dumps(produto.get('especificacoes', []), ensure_ascii=False)
-    
-    cursor.execute('''
-    INSERT OR REPLACE INTO produtos 
-    (url, nome, preco, disponibilidade, codigo, descricao, especificacoes, data_atualizacao) 
-    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-    ''', (
-        produto.get('url', ''),
-        produto.get('nome', ''),
-        produto.get('preco', ''),
-        produto.get('disponibilidade', ''),
-        produto.get('codigo', ''),
-        produto.get('descricao', ''),
-        especificacoes_json
-    ))
-    
-    conn.commit()
-    conn.close()
-    return True
-
 def formatar_para_chatgpt(info_produto):
     """
     Formata as informações do produto em um formato otimizado para o ChatGPT,
@@ -153,11 +92,40 @@ Link do Produto: {info_produto.get('url', '')}
         "chatgpt_texto": chatgpt_texto
     }
 
+acessos = ContadorAcessos(registrar_acessos_no_db)
+atexit.register(acessos.descarregar)
+
+# Política de validade do cache (fresco / desatualizado / expirado)
+# Extrações simultâneas da mesma URL são coalescidas, inclusive entre workers
+cache = CacheProdutos(
+    get_produto_from_db, save_produto_to_db, scraper.extrair_info_ciainfor,
+    lock_distribuido=LockExtracao(),
+    # Revalidação condicional (ETag / Last-Modified) dos produtos já salvos
+    buscar_validadores=get_validadores_from_db, confirmar=confirmar_produto_no_db,
+    # Acessos por URL, usados na prioridade das atualizações agendadas
+    registrar_acesso=acessos.registrar
+)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint para verificar se o serviço está online"""
     return jsonify({"status": "online"})
 
+@app.route('/metricas', methods=['GET'])
+def metricas():
+    """Endpoint com métricas de desempenho do worker (conexões HTTP, downloads e cache)"""
+    return jsonify({
+        "status": "sucesso",
+        "conexoes_http": scraper.estatisticas_conexoes(),
+        "downloads": scraper.estatisticas_download(),
+        "cache": cache.estatisticas(),
+        "cache_memoria": estatisticas_cache_memoria(),
+        "coalescencia": cache.extracao.estatisticas(),
+        "acessos": acessos.estatisticas(),
+        "agendador": agendador.estatisticas(),
+        "webhook_assincrono": entrega.estatisticas()
+    })
+
 @app.route('/produto', methods=['GET'])
 def get_produto():
     """Endpoint para extrair informações de um produto a partir da URL"""
@@ -171,25 +139,13 @@ def get_produto():
     # Verificar formato (completo ou chatgpt)
     formato = request.args.get('formato', 'completo').lower()
     
-    # Verificar se o produto já está no banco de dados
-    produto_db = None if force_update else get_produto_from_db(url)
-    
-    if produto_db and not force_update:
-        # Produto encontrado no banco, retornar diretamente
-        info_produto = produto_db
-        fonte = "cache"
-    else:
-        # Produto não encontrado no banco ou forçando atualização, extrair informações
-        info_produto = scraper.extrair_info_ciainfor(url)
-        fonte = "web"
-        
-        # Salvar no banco de dados
-        if "erro" not in info_produto:
-            save_produto_to_db(info_produto)
+    # Buscar no cache conforme a validade, ou extrair informações
+    info_produto, fonte = cache.obter(url, force_update)
     
     # Formatar resposta conforme o formato solicitado
     if formato == 'chatgpt':
         resposta = formatar_para_chatgpt(info_produto)
+        resposta["fonte"] = fonte
     else:
         resposta = {
             "status": "sucesso",
@@ -204,6 +160,24 @@ def get_produto():
         mimetype='application/json'
     )
 
+def _resposta_webhook(resultado, formato):
+    """Corpo da resposta do webhook (e do callback, no modo assíncrono) conforme o formato solicitado"""
+    if formato == 'chatgpt':
+        return formatar_para_chatgpt(resultado)
+    return {
+        "status": "sucesso",
+        "resposta": scraper.formatar_resposta(resultado),
+        "dados_produto": resultado
+    }
+
+def _processar_webhook(tarefa):
+    """Extração de uma mensagem aceita no modo assíncrono, executada pelas threads de entrega"""
+    return _resposta_webhook(cache.atualizar(tarefa["url"], acesso=True), tarefa["formato"])
+
+# Modo assíncrono do webhook (WEBHOOK_ASSINCRONO=true e WEBHOOK_CALLBACK_URL):
+# responde 202 e entrega o resultado por POST na URL de callback
+entrega = EntregaCallback(_processar_webhook)
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Endpoint para processar webhooks do Whaticket"""
@@ -214,25 +188,23 @@ def webhook():
         # Verificar formato (completo ou chatgpt)
         formato = request.args.get('formato', 'chatgpt').lower()
         
-        # Processar a mensagem
-        resultado = scraper.processar_mensagem(mensagem)
-        
-        # Se encontrou um produto, salvar no banco
-        if "erro" not in resultado and "url" in resultado:
-            save_produto_to_db(resultado)
-        
-        # Formatar resposta conforme o formato solicitado
-        if formato == 'chatgpt':
-            resposta = formatar_para_chatgpt(resultado)
+        if entrega.ativa:
+            url, erro = scraper.identificar_url(mensagem)
+            if erro is None:
+                # A extração e a resposta ficam para as threads de entrega
+                id_tarefa = entrega.enfileirar(url, formato=formato, requisicao=data)
+                if id_tarefa is None:
+                    return jsonify({"status": "erro", "mensagem": "Fila de mensagens cheia, tente novamente"}), 503
+                return jsonify({"status": "aceito", "id": id_tarefa, "url": url}), 202
+            # Mensagem sem pedido de produto válido: respondida na hora, sem callback
+            resultado = erro
         else:
-            resposta = {
-                "status": "sucesso",
-                "resposta": scraper.formatar_resposta(resultado),
-                "dados_produto": resultado
-            }
+            # Processar a mensagem; a extração (coalescida com as simultâneas
+            # da mesma URL) salva o produto no banco
+            resultado = scraper.processar_mensagem(mensagem, extrair=lambda url: cache.atualizar(url, acesso=True))
         
         return Response(
-            json.dumps(resposta, ensure_ascii=False),
+            json.dumps(_resposta_webhook(resultado, formato), ensure_ascii=False),
             status=200,
             mimetype='application/json'
         )
@@ -257,22 +229,12 @@ def chatgpt_produto():
     # Verificar se deve forçar atualização
     force_update = request.args.get('force', 'false').lower() == 'true'
     
-    # Verificar se o produto já está no banco de dados
-    produto_db = None if force_update else get_produto_from_db(url)
-    
-    if produto_db and not force_update:
-        # Produto encontrado no banco, retornar diretamente
-        info_produto = produto_db
-    else:
-        # Produto não encontrado no banco ou forçando atualização, extrair informações
-        info_produto = scraper.extrair_info_ciainfor(url)
-        
-        # Salvar no banco de dados
-        if "erro" not in info_produto:
-            save_produto_to_db(info_produto)
+    # Buscar no cache conforme a validade, ou extrair informações
+    info_produto, fonte = cache.obter(url, force_update)
     
     # Formatar para o ChatGPT
     resposta = formatar_para_chatgpt(info_produto)
+    resposta["fonte"] = fonte
     
     return Response(
         json.dumps(resposta, ensure_ascii=False),
@@ -280,8 +242,24 @@ def chatgpt_produto():
         mimetype='application/json'
     )
 
-# Inicializar o banco de dados ao iniciar o aplicativo
-init_db()
+# Atualização agendada dos produtos em uma thread do servidor (AGENDADOR_THREAD=true);
+# cada worker inicia a sua, mas só o que detém a liderança no banco atualiza.
+# De preferência, rodar o agendador em processo separado (python agendador.py)
+agendador = AgendadorAtualizacoes(
+    cache.atualizar, get_produtos_para_atualizar, lideranca=Lideranca(PAPEL_AGENDADOR)
+)
+
+def iniciar_worker():
+    """Tarefas em segundo plano do worker; com o app pré-carregado, chamada depois do fork"""
+    if AGENDADOR_EM_THREAD:
+        agendador.iniciar()
+
+# Inicializar o banco de dados e o worker ao importar o aplicativo; com o
+# gunicorn.conf.py, o banco é inicializado uma vez no processo mestre e cada
+# worker é iniciado depois do fork
+if INICIAR_NA_IMPORTACAO:
+    init_db()
+    iniciar_worker()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 5000)), debug=True)